@@ -37,6 +37,9 @@ GearmanJobTasks = dict[str, TaskData]
 # {
 #     "3e0a1962-bd4b-4b04-8d2a-ba273e65fe7f": {
 #         "exitCode": 0,
+#         "startedTimestamp": datetime.datetime(
+#             2024, 8, 4, 21, 44, 52, 102349, tzinfo=datetime.timezone.utc
+#         ),
 #         "finishedTimestamp": datetime.datetime(
 #             2024, 8, 4, 21, 44, 55, 661575, tzinfo=datetime.timezone.utc
 #         ),
@@ -84,6 +87,7 @@ class MCPGearmanWorker(gearman.GearmanWorker):  # type: ignore
         for job in jobs:
             results[job.uuid] = {
                 "exitCode": job.get_exit_code(),
+                "startedTimestamp": job.start_time,
                 "finishedTimestamp": job.end_time,
             }
 
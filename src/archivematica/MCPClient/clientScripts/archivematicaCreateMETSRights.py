@@ -59,7 +59,7 @@ def _add_start_end_date_complex_type(name, elem, start_date, end_date, end_date_
         etree.SubElement(dates, ns.premisBNS + "endDate").text = end_date
 
 
-def archivematicaGetRights(job, metadataAppliesToList, fileUUID, state):
+def archivematicaGetRights(job, metadataAppliesToList, fileUUID, state, prefetch=None):
     """Create the premis:rightsStatement elements of a file to be included
     in its amdSec in the METS file.
 
@@ -69,14 +69,21 @@ def archivematicaGetRights(job, metadataAppliesToList, fileUUID, state):
     )
     :param fileUUID: string with UUID of the File
     :param state: create_mets_v2.MetsState object
+    :param prefetch: create_mets_prefetch.PremisPrefetch to read the rights
+        statements from instead of querying the database
     :return ret: list of lxml Element objects
     """
     ret = []
     for metadataAppliesToidentifier, metadataAppliesToType in metadataAppliesToList:
-        statements = RightsStatement.objects.filter(
-            metadataappliestoidentifier=metadataAppliesToidentifier,
-            metadataappliestotype_id=metadataAppliesToType,
-        )
+        if prefetch is not None:
+            statements = prefetch.rights_statements(
+                metadataAppliesToidentifier, metadataAppliesToType
+            )
+        else:
+            statements = RightsStatement.objects.filter(
+                metadataappliestoidentifier=metadataAppliesToidentifier,
+                metadataappliestotype_id=metadataAppliesToType,
+            )
         for statement in statements:
             rightsStatement = createRightsStatement(job, statement, fileUUID, state)
             ret.append(rightsStatement)
@@ -21,7 +21,10 @@ import errno
 import multiprocessing
 import os
 import re
+import socket
+import struct
 import subprocess
+import tempfile
 import uuid
 
 import django
@@ -31,12 +34,14 @@ from clamd import BufferTooLongError
 from clamd import ClamdNetworkSocket
 from clamd import ClamdUnixSocket
 from clamd import ConnectionError
+from clamd import ResponseError
 from django.conf import settings as mcpclient_settings
 from django.core.exceptions import ValidationError
 from django.db import transaction
 
 from archivematica.archivematicaCommon.custom_handlers import get_script_logger
-from archivematica.archivematicaCommon.databaseFunctions import insertIntoEvents
+from archivematica.archivematicaCommon.databaseFunctions import bulkInsertIntoEvents
+from archivematica.archivematicaCommon.databaseFunctions import chunks
 from archivematica.dashboard.main.models import Event
 from archivematica.dashboard.main.models import File
 
@@ -81,6 +86,13 @@ class ScannerBase(metaclass=abc.ABCMeta):
             3. details (str - extra info when ERROR or FOUND)
         """
 
+    def scan_many(self, paths):
+        """Scan several files and return a dict with the results of
+        ``scan`` for each path. Scanners override this to scan the files of a
+        batch together.
+        """
+        return {path: self.scan(path) for path in paths}
+
     @abc.abstractproperty
     def version_attrs(self):
         """Obtain the version details. It is expected to return a tuple of two
@@ -98,6 +110,102 @@ class ScannerBase(metaclass=abc.ABCMeta):
         return self.version_attrs()[1]
 
 
+class ClamdSession:
+    """Several clamd commands sent over one connection (``IDSESSION``).
+
+    Commands are sent one at a time and clamd numbers the replies of a
+    session in order, starting at one. The clamd library has no sessions, so
+    the session uses a socket of its own.
+    """
+
+    # Same as ``clamd.ClamdNetworkSocket.instream``.
+    CHUNK_SIZE = 1024
+
+    # Result of a scan, e.g. "/path: Eicar-Signature FOUND".
+    RESULT = re.compile(r"^(?P<path>.*): ((?P<reason>.+) )?(?P<status>FOUND|OK|ERROR)$")
+
+    def __init__(self, addr, timeout=None):
+        self.addr = addr
+        self.timeout = timeout
+        self.socket = None
+        self.request_id = 0
+        self.buffer = b""
+
+    def __enter__(self):
+        self.socket = self._connect()
+        try:
+            self._send(b"zIDSESSION\0")
+        except ConnectionError:
+            self.socket.close()
+            raise
+        return self
+
+    def __exit__(self, *exc_info):
+        try:
+            self._send(b"zEND\0")
+        except ConnectionError:
+            pass
+        finally:
+            self.socket.close()
+
+    def _connect(self):
+        """Connect to clamd like ``ClamdScanner.get_client`` does."""
+        try:
+            if ":" not in self.addr:
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.settimeout(self.timeout)
+                try:
+                    sock.connect(self.addr)
+                except OSError:
+                    sock.close()
+                    raise
+                return sock
+            host, port = self.addr.split(":")
+            return socket.create_connection((host, int(port)), timeout=self.timeout)
+        except OSError as err:
+            raise ConnectionError(f"Error connecting to {self.addr}: {err}")
+
+    def _send(self, data):
+        try:
+            self.socket.sendall(data)
+        except OSError as err:
+            raise ConnectionError(f"Error while writing to socket: {err}")
+
+    def _reply(self):
+        self.request_id += 1
+        try:
+            while b"\0" not in self.buffer:
+                data = self.socket.recv(4096)
+                if not data:
+                    raise ConnectionError("Connection closed by clamd")
+                self.buffer += data
+        except OSError as err:
+            raise ConnectionError(f"Error while reading from socket: {err}")
+        reply, self.buffer = self.buffer.split(b"\0", 1)
+        request_id, _, result = reply.decode("utf-8", "replace").partition(": ")
+        if request_id != str(self.request_id):
+            raise ConnectionError(f"Unexpected reply from clamd: {reply!r}")
+        if result == "INSTREAM size limit exceeded. ERROR":
+            raise BufferTooLongError(result)
+        match = self.RESULT.match(result)
+        if match is None:
+            raise ResponseError(result.rsplit("ERROR", 1)[0])
+        return match.group("status"), match.group("reason")
+
+    def scan(self, path):
+        """Scan a file by reference, return its status and reason."""
+        self._send(b"zSCAN " + os.fsencode(path) + b"\0")
+        return self._reply()
+
+    def instream(self, buff):
+        """Stream the contents of a file, return its status and reason."""
+        self._send(b"zINSTREAM\0")
+        while chunk := buff.read(self.CHUNK_SIZE):
+            self._send(struct.pack("!L", len(chunk)) + chunk)
+        self._send(struct.pack("!L", 0))
+        return self._reply()
+
+
 class ClamdScanner(ScannerBase):
     PROGRAM = "ClamAV (clamd)"
 
@@ -125,6 +233,47 @@ class ClamdScanner(ScannerBase):
             passed = True
         return passed, state, details
 
+    def scan_many(self, paths):
+        """Scan the files over one clamd session.
+
+        If the session breaks, the files left are scanned one at a time.
+        """
+        results = {}
+        remaining = list(paths)
+        if not remaining:
+            return results
+        logger.info(
+            "Scanning %d files in one clamd session (%s).",
+            len(remaining),
+            "stream" if self.stream else "filesystem reference",
+        )
+        try:
+            with ClamdSession(self.addr, self.timeout) as session:
+                while remaining:
+                    path = remaining[0]
+                    try:
+                        if self.stream:
+                            with open(path, "rb") as f:
+                                state, details = session.instream(f)
+                        else:
+                            state, details = session.scan(path)
+                    except ConnectionError:
+                        raise
+                    except (ResponseError, OSError) as err:
+                        results[path] = (self.clamd_exception_handler(err), None, None)
+                    else:
+                        results[path] = (state == "OK", state, details)
+                    remaining.pop(0)
+        except ConnectionError as err:
+            logger.warning(
+                "Clamd session ended early, scanning %d files one at a time: %s",
+                len(remaining),
+                err,
+            )
+        for path in remaining:
+            results[path] = self.scan(path)
+        return results
+
     @staticmethod
     def clamd_exception_handler(err):
         """Manage each decision for an exception when it is raised. Ensure
@@ -187,25 +336,73 @@ class ClamScanner(ScannerBase):
     def _call(self, *args):
         return subprocess.check_output((self.COMMAND,) + args)
 
+    @staticmethod
+    def _limits():
+        return (
+            "--max-filesize=%dM" % mcpclient_settings.CLAMAV_CLIENT_MAX_FILE_SIZE,
+            "--max-scansize=%dM" % mcpclient_settings.CLAMAV_CLIENT_MAX_SCAN_SIZE,
+        )
+
     def scan(self, path):
         passed, state, details = (False, "ERROR", None)
         try:
-            max_file_size = (
-                "--max-filesize=%dM" % mcpclient_settings.CLAMAV_CLIENT_MAX_FILE_SIZE
-            )
-            max_scan_size = (
-                "--max-scansize=%dM" % mcpclient_settings.CLAMAV_CLIENT_MAX_SCAN_SIZE
-            )
-            self._call(max_file_size, max_scan_size, path)
+            self._call(*self._limits(), path)
         except subprocess.CalledProcessError as err:
             if err.returncode == 1:
                 state = "FOUND"
+                # Report the signature found, like scan_many.
+                _, _, details = self._parse_report(err.output, [path]).get(
+                    path, (None, None, None)
+                )
             else:
                 logger.error("Virus scanning failed: %s", err.output, exc_info=True)
         else:
             passed, state = (True, "OK")
         return passed, state, details
 
+    def scan_many(self, paths):
+        """Scan the files with one clamscan run, given a list of the files.
+
+        Files missing from the report, e.g. because of scanning errors, are
+        scanned again one at a time.
+        """
+        paths = list(paths)
+        if not paths:
+            return {}
+        with tempfile.NamedTemporaryFile(suffix=".txt") as file_list:
+            for path in paths:
+                file_list.write(os.fsencode(path) + b"\n")
+            file_list.flush()
+            try:
+                output = self._call(
+                    *self._limits(), "--no-summary", f"--file-list={file_list.name}"
+                )
+            except subprocess.CalledProcessError as err:
+                output = err.output or ""
+            except OSError as err:
+                logger.error("Virus scanning failed: %s", err)
+                output = ""
+        results = self._parse_report(output, paths)
+        for path in paths:
+            if path not in results:
+                results[path] = self.scan(path)
+        return results
+
+    @staticmethod
+    def _parse_report(output, paths):
+        """Return the results of ``paths`` found in the output of clamscan."""
+        results = {}
+        expected = set(paths)
+        for line in os.fsdecode(output or b"").splitlines():
+            path, _, status = line.rpartition(": ")
+            if path not in expected:
+                continue
+            if status == "OK":
+                results[path] = (True, "OK", None)
+            elif status.endswith(" FOUND"):
+                results[path] = (False, "FOUND", status[: -len(" FOUND")])
+        return results
+
     def version_attrs(self):
         try:
             self._version_attrs
@@ -297,43 +494,131 @@ def get_size(file_uuid, path):
         return None
 
 
-def scan_file(event_queue, file_uuid, path, date, task_uuid):
-    if file_already_scanned(file_uuid):
+def exceeded_scan_limit(size):
+    """Return the name and value in bytes of the first scanner limit that a
+    file of ``size`` bytes exceeds, or None.
+    """
+    max_file_size = mcpclient_settings.CLAMAV_CLIENT_MAX_FILE_SIZE * 1024 * 1024
+    max_scan_size = mcpclient_settings.CLAMAV_CLIENT_MAX_SCAN_SIZE * 1024 * 1024
+    if size > max_file_size:
+        return "max file size", max_file_size
+    if size > max_scan_size:
+        return "max scan size", max_scan_size
+    return None
+
+
+class ScanBatch:
+    """Scanner and database lookups shared by the files of a batch.
+
+    ``prefetch`` finds out which files of the batch were already scanned and
+    their sizes with a query each, and scans the files that need it with one
+    ``ScannerBase.scan_many`` call. Without it, or for files outside of the
+    batch, everything is done file by file.
+    """
+
+    def __init__(self):
+        self._scanner = None
+        self._file_uuids = set()
+        self._scanned = set()
+        self._sizes = {}
+        self._results = {}
+
+    @staticmethod
+    def _key(file_uuid):
+        try:
+            return str(uuid.UUID(file_uuid))
+        except (TypeError, ValueError):
+            return None
+
+    def scanner(self):
+        """Return the scanner of the batch."""
+        if self._scanner is None:
+            self._scanner = get_scanner()
+        return self._scanner
+
+    def prefetch(self, files):
+        """Look up and scan the files of the batch, given as a list of
+        (file UUID, path) tuples.
+        """
+        file_uuids = sorted({self._key(file_uuid) for file_uuid, _ in files} - {None})
+        for chunk in chunks(file_uuids):
+            self._scanned.update(
+                str(file_uuid)
+                for file_uuid in Event.objects.filter(
+                    file_uuid_id__in=chunk, event_type="virus check"
+                ).values_list("file_uuid_id", flat=True)
+            )
+            self._sizes.update(
+                (str(file_uuid), size)
+                for file_uuid, size in File.objects.filter(uuid__in=chunk).values_list(
+                    "uuid", "size"
+                )
+            )
+        self._file_uuids.update(file_uuids)
+
+        paths = []
+        for file_uuid, path in files:
+            if self.already_scanned(file_uuid):
+                continue
+            size = self.size(file_uuid, path)
+            if size is not None and exceeded_scan_limit(size) is None:
+                paths.append(path)
+        if not paths:
+            return
+        try:
+            self._results = self.scanner().scan_many(paths)
+        except Exception:
+            logger.error(
+                "Unexpected error scanning the batch, scanning files one at a time",
+                exc_info=True,
+            )
+
+    def already_scanned(self, file_uuid):
+        key = self._key(file_uuid)
+        if key not in self._file_uuids:
+            return file_already_scanned(file_uuid)
+        return key in self._scanned
+
+    def size(self, file_uuid, path):
+        key = self._key(file_uuid)
+        if key not in self._file_uuids or key not in self._sizes:
+            return get_size(file_uuid, path)
+        return self._sizes[key]
+
+    def scan(self, path):
+        """Return the result of the scan of a file."""
+        if path in self._results:
+            return self._results[path]
+        return self.scanner().scan(path)
+
+
+def scan_file(event_queue, file_uuid, path, date, task_uuid, batch=None):
+    if batch is None:
+        batch = ScanBatch()
+
+    if batch.already_scanned(file_uuid):
         logger.info("Virus scan already performed, not running scan again")
         return 0
 
     scanner, passed = None, False
 
     try:
-        size = get_size(file_uuid, path)
+        size = batch.size(file_uuid, path)
         if size is None:
             logger.error("Getting file size returned: %s", size)
             return 1
 
-        max_file_size = mcpclient_settings.CLAMAV_CLIENT_MAX_FILE_SIZE * 1024 * 1024
-        max_scan_size = mcpclient_settings.CLAMAV_CLIENT_MAX_SCAN_SIZE * 1024 * 1024
-
-        valid_scan = True
-
-        if size > max_file_size:
+        exceeded_limit = exceeded_scan_limit(size)
+        if exceeded_limit is not None:
             logger.info(
                 "File will not be scanned. Size %s bytes greater than scanner "
-                "max file size %s bytes",
+                "%s %s bytes",
                 size,
-                max_file_size,
+                *exceeded_limit,
             )
-            valid_scan = False
-        elif size > max_scan_size:
-            logger.info(
-                "File will not be scanned. Size %s bytes greater than scanner "
-                "max scan size %s bytes",
-                size,
-                max_scan_size,
-            )
-            valid_scan = False
-
-        if valid_scan:
-            scanner = get_scanner()
+            passed, state, details = None, None, None
+        else:
+            scanner = batch.scanner()
             logger.info(
                 "Using scanner %s (%s - %s)",
                 scanner.program(),
@@ -341,9 +626,7 @@ def scan_file(event_queue, file_uuid, path, date, task_uuid):
                 scanner.virus_definitions(),
             )
 
-            passed, state, details = scanner.scan(path)
-        else:
-            passed, state, details = None, None, None
+            passed, state, details = batch.scan(path)
 
     except Exception:
         logger.error("Unexpected error scanning file %s", path, exc_info=True)
@@ -365,10 +648,14 @@ def scan_file(event_queue, file_uuid, path, date, task_uuid):
 def call(jobs):
     event_queue = []
 
+    # Share the scanner and the database lookups between the files of the
+    # batch, which are scanned together first.
+    batch = ScanBatch()
+    batch.prefetch([tuple(job.args[1:3]) for job in jobs if len(job.args) > 2])
+
     for job in jobs:
         with job.JobContext(logger=logger):
-            job.set_status(scan_file(event_queue, *job.args[1:]))
+            job.set_status(scan_file(event_queue, *job.args[1:], batch=batch))
 
     with transaction.atomic():
-        for e in event_queue:
-            insertIntoEvents(**e)
+        bulkInsertIntoEvents(event_queue)
@@ -10,6 +10,7 @@ import argparse
 import dataclasses
 import multiprocessing
 import uuid
+from typing import Optional
 
 import django
 
@@ -26,8 +27,8 @@ from archivematica.archivematicaCommon.databaseFunctions import (
 from archivematica.archivematicaCommon.dicts import ReplacementDict
 from archivematica.archivematicaCommon.dicts import replace_string_values
 from archivematica.archivematicaCommon.executeOrRunSubProcess import executeOrRun
+from archivematica.dashboard.fpr import snapshot
 from archivematica.dashboard.fpr.models import FormatVersion
-from archivematica.dashboard.fpr.models import FPRule
 from archivematica.dashboard.main.models import FPCommandOutput
 from archivematica.MCPClient.client.job import Job
 from archivematica.MCPClient.clientScripts.lib import setup_dicts
@@ -43,9 +44,20 @@ def concurrent_instances() -> int:
     return multiprocessing.cpu_count()
 
 
-def main(job: Job, file_uuid: uuid.UUID, sip_uuid: uuid.UUID) -> int:
+def main(
+    job: Job,
+    file_uuid: uuid.UUID,
+    sip_uuid: uuid.UUID,
+    fpr: Optional[snapshot.FPRSnapshot] = None,
+    file_format_versions: Optional[snapshot.FileFormatVersions] = None,
+) -> int:
     setup_dicts(mcpclient_settings)
 
+    if fpr is None:
+        fpr = snapshot.current()
+    if file_format_versions is None:
+        file_format_versions = snapshot.FileFormatVersions([file_uuid])
+
     failed = False
 
     # Check to see whether the file has already been characterized; don't try
@@ -54,17 +66,17 @@ def main(job: Job, file_uuid: uuid.UUID, sip_uuid: uuid.UUID) -> int:
         return 0
 
     try:
-        format = FormatVersion.active.get(fileformatversion__file_uuid=file_uuid)
+        format = file_format_versions.active_format_version(file_uuid)
     except (FormatVersion.DoesNotExist, ValidationError):
         rules = format = None
 
     if format:
-        rules = FPRule.active.filter(format=format.uuid, purpose="characterization")
+        rules = fpr.rules_for_format(format, "characterization")
 
     # Characterization always occurs - if nothing is specified, get one or more
     # defaults specified in the FPR.
     if not rules:
-        rules = FPRule.active.filter(purpose="default_characterization")
+        rules = fpr.rules_for_purpose("default_characterization")
 
     for rule in rules:
         if (
@@ -145,7 +157,18 @@ def call(jobs: list[Job]) -> None:
     parser = get_parser()
 
     with transaction.atomic():
+        jobs_args = []
         for job in jobs:
             with job.JobContext():
-                args = parse_args(parser, job)
-                job.set_status(main(job, args.file_uuid, args.sip_uuid))
+                jobs_args.append((job, parse_args(parser, job)))
+
+        fpr = snapshot.current()
+        file_format_versions = snapshot.FileFormatVersions(
+            args.file_uuid for _, args in jobs_args
+        )
+
+        for job, args in jobs_args:
+            with job.JobContext():
+                job.set_status(
+                    main(job, args.file_uuid, args.sip_uuid, fpr, file_format_versions)
+                )
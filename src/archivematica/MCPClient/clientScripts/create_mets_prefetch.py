@@ -0,0 +1,276 @@
+"""Bulk loading of the database rows needed to describe files in a METS file.
+
+``create_mets_v2`` writes an amdSec for every file of a SIP: a PREMIS object
+built from the File, FileID, FPCommandOutput and Derivation tables, the
+PREMIS events and agents of the file and, for original files, its rights
+statements. Looking those up file by file costs around ten queries per file.
+
+``PremisPrefetch`` loads each kind of row for all the files it knows about in
+a few chunked queries the first time it is needed and answers the per file
+lookups from memory. Characterization outputs (e.g. FITS XML) are the bulk of
+that data, so only one chunk of them is held at a time.
+"""
+
+from collections import defaultdict
+
+from archivematica.archivematicaCommon.databaseFunctions import CHUNK_SIZE
+from archivematica.archivematicaCommon.databaseFunctions import chunks
+from archivematica.dashboard.main.models import Derivation
+from archivematica.dashboard.main.models import Event
+from archivematica.dashboard.main.models import File
+from archivematica.dashboard.main.models import FileID
+from archivematica.dashboard.main.models import FPCommandOutput
+from archivematica.dashboard.main.models import RightsStatement
+
+CHARACTERIZATION_PURPOSES = ["characterization", "default_characterization"]
+
+# Related rows read by ``archivematicaCreateMETSRights.createRightsStatement``.
+RIGHTS_STATEMENT_RELATIONS = (
+    "rightsstatementcopyright_set__rightsstatementcopyrightnote_set",
+    "rightsstatementcopyright_set__rightsstatementcopyrightdocumentationidentifier_set",
+    "rightsstatementlicense_set__rightsstatementlicensedocumentationidentifier_set",
+    "rightsstatementlicense_set__rightsstatementlicensenote_set",
+    "rightsstatementotherrightsinformation_set__rightsstatementotherrightsdocumentationidentifier_set",
+    "rightsstatementotherrightsinformation_set__rightsstatementotherrightsinformationnote_set",
+    "rightsstatementstatuteinformation_set__rightsstatementstatuteinformationnote_set",
+    "rightsstatementstatuteinformation_set__rightsstatementstatutedocumentationidentifier_set",
+    "rightsstatementrightsgranted_set__restrictions",
+    "rightsstatementrightsgranted_set__notes",
+)
+
+
+class PremisPrefetch:
+    """In-memory indexes of the PREMIS related rows of a set of files.
+
+    Every kind of row is loaded lazily, so callers only pay for what they
+    read. Lookups for files outside the set are answered by a prefetch of
+    that file alone.
+    """
+
+    def __init__(self, file_uuids, rights_identifiers=()):
+        self.file_uuids = list(dict.fromkeys(str(uuid) for uuid in file_uuids))
+        self._positions = {uuid: i for i, uuid in enumerate(self.file_uuids)}
+        self.rights_identifiers = set(self.file_uuids)
+        self.rights_identifiers.update(str(uuid) for uuid in rights_identifiers)
+
+        self._files = None
+        self._files_by_location = None
+        self._formats = None
+        self._characterization_documents = None
+        self._derivations_by_source = None
+        self._derivations_by_derived = None
+        self._events = None
+        self._rights_statements = None
+
+    @classmethod
+    def for_sip(cls, sip_uuid):
+        """Return a prefetch covering the files of the SIP given.
+
+        The files are loaded straight away. The rights statements of the SIP
+        and of the transfers of its files are covered too.
+        """
+        files = {
+            str(f.uuid): f
+            for f in File.objects.filter(sip_id=sip_uuid)
+            .select_related("transfer")
+            .prefetch_related("identifiers")
+            .order_by("pk")
+            .iterator(chunk_size=CHUNK_SIZE)
+        }
+        transfer_uuids = {f.transfer_id for f in files.values() if f.transfer_id}
+        # ``createFileSec`` builds the amdSecs walking the SIP directory in
+        # sorted order. Listing the files in the same order means each chunk
+        # of characterization outputs is used up before the next is loaded.
+        file_uuids = sorted(
+            files,
+            key=lambda uuid: bytes(files[uuid].currentlocation or b"").split(b"/"),
+        )
+
+        prefetch = cls(file_uuids, rights_identifiers=[sip_uuid, *transfer_uuids])
+        prefetch._files = files
+        return prefetch
+
+    def _covering(self, file_uuid):
+        if file_uuid in self._positions:
+            return self
+        return PremisPrefetch([file_uuid])
+
+    def file(self, file_uuid):
+        """Return the File with the UUID given."""
+        file_uuid = str(file_uuid)
+        prefetch = self._covering(file_uuid)
+        if prefetch._files is None:
+            prefetch._files = {}
+            for chunk in chunks(prefetch.file_uuids):
+                for f in File.objects.filter(uuid__in=chunk).prefetch_related(
+                    "identifiers"
+                ):
+                    prefetch._files[str(f.uuid)] = f
+        try:
+            return prefetch._files[file_uuid]
+        except KeyError:
+            raise File.DoesNotExist(f"File {file_uuid} does not exist")
+
+    def files_at(self, location):
+        """Return the files of the set, not removed, at the location given."""
+        if self._files_by_location is None:
+            self._files_by_location = defaultdict(list)
+            for file_uuid in self.file_uuids:
+                f = self.file(file_uuid)
+                if f.removedtime is None:
+                    self._files_by_location[bytes(f.currentlocation)].append(f)
+        return self._files_by_location.get(bytes(location), [])
+
+    def formats(self, file_uuid):
+        """Return the FileID rows of a file as (name, version, registry name,
+        registry key) tuples.
+        """
+        file_uuid = str(file_uuid)
+        prefetch = self._covering(file_uuid)
+        if prefetch._formats is None:
+            prefetch._formats = defaultdict(list)
+            for chunk in chunks(prefetch.file_uuids):
+                for uuid, *row in (
+                    FileID.objects.filter(file_id__in=chunk)
+                    .order_by("pk")
+                    .values_list(
+                        "file_id",
+                        "format_name",
+                        "format_version",
+                        "format_registry_name",
+                        "format_registry_key",
+                    )
+                ):
+                    prefetch._formats[str(uuid)].append(tuple(row))
+        return prefetch._formats.get(file_uuid, [])
+
+    def characterization_documents(self, file_uuid):
+        """Return the characterization outputs of a file.
+
+        Only the outputs of one chunk of files are held. Looking up a file
+        outside of it loads the outputs of that file and of the files that
+        follow it, in place of the current chunk. Call ``release`` once the
+        outputs of a file have been used.
+        """
+        file_uuid = str(file_uuid)
+        prefetch = self._covering(file_uuid)
+        documents = prefetch._characterization_documents
+        if documents is None or file_uuid not in documents:
+            prefetch._load_characterization_documents(file_uuid)
+        return prefetch._characterization_documents[file_uuid]
+
+    def _load_characterization_documents(self, file_uuid):
+        start = self._positions[file_uuid]
+        chunk = self.file_uuids[start : start + CHUNK_SIZE]
+
+        self._characterization_documents = {uuid: [] for uuid in chunk}
+        for uuid, content in (
+            FPCommandOutput.objects.filter(
+                file_id__in=chunk, rule__purpose__in=CHARACTERIZATION_PURPOSES
+            )
+            .order_by("pk")
+            .values_list("file_id", "content")
+        ):
+            self._characterization_documents[str(uuid)].append(content)
+
+    def release(self, file_uuid):
+        """Drop the characterization outputs of a file whose amdSec is built."""
+        if self._characterization_documents is not None:
+            self._characterization_documents.pop(str(file_uuid), None)
+
+    def _load_derivations(self):
+        derivations = {}
+        for chunk in chunks(self.file_uuids):
+            for derivation in Derivation.objects.filter(source_file_id__in=chunk):
+                derivations[derivation.pk] = derivation
+            for derivation in Derivation.objects.filter(derived_file_id__in=chunk):
+                derivations[derivation.pk] = derivation
+
+        self._derivations_by_source = defaultdict(list)
+        self._derivations_by_derived = defaultdict(list)
+        for pk in sorted(derivations):
+            derivation = derivations[pk]
+            self._derivations_by_source[str(derivation.source_file_id)].append(
+                derivation
+            )
+            self._derivations_by_derived[str(derivation.derived_file_id)].append(
+                derivation
+            )
+
+    def derivations_from(self, file_uuid):
+        """Return the Derivations, with an event, where the file is the source."""
+        file_uuid = str(file_uuid)
+        prefetch = self._covering(file_uuid)
+        if prefetch._derivations_by_source is None:
+            prefetch._load_derivations()
+        return [
+            derivation
+            for derivation in prefetch._derivations_by_source.get(file_uuid, [])
+            if derivation.event_id is not None
+        ]
+
+    def derivations_to(self, file_uuid):
+        """Return the Derivations, with an event, where the file is derived."""
+        return [
+            derivation
+            for derivation in self.sources(file_uuid)
+            if derivation.event_id is not None
+        ]
+
+    def sources(self, file_uuid):
+        """Return all the Derivations where the file is derived."""
+        file_uuid = str(file_uuid)
+        prefetch = self._covering(file_uuid)
+        if prefetch._derivations_by_derived is None:
+            prefetch._load_derivations()
+        return prefetch._derivations_by_derived.get(file_uuid, [])
+
+    def events(self, file_uuid):
+        """Return the Events of a file with their agents prefetched."""
+        file_uuid = str(file_uuid)
+        prefetch = self._covering(file_uuid)
+        if prefetch._events is None:
+            prefetch._events = defaultdict(list)
+            for chunk in chunks(prefetch.file_uuids):
+                for event in (
+                    Event.objects.filter(file_uuid_id__in=chunk)
+                    .order_by("pk")
+                    .prefetch_related("agents")
+                ):
+                    prefetch._events[str(event.file_uuid_id)].append(event)
+        return prefetch._events.get(file_uuid, [])
+
+    def agents(self, file_uuid):
+        """Return the distinct Agents linked to the Events of a file."""
+        agents = {}
+        for event in self.events(file_uuid):
+            for agent in event.agents.all():
+                agents.setdefault(agent.pk, agent)
+        return [agents[pk] for pk in sorted(agents)]
+
+    def rights_statements(self, identifier, metadata_applies_to_type):
+        """Return the RightsStatements of a File, SIP or Transfer."""
+        if identifier is None:
+            return []
+        identifier = str(identifier)
+        prefetch = self
+        if identifier not in self.rights_identifiers:
+            prefetch = PremisPrefetch([], rights_identifiers=[identifier])
+        if prefetch._rights_statements is None:
+            prefetch._rights_statements = defaultdict(list)
+            for chunk in chunks(sorted(prefetch.rights_identifiers)):
+                for statement in (
+                    RightsStatement.objects.filter(
+                        metadataappliestoidentifier__in=chunk
+                    )
+                    .order_by("pk")
+                    .prefetch_related(*RIGHTS_STATEMENT_RELATIONS)
+                ):
+                    key = (
+                        statement.metadataappliestoidentifier,
+                        str(statement.metadataappliestotype_id),
+                    )
+                    prefetch._rights_statements[key].append(statement)
+        return prefetch._rights_statements.get(
+            (identifier, str(metadata_applies_to_type)), []
+        )
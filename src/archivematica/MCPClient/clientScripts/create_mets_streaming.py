@@ -0,0 +1,266 @@
+"""Incremental writing of the METS file built by ``create_mets_v2``.
+
+The METS file of a SIP carries an amdSec per file and each of them wraps
+PREMIS documents, e.g. the characterization output of the file. Keeping all
+of those in memory until the document is written can take more memory than
+the MCPClient host has.
+
+``DocumentSpool`` serializes the PREMIS documents to a temporary file as soon
+as they are built and leaves a small placeholder element in their place, so
+the METS tree only holds the structure and IDs. ``write_mets`` then writes
+the tree serialized by ``metsrw`` one top level section at a time, swapping
+the placeholders back for their documents. The METS bytes written are the
+same as those written by ``create_mets_v2.write_mets``.
+"""
+
+import collections
+import copy
+import html
+import io
+import os
+import tempfile
+import uuid
+
+from lxml import etree
+
+from archivematica.archivematicaCommon import namespaces as ns
+
+SPOOL_NS = "urn:archivematica:mets-spool"
+PLACEHOLDER_TAG = f"{{{SPOOL_NS}}}document"
+MARKER_TAG = f"{{{SPOOL_NS}}}marker"
+
+# Root element namespaces used by ``create_mets_v2.main`` and ``metsrw``.
+ROOT_NSMAP = {"mets": ns.metsNS, "xsi": ns.xsiNS, "xlink": ns.xlinkNS}
+
+VALIDATOR_TESTER_HEAD = """<html>
+<body>
+  <form method="post" action="http://pim.fcla.edu/validate/results">
+    <label for="document">Enter XML Document:</label>
+    <br/>
+    <textarea id="directinput" rows="12" cols="76" name="document">"""
+VALIDATOR_TESTER_TAIL = """</textarea>
+    <br/>
+    <br/>
+    <input type="submit" value="Validate" />
+    <br/>
+  </form>
+</body>
+</html>"""
+
+# An XML document serialized by ``dump_document``. ``empty_text`` and
+# ``empty_tail`` hold the positions, in document order, of the nodes with an
+# empty string as text or tail: those are lost when the document is parsed
+# again but lxml serializes them differently than None.
+SerializedDocument = collections.namedtuple(
+    "SerializedDocument", "data empty_text empty_tail"
+)
+
+
+def dump_document(element):
+    """Serialize an XML document so that ``load_document`` gives it back."""
+    empty = {"text": [], "tail": []}
+    for position, node in enumerate(element.iter()):
+        for attribute, positions in empty.items():
+            if getattr(node, attribute) == "":
+                positions.append(position)
+
+    return SerializedDocument(
+        etree.tostring(element, encoding="utf-8", with_tail=False),
+        tuple(empty["text"]),
+        tuple(empty["tail"]),
+    )
+
+
+def load_document(document, parser=None):
+    """Parse a document serialized by ``dump_document``."""
+    element = etree.fromstring(document.data, parser)
+    if document.empty_text or document.empty_tail:
+        nodes = list(element.iter())
+        for position in document.empty_text:
+            nodes[position].text = ""
+        for position in document.empty_tail:
+            nodes[position].tail = ""
+
+    return element
+
+
+class DocumentSpool:
+    """Temporary file holding the serialized XML documents of a METS file."""
+
+    def __init__(self, directory=None):
+        if directory is not None and not os.path.isdir(directory):
+            directory = None
+        self.file = tempfile.TemporaryFile(dir=directory)
+        self.parser = etree.XMLParser(huge_tree=True)
+        self._context = self._xml_data_context()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def spool(self, element):
+        """Write ``element`` to the spool and return its placeholder."""
+        return self.spool_document(dump_document(element))
+
+    def spool_document(self, document):
+        """Write a ``SerializedDocument`` to the spool and return its
+        placeholder.
+        """
+        self.file.seek(0, io.SEEK_END)
+        offset = self.file.tell()
+        self.file.write(document.data)
+
+        placeholder = etree.Element(
+            PLACEHOLDER_TAG,
+            nsmap={"spool": SPOOL_NS},
+            offset=str(offset),
+            length=str(len(document.data)),
+        )
+        if document.empty_text:
+            placeholder.set("empty-text", " ".join(map(str, document.empty_text)))
+        if document.empty_tail:
+            placeholder.set("empty-tail", " ".join(map(str, document.empty_tail)))
+
+        return placeholder
+
+    def restore(self, tree):
+        """Replace the placeholders found in ``tree`` with their documents."""
+        for placeholder in list(tree.iter(PLACEHOLDER_TAG)):
+            placeholder.getparent().replace(placeholder, self._load(placeholder))
+
+    def _load(self, placeholder):
+        self.file.seek(int(placeholder.get("offset")))
+        document = SerializedDocument(
+            self.file.read(int(placeholder.get("length"))),
+            tuple(int(i) for i in placeholder.get("empty-text", "").split()),
+            tuple(int(i) for i in placeholder.get("empty-tail", "").split()),
+        )
+        element = load_document(document, self.parser)
+
+        # metsrw copies every document out of the tree it parses, which adds
+        # the namespace declarations of the METS root to it. Copy it from the
+        # same position so that it is serialized the same way.
+        self._context.append(element)
+        result = copy.deepcopy(element)
+        self._context.remove(element)
+
+        return result
+
+    @staticmethod
+    def _xml_data_context():
+        root = etree.Element(ns.metsBNS + "mets", nsmap=ROOT_NSMAP)
+        amd_sec = etree.SubElement(root, ns.metsBNS + "amdSec")
+        subsection = etree.SubElement(amd_sec, ns.metsBNS + "techMD")
+        md_wrap = etree.SubElement(subsection, ns.metsBNS + "mdWrap")
+        return etree.SubElement(md_wrap, ns.metsBNS + "xmlData")
+
+
+class _SectionWriter:
+    """Writes the top level elements of a document one at a time."""
+
+    def __init__(self, root, stream, validator_stream=None):
+        self.root = root
+        self.stream = stream
+        self.validator_stream = validator_stream
+
+        # Serialize the root around a marker to learn what goes before and
+        # after its children.
+        marker = etree.SubElement(root, MARKER_TAG, nsmap={"spool": SPOOL_NS})
+        document = self._serialize()
+        root.remove(marker)
+        start = document.index(b"  <spool:marker")
+        self.head = document[:start]
+        self.tail = document[document.index(b"\n", start) + 1 :]
+
+    def _serialize(self):
+        buffer = io.BytesIO()
+        etree.ElementTree(self.root).write(
+            buffer, pretty_print=True, xml_declaration=True, encoding="utf-8"
+        )
+        return buffer.getvalue()
+
+    def _write(self, data):
+        self.stream.write(data)
+        if self.validator_stream is not None:
+            self.validator_stream.write(html.escape(data.decode("utf-8"), quote=False))
+
+    def __enter__(self):
+        if self.validator_stream is not None:
+            self.validator_stream.write(html.escape(VALIDATOR_TESTER_HEAD, quote=False))
+        self._write(self.head)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            return
+        self._write(self.tail)
+        if self.validator_stream is not None:
+            self.validator_stream.write(html.escape(VALIDATOR_TESTER_TAIL, quote=False))
+
+    def write(self, element):
+        self.root.append(element)
+        try:
+            document = self._serialize()
+        finally:
+            self.root.remove(element)
+        self._write(document[len(self.head) : len(document) - len(self.tail)])
+
+
+def write_mets(mets, filename, spool=None, normative_structmap=True):
+    """Write a ``metsrw`` document to filename, and a validate METS form.
+
+    The document is serialized by ``metsrw`` with the documents held by
+    ``spool`` still left out. Each top level section then has them put back
+    and is written on its own, so only one section is complete in memory at
+    a time. Both files are written next to their final paths and only moved
+    into place once complete.
+
+    Unlike ``create_mets_v2.write_validator_tester``, the form holds the text
+    of the METS document rather than the ``repr`` of its bytes.
+    """
+    root = mets.serialize(normative_structmap=normative_structmap)
+    sections = list(root)
+    for section in sections:
+        root.remove(section)
+    # Write the sections from the end of the list, dropping each once written.
+    sections.reverse()
+
+    validator_filename = filename + ".validatorTester.html"
+    temporary_filenames = []
+    try:
+        with (
+            _temporary_file(filename, temporary_filenames, "wb") as stream,
+            _temporary_file(
+                validator_filename, temporary_filenames, "w", encoding="utf-8"
+            ) as validator_stream,
+            _SectionWriter(root, stream, validator_stream) as writer,
+        ):
+            while sections:
+                section = sections.pop()
+                if spool is not None:
+                    spool.restore(section)
+                writer.write(section)
+        os.replace(temporary_filenames[0], filename)
+        os.replace(temporary_filenames[1], validator_filename)
+    finally:
+        for temporary_filename in temporary_filenames:
+            if os.path.exists(temporary_filename):
+                os.remove(temporary_filename)
+
+
+def _temporary_file(path, filenames, mode, **kwargs):
+    """Create a new file next to path to write it, recording its name.
+
+    Unlike ``tempfile``, the file gets the same permissions as a file created
+    with ``open``.
+    """
+    directory, basename = os.path.split(path)
+    filename = os.path.join(directory, f".{basename}.{uuid.uuid4().hex}.tmp")
+    stream = open(filename, mode.replace("w", "x"), **kwargs)
+    filenames.append(filename)
+    return stream
@@ -17,7 +17,10 @@
 # You should have received a copy of the GNU General Public License
 # along with Archivematica.    If not, see <http://www.gnu.org/licenses/>.
 import collections
+import concurrent.futures
 import copy
+import itertools
+import multiprocessing
 import os
 import pprint
 import re
@@ -37,6 +40,7 @@ django.setup()
 
 from bagit import Bag
 from bagit import BagError
+from django import db
 from django.conf import settings as mcpclient_settings
 from django.core.exceptions import ValidationError
 
@@ -50,13 +54,11 @@ from archivematica.dashboard.main.models import Agent
 from archivematica.dashboard.main.models import Derivation
 from archivematica.dashboard.main.models import Directory
 from archivematica.dashboard.main.models import DublinCore
-from archivematica.dashboard.main.models import Event
 from archivematica.dashboard.main.models import File
-from archivematica.dashboard.main.models import FileID
-from archivematica.dashboard.main.models import FPCommandOutput
 from archivematica.dashboard.main.models import SIPArrange
 from archivematica.MCPClient.clientScripts import archivematicaCreateMETSMetadataXML
 from archivematica.MCPClient.clientScripts import archivematicaCreateMETSReingest
+from archivematica.MCPClient.clientScripts import create_mets_streaming
 from archivematica.MCPClient.clientScripts.archivematicaCreateMETSMetadataCSV import (
     parseMetadata,
 )
@@ -85,9 +87,14 @@ from archivematica.MCPClient.clientScripts.create_mets_dataverse_v2 import (
 from archivematica.MCPClient.clientScripts.create_mets_dataverse_v2 import (
     create_dataverse_tabfile_dmdsec,
 )
+from archivematica.MCPClient.clientScripts.create_mets_prefetch import PremisPrefetch
 
 SIP_DIR_VAR = r"%SIPDirectory%"
 
+# Number of files whose amdSec documents are built by each task sent to the
+# processes started by prebuild_amdsec_documents.
+AMDSEC_CHUNK_SIZE = 100
+
 
 class ErrorAccumulator:
     def __init__(self):
@@ -134,6 +141,34 @@ class MetsState:
         self.CSV_METADATA = {}
         self.error_accumulator = ErrorAccumulator()
 
+        # PremisPrefetch of the SIP, used by the amdSec builders when set.
+        self.premis_prefetch = None
+        # DocumentSpool holding the PREMIS documents of the amdSecs when set.
+        self.mets_spool = None
+        # PREMIS documents of the amdSecs built by prebuild_amdsec_documents,
+        # by file UUID, when set.
+        self.amdsec_documents = None
+
+    def xml_data(self, document):
+        """Return what to put in a mets:xmlData for the document given."""
+        if self.mets_spool is None:
+            return document
+        return self.mets_spool.spool(document)
+
+    def serialized_xml_data(self, document):
+        """Return what to put in a mets:xmlData for the serialized document
+        given.
+        """
+        if self.mets_spool is None:
+            return create_mets_streaming.load_document(document)
+        return self.mets_spool.spool_document(document)
+
+    def prebuilt_amdsec_documents(self, file_uuid):
+        """Return the prebuilt PREMIS documents of a file, if any."""
+        if self.amdsec_documents is None:
+            return None
+        return self.amdsec_documents.get(str(file_uuid))
+
 
 logger = get_script_logger("archivematica.mcp.client.createMETS2")
 
@@ -523,21 +558,30 @@ def createTechMD(fileUUID, state):
     mdWrap.set("MDTYPE", "PREMIS:OBJECT")
     xmlData = etree.SubElement(mdWrap, ns.metsBNS + "xmlData")
 
-    premis_object = create_premis_object(fileUUID)
-    xmlData.append(premis_object)
+    documents = state.prebuilt_amdsec_documents(fileUUID)
+    if documents is not None:
+        xmlData.append(documents["object"])
+    else:
+        premis_object = create_premis_object(fileUUID, state.premis_prefetch)
+        xmlData.append(state.xml_data(premis_object))
+        if state.premis_prefetch is not None:
+            state.premis_prefetch.release(fileUUID)
     return ret
 
 
-def create_premis_object(fileUUID):
+def create_premis_object(fileUUID, prefetch=None):
     """
     Create a PREMIS:OBJECT for fileUUID.
 
     Access the models for File, FileID, FPCommandOutput, Derivation
 
     :param str fileUUID: UUID of the File to create an object for
+    :param prefetch: PremisPrefetch to read the models from
     :return: premis:object Element, suitable for inserting into mets:xmlData
     """
-    f = File.objects.get(uuid=str(fileUUID))
+    if prefetch is None:
+        prefetch = PremisPrefetch([fileUUID])
+    f = prefetch.file(fileUUID)
     # PREMIS:OBJECT
     object_elem = etree.Element(ns.premisBNS + "object", nsmap={"premis": ns.premisNS})
     object_elem.set(ns.xsiBNS + "type", "premis:file")
@@ -567,7 +611,7 @@ def create_premis_object(fileUUID):
 
     etree.SubElement(objectCharacteristics, ns.premisBNS + "size").text = str(f.size)
 
-    for elem in create_premis_object_formats(fileUUID):
+    for elem in create_premis_object_formats(fileUUID, prefetch):
         objectCharacteristics.append(elem)
 
     creatingApplication = etree.Element(ns.premisBNS + "creatingApplication")
@@ -576,32 +620,32 @@ def create_premis_object(fileUUID):
     ).text = f.modificationtime.strftime("%Y-%m-%dT%H:%M:%SZ")
     objectCharacteristics.append(creatingApplication)
 
-    for elem in create_premis_object_characteristics_extensions(fileUUID):
+    for elem in create_premis_object_characteristics_extensions(fileUUID, prefetch):
         objectCharacteristics.append(elem)
 
     etree.SubElement(
         object_elem, ns.premisBNS + "originalName"
     ).text = f.originallocation.decode()
 
-    for elem in create_premis_object_derivations(fileUUID):
+    for elem in create_premis_object_derivations(fileUUID, prefetch):
         object_elem.append(elem)
 
     return object_elem
 
 
-def create_premis_object_formats(fileUUID):
-    files = FileID.objects.filter(file_id=fileUUID)
+def create_premis_object_formats(fileUUID, prefetch=None):
+    if prefetch is None:
+        prefetch = PremisPrefetch([fileUUID])
+    rows = prefetch.formats(fileUUID)
     elements = []
-    if not files.exists():
+    if not rows:
         fmt = etree.Element(ns.premisBNS + "format")
         formatDesignation = etree.SubElement(fmt, ns.premisBNS + "formatDesignation")
         etree.SubElement(
             formatDesignation, ns.premisBNS + "formatName"
         ).text = "Unknown"
         elements.append(fmt)
-    for row in files.values_list(
-        "format_name", "format_version", "format_registry_name", "format_registry_key"
-    ):
+    for row in rows:
         fmt = etree.Element(ns.premisBNS + "format")
 
         formatDesignation = etree.SubElement(fmt, ns.premisBNS + "formatDesignation")
@@ -622,17 +666,15 @@ def create_premis_object_formats(fileUUID):
     return elements
 
 
-def create_premis_object_characteristics_extensions(fileUUID):
+def create_premis_object_characteristics_extensions(fileUUID, prefetch=None):
+    if prefetch is None:
+        prefetch = PremisPrefetch([fileUUID])
     elements = []
     objectCharacteristicsExtension = etree.Element(
         ns.premisBNS + "objectCharacteristicsExtension"
     )
     parser = etree.XMLParser(remove_blank_text=True)
-    documents = FPCommandOutput.objects.filter(
-        file_id=fileUUID,
-        rule__purpose__in=["characterization", "default_characterization"],
-    ).values_list("content")
-    for (document,) in documents:
+    for document in prefetch.characterization_documents(fileUUID):
         # This needs to be converted into an str because lxml doesn't accept
         # XML documents in unicode strings if the document contains an
         # encoding declaration.
@@ -644,13 +686,12 @@ def create_premis_object_characteristics_extensions(fileUUID):
     return elements
 
 
-def create_premis_object_derivations(fileUUID):
+def create_premis_object_derivations(fileUUID, prefetch=None):
+    if prefetch is None:
+        prefetch = PremisPrefetch([fileUUID])
     elements = []
     # Derivations
-    derivations = Derivation.objects.filter(
-        source_file_id=fileUUID, event__isnull=False
-    )
-    for derivation in derivations:
+    for derivation in prefetch.derivations_from(fileUUID):
         relationship = etree.Element(ns.premisBNS + "relationship")
         etree.SubElement(
             relationship, ns.premisBNS + "relationshipType"
@@ -681,10 +722,7 @@ def create_premis_object_derivations(fileUUID):
 
         elements.append(relationship)
 
-    derivations = Derivation.objects.filter(
-        derived_file_id=fileUUID, event__isnull=False
-    )
-    for derivation in derivations:
+    for derivation in prefetch.derivations_to(fileUUID):
         relationship = etree.Element(ns.premisBNS + "relationship")
         etree.SubElement(
             relationship, ns.premisBNS + "relationshipType"
@@ -723,9 +761,26 @@ def createDigiprovMD(fileUUID, state):
     Create digiprovMD for PREMIS Events and linking Agents.
     """
     ret = []
+    documents = state.prebuilt_amdsec_documents(fileUUID)
+    if documents is not None:
+        events = documents["events"]
+        agents = documents["agents"]
+    else:
+        prefetch = state.premis_prefetch
+        if prefetch is None:
+            prefetch = PremisPrefetch([fileUUID])
+        events = (
+            state.xml_data(createEvent(event_record))
+            for event_record in prefetch.events(fileUUID)
+        )
+        agents = (
+            state.xml_data(createAgent(agent))
+            for agent in Agent.objects.extend_queryset_with_preservation_system(
+                prefetch.agents(fileUUID)
+            )
+        )
 
-    events = Event.objects.filter(file_uuid_id=str(fileUUID))
-    for event_record in events:
+    for event in events:
         state.globalDigiprovMDCounter += 1
         digiprovMD = etree.Element(
             ns.metsBNS + "digiprovMD",
@@ -737,11 +792,9 @@ def createDigiprovMD(fileUUID, state):
             digiprovMD, ns.metsBNS + "mdWrap", MDTYPE="PREMIS:EVENT"
         )
         xmlData = etree.SubElement(mdWrap, ns.metsBNS + "xmlData")
-        xmlData.append(createEvent(event_record))
+        xmlData.append(event)
 
-    for agent in Agent.objects.extend_queryset_with_preservation_system(
-        Agent.objects.filter(event__file_uuid_id=str(fileUUID)).distinct()
-    ):
+    for agent in agents:
         state.globalDigiprovMDCounter += 1
         digiprovMD = etree.Element(
             ns.metsBNS + "digiprovMD",
@@ -753,7 +806,7 @@ def createDigiprovMD(fileUUID, state):
             digiprovMD, ns.metsBNS + "mdWrap", MDTYPE="PREMIS:AGENT"
         )
         xmlData = etree.SubElement(mdWrap, ns.metsBNS + "xmlData")
-        xmlData.append(createAgent(agent))
+        xmlData.append(agent)
 
     return ret
 
@@ -836,6 +889,76 @@ def createAgent(agent_record):
     return agent
 
 
+def _build_amdsec_documents(file_uuids):
+    """Build the PREMIS object, events and agents of a chunk of files.
+
+    This runs in the processes started by ``prebuild_amdsec_documents``, so
+    the documents are returned serialized.
+    """
+    prefetch = PremisPrefetch(file_uuids)
+    ret = {}
+    for file_uuid in file_uuids:
+        agents = Agent.objects.extend_queryset_with_preservation_system(
+            prefetch.agents(file_uuid)
+        )
+        ret[file_uuid] = {
+            "object": create_mets_streaming.dump_document(
+                create_premis_object(file_uuid, prefetch)
+            ),
+            "events": [
+                create_mets_streaming.dump_document(createEvent(event_record))
+                for event_record in prefetch.events(file_uuid)
+            ],
+            "agents": [
+                create_mets_streaming.dump_document(createAgent(agent))
+                for agent in agents
+            ],
+        }
+        prefetch.release(file_uuid)
+    return ret
+
+
+def prebuild_amdsec_documents(file_uuids, processes, state):
+    """Build the PREMIS documents of the amdSecs of the files given in a pool
+    of processes.
+
+    The documents are stored in ``state.amdsec_documents``, ready to be put
+    in a mets:xmlData, so that ``getAMDSec`` only has to wrap them and the
+    IDs are still assigned in fileSec order.
+    """
+    # The processes read the database through their own connections, so they
+    # would not see the rows written by a transaction still open here.
+    if db.connection.in_atomic_block:
+        raise RuntimeError(
+            "amdSec documents cannot be built in processes inside a transaction"
+        )
+
+    state.amdsec_documents = {}
+    iterator = iter(file_uuids)
+    chunks = iter(lambda: list(itertools.islice(iterator, AMDSEC_CHUNK_SIZE)), [])
+
+    # Start the processes from scratch instead of forking this one, which
+    # would share its database connections and the state of the job.
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=processes,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=django.setup,
+    ) as executor:
+        for documents in executor.map(_build_amdsec_documents, chunks):
+            for file_uuid, file_documents in documents.items():
+                state.amdsec_documents[file_uuid] = {
+                    "object": state.serialized_xml_data(file_documents["object"]),
+                    "events": [
+                        state.serialized_xml_data(document)
+                        for document in file_documents["events"]
+                    ],
+                    "agents": [
+                        state.serialized_xml_data(document)
+                        for document in file_documents["agents"]
+                    ],
+                }
+
+
 def getAMDSec(
     job,
     fileUUID,
@@ -878,14 +1001,20 @@ def getAMDSec(
             (sip_uuid, SIPMetadataAppliesToType),
             (transferUUID, TransferMetadataAppliesToType),
         ]
-        for a in archivematicaGetRights(job, metadataAppliesToList, fileUUID, state):
+        for a in archivematicaGetRights(
+            job,
+            metadataAppliesToList,
+            fileUUID,
+            state,
+            prefetch=state.premis_prefetch,
+        ):
             state.globalRightsMDCounter += 1
             rightsMD = etree.SubElement(AMD, ns.metsBNS + "rightsMD")
             rightsMD.set("ID", "rightsMD_" + state.globalRightsMDCounter.__str__())
             mdWrap = newChild(rightsMD, ns.metsBNS + "mdWrap")
             mdWrap.set("MDTYPE", "PREMIS:RIGHTS")
             xmlData = newChild(mdWrap, ns.metsBNS + "xmlData")
-            xmlData.append(a)
+            xmlData.append(state.xml_data(a))
 
         if typeOfTransfer == "Dspace":
             for a in archivematicaCreateMETSRightsDspaceMDRef(
@@ -991,6 +1120,28 @@ def include_custom_structmap(
 # <file ID="file1-UUID" GROUPID="G1" DMDID="dmdSec_02" ADMID="amdSec_01">
 
 
+def _get_sip_file(kwargs, prefetch=None):
+    """Return the File matching a ``File.objects.get`` lookup by location.
+
+    Unambiguous matches are served from the prefetch; anything else is left to
+    the database so that the same exceptions are raised.
+    """
+    if prefetch is not None:
+        files = prefetch.files_at(kwargs["currentlocation"])
+        if len(files) == 1:
+            return files[0]
+    return File.objects.get(**kwargs)
+
+
+def _get_source_derivation(file_uuid, prefetch=None):
+    """Return the Derivation where ``file_uuid`` is the derived file."""
+    if prefetch is not None:
+        derivations = prefetch.sources(file_uuid)
+        if len(derivations) == 1:
+            return derivations[0]
+    return Derivation.objects.get(derived_file_id=file_uuid)
+
+
 def createFileSec(
     job,
     directoryPath,
@@ -1078,7 +1229,7 @@ def createFileSec(
                 "currentlocation": directoryPathSTR.encode(),
             }
             try:
-                f = File.objects.get(**kwargs)
+                f = _get_sip_file(kwargs, state.premis_prefetch)
             except (File.DoesNotExist, ValidationError):
                 job.pyprint(
                     'No uuid for file: "', directoryPathSTR, '"', file=sys.stderr
@@ -1211,7 +1362,7 @@ def createFileSec(
             elif use in ("preservation", "text/ocr", "derivative"):
                 # Derived files should be in the original file's group
                 try:
-                    d = Derivation.objects.get(derived_file_id=f.uuid)
+                    d = _get_source_derivation(f.uuid, state.premis_prefetch)
                 except (Derivation.DoesNotExist, ValidationError):
                     job.pyprint(
                         "Fatal error: unable to locate a Derivation object"
@@ -1720,7 +1871,32 @@ def main(
     createNormativeStructmap,
 ):
     state = MetsState()  # TODO: this needs to go.
+    try:
+        return _main(
+            job,
+            state,
+            sipType,
+            baseDirectoryPath,
+            XMLFile,
+            sipUUID,
+            includeAmdSec,
+            createNormativeStructmap,
+        )
+    finally:
+        if state.mets_spool is not None:
+            state.mets_spool.close()
 
+
+def _main(
+    job,
+    state,
+    sipType,
+    baseDirectoryPath,
+    XMLFile,
+    sipUUID,
+    includeAmdSec,
+    createNormativeStructmap,
+):
     # If reingesting, do not create a new METS, just modify existing one.
     if "REIN" in sipType:
         job.pyprint("Updating METS during reingest")
@@ -1780,6 +1956,22 @@ def main(
         # Get the <dmdSec> for the entire AIP; it is associated to the root
         # <mets:div> in the physical structMap.
         sip_mdl = SIP.objects.filter(uuid=str(sipUUID)).first()
+        state.premis_prefetch = PremisPrefetch.for_sip(sipUUID)
+        if getattr(mcpclient_settings, "METS_STREAMING_WRITER", False):
+            state.mets_spool = create_mets_streaming.DocumentSpool(
+                mcpclient_settings.TEMP_DIRECTORY
+            )
+        amdsec_processes = getattr(mcpclient_settings, "METS_AMDSEC_PROCESSES", 1)
+        if includeAmdSec and amdsec_processes > 1:
+            prebuild_amdsec_documents(
+                [
+                    file_uuid
+                    for file_uuid in state.premis_prefetch.file_uuids
+                    if state.premis_prefetch.file(file_uuid).removedtime is None
+                ],
+                amdsec_processes,
+                state,
+            )
         if sip_mdl:
             aipDmdSec = getDirDmdSec(sip_mdl, sip_dir_name)
             state.globalDmdSecCounter += 1
@@ -1900,8 +2092,16 @@ def main(
     for subsection, count in subsections_counts.items():
         job.pyprint(f"\t- {subsection} entries: {count}")
 
-    tree = mets.serialize(normative_structmap=createNormativeStructmap)
-    write_mets(etree.ElementTree(tree), XMLFile)
+    if getattr(mcpclient_settings, "METS_STREAMING_WRITER", False):
+        create_mets_streaming.write_mets(
+            mets,
+            XMLFile,
+            spool=state.mets_spool,
+            normative_structmap=createNormativeStructmap,
+        )
+    else:
+        tree = mets.serialize(normative_structmap=createNormativeStructmap)
+        write_mets(etree.ElementTree(tree), XMLFile)
 
     if len(xml_metadata_errors):
         job.pyprint(
@@ -1,26 +1,30 @@
 #!/usr/bin/env python
+import concurrent.futures
+import dataclasses
 import os
 import sys
 import uuid
 
 import django
+from django.conf import settings as mcpclient_settings
 from django.db import transaction
 
 django.setup()
 
 from archivematica.archivematicaCommon.archivematicaFunctions import format_subdir_path
 from archivematica.archivematicaCommon.archivematicaFunctions import get_dir_uuids
+from archivematica.archivematicaCommon.archivematicaFunctions import get_setting
 from archivematica.archivematicaCommon.custom_handlers import get_script_logger
 from archivematica.archivematicaCommon.databaseFunctions import fileWasRemoved
 from archivematica.archivematicaCommon.executeOrRunSubProcess import executeOrRun
-from archivematica.archivematicaCommon.fileOperations import addFileToTransfer
-from archivematica.archivematicaCommon.fileOperations import updateSizeAndChecksum
+from archivematica.archivematicaCommon.fileOperations import bulkAddFilesToTransfer
+from archivematica.archivematicaCommon.fileOperations import get_size_and_checksum
+from archivematica.dashboard.fpr import snapshot
 from archivematica.dashboard.fpr.models import FPCommand
 from archivematica.dashboard.main.models import Directory
 from archivematica.dashboard.main.models import File
-from archivematica.dashboard.main.models import FileFormatVersion
 from archivematica.dashboard.main.models import Transfer
-from archivematica.MCPClient.clientScripts.has_packages import already_extracted
+from archivematica.MCPClient.clientScripts.has_packages import extracted_packages
 
 logger = get_script_logger("archivematica.mcp.client.extractContents")
 
@@ -42,41 +46,69 @@ def tree(root):
             yield os.path.join(dirpath, file)
 
 
-def assign_uuid(
+@dataclasses.dataclass
+class ExtractedFile:
+    """File found in the extraction target of a package."""
+
+    path: str
+    size: int
+    checksum: str
+    checksum_type: str
+
+
+def assign_uuids(
     job,
-    filename,
-    extracted_file_original_location,
-    package_uuid,
-    transfer_uuid,
+    extracted_files,
+    extraction_target,
+    file_,
+    transfer_mdl,
     date,
-    task_uuid,
     sip_directory,
     package_filename,
 ):
-    """Assign a uuid to each file in the extracted package."""
-    file_uuid = str(uuid.uuid4())
+    """Assign a uuid to each file in the extracted package.
+
+    The files and their events are written with a few bulk queries, see
+    ``bulkAddFilesToTransfer``.
+    """
     # Correct the information in the path strings sent to this function. First
     # remove the SIP directory from the string. Second, make sure that file
     # paths have not been modified for processing purpose, i.e. in
     # Archivematica current terminology, filename change.
-    relative_path = filename.replace(sip_directory, TRANSFER_DIRECTORY, 1)
     relative_package_path = package_filename.replace(
         sip_directory, TRANSFER_DIRECTORY, 1
     )
-    package_detail = f"{relative_package_path} ({package_uuid})"
+    package_detail = f"{relative_package_path} ({file_.uuid})"
     event_detail = "Unpacked from: " + package_detail
-    addFileToTransfer(
-        relative_path,
-        file_uuid,
-        transfer_uuid,
-        task_uuid,
+
+    files = []
+    for extracted_file in extracted_files:
+        file_uuid = str(uuid.uuid4())
+        files.append(
+            {
+                "fileUUID": file_uuid,
+                "filePathRelativeToSIP": extracted_file.path.replace(
+                    sip_directory, TRANSFER_DIRECTORY, 1
+                ),
+                "originalLocation": extracted_file.path.replace(
+                    extraction_target, file_.originallocation.decode(), 1
+                ),
+                "fileSize": extracted_file.size,
+                "checksum": extracted_file.checksum,
+                "checksumType": extracted_file.checksum_type,
+            }
+        )
+        job.pyprint(
+            "Assigning new file UUID:", file_uuid, "to file", extracted_file.path
+        )
+
+    bulkAddFilesToTransfer(
+        files,
+        transfer_mdl.uuid,
         date,
         sourceType="unpacking",
         eventDetail=event_detail,
-        originalLocation=extracted_file_original_location,
     )
-    updateSizeAndChecksum(file_uuid, filename, date, str(uuid.uuid4()))
-    job.pyprint("Assigning new file UUID:", file_uuid, "to file", filename)
 
 
 def _get_subdir_paths(job, root_path, path_prefix_to_repl, original_location):
@@ -114,65 +146,72 @@ def delete_and_record_package_file(job, file_path, file_uuid, current_location):
     fileWasRemoved(file_uuid, eventDetail=event_detail_note)
 
 
-def main(job, transfer_uuid, sip_directory, date, task_uuid, delete=False):
-    file_path_cache = {}
-    files = File.objects.filter(transfer=transfer_uuid, removedtime__isnull=True)
-    if not files:
-        job.pyprint("No files found for transfer: ", transfer_uuid)
+@dataclasses.dataclass
+class Extraction:
+    """Extraction command planned by ``plan`` for a package."""
 
-    transfer_mdl = Transfer.objects.get(uuid=transfer_uuid)
+    file_: File
+    command: FPCommand
+    package_path: str
+    extraction_target: str
+    command_to_execute: str
+    args: list
 
-    # We track whether or not anything was extracted because that controls what
-    # the next microservice chain link will be.
-    # If something was extracted, then a new identification step has to be
-    # kicked off on those files; otherwise, we can go ahead with the transfer.
-    extracted = False
 
+@dataclasses.dataclass
+class ExtractionResult:
+    exitstatus: int
+    stdout: str
+    stderr: str
+    extracted_files: list
+
+
+def extract_command(file_, fpr, file_format_versions):
+    """Return the extraction command of a file, or the reason why it cannot
+    be extracted.
+    """
+    try:
+        file_format_version = file_format_versions.get(file_.uuid)
+    # Can't do anything if the file wasn't identified in the previous step
+    except Exception:
+        return " - file format not identified"
+    if file_format_version.format_version is None:
+        return " - file format not identified"
+    # Extraction commands are defined in the FPR just like normalization
+    # commands
+    commands = [
+        rule.command
+        for rule in fpr.rules_for_format(file_format_version.format_version, "extract")
+        if rule.command.enabled
+    ]
+    if not commands:
+        return " - No rule found to extract"
+    if len(commands) > 1:
+        raise FPCommand.MultipleObjectsReturned(
+            f"get() returned more than one FPCommand -- it returned {len(commands)}!"
+        )
+    return commands[0]
+
+
+def plan(files, sip_directory, date):
+    """Return the extraction of each file, or the reason why it is not
+    extracted, from a few bulk queries.
+    """
+    file_path_cache = {}
+    fpr = snapshot.current()
+    file_format_versions = snapshot.FileFormatVersions(f.uuid for f in files)
+    extracted = extracted_packages(files)
+
+    extractions = []
     for file_ in files:
-        try:
-            file_format_version = FileFormatVersion.objects.get(file_uuid=file_.uuid)
-        # Can't do anything if the file wasn't identified in the previous step
-        except Exception:
-            job.pyprint(
-                "Not extracting contents from",
-                os.path.basename(file_.currentlocation.decode()),
-                " - file format not identified",
-                file=sys.stderr,
-            )
-            continue
-        if file_format_version.format_version is None:
-            job.pyprint(
-                "Not extracting contents from",
-                os.path.basename(file_.currentlocation.decode()),
-                " - file format not identified",
-                file=sys.stderr,
-            )
-            continue
-        # Extraction commands are defined in the FPR just like normalization
-        # commands
-        try:
-            command = FPCommand.active.get(
-                fprule__format=file_format_version.format_version,
-                fprule__purpose="extract",
-                fprule__enabled=True,
-            )
-        except FPCommand.DoesNotExist:
-            job.pyprint(
-                "Not extracting contents from",
-                os.path.basename(file_.currentlocation.decode()),
-                " - No rule found to extract",
-                file=sys.stderr,
-            )
+        command = extract_command(file_, fpr, file_format_versions)
+        if not isinstance(command, FPCommand):
+            extractions.append((file_, command))
             continue
 
         # Check if file has already been extracted
-        if already_extracted(file_):
-            job.pyprint(
-                "Not extracting contents from",
-                os.path.basename(file_.currentlocation.decode()),
-                " - extraction already happened.",
-                file=sys.stderr,
-            )
+        if str(file_.uuid) in extracted:
+            extractions.append((file_, " - extraction already happened."))
             continue
 
         file_to_be_extracted_path = file_.currentlocation.decode().replace(
@@ -197,46 +236,120 @@ def main(job, transfer_uuid, sip_directory, date, task_uuid, delete=False):
 
         # Make the command clear to users when inspecting stdin/stdout.
         logger.info("Command to execute is: %s", command_to_execute)
-        exitstatus, stdout, stderr = executeOrRun(
-            command.script_type,
-            command_to_execute,
-            arguments=args,
-            printing=True,
-            capture_output=True,
+        extractions.append(
+            (
+                file_,
+                Extraction(
+                    file_,
+                    command,
+                    file_to_be_extracted_path,
+                    extraction_target,
+                    command_to_execute,
+                    args,
+                ),
+            )
         )
-        job.write_output(stdout)
-        job.write_error(stderr)
 
-        if not exitstatus == 0:
-            # Dang, looks like the extraction failed
-            job.pyprint("Command", command.description, "failed!", file=sys.stderr)
-        else:
+    return extractions
+
+
+def run(extraction, checksum_type):
+    """Run the extraction command and checksum the extracted files.
+
+    It runs in a thread of the pool, so it does not use the database.
+    """
+    exitstatus, stdout, stderr = executeOrRun(
+        extraction.command.script_type,
+        extraction.command_to_execute,
+        arguments=extraction.args,
+        printing=True,
+        capture_output=True,
+    )
+    extracted_files = []
+    if exitstatus == 0:
+        for path in tree(extraction.extraction_target):
+            size, checksum, _ = get_size_and_checksum(path, checksum_type=checksum_type)
+            extracted_files.append(ExtractedFile(path, size, checksum, checksum_type))
+    return ExtractionResult(exitstatus, stdout, stderr, extracted_files)
+
+
+def main(job, transfer_uuid, sip_directory, date, task_uuid, delete=False):
+    files = list(File.objects.filter(transfer=transfer_uuid, removedtime__isnull=True))
+    if not files:
+        job.pyprint("No files found for transfer: ", transfer_uuid)
+
+    transfer_mdl = Transfer.objects.get(uuid=transfer_uuid)
+
+    # We track whether or not anything was extracted because that controls what
+    # the next microservice chain link will be.
+    # If something was extracted, then a new identification step has to be
+    # kicked off on those files; otherwise, we can go ahead with the transfer.
+    extracted = False
+
+    extractions = plan(files, sip_directory, date)
+    checksum_type = get_setting("checksum_type", "sha256")
+
+    # Only the commands and checksums run in the pool: the files are
+    # registered by the thread of the job, in the order of the transfer.
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=max(mcpclient_settings.EXTRACT_THREADS, 1)
+    ) as executor:
+        runs = [
+            executor.submit(run, extraction, checksum_type)
+            if isinstance(extraction, Extraction)
+            else None
+            for _, extraction in extractions
+        ]
+
+        for (file_, extraction), future in zip(extractions, runs):
+            if future is None:
+                job.pyprint(
+                    "Not extracting contents from",
+                    os.path.basename(file_.currentlocation.decode()),
+                    extraction,
+                    file=sys.stderr,
+                )
+                continue
+
+            result = future.result()
+            job.write_output(result.stdout)
+            job.write_error(result.stderr)
+
+            if not result.exitstatus == 0:
+                # Dang, looks like the extraction failed
+                job.pyprint(
+                    "Command",
+                    extraction.command.description,
+                    "failed!",
+                    file=sys.stderr,
+                )
+                continue
+
             extracted = True
             job.pyprint(
-                "Extracted contents from", os.path.basename(file_to_be_extracted_path)
+                "Extracted contents from", os.path.basename(extraction.package_path)
             )
 
             # Assign UUIDs and insert them into the database, so the newly
             # extracted files are properly tracked by Archivematica
-            for extracted_file in tree(extraction_target):
-                extracted_file_original_location = extracted_file.replace(
-                    extraction_target, file_.originallocation.decode(), 1
-                )
-                assign_uuid(
-                    job,
-                    extracted_file,
-                    extracted_file_original_location,
-                    file_.uuid,
-                    transfer_uuid,
-                    date,
-                    task_uuid,
-                    sip_directory,
-                    file_to_be_extracted_path,
-                )
+            assign_uuids(
+                job,
+                result.extracted_files,
+                extraction.extraction_target,
+                file_,
+                transfer_mdl,
+                date,
+                sip_directory,
+                extraction.package_path,
+            )
 
             if transfer_mdl.diruuids:
                 create_extracted_dir_uuids(
-                    job, transfer_mdl, extraction_target, sip_directory, file_
+                    job,
+                    transfer_mdl,
+                    extraction.extraction_target,
+                    sip_directory,
+                    file_,
                 )
 
             # We may want to remove the original package file after extracting
@@ -244,7 +357,7 @@ def main(job, transfer_uuid, sip_directory, date, task_uuid, delete=False):
             if delete:
                 delete_and_record_package_file(
                     job,
-                    file_to_be_extracted_path,
+                    extraction.package_path,
                     file_.uuid,
                     file_.currentlocation.decode(),
                 )
@@ -4,6 +4,8 @@ import dataclasses
 import json
 import multiprocessing
 import uuid
+from collections import defaultdict
+from collections.abc import Iterable
 from typing import Optional
 
 import django
@@ -13,11 +15,14 @@ django.setup()
 from django.db import transaction
 from django.utils import timezone
 
-from archivematica.archivematicaCommon.databaseFunctions import insertIntoEvents
+from archivematica.archivematicaCommon.databaseFunctions import CHUNK_SIZE
+from archivematica.archivematicaCommon.databaseFunctions import bulkInsertIntoEvents
+from archivematica.archivematicaCommon.databaseFunctions import chunks
 from archivematica.archivematicaCommon.executeOrRunSubProcess import executeOrRun
 from archivematica.dashboard.fpr.models import FormatVersion
 from archivematica.dashboard.fpr.models import IDCommand
 from archivematica.dashboard.fpr.models import IDRule
+from archivematica.dashboard.main.models import Event
 from archivematica.dashboard.main.models import File
 from archivematica.dashboard.main.models import FileFormatVersion
 from archivematica.dashboard.main.models import FileID
@@ -40,29 +45,68 @@ def concurrent_instances() -> int:
     return multiprocessing.cpu_count()
 
 
-def _save_id_preference(file_: File, value: bool) -> None:
-    """
-    Saves whether file format identification is being used.
-
-    This is necessary in order to allow post-extraction identification to work.
-    The replacement dict will be saved to the special 'replacementDict' unit
-    variable, which will be transformed back into a passVar when a new chain in
-    the same unit is begun.
-    """
-    # The unit_uuid foreign key can point to a transfer or SIP, and this tool
-    # runs in both.
-    # Check the SIP first - if it hasn't been assigned yet, then this is being
-    # run during the transfer.
-    unit = file_.sip or file_.transfer
-
-    rd = {"%IDCommand%": str(value)}
-
-    UnitVariable.objects.create(
-        unituuid=unit.pk, variable="replacementDict", variablevalue=json.dumps(rd)
-    )
+@dataclasses.dataclass
+class IdentificationRecords:
+    """Rows written for a batch of files, written together by ``save``."""
+
+    events: list[dict] = dataclasses.field(default_factory=list)
+    file_ids: list[FileID] = dataclasses.field(default_factory=list)
+    # FormatVersion identified by file UUID.
+    format_versions: dict[str, FormatVersion] = dataclasses.field(default_factory=dict)
+    # Whether identification is enabled, by unit UUID.
+    id_preferences: dict[uuid.UUID, bool] = dataclasses.field(default_factory=dict)
+
+    def save_id_preference(self, file_: File, value: bool) -> None:
+        """
+        Saves whether file format identification is being used.
+
+        This is necessary in order to allow post-extraction identification to
+        work. The replacement dict will be saved to the special
+        'replacementDict' unit variable, which will be transformed back into a
+        passVar when a new chain in the same unit is begun.
+        """
+        # The unit_uuid foreign key can point to a transfer or SIP, and this
+        # tool runs in both.
+        # Check the SIP first - if it hasn't been assigned yet, then this is
+        # being run during the transfer.
+        self.id_preferences[file_.sip_id or file_.transfer_id] = value
+
+    def save(self) -> None:
+        UnitVariable.objects.bulk_create(
+            UnitVariable(
+                unituuid=unit_uuid,
+                variable="replacementDict",
+                variablevalue=json.dumps({"%IDCommand%": str(value)}),
+            )
+            for unit_uuid, value in self.id_preferences.items()
+        )
+        self._save_format_versions()
+        bulkInsertIntoEvents(self.events)
+        FileID.objects.bulk_create(self.file_ids, batch_size=CHUNK_SIZE)
+
+    def _save_format_versions(self) -> None:
+        existing = []
+        for chunk in chunks(self.format_versions):
+            existing.extend(FileFormatVersion.objects.filter(file_uuid_id__in=chunk))
+        # Update the version of the files already identified.
+        for ffv in existing:
+            ffv.format_version = self.format_versions[str(ffv.file_uuid_id)]
+        FileFormatVersion.objects.bulk_update(
+            existing, ["format_version"], batch_size=CHUNK_SIZE
+        )
+        identified = {str(ffv.file_uuid_id) for ffv in existing}
+        FileFormatVersion.objects.bulk_create(
+            (
+                FileFormatVersion(file_uuid_id=file_uuid, format_version=format_version)
+                for file_uuid, format_version in self.format_versions.items()
+                if file_uuid not in identified
+            ),
+            batch_size=CHUNK_SIZE,
+        )
 
 
 def write_identification_event(
+    records: IdentificationRecords,
     file_uuid: str,
     command: IDCommand,
     format: Optional[str] = None,
@@ -81,21 +125,29 @@ def write_identification_event(
 
     date = timezone.now()
 
-    insertIntoEvents(
-        fileUUID=file_uuid,
-        eventIdentifierUUID=str(uuid.uuid4()),
-        eventType="format identification",
-        eventDateTime=date,
-        eventDetail=event_detail_text,
-        eventOutcome=event_outcome_text,
-        eventOutcomeDetailNote=format,
+    records.events.append(
+        {
+            "fileUUID": file_uuid,
+            "eventIdentifierUUID": str(uuid.uuid4()),
+            "eventType": "format identification",
+            "eventDateTime": date,
+            "eventDetail": event_detail_text,
+            "eventOutcome": event_outcome_text,
+            "eventOutcomeDetailNote": format,
+        }
     )
 
 
-def write_file_id(file_uuid: str, format: FormatVersion, output: str) -> None:
+def write_file_id(
+    records: IdentificationRecords,
+    file_uuid: str,
+    format: FormatVersion,
+    output: str,
+) -> None:
     """
-    Write the identified format to the DB.
+    Queue the identified format to be written to the DB.
 
+    :param IdentificationRecords records: Records of the batch
     :param str file_uuid: UUID of the file identified
     :param FormatVersion format: FormatVersion it was identified as
     :param str output: Text that generated the match
@@ -110,12 +162,14 @@ def write_file_id(file_uuid: str, format: FormatVersion, output: str) -> None:
     # Sometimes, this is null instead of an empty string
     version = format.version or ""
 
-    FileID.objects.create(
-        file_id=file_uuid,
-        format_name=format.format.description,
-        format_version=version,
-        format_registry_name=format_registry,
-        format_registry_key=key,
+    records.file_ids.append(
+        FileID(
+            file_id=file_uuid,
+            format_name=format.format.description,
+            format_version=version,
+            format_registry_name=format_registry,
+            format_registry_key=key,
+        )
     )
 
 
@@ -127,92 +181,247 @@ def _default_idcommand() -> IDCommand:
     return IDCommand.active.first()
 
 
-def main(
-    job: Job, enabled: str, file_path: str, file_uuid: str, disable_reidentify: bool
-) -> int:
+class IdentificationRules:
+    """In-memory lookup of the formats matching the outputs of an IDCommand.
+
+    The outputs of a batch of files are resolved with one query, instead of an
+    ``IDRule`` or ``FormatVersion`` query per file.
+    """
+
+    def __init__(self, command: IDCommand) -> None:
+        self.command = command
+        self._formats: dict[str, list[FormatVersion]] = {}
+
+    def prefetch(self, outputs: Iterable[str]) -> None:
+        """Load the formats matching the outputs given."""
+        # The database compares these case-insensitively on MySQL.
+        new_outputs = []
+        requested = defaultdict(list)
+        for output in outputs:
+            if output not in self._formats:
+                self._formats[output] = []
+                new_outputs.append(output)
+                requested[output.casefold()].append(output)
+        if not new_outputs:
+            return
+
+        # PUIDs are the same regardless of tool, so PUID-producing tools
+        # don't have "rules" per se - we just go straight to the
+        # FormatVersion table to see if there's a matching PUID.
+        if self.command.config == "PUID":
+            matches = (
+                (format_version.pronom_id, format_version)
+                for format_version in FormatVersion.active.filter(
+                    pronom_id__in=new_outputs
+                ).select_related("format")
+            )
+        else:
+            matches = (
+                (rule.command_output, rule.format)
+                for rule in IDRule.active.filter(
+                    command=self.command,
+                    command_output__in=new_outputs,
+                ).select_related("format__format")
+            )
+        for output, format_version in matches:
+            for requested_output in requested.get(output.casefold(), []):
+                self._formats[requested_output].append(format_version)
+
+    def format_version(self, output: str) -> FormatVersion:
+        """Return the format matching an output.
+
+        Raises the exceptions ``IDRule.active.get`` or
+        ``FormatVersion.active.get`` would when there is not exactly one.
+        """
+        self.prefetch([output])
+        matches = self._formats[output]
+        model = FormatVersion if self.command.config == "PUID" else IDRule
+        if not matches:
+            raise model.DoesNotExist
+        if len(matches) > 1:
+            raise model.MultipleObjectsReturned
+        return matches[0]
+
+
+def run_idcommand(
+    command: IDCommand, file_paths: Iterable[str]
+) -> dict[str, tuple[int, str, str]]:
+    """Run an IDCommand on files.
+
+    Commands accepting multiple paths are run once for all of them and print
+    a JSON object mapping each path to its output. Files missing from that
+    object, or all of them if the command fails, are run one at a time.
+
+    :return: exit code, output and error of the command for each path
+    """
+    file_paths = list(dict.fromkeys(file_paths))
+    results = {}
+    if command.accepts_multiple_paths and len(file_paths) > 1:
+        results = _run_idcommand_batch(command, file_paths)
+
+    for file_path in file_paths:
+        if file_path not in results:
+            results[file_path] = executeOrRun(
+                command.script_type,
+                command.script,
+                arguments=[file_path],
+                printing=False,
+                capture_output=True,
+            )
+
+    return results
+
+
+def _run_idcommand_batch(
+    command: IDCommand, file_paths: list[str]
+) -> dict[str, tuple[int, str, str]]:
+    exitcode, output, _ = executeOrRun(
+        command.script_type,
+        command.script,
+        arguments=file_paths,
+        printing=False,
+        capture_output=True,
+    )
+    if exitcode != 0:
+        return {}
+    try:
+        outputs = json.loads(output)
+    except ValueError:
+        return {}
+    if not isinstance(outputs, dict):
+        return {}
+
+    return {
+        file_path: (0, outputs[file_path], "")
+        for file_path in file_paths
+        if isinstance(outputs.get(file_path), str)
+    }
+
+
+def prefetch_files(
+    args_list: list[IdentifyFileFormatArgs],
+) -> tuple[dict[str, File], set[str]]:
+    """Return the files of a batch by UUID and the UUIDs of those identified
+    already, with a query for each rather than for every file.
+    """
+    file_uuids = [args.file_uuid for args in args_list if args.idcommand == "True"]
+    files = {
+        str(file_uuid): file_
+        for file_uuid, file_ in File.objects.in_bulk(file_uuids).items()
+    }
+    reidentify_checks = [
+        args.file_uuid for args in args_list if args.disable_reidentify
+    ]
+    identified = set()
+    for chunk in chunks(reidentify_checks):
+        identified.update(
+            str(file_uuid)
+            for file_uuid in Event.objects.filter(
+                file_uuid_id__in=chunk, event_type="format identification"
+            ).values_list("file_uuid_id", flat=True)
+        )
+
+    return files, identified
+
+
+def prepare(
+    job: Job,
+    command: Optional[IDCommand],
+    records: IdentificationRecords,
+    files: dict[str, File],
+    identified: set[str],
+    enabled: str,
+    file_path: str,
+    file_uuid: str,
+    disable_reidentify: bool,
+) -> Optional[File]:
+    """Run the checks that come before the identification of a file.
+
+    ``files`` and ``identified`` come from ``prefetch_files``. Returns the
+    File to identify, or None once the status of the job is set.
+    """
     enabled_bool = True if enabled == "True" else False
     if not enabled_bool:
         job.print_output("Skipping file format identification")
-        return SUCCESS
+        job.set_status(SUCCESS)
+        return None
 
-    command = _default_idcommand()
     if command is None:
         job.write_error("Unable to determine IDCommand.\n")
-        return ERROR
+        job.set_status(ERROR)
+        return None
 
-    command_uuid = command.uuid
     job.print_output("IDCommand:", command.description)
     job.print_output("IDCommand UUID:", command.uuid)
     job.print_output("IDTool:", command.tool.description)
     job.print_output("IDTool UUID:", command.tool.uuid)
     job.print_output(f"File: ({file_uuid}) {file_path}")
 
-    file_ = File.objects.get(uuid=file_uuid)
+    try:
+        file_ = files[file_uuid]
+    except KeyError:
+        raise File.DoesNotExist(f"File {file_uuid} does not exist")
 
     # If reidentification is disabled and a format identification event exists for this file, exit
-    if (
-        disable_reidentify
-        and file_.event_set.filter(event_type="format identification").exists()
-    ):
+    if disable_reidentify and file_uuid in identified:
         job.print_output(
             "This file has already been identified, and re-identification is disabled. Skipping."
         )
-        return SUCCESS
+        job.set_status(SUCCESS)
+        return None
 
     # Save whether identification was enabled by the user for use in a later
     # chain.
-    _save_id_preference(file_, enabled_bool)
+    records.save_id_preference(file_, enabled_bool)
 
-    exitcode, output, err = executeOrRun(
-        command.script_type,
-        command.script,
-        arguments=[file_path],
-        printing=False,
-        capture_output=True,
-    )
+    return file_
+
+
+def main(
+    job: Job,
+    command: IDCommand,
+    rules: IdentificationRules,
+    records: IdentificationRecords,
+    file_: File,
+    file_path: str,
+    result: tuple[int, str, str],
+) -> int:
+    exitcode, output, err = result
     output = output.strip()
+    file_uuid = str(file_.uuid)
 
     if exitcode != 0:
-        job.print_error(f"Error: IDCommand with UUID {command_uuid} exited non-zero.")
+        job.print_error(f"Error: IDCommand with UUID {command.uuid} exited non-zero.")
         job.print_error(f"Error: {err}")
         return ERROR
 
     job.print_output("Command output:", output)
-    # PUIDs are the same regardless of tool, so PUID-producing tools don't have "rules" per se - we just
-    # go straight to the FormatVersion table to see if there's a matching PUID
     try:
-        if command.config == "PUID":
-            format_version = FormatVersion.active.get(pronom_id=output)
-        else:
-            rule = IDRule.active.get(command_output=output, command=command)
-            format_version = rule.format
+        format_version = rules.format_version(output)
     except IDRule.DoesNotExist:
         job.print_error(
             f'Error: No FPR identification rule for tool output "{output}" found'
         )
-        write_identification_event(file_uuid, command, success=False)
+        write_identification_event(records, file_uuid, command, success=False)
         return ERROR
     except IDRule.MultipleObjectsReturned:
         job.print_error(
             f'Error: Multiple FPR identification rules for tool output "{output}" found'
         )
-        write_identification_event(file_uuid, command, success=False)
+        write_identification_event(records, file_uuid, command, success=False)
         return ERROR
     except FormatVersion.DoesNotExist:
         job.print_error(f"Error: No FPR format record found for PUID {output}")
-        write_identification_event(file_uuid, command, success=False)
+        write_identification_event(records, file_uuid, command, success=False)
         return ERROR
 
-    (ffv, created) = FileFormatVersion.objects.get_or_create(
-        file_uuid=file_, defaults={"format_version": format_version}
-    )
-    if not created:  # Update the version if it wasn't created new
-        ffv.format_version = format_version
-        ffv.save()
+    records.format_versions[file_uuid] = format_version
     job.print_output(f"{file_path} identified as a {format_version.description}")
 
-    write_identification_event(file_uuid, command, format=format_version.pronom_id)
-    write_file_id(file_uuid=file_uuid, format=format_version, output=output)
+    write_identification_event(
+        records, file_uuid, command, format=format_version.pronom_id
+    )
+    write_file_id(records, file_uuid=file_uuid, format=format_version, output=output)
 
     return SUCCESS
 
@@ -247,15 +456,53 @@ def call(jobs: list[Job]) -> None:
     parser = get_parser()
 
     with transaction.atomic():
+        command = _default_idcommand()
+
+        parsed = []
         for job in jobs:
             with job.JobContext():
-                args = parse_args(parser, job)
+                parsed.append((job, parse_args(parser, job)))
+        files, identified = prefetch_files([args for _, args in parsed])
+
+        records = IdentificationRecords()
+        pending = []
+        for job, args in parsed:
+            with job.JobContext():
+                file_ = prepare(
+                    job,
+                    command,
+                    records,
+                    files,
+                    identified,
+                    args.idcommand,
+                    args.file_path,
+                    args.file_uuid,
+                    args.disable_reidentify,
+                )
+                if file_ is not None:
+                    pending.append((job, file_, args.file_path))
+        if not pending:
+            records.save()
+            return
+
+        # Run the tool once for the batch when the command supports it.
+        results = run_idcommand(command, [file_path for _, _, file_path in pending])
+        rules = IdentificationRules(command)
+        rules.prefetch(
+            output.strip() for exitcode, output, _ in results.values() if exitcode == 0
+        )
+
+        for job, file_, file_path in pending:
+            with job.JobContext():
                 job.set_status(
                     main(
                         job,
-                        args.idcommand,
-                        args.file_path,
-                        args.file_uuid,
-                        args.disable_reidentify,
+                        command,
+                        rules,
+                        records,
+                        file_,
+                        file_path,
+                        results[file_path],
                     )
                 )
+        records.save()
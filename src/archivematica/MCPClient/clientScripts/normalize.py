@@ -1,5 +1,6 @@
 #!/usr/bin/env python
 import argparse
+import concurrent.futures
 import csv
 import dataclasses
 import datetime
@@ -10,6 +11,7 @@ import traceback
 import uuid
 from typing import Callable
 from typing import Optional
+from typing import Union
 
 import django
 from django.utils import timezone
@@ -24,6 +26,8 @@ from django.db import transaction
 from archivematica.archivematicaCommon import databaseFunctions
 from archivematica.archivematicaCommon import fileOperations
 from archivematica.archivematicaCommon.dicts import ReplacementDict
+from archivematica.dashboard.fpr import snapshot
+from archivematica.dashboard.fpr.models import FPCommand
 from archivematica.dashboard.fpr.models import FPRule
 from archivematica.dashboard.main.models import Derivation
 from archivematica.dashboard.main.models import File
@@ -210,11 +214,29 @@ def check_manual_normalization(job: Job, opts: NormalizeArgs) -> Optional[File]:
     return matches[0]
 
 
+@dataclasses.dataclass
+class NormalizationRecords:
+    """Events and derivations of a batch of files, written together by
+    ``save`` once the commands of the batch have run.
+    """
+
+    events: list[dict] = dataclasses.field(default_factory=list)
+    derivations: list[dict] = dataclasses.field(default_factory=list)
+
+    def save(self) -> None:
+        # Derivations point to their normalization events.
+        databaseFunctions.bulkInsertIntoEvents(self.events)
+        databaseFunctions.bulkInsertIntoDerivations(self.derivations)
+        self.events.clear()
+        self.derivations.clear()
+
+
 def once_normalized(
     job: Job,
     command: transcoder.Command,
     opts: NormalizeArgs,
     replacement_dict: ReplacementDict,
+    records: NormalizationRecords,
 ) -> None:
     """Updates the database if normalization completed successfully.
 
@@ -222,7 +244,8 @@ def once_normalized(
 
     For preservation files, adds a normalization event, and derivation, as well
     as updating the size and checksum for the new file in the DB.  Adds format
-    information for use in the METS file to FilesIDs.
+    information for use in the METS file to FilesIDs. The events and
+    derivations are queued in ``records``.
     """
     transcoded_files = []
     if not command.output_location:
@@ -255,22 +278,37 @@ def once_normalized(
         # TODO Add manual normalization for files of same name mapping?
         # Add the new file to the SIP
         path_relative_to_sip = ef.replace(opts.sip_path, "%SIPDirectory%", 1)
-        fileOperations.addFileToSIP(
-            path_relative_to_sip,
+        databaseFunctions.insertIntoFiles(
             output_file_uuid,  # File UUID
-            opts.sip_uuid,  # SIP UUID
-            opts.task_uuid,  # Task UUID
+            path_relative_to_sip,
             today,  # Current date
-            sourceType="creation",
+            sipUUID=opts.sip_uuid,
             use=opts.purpose,
         )
+        records.events.append(
+            {
+                "fileUUID": output_file_uuid,
+                "eventType": "creation",
+                "eventDateTime": today,
+            }
+        )
 
         # Calculate new file checksum
+        size, checksum, checksum_type = fileOperations.get_size_and_checksum(ef)
         fileOperations.updateSizeAndChecksum(
             output_file_uuid,  # File UUID, same as task UUID for preservation
             ef,  # File path
             today,  # Date
             str(uuid.uuid4()),  # Event UUID, new UUID
+            fileSize=size,
+            checksum=checksum,
+            checksumType=checksum_type,
+            add_event=False,
+        )
+        records.events.append(
+            fileOperations.checksum_event(
+                output_file_uuid, today, checksum, checksum_type
+            )
         )
 
         # Add derivation link and associated event
@@ -279,6 +317,7 @@ def once_normalized(
         # preservation copies
         if "preservation" in opts.purpose:
             insert_derivation_event(
+                records,
                 original_uuid=opts.file_uuid,
                 output_uuid=output_file_uuid,
                 derivation_uuid=derivation_event_uuid,
@@ -290,12 +329,12 @@ def once_normalized(
         # don't get added to the PREMIS Events because they will
         # not appear in the METS.
         else:
-            d = Derivation(
-                source_file_id=opts.file_uuid,
-                derived_file_id=output_file_uuid,
-                event=None,
+            records.derivations.append(
+                {
+                    "sourceFileUUID": opts.file_uuid,
+                    "derivedFileUUID": output_file_uuid,
+                }
             )
-            d.save()
 
         # Use the format info from the normalization command
         # to save identification into the DB
@@ -311,18 +350,21 @@ def once_normalized(
         )
 
 
-def once_normalized_callback(job: Job) -> Callable[..., None]:
+def once_normalized_callback(
+    job: Job, records: NormalizationRecords
+) -> Callable[..., None]:
     def wrapper(
         command: transcoder.Command,
         opts: NormalizeArgs,
         replacement_dict: ReplacementDict,
     ) -> None:
-        return once_normalized(job, command, opts, replacement_dict)
+        return once_normalized(job, command, opts, replacement_dict, records)
 
     return wrapper
 
 
 def insert_derivation_event(
+    records: NormalizationRecords,
     original_uuid: str,
     output_uuid: str,
     derivation_uuid: str,
@@ -330,38 +372,94 @@ def insert_derivation_event(
     outcome_detail_note: Optional[str],
     today: Optional[datetime.datetime] = None,
 ) -> None:
-    """Add the derivation link for preservation files and the event."""
+    """Queue the derivation link for preservation files and the event."""
     if today is None:
         today = timezone.now()
     # Add event information to current file
-    databaseFunctions.insertIntoEvents(
-        fileUUID=original_uuid,
-        eventIdentifierUUID=derivation_uuid,
-        eventType="normalization",
-        eventDateTime=today,
-        eventDetail=event_detail_output,
-        eventOutcome="",
-        eventOutcomeDetailNote=outcome_detail_note or "",
+    records.events.append(
+        {
+            "fileUUID": original_uuid,
+            "eventIdentifierUUID": derivation_uuid,
+            "eventType": "normalization",
+            "eventDateTime": today,
+            "eventDetail": event_detail_output,
+            "eventOutcome": "",
+            "eventOutcomeDetailNote": outcome_detail_note or "",
+        }
     )
 
     # Add linking information between files
-    databaseFunctions.insertIntoDerivations(
-        sourceFileUUID=original_uuid,
-        derivedFileUUID=output_uuid,
-        relatedEventUUID=derivation_uuid,
+    records.derivations.append(
+        {
+            "sourceFileUUID": original_uuid,
+            "derivedFileUUID": output_uuid,
+            "relatedEventUUID": derivation_uuid,
+        }
     )
 
 
-def get_default_rule(purpose: str) -> FPRule:
-    return FPRule.active.get(purpose="default_" + purpose)
+def get_default_rule(
+    purpose: str, fpr: Optional[snapshot.FPRSnapshot] = None
+) -> FPRule:
+    if fpr is None:
+        fpr = snapshot.current()
+    return fpr.default_rule(purpose)
+
+
+@dataclasses.dataclass
+class Normalization:
+    """Normalization command found by ``prepare`` for a file."""
+
+    job: Job
+    opts: NormalizeArgs
+    file_: File
+    fpr: snapshot.FPRSnapshot
+    command: FPCommand
+    replacement_dict: ReplacementDict
+    command_linker: transcoder.CommandLinker
+    records: NormalizationRecords
 
 
-def main(job: Job, opts: NormalizeArgs) -> int:
+def main(
+    job: Job,
+    opts: NormalizeArgs,
+    fpr: Optional[snapshot.FPRSnapshot] = None,
+    file_format_versions: Optional[snapshot.FileFormatVersions] = None,
+) -> int:
     """Find and execute normalization commands on input file."""
+    records = NormalizationRecords()
+    normalization = prepare(job, opts, records, fpr, file_format_versions)
+    if isinstance(normalization, Normalization):
+        exitstatus = finish(normalization, normalization.command_linker.execute())
+    else:
+        exitstatus = normalization
+    records.save()
+
+    return exitstatus
+
+
+def prepare(
+    job: Job,
+    opts: NormalizeArgs,
+    records: NormalizationRecords,
+    fpr: Optional[snapshot.FPRSnapshot] = None,
+    file_format_versions: Optional[snapshot.FileFormatVersions] = None,
+) -> Union[Normalization, int]:
+    """Find the normalization command of the input file.
+
+    Returns the command to run, or the exit code of the job if there is
+    nothing to run. The events and derivations of the file are queued in
+    ``records``.
+    """
     # TODO fix for maildir working only on attachments
 
     setup_dicts(mcpclient_settings)
 
+    if fpr is None:
+        fpr = snapshot.current()
+    if file_format_versions is None:
+        file_format_versions = snapshot.FileFormatVersions([opts.file_uuid])
+
     # Find the file and it's FormatVersion (file identification)
     try:
         file_ = File.objects.get(uuid=opts.file_uuid)
@@ -416,8 +514,8 @@ def main(job: Job, opts: NormalizeArgs) -> int:
         )
         # Don't create events for thumbnail files
         if opts.purpose != "thumbnail":
-            databaseFunctions.insertIntoEvents(
-                fileUUID=derivative.derived_file_id, eventType="deletion"
+            records.events.append(
+                {"fileUUID": derivative.derived_file_id, "eventType": "deletion"}
             )
     if derivatives_to_delete:
         Derivation.objects.filter(id__in=derivatives_to_delete).delete()
@@ -433,6 +531,7 @@ def main(job: Job, opts: NormalizeArgs) -> int:
         if "preservation" in opts.purpose:
             # Add derivation link and associated event
             insert_derivation_event(
+                records,
                 original_uuid=opts.file_uuid,
                 output_uuid=manually_normalized_file.uuid,
                 derivation_uuid=str(uuid.uuid4()),
@@ -443,7 +542,7 @@ def main(job: Job, opts: NormalizeArgs) -> int:
 
     do_fallback = False
     try:
-        file_format_version = FileFormatVersion.objects.get(file_uuid=opts.file_uuid)
+        file_format_version = file_format_versions.get(opts.file_uuid)
     except (FileFormatVersion.DoesNotExist, ValidationError):
         file_format_version = None
 
@@ -451,9 +550,7 @@ def main(job: Job, opts: NormalizeArgs) -> int:
     if file_format_version:
         job.print_output("File format:", file_format_version.format_version)
         try:
-            rule = FPRule.active.get(
-                format=file_format_version.format_version, purpose=opts.purpose
-            )
+            rule = fpr.rule_for_format(file_format_version.format_version, opts.purpose)
         except FPRule.DoesNotExist:
             if (
                 opts.purpose == "thumbnail"
@@ -467,7 +564,7 @@ def main(job: Job, opts: NormalizeArgs) -> int:
     # Try with default rule if no format_id or rule was found
     if file_format_version is None or do_fallback:
         try:
-            rule = get_default_rule(opts.purpose)
+            rule = get_default_rule(opts.purpose, fpr)
             job.print_output(
                 os.path.basename(file_.currentlocation.decode()),
                 "not identified or without rule",
@@ -490,9 +587,29 @@ def main(job: Job, opts: NormalizeArgs) -> int:
 
     replacement_dict = get_replacement_dict(job, opts)
     cl = transcoder.CommandLinker(
-        job, rule, command, replacement_dict, opts, once_normalized_callback(job)
+        job,
+        rule,
+        command,
+        replacement_dict,
+        opts,
+        once_normalized_callback(job, records),
     )
-    exitstatus = cl.execute()
+    return Normalization(job, opts, file_, fpr, command, replacement_dict, cl, records)
+
+
+def finish(normalization: Normalization, exitstatus: int) -> int:
+    """Complete the normalization once its command, executed by the command
+    linker, exited with ``exitstatus``.
+
+    Runs the default rule if the command failed, and returns the exit code of
+    the job.
+    """
+    job = normalization.job
+    opts = normalization.opts
+    file_ = normalization.file_
+    command = normalization.command
+    replacement_dict = normalization.replacement_dict
+    cl = normalization.command_linker
 
     # If the access/thumbnail normalization command has errored AND a
     # derivative was NOT created, then we run the default access/thumbnail
@@ -512,7 +629,7 @@ def main(job: Job, opts: NormalizeArgs) -> int:
     ):
         # Fall back to default rule
         try:
-            fallback_rule = get_default_rule(opts.purpose)
+            fallback_rule = get_default_rule(opts.purpose, normalization.fpr)
             job.print_output(
                 opts.purpose,
                 "normalization failed, falling back to default",
@@ -540,7 +657,7 @@ def main(job: Job, opts: NormalizeArgs) -> int:
                 command,
                 replacement_dict,
                 opts,
-                once_normalized_callback(job),
+                once_normalized_callback(job, normalization.records),
             )
             exitstatus = cl.execute()
 
@@ -613,10 +730,20 @@ def call(jobs: list[Job]) -> None:
     parser = get_parser()
 
     with transaction.atomic():
+        jobs_opts = []
         for job in jobs:
             with job.JobContext():
-                opts = parse_args(parser, job)
+                jobs_opts.append((job, parse_args(parser, job)))
 
+        fpr = snapshot.current()
+        file_format_versions = snapshot.FileFormatVersions(
+            opts.file_uuid for _, opts in jobs_opts
+        )
+        records = NormalizationRecords()
+
+        normalizations = []
+        for job, opts in jobs_opts:
+            with job.JobContext():
                 if (
                     opts.purpose == "thumbnail"
                     and opts.thumbnail_mode == "do_not_generate"
@@ -626,7 +753,38 @@ def call(jobs: list[Job]) -> None:
                     continue
 
                 try:
-                    job.set_status(main(job, opts))
+                    normalization = prepare(
+                        job, opts, records, fpr, file_format_versions
+                    )
                 except Exception as e:
                     job.print_error(str(e))
                     job.set_status(1)
+                    continue
+                if isinstance(normalization, Normalization):
+                    normalizations.append(normalization)
+                else:
+                    job.set_status(normalization)
+
+        # Only the commands run in the pool: the database is used by the
+        # thread of the batch, so that its writes are committed together.
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(mcpclient_settings.NORMALIZE_THREADS, 1)
+        ) as executor:
+            runs = [
+                executor.submit(normalization.command_linker.run)
+                for normalization in normalizations
+            ]
+
+            for normalization, run in zip(normalizations, runs):
+                job = normalization.job
+                with job.JobContext():
+                    try:
+                        exitstatus = normalization.command_linker.finish(run.result())
+                        job.set_status(finish(normalization, exitstatus))
+                    except Exception as e:
+                        job.print_error(str(e))
+                        job.set_status(1)
+
+        # Written once the commands have run, instead of one row at a time
+        # from the callback of each command.
+        records.save()
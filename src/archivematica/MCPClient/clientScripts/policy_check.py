@@ -28,6 +28,7 @@ from django.db import transaction
 from archivematica.archivematicaCommon import databaseFunctions
 from archivematica.archivematicaCommon.dicts import replace_string_values
 from archivematica.archivematicaCommon.executeOrRunSubProcess import executeOrRun
+from archivematica.dashboard.fpr import snapshot
 from archivematica.dashboard.fpr.models import FormatVersion
 from archivematica.dashboard.fpr.models import FPRule
 from archivematica.dashboard.main.models import SIP
@@ -51,12 +52,21 @@ def main(
     sip_uuid: str,
     shared_path: str,
     file_type: str,
+    fpr: Optional[snapshot.FPRSnapshot] = None,
+    file_format_versions: Optional[snapshot.FileFormatVersions] = None,
 ) -> int:
     """Entry point for policy checker."""
     setup_dicts(mcpclient_settings)
 
     policy_checker = PolicyChecker(
-        job, file_path, file_uuid, sip_uuid, shared_path, file_type
+        job,
+        file_path,
+        file_uuid,
+        sip_uuid,
+        shared_path,
+        file_type,
+        fpr,
+        file_format_versions,
     )
     return policy_checker.check()
 
@@ -81,6 +91,8 @@ class PolicyChecker:
         sip_uuid: str,
         shared_path: str,
         file_type: str,
+        fpr: Optional[snapshot.FPRSnapshot] = None,
+        file_format_versions: Optional[snapshot.FileFormatVersions] = None,
     ) -> None:
         """Initiate a new policy check."""
         self.job = job
@@ -89,6 +101,10 @@ class PolicyChecker:
         self.sip_uuid = sip_uuid
         self.shared_path = shared_path
         self.file_type = file_type
+        self.fpr = fpr or snapshot.current()
+        self.file_format_versions = file_format_versions or snapshot.FileFormatVersions(
+            [file_uuid]
+        )
         self.policies_dir = self._get_policies_dir()
         self.is_manually_normalized_access_derivative = (
             self._get_is_manually_normalized_access_derivative()
@@ -226,7 +242,7 @@ class PolicyChecker:
         except (File.DoesNotExist, File.MultipleObjectsReturned, ValidationError):
             return None
 
-    def _get_rules(self) -> FPRule:
+    def _get_rules(self) -> list[FPRule]:
         """Return the FPR rules with purpose ``self.purpose`` and that apply to
         the type/format of file given as input.
         """
@@ -234,14 +250,14 @@ class PolicyChecker:
         if self.is_manually_normalized_access_derivative:
             file_uuid = self._get_manually_normalized_access_derivative_file_uuid()
         try:
-            fmt = FormatVersion.active.get(fileformatversion__file_uuid=file_uuid)
+            fmt = self.file_format_versions.active_format_version(file_uuid)
         except (FormatVersion.DoesNotExist, ValidationError):
             rules = fmt = None
         if fmt:
-            rules = FPRule.active.filter(format=fmt.uuid, purpose=self.purpose)
+            rules = self.fpr.rules_for_format(fmt, self.purpose)
         # Check for default rules.
         if not rules:
-            rules = FPRule.active.filter(purpose=f"default_{self.purpose}")
+            rules = self.fpr.rules_for_purpose(f"default_{self.purpose}")
         return rules
 
     def _execute_rule_command(self, rule: FPRule) -> str:
@@ -464,6 +480,10 @@ class PolicyChecker:
 
 def call(jobs: list[Job]) -> None:
     with transaction.atomic():
+        fpr = snapshot.current()
+        file_format_versions = snapshot.FileFormatVersions(
+            job.args[2] for job in jobs if len(job.args) > 2
+        )
         for job in jobs:
             with job.JobContext(logger=logger):
                 file_path = job.args[1]
@@ -475,7 +495,14 @@ def call(jobs: list[Job]) -> None:
                 try:
                     job.set_status(
                         main(
-                            job, file_path, file_uuid, sip_uuid, shared_path, file_type
+                            job,
+                            file_path,
+                            file_uuid,
+                            sip_uuid,
+                            shared_path,
+                            file_type,
+                            fpr,
+                            file_format_versions,
                         )
                     )
                 except ValueError:
@@ -129,13 +129,34 @@ class CommandLinker:
         """Execute the command, and track the success statistics.
 
         Returns 0 on success, non-0 on failure."""
+        return self.finish(self.run())
+
+    def run(self):
+        """Execute the command without its success callback, which may use
+        the database, so that it can run outside of the thread of the job.
+
+        Returns the exit code to pass to ``finish``."""
+        return self.commandObject.execute(skip_on_success=True)
+
+    def finish(self, ret):
+        """Call the success callback of a command executed by ``run``, and
+        track the success statistics.
+
+        Returns 0 on success, non-0 on failure."""
+        if ret == 0 and self.on_success:
+            self.on_success(
+                self.commandObject, self.opts, self.commandObject.replacement_dict
+            )
+            ret = self.commandObject.exit_code
+
         # Track success/failure rates of FP Rules
-        # Use Django's F() to prevent race condition updating the counts
-        self.fprule.count_attempts = F("count_attempts") + 1
-        ret = self.commandObject.execute()
+        # Use Django's F() to prevent race condition updating the counts, and
+        # update the counts only, through the base manager: the counts are not
+        # part of the rule, so they must not start a new FPR revision.
+        counts = {"count_attempts": F("count_attempts") + 1}
         if ret:
-            self.fprule.count_not_okay = F("count_not_okay") + 1
+            counts["count_not_okay"] = F("count_not_okay") + 1
         else:
-            self.fprule.count_okay = F("count_okay") + 1
-        self.fprule.save()
+            counts["count_okay"] = F("count_okay") + 1
+        type(self.fprule)._base_manager.filter(pk=self.fprule.pk).update(**counts)
         return ret
@@ -16,10 +16,12 @@
 # You should have received a copy of the GNU General Public License
 # along with Archivematica.  If not, see <http://www.gnu.org/licenses/>.
 import argparse
+import concurrent.futures
 import os
 import uuid
 
 import django
+from django.conf import settings as mcpclient_settings
 from django.db import transaction
 
 django.setup()
@@ -27,10 +29,15 @@ django.setup()
 import metsrw
 
 from archivematica.archivematicaCommon.archivematicaFunctions import find_mets_file
+from archivematica.archivematicaCommon.archivematicaFunctions import get_setting
 from archivematica.archivematicaCommon.custom_handlers import get_script_logger
-from archivematica.archivematicaCommon.databaseFunctions import insertIntoDerivations
+from archivematica.archivematicaCommon.databaseFunctions import CHUNK_SIZE
+from archivematica.archivematicaCommon.databaseFunctions import (
+    bulkInsertIntoDerivations,
+)
+from archivematica.archivematicaCommon.databaseFunctions import bulkInsertIntoEvents
+from archivematica.archivematicaCommon.fileOperations import checksum_event
 from archivematica.archivematicaCommon.fileOperations import get_size_and_checksum
-from archivematica.archivematicaCommon.fileOperations import updateSizeAndChecksum
 from archivematica.dashboard.main.models import File
 from archivematica.dashboard.main.models import FileFormatVersion
 from archivematica.MCPClient.clientScripts import parse_mets_to_db
@@ -127,10 +134,11 @@ def get_size_and_checksum_for_file(
     event_uuid,
     filter_subdir,
 ):
-    """Get size and checksum for a file.
+    """Get what is known about the size and checksum of a file.
 
     If file is from Archivematica AIP transfer, try to extract and use
-    the size, checksum, and checksum type values from the METS.
+    the size, checksum, and checksum type values from the METS. Whatever is
+    missing is computed later by ``add_size_and_checksum``.
     """
     kw = {}
     if transfer_uuid:
@@ -160,17 +168,27 @@ def get_size_and_checksum_for_file(
         if info.get("format_version"):
             kw["formatVersion"] = info["format_version"]
 
+    return kw
+
+
+def add_size_and_checksum(file_info, checksum_type, use_mmap=False):
+    """Compute the size and checksum missing from ``file_info``.
+
+    This reads the file and does not touch the database, so it is safe to
+    call from worker threads.
+    """
     fileSize, checksum, checksumType = get_size_and_checksum(
-        file_path,
-        file_size=kw.get("fileSize"),
-        checksum=kw.get("checksum"),
-        checksum_type=kw.get("checksumType"),
+        file_info["filePath"],
+        file_size=file_info.get("fileSize"),
+        checksum=file_info.get("checksum"),
+        checksum_type=file_info.get("checksumType") or checksum_type,
+        use_mmap=use_mmap,
     )
-    kw.update(
+    file_info.update(
         {"fileSize": fileSize, "checksum": checksum, "checksumType": checksumType}
     )
 
-    return kw
+    return file_info
 
 
 def call(jobs):
@@ -194,65 +212,108 @@ def call(jobs):
 
     state = []
 
-    for job in jobs:
-        with job.JobContext(logger=logger):
-            args = parser.parse_args(job.args[1:])
-
-            TRANSFER_SIP_UUIDS = [args.sip_uuid, args.transfer_uuid]
-            if all(TRANSFER_SIP_UUIDS) or not any(TRANSFER_SIP_UUIDS):
-                job.print_error("SIP exclusive-or Transfer UUID must be defined")
-                job.set_status(2)
-                continue
-
-            files = get_transfer_file_queryset(args.transfer_uuid, args.filter_subdir)
-            if args.sip_uuid:
-                files = get_sip_file_queryset(args.sip_uuid, args.filter_subdir)
-
-            mets_file = None
-            mets = None
-            try:
-                mets_file = find_mets_file(args.sip_directory)
-            except OSError as err:
-                job.print_error(f"METS file not found: {err}")
-            if mets_file:
-                job.print_output(f"Reading METS file {mets_file}")
-                mets = metsrw.METSDocument.fromfile(mets_file)
-
-            for file_ in files:
-                if not file_:
+    # Read the setting once, the hashing threads do not use the database.
+    checksum_type = get_setting("checksum_type", "sha256")
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=max(mcpclient_settings.CHECKSUM_THREADS, 1)
+    ) as executor:
+        for job in jobs:
+            with job.JobContext(logger=logger):
+                args = parser.parse_args(job.args[1:])
+
+                TRANSFER_SIP_UUIDS = [args.sip_uuid, args.transfer_uuid]
+                if all(TRANSFER_SIP_UUIDS) or not any(TRANSFER_SIP_UUIDS):
+                    job.print_error("SIP exclusive-or Transfer UUID must be defined")
+                    job.set_status(2)
                     continue
-                file_info = get_size_and_checksum_for_file(
-                    job,
-                    file_,
-                    mets,
-                    args.sharedPath,
-                    args.sip_directory,
-                    args.sip_uuid,
-                    args.transfer_uuid,
-                    args.date,
-                    args.event_uuid,
-                    args.filter_subdir,
-                )
-                if file_info:
-                    state.append((file_.uuid, file_info, args))
 
-            job.set_status(0)
-
-    with transaction.atomic():
-        for file_uuid, file_info, args in state:
-            file_path = file_info.pop("filePath")
-            derivation = file_info.pop("derivation", None)
-            format_version = file_info.pop("formatVersion", None)
-            if derivation is not None:
-                insertIntoDerivations(
-                    sourceFileUUID=file_uuid,
-                    derivedFileUUID=derivation,
+                files = get_transfer_file_queryset(
+                    args.transfer_uuid, args.filter_subdir
                 )
-            if format_version is not None:
-                FileFormatVersion.objects.create(
-                    file_uuid_id=file_uuid,
-                    format_version=format_version,
+                if args.sip_uuid:
+                    files = get_sip_file_queryset(args.sip_uuid, args.filter_subdir)
+
+                mets_file = None
+                mets = None
+                try:
+                    mets_file = find_mets_file(args.sip_directory)
+                except OSError as err:
+                    job.print_error(f"METS file not found: {err}")
+                if mets_file:
+                    job.print_output(f"Reading METS file {mets_file}")
+                    mets = metsrw.METSDocument.fromfile(mets_file)
+
+                pending = []
+                for file_ in files:
+                    if not file_:
+                        continue
+                    file_info = get_size_and_checksum_for_file(
+                        job,
+                        file_,
+                        mets,
+                        args.sharedPath,
+                        args.sip_directory,
+                        args.sip_uuid,
+                        args.transfer_uuid,
+                        args.date,
+                        args.event_uuid,
+                        args.filter_subdir,
+                    )
+                    if file_info:
+                        future = executor.submit(
+                            add_size_and_checksum,
+                            file_info,
+                            checksum_type,
+                            use_mmap=mcpclient_settings.CHECKSUM_USE_MMAP,
+                        )
+                        pending.append((file_.uuid, future))
+
+                for file_uuid, future in pending:
+                    state.append((file_uuid, future.result(), args))
+
+                job.set_status(0)
+
+    # Write the results of the batch with a few bulk queries.
+    derivations = []
+    file_format_versions = []
+    files = []
+    events = []
+    for file_uuid, file_info, args in state:
+        file_info.pop("filePath")
+        derivation = file_info.pop("derivation", None)
+        format_version = file_info.pop("formatVersion", None)
+        if derivation is not None:
+            derivations.append(
+                {"sourceFileUUID": file_uuid, "derivedFileUUID": derivation}
+            )
+        if format_version is not None:
+            file_format_versions.append(
+                FileFormatVersion(file_uuid_id=file_uuid, format_version=format_version)
+            )
+        files.append(
+            File(
+                uuid=file_uuid,
+                size=file_info["fileSize"],
+                checksum=file_info["checksum"],
+                checksumtype=file_info["checksumType"],
+            )
+        )
+        if file_info.get("add_event", True):
+            events.append(
+                checksum_event(
+                    file_uuid,
+                    args.date,
+                    file_info["checksum"],
+                    file_info["checksumType"],
                 )
-            updateSizeAndChecksum(
-                file_uuid, file_path, args.date, args.event_uuid, **file_info
             )
+
+    with transaction.atomic():
+        bulkInsertIntoDerivations(derivations)
+        FileFormatVersion.objects.bulk_create(
+            file_format_versions, batch_size=CHUNK_SIZE
+        )
+        File.objects.bulk_update(
+            files, ["size", "checksum", "checksumtype"], batch_size=CHUNK_SIZE
+        )
+        bulkInsertIntoEvents(events)
@@ -35,6 +35,7 @@ from archivematica.archivematicaCommon import databaseFunctions
 from archivematica.archivematicaCommon.custom_handlers import get_script_logger
 from archivematica.archivematicaCommon.dicts import replace_string_values
 from archivematica.archivematicaCommon.executeOrRunSubProcess import executeOrRun
+from archivematica.dashboard.fpr import snapshot
 from archivematica.dashboard.fpr.models import FormatVersion
 from archivematica.dashboard.fpr.models import FPRule
 from archivematica.dashboard.main.models import SIP
@@ -57,10 +58,21 @@ def main(
     sip_uuid: str,
     shared_path: Optional[str],
     file_type: str,
+    fpr: Optional[snapshot.FPRSnapshot] = None,
+    file_format_versions: Optional[snapshot.FileFormatVersions] = None,
 ) -> int:
     setup_dicts(mcpclient_settings)
 
-    validator = Validator(job, file_path, file_uuid, sip_uuid, shared_path, file_type)
+    validator = Validator(
+        job,
+        file_path,
+        file_uuid,
+        sip_uuid,
+        shared_path,
+        file_type,
+        fpr,
+        file_format_versions,
+    )
     return validator.validate()
 
 
@@ -130,6 +142,8 @@ class Validator:
         sip_uuid: str,
         shared_path: Optional[str],
         file_type: str,
+        fpr: Optional[snapshot.FPRSnapshot] = None,
+        file_format_versions: Optional[snapshot.FileFormatVersions] = None,
     ):
         self.job = job
         self.file_path = file_path
@@ -137,6 +151,10 @@ class Validator:
         self.sip_uuid = sip_uuid
         self.shared_path = shared_path if shared_path else ""
         self.file_type = file_type
+        self.fpr = fpr or snapshot.current()
+        self.file_format_versions = file_format_versions or snapshot.FileFormatVersions(
+            [file_uuid]
+        )
         self.purpose = "validation"
         self._sip_logs_dir: Optional[str] = None
         self._sip_pres_val_dir: Optional[str] = None
@@ -164,17 +182,17 @@ class Validator:
 
         return SUCCESS_CODE
 
-    def _get_rules(self) -> FPRule:
+    def _get_rules(self) -> list[FPRule]:
         """Return all FPR rules that apply to files of this type."""
         try:
-            fmt = FormatVersion.active.get(fileformatversion__file_uuid=self.file_uuid)
+            fmt = self.file_format_versions.active_format_version(self.file_uuid)
         except (FormatVersion.DoesNotExist, ValidationError):
             rules = fmt = None
         if fmt:
-            rules = FPRule.active.filter(format=fmt.uuid, purpose=self.purpose)
+            rules = self.fpr.rules_for_format(fmt, self.purpose)
         # Check default rules.
         if not rules:
-            rules = FPRule.active.filter(purpose=f"default_{self.purpose}")
+            rules = self.fpr.rules_for_purpose(f"default_{self.purpose}")
         return rules
 
     def _execute_rule_command(self, rule: FPRule) -> str:
@@ -375,6 +393,10 @@ def _get_file_type(argv: list[str]) -> str:
 
 def call(jobs: list[Job]) -> None:
     with transaction.atomic():
+        fpr = snapshot.current()
+        file_format_versions = snapshot.FileFormatVersions(
+            job.args[2] for job in jobs if len(job.args) > 2
+        )
         for job in jobs:
             with job.JobContext(logger=logger):
                 file_path = job.args[1]
@@ -383,5 +405,14 @@ def call(jobs: list[Job]) -> None:
                 shared_path = _get_shared_path(job.args)
                 file_type = _get_file_type(job.args)
                 job.set_status(
-                    main(job, file_path, file_uuid, sip_uuid, shared_path, file_type)
+                    main(
+                        job,
+                        file_path,
+                        file_uuid,
+                        sip_uuid,
+                        shared_path,
+                        file_type,
+                        fpr,
+                        file_format_versions,
+                    )
                 )
@@ -1,7 +1,10 @@
 #!/usr/bin/env python
+import hashlib
 import os
 import shutil
+import subprocess
 import sys
+import tarfile
 from pprint import pformat
 
 import django
@@ -18,11 +21,24 @@ from archivematica.archivematicaCommon.executeOrRunSubProcess import executeOrRu
 from archivematica.dashboard.main.models import SIP
 from archivematica.dashboard.main.models import File
 
+# Bytes read from an archive member at a time when hashing it.
+CHUNK_SIZE = 1024 * 1024
+
+TAR_EXTENSIONS = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2")
+
 
 class VerifyChecksumsError(Exception):
     """Checksum verification has failed."""
 
 
+def aip_identifier_from_path(aip_path):
+    """Return the name of the bag directory inside of a compressed AIP."""
+    aip_identifier, ext = os.path.splitext(os.path.basename(aip_path))
+    if ext in (".bz2", ".gz"):
+        aip_identifier, _ = os.path.splitext(aip_identifier)
+    return aip_identifier
+
+
 def extract_aip(job, aip_path, extract_path):
     os.makedirs(extract_path)
     command = f"atool --extract-to={extract_path} -V0 {aip_path}"
@@ -35,10 +51,208 @@ def extract_aip(job, aip_path, extract_path):
     if exit_code != 0:
         raise Exception("Error extracting AIP")
 
-    aip_identifier, ext = os.path.splitext(os.path.basename(aip_path))
-    if ext in (".bz2", ".gz"):
-        aip_identifier, _ = os.path.splitext(aip_identifier)
-    return os.path.join(extract_path, aip_identifier)
+    return os.path.join(extract_path, aip_identifier_from_path(aip_path))
+
+
+class MemberReader:
+    """Read exactly ``size`` bytes of a stream holding several members."""
+
+    def __init__(self, stream, size):
+        self.stream = stream
+        self.remaining = size
+
+    def read(self, size=CHUNK_SIZE):
+        if size < 0:
+            size = self.remaining
+        data = self.stream.read(min(size, self.remaining))
+        if self.remaining and not data:
+            raise BagError("Unexpected end of the 7z output stream")
+        self.remaining -= len(data)
+        return data
+
+    def drain(self):
+        while self.read():
+            pass
+
+
+def parse_7z_listing(listing):
+    """Return the ``(path, size)`` of the files in the output of
+    ``7z l -slt``, in the order of the archive.
+    """
+    members = []
+    # The properties of the archive itself come before the separator.
+    _, _, listing = listing.partition("\n----------\n")
+    for block in listing.split("\n\n"):
+        properties = dict(
+            line.split(" = ", 1) for line in block.splitlines() if " = " in line
+        )
+        if "Path" not in properties:
+            continue
+        if properties.get("Folder") == "+" or properties.get(
+            "Attributes", ""
+        ).startswith("D"):
+            continue
+        members.append((properties["Path"], int(properties.get("Size") or 0)))
+    return members
+
+
+def iter_7z_members(aip_path):
+    """Yield the ``(path, reader)`` of the files of a 7z archive.
+
+    7-Zip writes the files it extracts to the standard output one after the
+    other, in the order of the archive, so their sizes from the listing are
+    used to split the stream.
+    """
+    listing = subprocess.run(
+        ("7z", "l", "-slt", aip_path), capture_output=True, text=True, check=True
+    ).stdout
+    members = parse_7z_listing(listing)
+    with subprocess.Popen(
+        ("7z", "x", "-so", aip_path),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+    ) as process:
+        try:
+            for path, size in members:
+                reader = MemberReader(process.stdout, size)
+                yield path, reader
+                reader.drain()
+            if process.stdout.read(1):
+                raise BagError("The 7z output stream is longer than its listing")
+        finally:
+            process.stdout.close()
+            process.wait()
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, process.args)
+
+
+def iter_tar_members(aip_path):
+    """Yield the ``(path, reader)`` of the files of a (compressed) tarball."""
+    with tarfile.open(aip_path, mode="r|*") as tar:
+        for member in tar:
+            if member.isfile():
+                yield member.name, tar.extractfile(member)
+
+
+def iter_archive_members(aip_path):
+    if aip_path.endswith(TAR_EXTENSIONS):
+        return iter_tar_members(aip_path)
+    return iter_7z_members(aip_path)
+
+
+def parse_manifest(content):
+    """Return the paths and checksums of a BagIt manifest file."""
+    entries = {}
+    for line in content.decode("utf-8").splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        checksum, path = line.split(None, 1)
+        path = path.replace("%0A", "\n").replace("%0D", "\r").replace("%25", "%")
+        entries[os.path.normpath(path.strip("*"))] = checksum.lower()
+    return entries
+
+
+def parse_payload_oxum(content):
+    """Return the ``(bytes, files)`` of the Payload-Oxum of bag-info.txt."""
+    for line in content.decode("utf-8").splitlines():
+        name, _, value = line.partition(":")
+        if name.strip().lower() == "payload-oxum":
+            octets, _, count = value.strip().partition(".")
+            return int(octets), int(count)
+    return None
+
+
+class StreamedBag:
+    """Bag read from a compressed AIP without extracting it to disk.
+
+    Every payload file is hashed as its archive member is read. ``validate``
+    checks that the payload matches the ``manifest-*.txt`` of the bag and
+    ``entries`` maps the paths of the manifest to their checksums like
+    ``bagit.Bag.entries`` does. The payload is hashed with ``checksum_type``
+    and read a second time only if the bag has no manifest for it.
+    """
+
+    def __init__(self, aip_path, checksum_type):
+        self.aip_path = aip_path
+        self.checksum_type = checksum_type
+        self.entries = {}
+
+    def validate(self):
+        tag_files, payload = self._read(self.checksum_type)
+
+        if "bagit.txt" not in tag_files:
+            raise BagError("Expected bagit.txt does not exist")
+        manifests = {
+            path[len("manifest-") : -len(".txt")]: path
+            for path in tag_files
+            if path.startswith("manifest-")
+        }
+        if not manifests:
+            raise BagError("Expected manifest-*.txt does not exist")
+        if self.checksum_type not in manifests:
+            # E.g. the checksum type was changed after the AIP was bagged.
+            self.checksum_type = sorted(manifests)[0]
+            if self.checksum_type not in hashlib.algorithms_available:
+                raise BagError(f"Unsupported manifest {manifests[self.checksum_type]}")
+            _, payload = self._read(self.checksum_type)
+        manifest = parse_manifest(tag_files[manifests[self.checksum_type]])
+        self.entries = {
+            path: {self.checksum_type: checksum} for path, checksum in manifest.items()
+        }
+
+        missing = sorted(set(manifest) - set(payload))
+        if missing:
+            raise BagError(f"Bag is incomplete, missing files: {missing}")
+        unexpected = sorted(set(payload) - set(manifest))
+        if unexpected:
+            raise BagError(f"Payload files not in the manifest: {unexpected}")
+        invalid = sorted(
+            path
+            for path, (checksum, _) in payload.items()
+            if checksum != manifest[path]
+        )
+        if invalid:
+            raise BagError(f"Payload files with invalid checksums: {invalid}")
+
+        oxum = parse_payload_oxum(tag_files.get("bag-info.txt", b""))
+        found = (sum(size for _, size in payload.values()), len(payload))
+        if oxum is not None and oxum != found:
+            raise BagError(
+                f"Payload-Oxum validation failed. Expected {oxum[1]} files and"
+                f" {oxum[0]} bytes but found {found[1]} files and {found[0]} bytes"
+            )
+
+    def _read(self, checksum_type):
+        """Return the tag files and the hashed payload files of the bag."""
+        prefix = aip_identifier_from_path(self.aip_path) + "/"
+        tag_files = {}
+        payload = {}
+        try:
+            for path, reader in iter_archive_members(self.aip_path):
+                path = os.path.normpath(path)
+                if not path.startswith(prefix):
+                    continue
+                path = path[len(prefix) :]
+                if path.startswith("data/"):
+                    payload[path] = self._hash(reader, checksum_type)
+                elif path in ("bagit.txt", "bag-info.txt") or (
+                    path.startswith("manifest-") and path.endswith(".txt")
+                ):
+                    tag_files[path] = reader.read(-1)
+        except (OSError, tarfile.TarError, subprocess.CalledProcessError) as err:
+            raise BagError(f"Unable to read {self.aip_path}: {err}")
+        return tag_files, payload
+
+    @staticmethod
+    def _hash(reader, checksum_type):
+        """Return the checksum and size of an archive member."""
+        checksum = hashlib.new(checksum_type)
+        size = 0
+        while chunk := reader.read(CHUNK_SIZE):
+            checksum.update(chunk)
+            size += len(chunk)
+        return checksum.hexdigest(), size
 
 
 def write_premis_event(
@@ -188,9 +402,14 @@ def verify_aip(job):
     temp_dir = mcpclient_settings.TEMP_DIRECTORY
 
     is_uncompressed_aip = os.path.isdir(aip_path)
+    is_streamed_aip = (
+        not is_uncompressed_aip and mcpclient_settings.VERIFY_AIP_STREAMING
+    )
 
     if is_uncompressed_aip:
         bag_path = aip_path
+    elif is_streamed_aip:
+        bag_path = None
     else:
         try:
             extract_dir = os.path.join(temp_dir, sip_uuid)
@@ -202,10 +421,19 @@ def verify_aip(job):
 
     return_code = 0
     try:
-        # Only validate completeness since we're going to verify checksums
-        # later against what we have in the database via `verify_checksums`.
-        bag = Bag(bag_path)
-        bag.validate(completeness_only=True)
+        if is_streamed_aip:
+            bag = StreamedBag(
+                aip_path,
+                get_setting(
+                    "checksum_type", mcpclient_settings.DEFAULT_CHECKSUM_ALGORITHM
+                ),
+            )
+            bag.validate()
+        else:
+            # Only validate completeness since we're going to verify checksums
+            # later against what we have in the database via `verify_checksums`.
+            bag = Bag(bag_path)
+            bag.validate(completeness_only=True)
     except BagError as err:
         job.print_error(f"Error validating BagIt package: {err}")
         return_code = 1
@@ -219,7 +447,7 @@ def verify_aip(job):
         job.pyprint("Not verifying checksums because other tests have already failed.")
 
     # cleanup
-    if not is_uncompressed_aip:
+    if not is_uncompressed_aip and not is_streamed_aip:
         try:
             shutil.rmtree(extract_dir)
         except OSError as err:
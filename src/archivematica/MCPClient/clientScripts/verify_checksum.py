@@ -31,14 +31,13 @@ import datetime
 import os
 import subprocess
 import sys
-import uuid
 
 import django
 from django.db import transaction
 
 django.setup()
 from archivematica.archivematicaCommon.custom_handlers import get_script_logger
-from archivematica.dashboard.main.models import Event
+from archivematica.archivematicaCommon.databaseFunctions import bulkInsertIntoEvents
 from archivematica.dashboard.main.models import File
 from archivematica.dashboard.main.models import Transfer
 
@@ -215,30 +214,21 @@ def get_file_queryset(transfer_uuid):
 
 def write_premis_event_per_file(file_uuids, transfer_uuid, event_detail):
     """Generate PREMIS events per File object verified in this transfer."""
-    event_type = "fixity check"
-    event_outcome = "pass"
-    events = []
-    agents = Transfer.objects.get(uuid=transfer_uuid).agents
+    agents = list(
+        Transfer.objects.get(uuid=transfer_uuid).agents.values_list("pk", flat=True)
+    )
     with transaction.atomic():
-        for file_obj in file_uuids:
-            checksum_event = Event(
-                file_uuid=file_obj,
-                event_type=event_type,
-                event_datetime=datetime.datetime.now(),
-                event_outcome=event_outcome,
-                event_detail=event_detail,
-                event_id=uuid.uuid4(),
-            )
-            events.append(checksum_event)
-        # All the events sit in memory at this point and are then written.
-        # We could write this in batches if we need to optimize further.
-        Event.objects.bulk_create(events)
-        # Adding many-to-many fields with bulk create is awkward, we have to
-        # loop through again.
-        for event in Event.objects.filter(
-            file_uuid__in=[event.file_uuid for event in events]
-        ):
-            event.agents.add(*agents)
+        bulkInsertIntoEvents(
+            {
+                "fileUUID": file_obj.uuid,
+                "eventType": "fixity check",
+                "eventDateTime": datetime.datetime.now(),
+                "eventDetail": event_detail,
+                "eventOutcome": "pass",
+                "agents": agents,
+            }
+            for file_obj in file_uuids
+        )
 
 
 def run_hashsum_commands(job):
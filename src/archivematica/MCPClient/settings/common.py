@@ -51,6 +51,30 @@ def workers(config, section):
         return multiprocessing.cpu_count()
 
 
+def threads_per_worker(config, section, option):
+    """Return the thread pool size set in `option`, or a share of the CPUs.
+
+    Every worker runs its own pool, so by default the CPUs available are split
+    between the workers instead of each pool getting all of them.
+    """
+    try:
+        return config.config.getint(section, option)
+    except (configparser.Error, ValueError):
+        return max(1, multiprocessing.cpu_count() // max(1, workers(config, section)))
+
+
+def checksum_threads(config, section):
+    return threads_per_worker(config, section, "checksum_threads")
+
+
+def normalize_threads(config, section):
+    return threads_per_worker(config, section, "normalize_threads")
+
+
+def extract_threads(config, section):
+    return threads_per_worker(config, section, "extract_threads")
+
+
 CONFIG_MAPPING = {
     # [MCPClient]
     "workers": {
@@ -108,10 +132,65 @@ CONFIG_MAPPING = {
         "option": "elasticsearchTimeout",
         "type": "float",
     },
+    "elasticsearch_bulk_chunk_size": {
+        "section": "MCPClient",
+        "option": "elasticsearchBulkChunkSize",
+        "type": "int",
+    },
+    "elasticsearch_bulk_thread_count": {
+        "section": "MCPClient",
+        "option": "elasticsearchBulkThreadCount",
+        "type": "int",
+    },
     "search_enabled": {
         "section": "MCPClient",
         "process_function": process_search_enabled,
     },
+    "checksum_threads": {
+        "section": "MCPClient",
+        "option": "checksum_threads",
+        "process_function": checksum_threads,
+    },
+    "normalize_threads": {
+        "section": "MCPClient",
+        "option": "normalize_threads",
+        "process_function": normalize_threads,
+    },
+    "extract_threads": {
+        "section": "MCPClient",
+        "option": "extract_threads",
+        "process_function": extract_threads,
+    },
+    "checksum_use_mmap": {
+        "section": "MCPClient",
+        "option": "checksum_use_mmap",
+        "type": "boolean",
+    },
+    "mets_streaming_writer": {
+        "section": "MCPClient",
+        "option": "mets_streaming_writer",
+        "type": "boolean",
+    },
+    "mets_amdsec_processes": {
+        "section": "MCPClient",
+        "option": "mets_amdsec_processes",
+        "type": "int",
+    },
+    "python_script_runner": {
+        "section": "MCPClient",
+        "option": "python_script_runner",
+        "type": "boolean",
+    },
+    "fpr_snapshot_cache": {
+        "section": "MCPClient",
+        "option": "fpr_snapshot_cache",
+        "type": "boolean",
+    },
+    "verify_aip_streaming": {
+        "section": "MCPClient",
+        "option": "verify_aip_streaming",
+        "type": "boolean",
+    },
     "index_aip_continue_on_error": {
         "section": "MCPClient",
         "option": "index_aip_continue_on_error",
@@ -143,11 +222,26 @@ CONFIG_MAPPING = {
         "option": "storage_service_client_quick_timeout",
         "type": "float",
     },
+    "storage_service_client_retries": {
+        "section": "MCPClient",
+        "option": "storage_service_client_retries",
+        "type": "int",
+    },
+    "storage_service_cache_ttl": {
+        "section": "MCPClient",
+        "option": "storage_service_cache_ttl",
+        "type": "float",
+    },
     "agentarchives_client_timeout": {
         "section": "MCPClient",
         "option": "agentarchives_client_timeout",
         "type": "float",
     },
+    "dashboard_settings_cache_ttl": {
+        "section": "MCPClient",
+        "option": "dashboard_settings_cache_ttl",
+        "type": "float",
+    },
     "prometheus_bind_address": {
         "section": "MCPClient",
         "option": "prometheus_bind_address",
@@ -222,17 +316,31 @@ archivematicaClientModules = /usr/lib/archivematica/MCPClient/archivematicaClien
 clientAssetsDirectory = /usr/lib/archivematica/MCPClient/assets/
 elasticsearchServer = localhost:9200
 elasticsearchTimeout = 10
+elasticsearchBulkChunkSize = 500
+elasticsearchBulkThreadCount = 1
 search_enabled = true
 metadata_xml_validation_enabled = false
 index_aip_continue_on_error = false
 capture_client_script_output = true
+checksum_threads =
+checksum_use_mmap = false
+normalize_threads =
+extract_threads =
+mets_streaming_writer = false
+mets_amdsec_processes = 1
+python_script_runner = false
+fpr_snapshot_cache = true
+verify_aip_streaming = false
 temp_dir = /var/archivematica/sharedDirectory/tmp
 removableFiles = Thumbs.db, Icon, Icon\r, .DS_Store
 clamav_server = /var/run/clamav/clamd.ctl
 clamav_pass_by_stream = True
 storage_service_client_timeout = 86400
 storage_service_client_quick_timeout = 5
+storage_service_client_retries = 3
+storage_service_cache_ttl = 60
 agentarchives_client_timeout = 300
+dashboard_settings_cache_ttl = 60
 prometheus_bind_address =
 prometheus_bind_port =
 prometheus_detailed_metrics = false
@@ -352,6 +460,15 @@ else:
 
 WORKERS = config.get("workers")
 MAX_TASKS_PER_CHILD = config.get("max_tasks_per_child")
+CHECKSUM_THREADS = config.get("checksum_threads")
+NORMALIZE_THREADS = config.get("normalize_threads")
+EXTRACT_THREADS = config.get("extract_threads")
+CHECKSUM_USE_MMAP = config.get("checksum_use_mmap")
+METS_STREAMING_WRITER = config.get("mets_streaming_writer")
+METS_AMDSEC_PROCESSES = config.get("mets_amdsec_processes")
+PYTHON_SCRIPT_RUNNER = config.get("python_script_runner")
+FPR_SNAPSHOT_CACHE = config.get("fpr_snapshot_cache")
+VERIFY_AIP_STREAMING = config.get("verify_aip_streaming")
 SHARED_DIRECTORY = config.get("shared_directory")
 PROCESSING_DIRECTORY = config.get("processing_directory")
 REJECTED_DIRECTORY = config.get("rejected_directory")
@@ -363,6 +480,8 @@ REMOVABLE_FILES = config.get("removable_files")
 TEMP_DIRECTORY = config.get("temp_directory")
 ELASTICSEARCH_SERVER = config.get("elasticsearch_server")
 ELASTICSEARCH_TIMEOUT = config.get("elasticsearch_timeout")
+ELASTICSEARCH_BULK_CHUNK_SIZE = config.get("elasticsearch_bulk_chunk_size")
+ELASTICSEARCH_BULK_THREAD_COUNT = config.get("elasticsearch_bulk_thread_count")
 CLAMAV_SERVER = config.get("clamav_server")
 CLAMAV_PASS_BY_STREAM = config.get("clamav_pass_by_stream")
 CLAMAV_CLIENT_TIMEOUT = config.get("clamav_client_timeout")
@@ -373,7 +492,10 @@ STORAGE_SERVICE_CLIENT_TIMEOUT = config.get("storage_service_client_timeout")
 STORAGE_SERVICE_CLIENT_QUICK_TIMEOUT = config.get(
     "storage_service_client_quick_timeout"
 )
+STORAGE_SERVICE_CLIENT_RETRIES = config.get("storage_service_client_retries")
+STORAGE_SERVICE_CACHE_TTL = config.get("storage_service_cache_ttl")
 AGENTARCHIVES_CLIENT_TIMEOUT = config.get("agentarchives_client_timeout")
+DASHBOARD_SETTINGS_CACHE_TTL = config.get("dashboard_settings_cache_ttl")
 SEARCH_ENABLED = config.get("search_enabled")
 INDEX_AIP_CONTINUE_ON_ERROR = config.get("index_aip_continue_on_error")
 CAPTURE_CLIENT_SCRIPT_OUTPUT = config.get("capture_client_script_output")
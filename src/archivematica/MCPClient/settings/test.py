@@ -29,3 +29,15 @@ DATABASES = {
         "PORT": "",
     }
 }
+
+# Test transactions are rolled back without sending signals, so a cached
+# DashboardSetting could leak into the next test.
+DASHBOARD_SETTINGS_CACHE_TTL = 0
+
+# Likewise, the FPR revision counter goes back with the rolled back test
+# transactions, so a cached FPR snapshot could look current in the next test.
+FPR_SNAPSHOT_CACHE = False
+
+# Tests mock the Storage Service responses, so a cached location could leak
+# into the next test.
+STORAGE_SERVICE_CACHE_TTL = 0
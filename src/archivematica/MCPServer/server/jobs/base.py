@@ -66,9 +66,20 @@ class Job(metaclass=abc.ABCMeta):
         to process.
         """
 
+    def update_unit_status(self, currentstep):
+        """Record the status of the package after a change to this job."""
+        models.UnitStatus.objects.record_job(
+            self.package.uuid,
+            self.package.JOB_UNIT_TYPE,
+            self.uuid,
+            self.description,
+            self.group,
+            currentstep,
+        )
+
     @auto_close_old_connections()
     def save_to_db(self):
-        return models.Job.objects.create(
+        job = models.Job.objects.create(
             jobuuid=self.uuid,
             jobtype=self.description,
             directory=self.package.current_path_for_db,
@@ -80,12 +91,16 @@ class Job(metaclass=abc.ABCMeta):
             createdtimedec=float(self.created_at.strftime("0.%f")),
             microservicechainlink=self.link.id,
         )
+        self.update_unit_status(self.STATUS_EXECUTING_COMMANDS)
+        return job
 
     @auto_close_old_connections()
     def mark_awaiting_decision(self):
-        return models.Job.objects.filter(jobuuid=self.uuid).update(
+        updated = models.Job.objects.filter(jobuuid=self.uuid).update(
             currentstep=self.STATUS_AWAITING_DECISION
         )
+        self.update_unit_status(self.STATUS_AWAITING_DECISION)
+        return updated
 
     @auto_close_old_connections()
     def mark_complete(self):
@@ -95,6 +110,8 @@ class Job(metaclass=abc.ABCMeta):
             self.uuid,
             self.exit_code,
         )
-        return models.Job.objects.filter(jobuuid=self.uuid).update(
+        updated = models.Job.objects.filter(jobuuid=self.uuid).update(
             currentstep=self.STATUS_COMPLETED_SUCCESSFULLY
         )
+        self.update_unit_status(self.STATUS_COMPLETED_SUCCESSFULLY)
+        return updated
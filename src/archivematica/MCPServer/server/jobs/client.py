@@ -138,8 +138,20 @@ class ClientScriptJob(Job, metaclass=abc.ABCMeta):
         )
         self.task_backend.submit_task(self, task)
 
+    def collect_completed_task_results(self):
+        """Process the results of any tasks completed so far.
+
+        Called while tasks are still being submitted, so that results are
+        written back while later batches are processed. This may block if the
+        backend has too many batches in flight for this job.
+        """
+        self.process_task_results(self.task_backend.collect_completed_results(self))
+
     def wait_for_task_results(self):
-        for task in self.task_backend.wait_for_results(self):
+        self.process_task_results(self.task_backend.wait_for_results(self))
+
+    def process_task_results(self, tasks):
+        for task in tasks:
             self.exit_code = max([self.exit_code or 0, task.exit_code or 0])
             metrics.task_completed(task, self)
             self.task_completed_callback(task)
@@ -151,9 +163,11 @@ class ClientScriptJob(Job, metaclass=abc.ABCMeta):
     def update_status_from_exit_code(self):
         status_code = self.link.get_status_id(self.exit_code)
 
-        return models.Job.objects.filter(jobuuid=self.uuid).update(
+        updated = models.Job.objects.filter(jobuuid=self.uuid).update(
             currentstep=status_code
         )
+        self.update_unit_status(status_code)
+        return updated
 
 
 class DirectoryClientScriptJob(ClientScriptJob):
@@ -210,7 +224,11 @@ class FilesClientScriptJob(ClientScriptJob):
         return filter_subdir
 
     def submit_tasks(self):
-        """Iterate through all matching files for the package, and submit tasks."""
+        """Iterate through all matching files for the package, and submit tasks.
+
+        Results from completed batches are collected as we go, rather than
+        after every file has been submitted.
+        """
         for file_replacements in self.package.files(
             filter_filename_end=self.filter_file_end,
             filter_subdir=self.filter_subdir,
@@ -231,8 +249,10 @@ class FilesClientScriptJob(ClientScriptJob):
                 wants_output=self.capture_task_output,
             )
             self.task_backend.submit_task(self, task)
-        else:
-            # Nothing to do; set exit code to success
+            self.collect_completed_task_results()
+
+        if self.exit_code is None:
+            # Nothing has failed yet; start from success
             self.exit_code = 0
 
 
@@ -45,6 +45,7 @@ from archivematica.MCPServer.server.packages import Package
 from archivematica.MCPServer.server.packages import Transfer
 from archivematica.MCPServer.server.queues import PackageQueue
 from archivematica.MCPServer.server.tasks import Task
+from archivematica.MCPServer.server.tasks import get_completion_dispatcher
 from archivematica.MCPServer.server.watch_dirs import watch_directories
 from archivematica.MCPServer.server.workflow import load_workflow
 
@@ -141,6 +142,7 @@ def main(shutdown_event=None):
     for thread in rpc_threads:
         thread.join(0.1)
     logger.debug("RPC threads stopped.")
+    get_completion_dispatcher().stop(1.0)
 
     logger.info("MCP server shut down complete.")
 
@@ -64,6 +64,20 @@ package_queue_length_gauge = Gauge(
     "mcpserver_package_queue_length", "Number of queued packages", ["package_type"]
 )
 
+watched_dir_entry_counter = Counter(
+    "mcpserver_watched_dir_entries_total",
+    "Number of entries found in watched directories, labeled by watched "
+    "directory and by how they were found",
+    ["watched_dir", "source"],
+)
+watched_dir_latency_histogram = Histogram(
+    "mcpserver_watched_dir_latency_seconds",
+    "Histogram of the time in seconds between an entry appearing in a watched "
+    "directory and its chain being started, labeled by watched directory",
+    ["watched_dir"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60, 120, 300, float("inf")),
+)
+
 PACKAGE_TYPES = ("Transfer", "SIP", "DIP")
 
 
@@ -85,6 +99,9 @@ def init_labels(workflow):
     for package_type in PACKAGE_TYPES:
         package_queue_length_gauge.labels(package_type=package_type)
 
+    for watched_dir in workflow.get_wdirs():
+        watched_dir_latency_histogram.labels(watched_dir=watched_dir.path)
+
     for link in workflow.get_links().values():
         group_name = link.get_label("group", "en")
         task_name = link.get_label("description", "en")
@@ -130,3 +147,11 @@ def task_failed(task, job):
         task_group_name=job.group, task_name=job.description
     ).inc()
     task_counter.labels(task_group_name=job.group, task_name=job.description).inc()
+
+
+@skip_if_prometheus_disabled
+def watched_dir_entry_reported(watched_dir, source, latency):
+    watched_dir_entry_counter.labels(watched_dir=watched_dir.path, source=source).inc()
+    watched_dir_latency_histogram.labels(watched_dir=watched_dir.path).observe(
+        max(latency, 0)
+    )
@@ -5,6 +5,7 @@ import collections
 import json
 import logging
 import os
+import time
 from pathlib import Path
 from tempfile import mkdtemp
 from uuid import UUID
@@ -497,6 +498,101 @@ class LocationPath:
         return self.uuid, self.path
 
 
+# The subset of `File` model fields needed to build replacement mappings.
+FileRow = collections.namedtuple(
+    "FileRow", "pk currentlocation originallocation filegrpuse"
+)
+
+
+class PackageFileInventory:
+    """A listing of the files under a package directory, cached between
+    calls.
+
+    Each directory listing is kept alongside the directory's inode and mtime.
+    Creating, deleting or renaming an entry updates the mtime of the directory
+    containing it, so on later calls a directory is only re-read if it has
+    changed; unchanged directories cost a single `stat`. Listings of
+    directories modified within the last `RACY_INTERVAL` seconds are not kept,
+    as further changes could land within the same mtime tick.
+    """
+
+    # Directory mtimes are only as precise as the filesystem storing them:
+    # whole seconds on many NFS and SMB servers, and two seconds on FAT/exFAT
+    # volumes. A directory changed again within that granularity would keep
+    # the mtime of the cached listing, so two seconds covers the coarsest of
+    # them.
+    RACY_INTERVAL = 2.0
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.directories = {}  # path: ((st_ino, st_mtime_ns), files, subdirs)
+
+    def clear(self):
+        self.directories.clear()
+
+    def files(self, start_path):
+        """Return the paths of all the files under `start_path`.
+
+        Paths are returned in the same order as `os.walk` would return them,
+        and like `os.walk`, symbolic links to directories are not followed.
+        """
+        file_paths = []
+        visited = set()
+        pending = [start_path]
+        while pending:
+            path = pending.pop()
+            listing = self._list_directory(path)
+            if listing is None:
+                continue
+            visited.add(path)
+            files, subdirs = listing
+            file_paths.extend(files)
+            pending.extend(reversed(subdirs))
+
+        # Forget directories below `start_path` that no longer exist
+        prefix = os.path.join(start_path, "")
+        for path in list(self.directories):
+            if path.startswith(prefix) and path not in visited:
+                del self.directories[path]
+
+        return file_paths
+
+    def _list_directory(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.directories.pop(path, None)
+            return None
+
+        key = (stat.st_ino, stat.st_mtime_ns)
+        cached = self.directories.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1], cached[2]
+
+        files, subdirs = [], []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    if not is_dir:
+                        files.append(entry.path)
+                    elif not entry.is_symlink():
+                        subdirs.append(entry.path)
+        except OSError:
+            self.directories.pop(path, None)
+            return None
+
+        if self.enabled and time.time() - stat.st_mtime > self.RACY_INTERVAL:
+            self.directories[path] = (key, files, subdirs)
+        else:
+            self.directories.pop(path, None)
+
+        return files, subdirs
+
+
 def get_file_replacement_mapping(file_obj, unit_directory):
     mapping = BASE_REPLACEMENTS.copy()
     dirname = os.path.dirname(file_obj.currentlocation.decode())
@@ -531,6 +627,9 @@ def get_file_replacement_mapping(file_obj, unit_directory):
 class Package(metaclass=abc.ABCMeta):
     """A `Package` can be a Transfer, a SIP, or a DIP."""
 
+    # The number of file rows fetched from the database at a time by `files`.
+    FILES_CHUNK_SIZE = 2000
+
     def __init__(self, current_path, uuid):
         self._current_path = current_path.replace(
             r"%sharedPath%", _get_setting("SHARED_DIRECTORY")
@@ -538,6 +637,9 @@ class Package(metaclass=abc.ABCMeta):
         if uuid and not isinstance(uuid, UUID):
             uuid = UUID(uuid)
         self.uuid = uuid
+        self.file_inventory = PackageFileInventory(
+            enabled=_get_setting("PACKAGE_FILE_INVENTORY_CACHE")
+        )
 
     def __repr__(self):
         return f'{self.__class__.__name__}("{self.current_path}", {self.uuid})'
@@ -572,6 +674,8 @@ class Package(metaclass=abc.ABCMeta):
         """
         with auto_close_old_connections():
             self.queryset().update(status=status, **defaults)
+            # Reconcile the status recorded job by job with all the jobs.
+            models.UnitStatus.objects.refresh(self.uuid, self.JOB_UNIT_TYPE)
 
     def mark_as_done(self):
         """Change the status of the package to Done."""
@@ -588,9 +692,10 @@ class Package(metaclass=abc.ABCMeta):
     @current_path.setter
     def current_path(self, value):
         """The real (no shared dir vars) path to the package."""
-        self._current_path = value.replace(
-            r"%sharedPath%", _get_setting("SHARED_DIRECTORY")
-        )
+        current_path = value.replace(r"%sharedPath%", _get_setting("SHARED_DIRECTORY"))
+        if current_path != self._current_path:
+            self.file_inventory.clear()
+        self._current_path = current_path
 
     @property
     def current_path_for_db(self):
@@ -644,6 +749,11 @@ class Package(metaclass=abc.ABCMeta):
     def files(self, filter_filename_end=None, filter_subdir=None):
         """Generator that yields all files associated with the package or that
         should be associated with a package.
+
+        The package directory is listed once (see `PackageFileInventory`) and
+        matched against the package's file rows, which are streamed from the
+        database. Rows for files that are no longer on disk are skipped; files
+        on disk without a row are yielded last, with a `None` UUID.
         """
         with auto_close_old_connections():
             queryset = self.base_queryset
@@ -660,30 +770,43 @@ class Package(metaclass=abc.ABCMeta):
             if filter_subdir:
                 start_path = start_path + filter_subdir
 
+            # Normalized path: path as listed
+            files_on_disk = {}
+            for file_path in self.file_inventory.files(start_path):
+                if filter_filename_end and not file_path.endswith(filter_filename_end):
+                    continue
+                files_on_disk[os.path.normpath(file_path)] = file_path
+
+            rows = queryset.values_list(
+                "uuid", "currentlocation", "originallocation", "filegrpuse"
+            )
             files_returned_already = set()
-            if queryset.exists():
-                for file_obj in queryset.iterator():
-                    file_obj_mapped = get_file_replacement_mapping(
-                        file_obj, self.current_path
-                    )
-                    if not os.path.exists(file_obj_mapped.get("%inputFile%")):
-                        continue
-                    files_returned_already.add(file_obj_mapped.get("%inputFile%"))
-                    yield file_obj_mapped
-
-            for basedir, _, files in os.walk(start_path):
-                for file_name in files:
-                    if filter_filename_end and not file_name.endswith(
-                        filter_filename_end
-                    ):
-                        continue
-                    file_path = os.path.join(basedir, file_name)
-                    if file_path not in files_returned_already:
-                        yield {
-                            r"%relativeLocation%": file_path,
-                            r"%fileUUID%": "None",
-                            r"%fileGrpUse%": "",
-                        }
+            for row in rows.iterator(chunk_size=self.FILES_CHUNK_SIZE):
+                file_obj = FileRow(*row)
+                if file_obj.currentlocation is None:
+                    continue
+                file_obj_mapped = get_file_replacement_mapping(
+                    file_obj, self.current_path
+                )
+                input_file = file_obj_mapped.get("%inputFile%")
+                normalized_path = os.path.normpath(input_file)
+                # Rows for paths the listing doesn't cover, e.g. below a
+                # symlinked directory, are checked on disk instead.
+                if normalized_path not in files_on_disk and not os.path.exists(
+                    input_file
+                ):
+                    continue
+                files_returned_already.add(normalized_path)
+                yield file_obj_mapped
+
+            for normalized_path, file_path in files_on_disk.items():
+                if normalized_path in files_returned_already:
+                    continue
+                yield {
+                    r"%relativeLocation%": file_path,
+                    r"%fileUUID%": "None",
+                    r"%fileGrpUse%": "",
+                }
 
     @auto_close_old_connections()
     def set_variable(self, key, value, chain_link_id):
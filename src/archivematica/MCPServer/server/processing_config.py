@@ -8,6 +8,8 @@ processing config file operations.
 import abc
 import logging
 import os
+import threading
+from collections import OrderedDict
 
 from django.conf import settings
 from lxml import etree
@@ -317,16 +319,79 @@ def load_processing_xml(package_path):
         return None
 
 
-def load_preconfigured_choice(package_path, workflow_link_id):
-    choice = None
+class PreconfiguredChoicesCache:
+    """Parsed preconfigured choices, keyed by processing config file path.
+
+    Decision links look up their preconfigured choice every time they run, so
+    instead of parsing the package's processing config for each of them we
+    keep a mapping of ``appliesTo`` to ``goToChain`` per file. Entries are
+    revalidated with ``os.stat`` on every lookup and reparsed when the file
+    is replaced or modified.
+    """
+
+    MAX_ENTRIES = 256
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries or self.MAX_ENTRIES
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # path: (stat key, choices)
+
+    def get(self, package_path):
+        processing_file_path = os.path.join(package_path, settings.PROCESSING_XML_FILE)
+        try:
+            stat_result = os.stat(processing_file_path)
+        except OSError:
+            self.discard(processing_file_path)
+            return {}
+
+        key = (stat_result.st_ino, stat_result.st_mtime_ns, stat_result.st_size)
+        with self.lock:
+            entry = self.entries.get(processing_file_path)
+            if entry is not None and entry[0] == key:
+                self.entries.move_to_end(processing_file_path)
+                return entry[1]
+
+        choices = {}
+        processing_xml = load_processing_xml(package_path)
+        if processing_xml is not None:
+            for preconfigured_choice in processing_xml.findall(
+                ".//preconfiguredChoice"
+            ):
+                applies_to = preconfigured_choice.findtext("appliesTo")
+                if applies_to is not None:
+                    # Later entries win, as they always have.
+                    choices[applies_to] = preconfigured_choice.findtext("goToChain")
+
+        with self.lock:
+            self.entries[processing_file_path] = (key, choices)
+            self.entries.move_to_end(processing_file_path)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+        return choices
 
-    processing_xml = load_processing_xml(package_path)
-    if processing_xml is not None:
-        for preconfigured_choice in processing_xml.findall(".//preconfiguredChoice"):
-            if preconfigured_choice.find("appliesTo").text == str(workflow_link_id):
-                choice = preconfigured_choice.find("goToChain").text
+    def discard(self, processing_file_path):
+        with self.lock:
+            self.entries.pop(processing_file_path, None)
 
-    return choice
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+preconfigured_choices_cache = PreconfiguredChoicesCache()
+
+
+def load_preconfigured_choices(package_path):
+    """Return a dict of link ID to preconfigured choice for the package.
+
+    The returned dict is shared with the cache and must not be modified.
+    """
+    return preconfigured_choices_cache.get(package_path)
+
+
+def load_preconfigured_choice(package_path, workflow_link_id):
+    return load_preconfigured_choices(package_path).get(str(workflow_link_id))
 
 
 def processing_configuration_file_exists(processing_configuration_name):
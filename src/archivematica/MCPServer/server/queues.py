@@ -43,8 +43,10 @@ class PackageQueue:
        `ThreadPoolExecutor.submit`).
     3. The `Job.run` method executes. If it is a `ClientScriptJob` (executing
        on MCPClient), it generates the `Task` objects required, and sends them
-       to MCPClient via `GearmanTaskBackend`, and waits for the results. All of
-       this happens on the one worker thread.
+       to MCPClient via `GearmanTaskBackend`, and waits for the results. The
+       worker thread blocks on one future per task batch; the batches
+       themselves are sent and polled by the single, shared
+       `GearmanCompletionDispatcher` thread.
     4. On the completion of tasks (i.e. results are returned by Gearman),
        `Job.run` returns the _next_ job to schedule, if any. In practice this
        is usually retrieved from the `JobChain` via `next(self.job_chain)`.
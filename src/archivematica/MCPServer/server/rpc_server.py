@@ -14,17 +14,20 @@ import logging
 import re
 import time
 from collections import OrderedDict
+from datetime import datetime
+from datetime import timezone
 from io import StringIO
 from socket import gethostname
 
 import gearman
 from django.conf import settings as django_settings
-from django.db import connection
+from django.db.models import Q
 from gearman import GearmanWorker
 from lxml import etree
 
 from archivematica.archivematicaCommon.dbconns import auto_close_old_connections
 from archivematica.archivematicaCommon.gearman_encoder import JSONDataEncoder
+from archivematica.dashboard.main.models import PACKAGE_STATUS_PROCESSING
 from archivematica.dashboard.main.models import SIP
 from archivematica.dashboard.main.models import Job
 from archivematica.dashboard.main.models import Transfer
@@ -109,6 +112,19 @@ class RPCServer(GearmanWorker):
     # the partial approval of AIP reingest.
     APPROVE_AIP_REINGEST_CHAIN_ID = "260ef4ea-f87d-4acf-830d-d0de41e6d2af"
 
+    # Job columns read by ``getUnitsStatuses`` and how many rows are fetched
+    # from the database at a time.
+    UNITS_STATUSES_JOB_FIELDS = (
+        "jobuuid",
+        "sipuuid",
+        "createdtime",
+        "createdtimedec",
+        "currentstep",
+        "directory",
+        "microservicechainlink",
+    )
+    UNITS_STATUSES_CHUNK_SIZE = 2000
+
     def __init__(self, workflow, shutdown_event, package_queue, executor):
         super().__init__(host_list=[django_settings.GEARMAN_SERVER])
         self.workflow = workflow
@@ -341,53 +357,89 @@ class RPCServer(GearmanWorker):
         has a ``jobs`` attribute shoe value is an array of objects, each of
         which represents a job of the unit.
 
+        When the payload includes ``changed_since`` (a UNIX timestamp), only
+        units that may have changed since then are returned: units with jobs
+        created after it, units still processing and units completed after
+        it. Clients are expected to merge these into the list they hold and
+        to make a full request from time to time to drop hidden units.
+
         [config]
         name = getUnitsStatuses
         raise_exc = False
         """
         unit_types = {"SIP": (SIP, "unitSIP"), "Transfer": (Transfer, "unitTransfer")}
         try:
-            model_attrs = unit_types[payload["type"]]
+            model, unit_type = unit_types[payload["type"]]
             lang = payload["lang"]
         except KeyError as err:
             raise UnexpectedPayloadError(f"Missing parameter: {err}")
-        model = model_attrs[0]
-        sql = """
-        SELECT SIPUUID,
-               MAX(UNIX_TIMESTAMP(createdTime) + createdTimeDec) AS timestamp
-            FROM Jobs
-            WHERE unitType=%s AND NOT SIPUUID LIKE '%%None%%'
-            GROUP BY SIPUUID;"""
-        with connection.cursor() as cursor:
-            cursor.execute(sql, (model_attrs[1],))
-            sipuuids_and_timestamps = cursor.fetchall()
+        changed_since = payload.get("changed_since")
+
+        units = model.objects.filter(hidden=False)
+        if changed_since is not None:
+            try:
+                since = datetime.fromtimestamp(float(changed_since), tz=timezone.utc)
+            except (TypeError, ValueError, OverflowError, OSError):
+                raise UnexpectedPayloadError(
+                    f"Invalid parameter: changed_since={changed_since!r}"
+                )
+            units = units.filter(
+                Q(status=PACKAGE_STATUS_PROCESSING)
+                | Q(completed_at__gte=since)
+                | Q(
+                    pk__in=Job.objects.filter(
+                        unittype=unit_type, createdtime__gte=since
+                    ).values("sipuuid")
+                )
+            )
+        active_units = {
+            unit_id: status == PACKAGE_STATUS_PROCESSING
+            for unit_id, status in units.values_list("pk", "status")
+        }
+
+        # Jobs of every unit listed, newest first, grouped by unit.
+        unit_jobs = {}
+        jobs_qs = (
+            Job.objects.filter(unittype=unit_type, sipuuid__in=units.values("pk"))
+            .only(*self.UNITS_STATUSES_JOB_FIELDS)
+            .order_by("-createdtime", "-createdtimedec")
+        )
+        for job_ in jobs_qs.iterator(chunk_size=self.UNITS_STATUSES_CHUNK_SIZE):
+            unit_jobs.setdefault(job_.sipuuid, []).append(job_)
+
+        # Embed "Access System ID" in status data (used in Upload DIP).
+        # `access_system_id` is a property of the Transfer model - the only
+        # way we have at the moment to look up the Transfer is by using the
+        # files in common.
+        access_system_ids = {}
+        if model is SIP:
+            try:
+                pairs = (
+                    Transfer.objects.filter(file__sip__in=units.values("pk"))
+                    .values_list("file__sip_id", "access_system_id")
+                    .distinct()
+                )
+                for sip_id, access_system_id in pairs:
+                    access_system_ids.setdefault(sip_id, access_system_id)
+            except Exception:
+                logger.warning("Unable to look up access system IDs", exc_info=True)
+
         jobs_awaiting_for_approval = self.package_queue.jobs_awaiting_decisions()
         objects = []
-        for unit_id, timestamp in sipuuids_and_timestamps:
-            unit = model.objects.get(pk=unit_id)
-            if unit.hidden:
+        for unit_id in sorted(unit_jobs, key=str):
+            if unit_id not in active_units:
                 continue
+            jobs = unit_jobs[unit_id]
             item = {
-                "id": unit_id,
-                "uuid": unit_id,
-                "timestamp": float(timestamp),
-                "active": unit.active,
+                "id": str(unit_id),
+                "uuid": str(unit_id),
+                "timestamp": max(_job_timestamp(job_) for job_ in jobs),
+                "active": active_units[unit_id],
+                "directory": jobs[0].get_directory_name(),
                 "jobs": [],
             }
-            jobs = Job.objects.filter(sipuuid=unit_id).order_by("-createdtime")
-            if jobs:
-                item["directory"] = jobs[0].get_directory_name()
-            # Embed "Access System ID" in status data (used in Upload DIP).
-            # `access_system_id` is a property of the Transfer model - the
-            # only way we have at the moment to look up the Transfer is by
-            # using the files in common.
-            if model is SIP:
-                try:
-                    trfs = Transfer.objects.filter(file__sip_id=item["uuid"]).distinct()
-                    if trfs:
-                        item["access_system_id"] = trfs[0].access_system_id
-                except Exception:
-                    pass
+            if unit_id in access_system_ids:
+                item["access_system_id"] = access_system_ids[unit_id]
             # Append jobs
             for job_ in jobs:
                 try:
@@ -453,6 +505,11 @@ class RPCServer(GearmanWorker):
         return {"name": jobs_qs.get_directory_name(), "jobs": jobs}
 
 
+def _job_timestamp(job):
+    """Return the creation time of a job as a UNIX timestamp."""
+    return calendar.timegm(job.createdtime.timetuple()) + float(job.createdtimedec)
+
+
 class JobNotWaitingForApprovalError(Exception):
     """When a job is not waiting for a decision to be made."""
 
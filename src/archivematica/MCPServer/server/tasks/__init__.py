@@ -1,6 +1,15 @@
+from archivematica.MCPServer.server.tasks.backends import GearmanCompletionDispatcher
 from archivematica.MCPServer.server.tasks.backends import GearmanTaskBackend
 from archivematica.MCPServer.server.tasks.backends import TaskBackend
+from archivematica.MCPServer.server.tasks.backends import get_completion_dispatcher
 from archivematica.MCPServer.server.tasks.backends import get_task_backend
 from archivematica.MCPServer.server.tasks.task import Task
 
-__all__ = ("GearmanTaskBackend", "Task", "TaskBackend", "get_task_backend")
+__all__ = (
+    "GearmanCompletionDispatcher",
+    "GearmanTaskBackend",
+    "Task",
+    "TaskBackend",
+    "get_completion_dispatcher",
+    "get_task_backend",
+)
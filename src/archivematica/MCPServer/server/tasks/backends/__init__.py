@@ -5,9 +5,15 @@ Handle offloading of Task objects to MCP Client for processing.
 import threading
 
 from archivematica.MCPServer.server.tasks.backends.base import TaskBackend
+from archivematica.MCPServer.server.tasks.backends.gearman_backend import (
+    GearmanCompletionDispatcher,
+)
 from archivematica.MCPServer.server.tasks.backends.gearman_backend import (
     GearmanTaskBackend,
 )
+from archivematica.MCPServer.server.tasks.backends.gearman_backend import (
+    get_completion_dispatcher,
+)
 
 backend_local = threading.local()
 
@@ -16,7 +22,7 @@ def get_task_backend():
     """Return the backend for processing tasks.
 
     The backend is thread-local, so each thread will have a different
-    instance.
+    instance. All instances share the process wide completion dispatcher.
     """
     # In future, this could be a configuration setting, but for now it
     # is always gearman.
@@ -26,4 +32,10 @@ def get_task_backend():
     return backend_local.task_backend
 
 
-__all__ = ("GearmanTaskBackend", "TaskBackend", "get_task_backend")
+__all__ = (
+    "GearmanCompletionDispatcher",
+    "GearmanTaskBackend",
+    "TaskBackend",
+    "get_completion_dispatcher",
+    "get_task_backend",
+)
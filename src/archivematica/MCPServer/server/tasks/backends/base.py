@@ -11,6 +11,16 @@ class TaskBackend(metaclass=abc.ABCMeta):
     def submit_task(self, job, task):
         """Submit a task as part of the job given, for offline processing."""
 
+    def collect_completed_results(self, job):
+        """Generator that yields `Task` objects related to the job given that
+        have already been processed, while further tasks are being submitted.
+
+        Backends may block here to limit the amount of outstanding work per
+        job. The default implementation yields nothing, leaving all results to
+        `wait_for_results`.
+        """
+        return iter(())
+
     @abc.abstractmethod
     def wait_for_results(self, job):
         """Generator that yields `Task` objects related to the job given,
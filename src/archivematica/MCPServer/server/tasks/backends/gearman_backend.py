@@ -3,8 +3,12 @@ Gearman task backend. Submits `Task` objects to gearman for processing,
 and returns results.
 """
 
+import concurrent.futures
 import datetime
+import itertools
 import logging
+import queue
+import threading
 import uuid
 
 from django.conf import settings
@@ -16,6 +20,7 @@ from gearman.constants import JOB_UNKNOWN
 from archivematica.archivematicaCommon.gearman_encoder import JSONDataEncoder
 from archivematica.MCPServer.server import metrics
 from archivematica.MCPServer.server.tasks.backends.base import TaskBackend
+from archivematica.MCPServer.server.tasks.batch_sizing import get_batch_sizer
 from archivematica.MCPServer.server.tasks.task import Task
 
 logger = logging.getLogger("archivematica.mcp.server.jobs.tasks")
@@ -29,15 +34,22 @@ class MCPGearmanClient(GearmanClient):
 
     data_encoder = JSONDataEncoder
 
-    def wait_until_any_job_completed(self, job_requests, poll_timeout=None):
+    def wait_until_any_job_completed(
+        self, job_requests, poll_timeout=None, interrupted=None
+    ):
         """
         Go into a select loop until any of our jobs have completed or failed.
 
+        If given, `interrupted` is a callable checked on every iteration of the
+        loop; when it returns True the loop exits early.
+
         This is a modified version of `wait_until_jobs_completed`.
         """
 
         def continue_while_no_job_completed(any_activity):
             """Returns False (exiting the poll loop) if anything was completed."""
+            if interrupted is not None and interrupted():
+                return False
             for current_request in job_requests:
                 if current_request.complete and current_request.state != JOB_UNKNOWN:
                     return False
@@ -56,11 +68,184 @@ class MCPGearmanClient(GearmanClient):
         return job_requests
 
 
+class GearmanCompletionDispatcher:
+    """Routes gearman job completions to futures, using a single thread.
+
+    python-gearman clients are not thread safe, so one dispatcher owns the
+    process wide client (and so its connections). Task batches are queued
+    via `submit`, which returns a `concurrent.futures.Future`. The dispatcher
+    thread sends queued batches to gearman and runs one select loop over all
+    in-flight requests, resolving each batch future as its request completes
+    or fails. Callers can then block on the future without polling, so any
+    number of in-flight batches cost one thread.
+    """
+
+    # How long the select loop may block before picking up new submissions.
+    POLL_TIMEOUT = 0.1
+    # How long to block when idle before checking for shutdown.
+    IDLE_TIMEOUT = 1.0
+
+    def __init__(self, client=None):
+        if client is None:
+            client = MCPGearmanClient([settings.GEARMAN_SERVER])
+        self.client = client
+
+        self.submission_queue = queue.Queue()
+        self.in_flight = {}  # GearmanJobRequest: (GearmanTaskBatch, Future)
+        self.completion_counter = itertools.count()
+
+        self.shutdown_event = threading.Event()
+        self.thread = None
+        self.thread_lock = threading.Lock()
+
+    def start(self):
+        """Start the dispatcher thread, if it isn't running already."""
+        with self.thread_lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.shutdown_event.clear()
+            self.thread = threading.Thread(
+                target=self.run, name="GearmanDispatcher", daemon=True
+            )
+            self.thread.start()
+
+    def stop(self, timeout=None):
+        """Stop the dispatcher thread."""
+        self.shutdown_event.set()
+        # Wake the thread if it is idle
+        self.submission_queue.put(None)
+        with self.thread_lock:
+            thread = self.thread
+            self.thread = None
+        if thread is not None:
+            thread.join(timeout)
+
+    def submit(self, task_batch, job, max_retries=0):
+        """Queue a batch for submission and return a future for its completion.
+
+        The future resolves to the batch once gearman reports it as complete
+        or failed, or raises if the batch could not be sent.
+        """
+        future = concurrent.futures.Future()
+        self.submission_queue.put((task_batch, job, max_retries, future))
+        self.start()
+
+        return future
+
+    def run(self):
+        while not self.shutdown_event.is_set():
+            self.poll_once()
+
+        self._fail_in_flight(RuntimeError("Gearman dispatcher stopped."))
+
+    def poll_once(self):
+        """Send queued batches, then wait for any in-flight request to finish."""
+        self._send_queued_batches(block=not self.in_flight)
+        if not self.in_flight:
+            return
+
+        try:
+            self.client.wait_until_any_job_completed(
+                list(self.in_flight),
+                poll_timeout=self.POLL_TIMEOUT,
+                interrupted=self._has_queued_batches,
+            )
+        except Exception as err:
+            logger.exception("Error polling gearman connections")
+            error = err
+        else:
+            error = None
+
+        for request, (task_batch, future) in list(self.in_flight.items()):
+            if request.state in (JOB_COMPLETE, JOB_FAILED):
+                del self.in_flight[request]
+                self._mark_completed(task_batch)
+                future.set_result(task_batch)
+            elif error is not None and self._connection_failed(request):
+                # Only requests sent over the connection that raised are lost;
+                # those on healthy connections are still being processed.
+                del self.in_flight[request]
+                self._mark_completed(task_batch)
+                future.set_exception(error)
+
+    @staticmethod
+    def _connection_failed(request):
+        """Return True if the connection the request was sent over has failed.
+
+        python-gearman resets submitted requests to JOB_UNKNOWN when their
+        connection errors, and closes the connection.
+        """
+        if request.state == JOB_UNKNOWN:
+            return True
+        connection = request.job.connection if request.job is not None else None
+
+        return connection is None or not connection.connected
+
+    def _has_queued_batches(self):
+        return not self.submission_queue.empty()
+
+    def _send_queued_batches(self, block=False):
+        timeout = self.IDLE_TIMEOUT if block else None
+        while True:
+            try:
+                submission = self.submission_queue.get(block=block, timeout=timeout)
+            except queue.Empty:
+                return
+            # Only ever block for the first item
+            block = False
+
+            if submission is None:
+                continue
+            task_batch, job, max_retries, future = submission
+
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            try:
+                task_batch.submit(self.client, job, max_retries=max_retries)
+            except Exception as err:
+                logger.exception("Error submitting gearman job %s", task_batch.uuid)
+                self._mark_completed(task_batch)
+                future.set_exception(err)
+            else:
+                self.in_flight[task_batch.pending] = (task_batch, future)
+
+    def _fail_in_flight(self, err):
+        for task_batch, future in self.in_flight.values():
+            self._mark_completed(task_batch)
+            future.set_exception(err)
+        self.in_flight.clear()
+
+    def _mark_completed(self, task_batch):
+        # Lets backends hand out results in the order batches completed.
+        task_batch.completion_order = next(self.completion_counter)
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_completion_dispatcher():
+    """Return the process wide `GearmanCompletionDispatcher`."""
+    global _dispatcher
+
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = GearmanCompletionDispatcher()
+
+    return _dispatcher
+
+
 class GearmanTaskBackend(TaskBackend):
     """Submits tasks to MCPClient via Gearman.
 
     Tasks are batched into BATCH_SIZE groups (default 128), serialized and sent
-    to MCPClient. This adds some complexity but saves a lot of overhead.
+    to MCPClient. This adds some complexity but saves a lot of overhead. The
+    size of each batch can be adapted per client script; see `BatchSizer`.
+
+    Batches are sent and their results collected by the shared
+    `GearmanCompletionDispatcher`; waiting for results blocks on one future
+    per batch rather than polling gearman from every job thread.
     """
 
     # The number of files we'll pack into each MCP Client job.  Chosen somewhat
@@ -71,9 +256,18 @@ class GearmanTaskBackend(TaskBackend):
     # throughput.  So the trick is to set it juuuust right.
     TASK_BATCH_SIZE = settings.BATCH_SIZE
     MAX_RETRIES = 5
-
-    def __init__(self):
-        self.client = MCPGearmanClient([settings.GEARMAN_SERVER])
+    # The number of submitted batches per job that may be awaiting collection
+    # before submission blocks. Bounds memory use for very large packages; zero
+    # means no limit.
+    MAX_IN_FLIGHT_BATCHES = settings.MAX_IN_FLIGHT_BATCHES
+
+    def __init__(self, dispatcher=None, batch_sizer=None):
+        if dispatcher is None:
+            dispatcher = get_completion_dispatcher()
+        self.dispatcher = dispatcher
+        if batch_sizer is None:
+            batch_sizer = get_batch_sizer()
+        self.batch_sizer = batch_sizer
 
         self.current_task_batches = {}  # job_uuid: GearmanTaskBatch
         self.pending_gearman_jobs = {}  # job_uuid: List[GearmanTaskBatch]
@@ -84,80 +278,111 @@ class GearmanTaskBackend(TaskBackend):
         We add the task to the batch, and only actually send the batch
         to gearman if it's "full".
         """
-        current_task_batch = self._get_current_task_batch(job.uuid)
+        current_task_batch = self._get_current_task_batch(job)
         if len(current_task_batch) == 0:
             metrics.gearman_pending_jobs_gauge.inc()
 
         current_task_batch.add_task(task)
 
-        # If we've hit TASK_BATCH_SIZE, send the batch to gearman
-        if (len(current_task_batch) % self.TASK_BATCH_SIZE) == 0:
+        # If the batch is full, send it to gearman
+        if len(current_task_batch) >= current_task_batch.size:
             self._submit_batch(job, current_task_batch)
 
     def wait_for_results(self, job):
         # Check if we have anything for this job that hasn't been submitted
-        current_task_batch = self._get_current_task_batch(job.uuid)
+        current_task_batch = self._get_current_task_batch(job)
         if len(current_task_batch) > 0:
             self._submit_batch(job, current_task_batch)
 
         try:
-            pending_batches = self.pending_gearman_jobs[job.uuid]
+            pending_batches = self.pending_gearman_jobs.pop(job.uuid)
         except KeyError:
             # No batches submitted
             return
 
-        completed_request_count = 0
-        gearman_requests = [request.pending for request in pending_batches]
-
-        # Make sure everything has been accepted by gearman before getting results
-        # Note that accepted here means STATE_PENDING, that is accepted by the
-        # gearman server, not a client.
-        self.client.wait_until_jobs_accepted(gearman_requests)
-
-        while len(pending_batches) > completed_request_count:
-            gearman_requests = self.client.wait_until_any_job_completed(
-                gearman_requests
+        while pending_batches:
+            concurrent.futures.wait(
+                [batch.future for batch in pending_batches],
+                return_when=concurrent.futures.FIRST_COMPLETED,
             )
+            for batch in self._completed_batches(pending_batches):
+                pending_batches.remove(batch)
+                yield from self._collect_batch(job, batch)
 
-            for batch in pending_batches:
-                if batch.collected:
-                    continue
+    def collect_completed_results(self, job):
+        """Yield results from any batches for the job that have completed.
 
-                if batch.complete or batch.failed:
-                    yield from batch.update_task_results()
+        If the job has `MAX_IN_FLIGHT_BATCHES` or more uncollected batches,
+        block until enough of them complete to open up the window again.
+        """
+        pending_batches = self.pending_gearman_jobs.get(job.uuid)
+        while pending_batches:
+            completed_batches = self._completed_batches(pending_batches)
+            if not completed_batches:
+                if not (
+                    self.MAX_IN_FLIGHT_BATCHES
+                    and len(pending_batches) >= self.MAX_IN_FLIGHT_BATCHES
+                ):
+                    return
+                concurrent.futures.wait(
+                    [batch.future for batch in pending_batches],
+                    return_when=concurrent.futures.FIRST_COMPLETED,
+                )
+                continue
+
+            for batch in completed_batches:
+                pending_batches.remove(batch)
+                yield from self._collect_batch(job, batch)
+
+    @staticmethod
+    def _completed_batches(batches):
+        """Return the batches given that have completed, in completion order."""
+        return sorted(
+            (batch for batch in batches if batch.future.done()),
+            key=lambda batch: batch.completion_order,
+        )
 
-                    batch.collected = True
-                    completed_request_count += 1
-                    metrics.gearman_active_jobs_gauge.dec()
+    def _collect_batch(self, job, batch):
+        # Raises if the batch could not be sent to gearman, or was lost
+        yield from batch.future.result().update_task_results()
 
-            # Only keep checking unfinished requests
-            gearman_requests = [
-                request
-                for request in gearman_requests
-                if request.state not in (JOB_COMPLETE, JOB_FAILED)
-            ]
+        batch.collected = True
 
-        # Once we've gotten results for all job tasks, clear the batches
-        del self.pending_gearman_jobs[job.uuid]
+        duration = batch.processing_duration()
+        if duration is not None:
+            self.batch_sizer.observe(job.name, len(batch), duration)
 
-    def _get_current_task_batch(self, job_uuid):
+    def _get_current_task_batch(self, job):
         """Return the current GearmanTaskBatch for the job, or initialize a new
         one.
         """
         try:
-            return self.current_task_batches[job_uuid]
+            return self.current_task_batches[job.uuid]
         except KeyError:
-            self.current_task_batches[job_uuid] = GearmanTaskBatch()
-            return self.current_task_batches[job_uuid]
+            size = self.batch_sizer.batch_size(
+                job.link.config, default_size=self.TASK_BATCH_SIZE
+            )
+            self.current_task_batches[job.uuid] = GearmanTaskBatch(size=size)
+            return self.current_task_batches[job.uuid]
 
     def _submit_batch(self, job, task_batch):
         if len(task_batch) == 0:
             return
 
-        task_batch.submit(self.client, job, max_retries=self.MAX_RETRIES)
+        # Log tasks to DB, before submitting the batch, as mcpclient then updates them
+        Task.bulk_log(task_batch.tasks, job)
+
+        task_batch.future = self.dispatcher.submit(
+            task_batch, job, max_retries=self.MAX_RETRIES
+        )
 
         metrics.gearman_active_jobs_gauge.inc()
         metrics.gearman_pending_jobs_gauge.dec()
+        # However the batch ends (completed, failed, lost or never sent), and
+        # whether or not its results are ever collected.
+        task_batch.future.add_done_callback(
+            lambda future: metrics.gearman_active_jobs_gauge.dec()
+        )
 
         if job.uuid not in self.pending_gearman_jobs:
             self.pending_gearman_jobs[job.uuid] = []
@@ -171,10 +396,15 @@ class GearmanTaskBackend(TaskBackend):
 class GearmanTaskBatch:
     """A collection of `Task` objects, to be submitted as one gearman job."""
 
-    def __init__(self):
+    def __init__(self, size=None):
         self.uuid = uuid.uuid4()
+        if size is None:
+            size = settings.BATCH_SIZE
+        self.size = size
         self.tasks = []
         self.pending = None
+        self.future = None
+        self.completion_order = None
         self.collected = False
 
     def __len__(self):
@@ -200,9 +430,6 @@ class GearmanTaskBatch:
         self.tasks.append(task)
 
     def submit(self, client, job, max_retries=0):
-        # Log tasks to DB, before submitting the batch, as mcpclient then updates them
-        Task.bulk_log(self.tasks, job)
-
         data = {"tasks": {}}
         for task in self.tasks:
             task_uuid = str(task.uuid)
@@ -233,6 +460,15 @@ class GearmanTaskBatch:
                 f"Expected a map containing 'task_results', but got: {job_result!r}"
             )
 
+    def processing_duration(self):
+        """Return the seconds MCPClient spent processing the batch, if known."""
+        started = [task.started_timestamp for task in self.tasks]
+        finished = [task.finished_timestamp for task in self.tasks]
+        if None in started or None in finished or not self.tasks:
+            return None
+
+        return (max(finished) - min(started)).total_seconds()
+
     def update_task_results(self):
         if self.failed:
             logger.error("Gearman task batch %s failed to execute", self.uuid)
@@ -249,6 +485,11 @@ class GearmanTaskBatch:
                 task.exit_code = task_result["exitCode"]
                 task.stdout = task_result.get("stdout", "")
                 task.stderr = task_result.get("stderr", "")
+                task.started_timestamp = task_result.get("startedTimestamp")
+                if task.started_timestamp:
+                    task.started_timestamp = datetime.datetime.fromisoformat(
+                        task.started_timestamp
+                    )
                 task.finished_timestamp = task_result.get("finishedTimestamp")
                 if task.finished_timestamp:
                     task.finished_timestamp = datetime.datetime.fromisoformat(
@@ -0,0 +1,117 @@
+"""
+Sizing of task batches sent to MCPClient.
+
+Client scripts differ in cost by orders of magnitude, so a single batch size
+either ships tiny batches of cheap tasks (wasting round trips) or huge batches
+of expensive tasks (serializing work that could be spread across workers).
+
+`BatchSizer` tracks how long each client script takes per task, measured from
+the timestamps MCPClient reports for every completed batch, and picks a batch
+size that should take roughly `BATCH_TARGET_DURATION` seconds. A link can also
+fix its batch size with a `batch_size` value in its workflow config.
+"""
+
+import logging
+import threading
+
+from django.conf import settings
+
+logger = logging.getLogger("archivematica.mcp.server.jobs.tasks")
+
+
+class BatchSizer:
+    """Chooses batch sizes per client script from observed task durations.
+
+    Methods on this class are threadsafe; one instance is shared by all task
+    backends in the process.
+    """
+
+    # Weight given to the latest observation in the moving average.
+    SMOOTHING = 0.3
+
+    def __init__(
+        self,
+        default_size=None,
+        target_duration=None,
+        max_size=None,
+    ):
+        if default_size is None:
+            default_size = settings.BATCH_SIZE
+        if target_duration is None:
+            target_duration = settings.BATCH_TARGET_DURATION
+        if max_size is None:
+            max_size = settings.MAX_BATCH_SIZE
+
+        self.default_size = default_size
+        self.target_duration = target_duration
+        self.max_size = max(max_size, 1)
+
+        self.lock = threading.Lock()
+        self.task_durations = {}  # script name: average seconds per task
+
+    @property
+    def adaptive(self):
+        return self.target_duration > 0
+
+    def batch_size(self, link_config, default_size=None):
+        """Return the number of tasks to pack into a batch for the link given.
+
+        A `batch_size` set in the link config always wins. Otherwise, if
+        adaptive sizing is enabled and the script has been observed, aim for
+        batches of `target_duration` seconds; failing that use the default.
+        """
+        if default_size is None:
+            default_size = self.default_size
+
+        configured_size = link_config.get("batch_size")
+        if isinstance(configured_size, int) and configured_size > 0:
+            return configured_size
+
+        if not self.adaptive:
+            return default_size
+
+        script_name = link_config.get("execute", "").lower()
+        with self.lock:
+            task_duration = self.task_durations.get(script_name)
+        if task_duration is None:
+            return default_size
+        if task_duration <= 0:
+            return self.max_size
+
+        size = int(self.target_duration / task_duration)
+        return min(max(size, 1), self.max_size)
+
+    def observe(self, script_name, task_count, duration):
+        """Record that `task_count` tasks of `script_name` took `duration`
+        seconds of wall time on MCPClient.
+        """
+        if task_count < 1 or duration < 0:
+            return
+
+        task_duration = duration / task_count
+        with self.lock:
+            previous = self.task_durations.get(script_name)
+            if previous is not None:
+                task_duration = (
+                    self.SMOOTHING * task_duration + (1 - self.SMOOTHING) * previous
+                )
+            self.task_durations[script_name] = task_duration
+
+        logger.debug(
+            "Average task duration for %s is now %.4fs", script_name, task_duration
+        )
+
+
+_batch_sizer = None
+_batch_sizer_lock = threading.Lock()
+
+
+def get_batch_sizer():
+    """Return the process wide `BatchSizer`."""
+    global _batch_sizer
+
+    with _batch_sizer_lock:
+        if _batch_sizer is None:
+            _batch_sizer = BatchSizer()
+
+    return _batch_sizer
@@ -42,6 +42,8 @@ class Task:
         self.stderr = ""
 
         self.start_timestamp = timezone.now()
+        # Set from the results reported by MCPClient
+        self.started_timestamp = None
         self.finished_timestamp = None
 
     def __repr__(self):
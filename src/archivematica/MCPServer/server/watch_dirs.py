@@ -8,8 +8,10 @@ workflows, as many chains start the next chain by moving a transfer or SIP t
 the appropriate watched directory.
 """
 
+import dataclasses
 import logging
 import os
+import stat
 import sys
 import time
 import warnings
@@ -18,9 +20,16 @@ from django.conf import settings
 from inotify_simple import INotify
 from inotify_simple import flags
 
+from archivematica.MCPServer.server import metrics
+
 IS_LINUX = sys.platform.startswith("linux")
 WATCHED_BASE_DIR = os.path.abspath(settings.WATCH_DIRECTORY)
 
+# How entries of watched dirs were found, used as a metrics label.
+SOURCE_INOTIFY = "inotify"
+SOURCE_SCAN = "scan"
+SOURCE_POLL = "poll"
+
 logger = logging.getLogger("archivematica.mcp.server.watchdirs")
 
 
@@ -36,6 +45,7 @@ def watch_directories_poll(
     """
     # paths that have already appeared in watch directories
     known_paths = set()
+    started_at = time.time()
 
     while not shutdown_event.is_set():
         current_paths = set()
@@ -51,6 +61,13 @@ def watch_directories_poll(
                     continue
 
                 current_paths.add(item.path)
+                try:
+                    appeared_at = max(item.stat().st_ctime, started_at)
+                except OSError:
+                    appeared_at = time.time()
+                metrics.watched_dir_entry_reported(
+                    watched_dir, SOURCE_POLL, time.time() - appeared_at
+                )
                 callback(item.path, watched_dir)
 
         # Update what we know about from the last pass, so that it doesn't grow
@@ -60,64 +77,307 @@ def watch_directories_poll(
         time.sleep(interval)
 
 
-def watch_directories_inotify(
-    watched_dirs, shutdown_event, callback, interval=settings.WATCH_DIRECTORY_INTERVAL
-):
+@dataclasses.dataclass
+class PendingEntry:
+    """An entry of a watched directory which may still be being written to.
+
+    Entries seen by inotify settle once nothing was written under them for
+    ``settle_time`` seconds and no file under them is left open for writing.
+    Entries found by a scan of the directory, where there are no events to go
+    by, settle once their status has not changed for as long.
     """
-    Watch the directories given via inotify. This is a very efficient way to handle
-    watches, however it requires linux, and may not work with NFS mounts.
 
-    Accepts an iterable of workflow WatchedDir objects, a shutdown event, and a
-    callback to be called when content appears in the watched dir.
+    watched_dir: object
+    path: str
+    detected_at: float
+    source: str
+    last_activity: float = 0.0
+    open_files: set = dataclasses.field(default_factory=set)
+    watches: set = dataclasses.field(default_factory=set)
+
+    def settled(self, now, settle_time):
+        if self.source != SOURCE_INOTIFY:
+            try:
+                stat = os.stat(self.path)
+            except OSError:
+                return False
+            self.last_activity = max(self.last_activity, stat.st_mtime, stat.st_ctime)
+        return not self.open_files and now - self.last_activity >= settle_time
+
+
+class InotifyWatcher:
+    """Watches directories with inotify and reports the entries placed in
+    them once they are complete.
+
+    Entries moved into a watched directory are complete straight away.
+    Entries created in it are pending until they settle, see
+    ``PendingEntry``; the subdirectories of pending directories are watched
+    too so that writes to them are noticed. Scans of the watched directories,
+    on start, after the inotify queue overflows and every
+    ``reconcile_interval`` seconds if set, pick up entries missed by inotify,
+    e.g. those written by other hosts to an NFS mount.
     """
-    if not IS_LINUX:
-        warnings.warn(
-            "inotify may not work as a watched directory method on non-linux systems.",
-            RuntimeWarning,
-            stacklevel=2,
-        )
 
-    inotify = INotify()
-    watch_flags = flags.CREATE | flags.MOVED_TO
-    watches = {}  # descriptor: (path, WatchedDir)
+    DIR_FLAGS = (
+        flags.CREATE
+        | flags.MOVED_TO
+        | flags.MOVED_FROM
+        | flags.DELETE
+        | flags.MODIFY
+        | flags.CLOSE_WRITE
+    )
 
-    for watched_dir in watched_dirs:
-        path = os.path.join(WATCHED_BASE_DIR, watched_dir.path.lstrip("/"))
-        if not os.path.isdir(path):
-            raise OSError(f'The path "{path}" is not a directory.')
+    def __init__(self, watched_dirs, callback, settle_time, reconcile_interval=None):
+        self.watched_dirs = watched_dirs
+        self.callback = callback
+        self.settle_time = settle_time
+        self.reconcile_interval = reconcile_interval
+        self.inotify = INotify()
+        self.started_at = time.time()
+        self.last_reconcile = None
+        # descriptor: (path, WatchedDir, path of the pending entry or None)
+        self.watches = {}
+        self.pending = {}  # path: PendingEntry
+        self.reported = {}  # WatchedDir path: set of reported paths
 
-        descriptor = inotify.add_watch(path, watch_flags)
-        watches[descriptor] = (path, watched_dir)
+    def start(self):
+        for watched_dir in self.watched_dirs:
+            path = os.path.join(WATCHED_BASE_DIR, watched_dir.path.lstrip("/"))
+            if not os.path.isdir(path):
+                raise OSError(f'The path "{path}" is not a directory.')
 
-        # If the directory already has something in it, trigger callbacks
-        for item in os.scandir(path):
-            if watched_dir.only_dirs and not item.is_dir():
-                continue
-            logger.debug(
-                "Found existing data in watched dir %s: %s", watched_dir.path, item.name
-            )
+            descriptor = self.inotify.add_watch(path, self.DIR_FLAGS)
+            self.watches[descriptor] = (path, watched_dir, None)
+            self.reported[watched_dir.path] = set()
+        # Report what is already there straight away.
+        self.reconcile()
+        for entry in list(self.pending.values()):
+            self.pending.pop(entry.path)
+            self.report(entry)
 
-            callback(item.path, watched_dir)
+    def close(self):
+        for descriptor in list(self.watches):
+            self._rm_watch(descriptor)
+        self.inotify.close()
 
-    while not shutdown_event.is_set():
+    def run(self, shutdown_event, interval):
+        self.start()
+        try:
+            while not shutdown_event.is_set():
+                timeout = interval
+                if self.pending:
+                    timeout = min(timeout, self.settle_time or interval)
+                self.step(timeout)
+        finally:
+            self.close()
+
+    def step(self, timeout):
+        """Handle the events read within ``timeout`` seconds and report the
+        entries that are complete.
+        """
         # timeout is in milliseconds
-        events = inotify.read(timeout=interval * 1000)
-        for event in events:
-            path, watched_dir = watches[event.wd]
+        for event in self.inotify.read(timeout=max(timeout, 0.01) * 1000):
+            self.handle(event)
+        if (
+            self.reconcile_interval is not None
+            and time.monotonic() - self.last_reconcile >= self.reconcile_interval
+        ):
+            self.reconcile()
+        self.flush()
+
+    def _rm_watch(self, descriptor):
+        self.watches.pop(descriptor, None)
+        try:
+            self.inotify.rm_watch(descriptor)
+        except OSError:
+            # The directory is already gone.
+            pass
+
+    def _watch_tree(self, entry, path):
+        """Watch a directory of a pending entry and its subdirectories."""
+        try:
+            descriptor = self.inotify.add_watch(path, self.DIR_FLAGS)
+        except OSError:
+            return
+        self.watches[descriptor] = (path, entry.watched_dir, entry.path)
+        entry.watches.add(descriptor)
+        # Look for what was written before the watch was added.
+        try:
+            items = list(os.scandir(path))
+        except OSError:
+            return
+        for item in items:
+            if item.is_dir(follow_symlinks=False):
+                self._watch_tree(entry, item.path)
+
+    def _is_entry(self, watched_dir, is_dir):
+        return is_dir or not watched_dir.only_dirs
+
+    @staticmethod
+    def _is_being_written(path):
+        """Whether a created file will be closed after writing.
+
+        Symbolic and hard links are created complete and are never closed,
+        so only regular files with a single link are waited for. Writes made
+        through a link are still tracked from their ``MODIFY`` events.
+        """
+        try:
+            status = os.lstat(path)
+        except OSError:
+            return False
+        return stat.S_ISREG(status.st_mode) and status.st_nlink == 1
+
+    def handle(self, event):
+        if event.mask & flags.Q_OVERFLOW:
+            logger.warning("Watched dir events were lost, scanning watched dirs.")
+            self.reconcile()
+            return
+        if event.wd not in self.watches:
+            return
+        path, watched_dir, entry_path = self.watches[event.wd]
+        if event.mask & flags.IGNORED:
+            self.watches.pop(event.wd, None)
+            return
+
+        event_path = os.path.join(path, event.name)
+        is_dir = bool(event.mask & flags.ISDIR)
+        now = time.monotonic()
+
+        if entry_path is None:
             logger.debug(
                 "Watched dir %s detected activity: %s", watched_dir.path, event.name
             )
+            entry_path = event_path
+            if event.mask & (flags.MOVED_FROM | flags.DELETE):
+                self._forget(watched_dir, event_path)
+                return
+            if event.mask & flags.MOVED_TO:
+                # Entries moved in are complete.
+                if self._is_entry(watched_dir, is_dir):
+                    self._forget(watched_dir, event_path)
+                    self.report(
+                        PendingEntry(
+                            watched_dir, event_path, time.time(), SOURCE_INOTIFY
+                        )
+                    )
+                return
+            if event.mask & flags.CREATE:
+                if not self._is_entry(watched_dir, is_dir):
+                    return
+                self._forget(watched_dir, event_path)
+                entry = self.pending[event_path] = PendingEntry(
+                    watched_dir, event_path, time.time(), SOURCE_INOTIFY, now
+                )
+                if is_dir:
+                    self._watch_tree(entry, event_path)
+                elif self._is_being_written(event_path):
+                    entry.open_files.add(event_path)
+                return
 
-            # bitwise check the mask for dirs, if dirs_only is set
-            if watched_dir.only_dirs and (flags.ISDIR & event.mask == 0):
+        entry = self.pending.get(entry_path)
+        if entry is None:
+            return
+        entry.last_activity = now
+        if event.mask & flags.MODIFY or (
+            event.mask & flags.CREATE
+            and not is_dir
+            and self._is_being_written(event_path)
+        ):
+            entry.open_files.add(event_path)
+        elif event.mask & (flags.CLOSE_WRITE | flags.MOVED_FROM | flags.DELETE):
+            entry.open_files.discard(event_path)
+        if event.mask & (flags.CREATE | flags.MOVED_TO) and is_dir:
+            self._watch_tree(entry, event_path)
+
+    def _forget(self, watched_dir, path):
+        self.reported[watched_dir.path].discard(path)
+        entry = self.pending.pop(path, None)
+        if entry is not None:
+            for descriptor in entry.watches:
+                self._rm_watch(descriptor)
+
+    def reconcile(self):
+        """Scan the watched dirs for entries inotify did not report."""
+        self.last_reconcile = time.monotonic()
+        for path, watched_dir, entry_path in list(self.watches.values()):
+            if entry_path is not None:
                 continue
+            current_paths = set()
+            for item in os.scandir(path):
+                if not self._is_entry(watched_dir, item.is_dir()):
+                    continue
+                current_paths.add(item.path)
+                if item.path in self.reported[watched_dir.path]:
+                    continue
+                if item.path not in self.pending:
+                    logger.debug(
+                        "Found data in watched dir %s: %s", watched_dir.path, item.name
+                    )
+                    self.pending[item.path] = PendingEntry(
+                        watched_dir, item.path, time.time(), SOURCE_SCAN
+                    )
+            # Forget what is gone, so that it is reported if it comes back.
+            self.reported[watched_dir.path] &= current_paths
+            for pending_path in list(self.pending):
+                entry = self.pending[pending_path]
+                if (
+                    entry.watched_dir is watched_dir
+                    and entry.source == SOURCE_SCAN
+                    and pending_path not in current_paths
+                ):
+                    self._forget(watched_dir, pending_path)
 
-            callback(os.path.join(path, event.name), watched_dir)
+    def flush(self):
+        """Report the pending entries which have settled."""
+        for entry in list(self.pending.values()):
+            now = time.monotonic() if entry.source == SOURCE_INOTIFY else time.time()
+            if entry.settled(now, self.settle_time):
+                self.pending.pop(entry.path)
+                for descriptor in entry.watches:
+                    self._rm_watch(descriptor)
+                self.report(entry)
 
-    for watch_descriptor in watches.keys():
-        inotify.rm_watch(watch_descriptor)
+    def report(self, entry):
+        self.reported[entry.watched_dir.path].add(entry.path)
+        if entry.source == SOURCE_SCAN:
+            # Entries found on start up were there before we were.
+            try:
+                appeared_at = os.stat(entry.path).st_ctime
+            except OSError:
+                appeared_at = entry.detected_at
+            entry.detected_at = max(appeared_at, self.started_at)
+        metrics.watched_dir_entry_reported(
+            entry.watched_dir, entry.source, time.time() - entry.detected_at
+        )
+        self.callback(entry.path, entry.watched_dir)
 
-    inotify.close()
+
+def watch_directories_inotify(
+    watched_dirs,
+    shutdown_event,
+    callback,
+    interval=settings.WATCH_DIRECTORY_INTERVAL,
+    settle_time=settings.WATCH_DIRECTORY_SETTLE_TIME,
+    reconcile_interval=None,
+):
+    """
+    Watch the directories given via inotify. This is a very efficient way to handle
+    watches, however it requires linux, and may not work with NFS mounts unless
+    ``reconcile_interval`` is set, see ``InotifyWatcher``.
+
+    Accepts an iterable of workflow WatchedDir objects, a shutdown event, and a
+    callback to be called when content appears in the watched dir.
+    """
+    if not IS_LINUX:
+        warnings.warn(
+            "inotify may not work as a watched directory method on non-linux systems.",
+            RuntimeWarning,
+            stacklevel=2,
+        )
+
+    InotifyWatcher(
+        watched_dirs, callback, settle_time, reconcile_interval=reconcile_interval
+    ).run(shutdown_event, interval)
 
 
 def watch_directories(*args, **kwargs):
@@ -127,6 +387,11 @@ def watch_directories(*args, **kwargs):
 
     if method == "inotify":
         watch_directories_inotify(*args, **kwargs)
+    elif method == "hybrid":
+        kwargs.setdefault(
+            "reconcile_interval", settings.WATCH_DIRECTORY_RECONCILE_INTERVAL
+        )
+        watch_directories_inotify(*args, **kwargs)
     elif method == "poll":
         watch_directories_poll(*args, **kwargs)
     else:
@@ -74,6 +74,16 @@ CONFIG_MAPPING = {
         "section": "MCPServer",
         "process_function": process_watched_directory_interval,
     },
+    "watch_directory_settle_time": {
+        "section": "MCPServer",
+        "option": "watch_directory_settle_time",
+        "type": "float",
+    },
+    "watch_directory_reconcile_interval": {
+        "section": "MCPServer",
+        "option": "watch_directory_reconcile_interval",
+        "type": "float",
+    },
     "secret_key": {
         "section": "MCPServer",
         "option": "django_secret_key",
@@ -84,12 +94,32 @@ CONFIG_MAPPING = {
         "process_function": process_search_enabled,
     },
     "batch_size": {"section": "MCPServer", "option": "batch_size", "type": "int"},
+    "batch_target_duration": {
+        "section": "MCPServer",
+        "option": "batch_target_duration",
+        "type": "float",
+    },
+    "max_batch_size": {
+        "section": "MCPServer",
+        "option": "max_batch_size",
+        "type": "int",
+    },
+    "max_in_flight_batches": {
+        "section": "MCPServer",
+        "option": "max_in_flight_batches",
+        "type": "int",
+    },
     "concurrent_packages": {
         "section": "MCPServer",
         "option": "concurrent_packages",
         "type": "int",
     },
     "rpc_threads": {"section": "MCPServer", "option": "rpc_threads", "type": "int"},
+    "package_file_inventory_cache": {
+        "section": "MCPServer",
+        "option": "package_file_inventory_cache",
+        "type": "boolean",
+    },
     "worker_threads": {
         "section": "MCPServer",
         "option": "worker_threads",
@@ -105,6 +135,16 @@ CONFIG_MAPPING = {
         "option": "storage_service_client_quick_timeout",
         "type": "float",
     },
+    "storage_service_client_retries": {
+        "section": "MCPServer",
+        "option": "storage_service_client_retries",
+        "type": "int",
+    },
+    "storage_service_cache_ttl": {
+        "section": "MCPServer",
+        "option": "storage_service_cache_ttl",
+        "type": "float",
+    },
     "prometheus_bind_address": {
         "section": "MCPServer",
         "option": "prometheus_bind_address",
@@ -141,13 +181,21 @@ processingDirectory = /var/archivematica/sharedDirectory/currentlyProcessing/
 rejectedDirectory = /var/archivematica/sharedDirectory/rejected/
 watch_directory_method = poll
 watch_directory_interval = 1
+watch_directory_settle_time = 0.5
+watch_directory_reconcile_interval = 60
 processingXMLFile = processingMCP.xml
 waitOnAutoApprove = 0
 search_enabled = true
 batch_size = 128
+batch_target_duration = 0
+max_batch_size = 1024
+max_in_flight_batches = 16
 rpc_threads = 4
+package_file_inventory_cache = true
 storage_service_client_timeout = 86400
 storage_service_client_quick_timeout = 5
+storage_service_client_retries = 3
+storage_service_cache_ttl = 60
 prometheus_bind_address =
 prometheus_bind_port =
 workflow_file =
@@ -268,18 +316,26 @@ GEARMAN_SERVER = config.get("gearman_server")
 WAIT_ON_AUTO_APPROVE = config.get("wait_on_auto_approve")
 WATCH_DIRECTORY_METHOD = config.get("watch_directory_method")
 WATCH_DIRECTORY_INTERVAL = config.get("watch_directory_interval")
+WATCH_DIRECTORY_SETTLE_TIME = config.get("watch_directory_settle_time")
+WATCH_DIRECTORY_RECONCILE_INTERVAL = config.get("watch_directory_reconcile_interval")
 SEARCH_ENABLED = config.get("search_enabled")
 BATCH_SIZE = config.get("batch_size")
+BATCH_TARGET_DURATION = config.get("batch_target_duration")
+MAX_BATCH_SIZE = config.get("max_batch_size")
+MAX_IN_FLIGHT_BATCHES = config.get("max_in_flight_batches")
 CONCURRENT_PACKAGES = config.get(
     "concurrent_packages", default=concurrent_packages_default()
 )
 RPC_THREADS = config.get("rpc_threads")
+PACKAGE_FILE_INVENTORY_CACHE = config.get("package_file_inventory_cache")
 WORKER_THREADS = config.get("worker_threads", default=multiprocessing.cpu_count() + 1)
 
 STORAGE_SERVICE_CLIENT_TIMEOUT = config.get("storage_service_client_timeout")
 STORAGE_SERVICE_CLIENT_QUICK_TIMEOUT = config.get(
     "storage_service_client_quick_timeout"
 )
+STORAGE_SERVICE_CLIENT_RETRIES = config.get("storage_service_client_retries")
+STORAGE_SERVICE_CACHE_TTL = config.get("storage_service_cache_ttl")
 PROMETHEUS_BIND_ADDRESS = config.get("prometheus_bind_address")
 try:
     PROMETHEUS_BIND_PORT = int(config.get("prometheus_bind_port"))
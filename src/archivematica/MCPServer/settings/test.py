@@ -29,3 +29,7 @@ DATABASES = {
         "PORT": "",
     }
 }
+
+# Tests mock the Storage Service responses, so a cached location could leak
+# into the next test.
+STORAGE_SERVICE_CACHE_TTL = 0
@@ -25,9 +25,12 @@ import glob
 import hashlib
 import json
 import locale
+import mmap
 import os
 import pprint
 import re
+import threading
+import time
 from collections.abc import Iterable
 from itertools import zip_longest
 from pathlib import Path
@@ -36,6 +39,10 @@ from uuid import uuid4
 
 from amclient import AMClient
 from django.apps import apps
+from django.conf import settings as django_settings
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
 from lxml import etree
 
 from archivematica.archivematicaCommon.namespaces import NSMAP
@@ -76,13 +83,152 @@ COMPRESS_EXTENSIONS = (
 PACKAGE_EXTENSIONS = (".tar",) + COMPRESS_EXTENSIONS
 
 
+# Seconds a process keeps the Dashboard settings in memory, unless the
+# ``DASHBOARD_SETTINGS_CACHE_TTL`` Django setting says otherwise.
+DEFAULT_DASHBOARD_SETTINGS_CACHE_TTL = 60
+
+
+class DashboardSettingsCache:
+    """Process wide cache of the ``DashboardSetting`` table.
+
+    All settings are loaded with a single query, together with the
+    ``DashboardSettingRevision`` they belong to. Once ``ttl`` seconds have
+    passed the revision is read again and the settings are only reloaded if
+    another process changed them meanwhile. Saving or deleting a
+    ``DashboardSetting`` in this process invalidates the cache once the change
+    is committed. Until then, the thread that made the change reads the
+    settings without caching them, so a change that is rolled back is never
+    cached. A TTL of zero disables caching: every lookup reads the settings
+    asked for.
+    """
+
+    def __init__(self, ttl=None):
+        self._ttl = ttl
+        self.lock = threading.Lock()
+        self.version = 0
+        self.values = None
+        self.revision = None
+        self.loaded_at = None
+        # Whether the current thread has uncommitted setting changes.
+        self.local = threading.local()
+
+    @property
+    def ttl(self):
+        if self._ttl is not None:
+            return self._ttl
+        return getattr(
+            django_settings,
+            "DASHBOARD_SETTINGS_CACHE_TTL",
+            DEFAULT_DASHBOARD_SETTINGS_CACHE_TTL,
+        )
+
+    def get(self, name, default=""):
+        return self.get_many({name: default})[name]
+
+    def get_many(self, defaults):
+        """Return the values of the settings named in ``defaults``, which maps
+        each name to the value to use if the setting does not exist.
+        """
+        ttl = self.ttl
+        if ttl <= 0 or self._has_uncommitted_changes():
+            values = self._load(defaults)
+        else:
+            values = self._cached(ttl)
+        return {name: values.get(name, default) for name, default in defaults.items()}
+
+    def _cached(self, ttl):
+        with self.lock:
+            values = self.values
+            revision = self.revision
+            expired = self.loaded_at is None or time.monotonic() - self.loaded_at > ttl
+            version = self.version
+        if values is None or expired:
+            # Read before the settings, so a change made meanwhile is not
+            # missed by the next check.
+            current = self._model("DashboardSettingRevision").current()
+            if values is None or current != revision:
+                values = self._load()
+            with self.lock:
+                # Do not keep what was read if it was invalidated meanwhile.
+                if self.version == version:
+                    self.values = values
+                    self.revision = current
+                    self.loaded_at = time.monotonic()
+
+        return values
+
+    def invalidate(self, **kwargs):
+        with self.lock:
+            self.version += 1
+            self.values = None
+            self.revision = None
+            self.loaded_at = None
+
+    def changed(self, **kwargs):
+        """Receiver for the signals sent when a ``DashboardSetting`` changes."""
+        self.invalidate()
+        if transaction.get_connection().in_atomic_block:
+            self.local.uncommitted = True
+        transaction.on_commit(self._committed)
+
+    def _committed(self):
+        self.local.uncommitted = False
+        self.invalidate()
+
+    def _has_uncommitted_changes(self):
+        if not getattr(self.local, "uncommitted", False):
+            return False
+        if transaction.get_connection().in_atomic_block:
+            return True
+        # The transaction was rolled back, so nothing needs invalidating.
+        self.local.uncommitted = False
+        return False
+
+    @staticmethod
+    def _model(name):
+        return apps.get_model(app_label="main", model_name=name)
+
+    def _load(self, names=None):
+        """Return the settings by name, or only the ones named."""
+        queryset = self._model("DashboardSetting").objects.all()
+        if names is not None:
+            queryset = queryset.filter(name__in=list(names))
+        values = {}
+        # Scoped entries (see ``DashboardSettingManager.get_dict``) never
+        # shadow a global setting with the same name.
+        for scope, key, value in queryset.values_list("scope", "name", "value"):
+            if not scope or key not in values:
+                values[key] = value
+        return values
+
+
+dashboard_settings_cache = DashboardSettingsCache()
+
+post_save.connect(
+    dashboard_settings_cache.changed,
+    sender="main.DashboardSetting",
+    weak=False,
+    dispatch_uid="dashboard_settings_cache_post_save",
+)
+post_delete.connect(
+    dashboard_settings_cache.changed,
+    sender="main.DashboardSetting",
+    weak=False,
+    dispatch_uid="dashboard_settings_cache_post_delete",
+)
+
+
 def get_setting(setting, default=""):
     """Get Dashboard setting from database model."""
-    DashboardSetting = apps.get_model(app_label="main", model_name="DashboardSetting")
-    try:
-        return DashboardSetting.objects.get(name=setting).value
-    except DashboardSetting.DoesNotExist:
-        return default
+    return dashboard_settings_cache.get(setting, default)
+
+
+def get_settings(defaults):
+    """Get several Dashboard settings at once, see ``get_setting``.
+
+    ``defaults`` maps the name of each setting to its default value.
+    """
+    return dashboard_settings_cache.get_many(defaults)
 
 
 def get_dashboard_uuid():
@@ -186,7 +332,13 @@ def normalizeNonDcElementName(string):
     return normalized_string
 
 
-def get_file_checksum(filename, algorithm="sha256"):
+# Size of the reads used to checksum files. Large reads keep the number of
+# system calls down and let hashlib release the GIL for longer, so files can
+# be hashed in parallel threads.
+CHECKSUM_BUFFER_SIZE = 1024 * 1024
+
+
+def get_file_checksum(filename, algorithm="sha256", use_mmap=False):
     """
     Perform a checksum on the specified file.
 
@@ -195,12 +347,27 @@ def get_file_checksum(filename, algorithm="sha256"):
 
     :param filename: The path to the file we want to check
     :param algorithm: Which algorithm to use for hashing, e.g. 'md5'
+    :param use_mmap: Map the file in memory instead of reading it
     :return: Returns a checksum string for the specified file.
     """
     hash_ = hashlib.new(algorithm)
     with open(filename, "rb") as file_:
-        for chunk in iter(lambda: file_.read(1024 * hash_.block_size), b""):
-            hash_.update(chunk)
+        # Empty files cannot be mapped.
+        if use_mmap and os.fstat(file_.fileno()).st_size > 0:
+            with mmap.mmap(file_.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                with memoryview(mapped) as view:
+                    for offset in range(0, len(view), CHECKSUM_BUFFER_SIZE):
+                        with view[offset : offset + CHECKSUM_BUFFER_SIZE] as chunk:
+                            hash_.update(chunk)
+        else:
+            buffer = bytearray(CHECKSUM_BUFFER_SIZE)
+            with memoryview(buffer) as view:
+                while True:
+                    size = file_.readinto(buffer)
+                    if not size:
+                        break
+                    with view[:size] as chunk:
+                        hash_.update(chunk)
     return hash_.hexdigest()
 
 
@@ -14,10 +14,12 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with Archivematica.  If not, see <http://www.gnu.org/licenses/>.
+import itertools
 import logging
 import sys
 import uuid
 
+from django.db import transaction
 from django.utils import timezone
 
 from archivematica.dashboard.main.models import SIP
@@ -26,9 +28,20 @@ from archivematica.dashboard.main.models import Derivation
 from archivematica.dashboard.main.models import Event
 from archivematica.dashboard.main.models import File
 from archivematica.dashboard.main.models import FPCommandOutput
+from archivematica.dashboard.main.models import Transfer
 
 LOGGER = logging.getLogger("archivematica.common")
 
+# Number of rows sent in each bulk insert or ``IN`` clause.
+CHUNK_SIZE = 500
+
+
+def chunks(items, size=CHUNK_SIZE):
+    """Yield lists of at most ``size`` items, e.g. for an ``IN`` clause."""
+    iterator = iter(items)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
 
 def insertIntoFiles(
     fileUUID,
@@ -116,6 +129,83 @@ def getAMAgentsForFile(fileUUID):
     ).values_list("pk", flat=True)
 
 
+def getAMAgentsForFiles(fileUUIDs):
+    """
+    Fetches the IDs for the Archivematica agents associated with many files.
+
+    This works like ``getAMAgentsForFile`` but the agents are looked up once
+    per SIP or transfer instead of once per file.
+
+    :param list fileUUIDs: UUIDs of the files.
+    :returns: A dict of lists of Agent IDs keyed by file UUID, as a string.
+        Files which do not exist in the database are left out.
+    """
+    file_uuids = set()
+    for fileUUID in fileUUIDs:
+        try:
+            file_uuids.add(str(uuid.UUID(str(fileUUID))))
+        except ValueError:
+            pass
+
+    units = {}
+    for chunk in chunks(sorted(file_uuids)):
+        for file_uuid, sip_id, transfer_id in File.objects.filter(
+            uuid__in=chunk
+        ).values_list("uuid", "sip_id", "transfer_id"):
+            if sip_id:
+                units[str(file_uuid)] = (SIP, sip_id)
+            elif transfer_id:
+                units[str(file_uuid)] = (Transfer, transfer_id)
+            else:
+                units[str(file_uuid)] = (None, None)
+    for file_uuid in file_uuids - set(units):
+        LOGGER.warning(
+            "File with UUID %s does not exist in database; unable to fetch Agents",
+            file_uuid,
+        )
+
+    unit_agents = {}
+    for model, unit_uuid in set(units.values()):
+        if model is None:
+            # Fetch the default Agents
+            agents = Agent.objects.filter(Agent.objects.default_agents_query_keywords())
+        else:
+            # Fetch Agent for the User
+            agents = model.objects.get(uuid=unit_uuid).agents
+        unit_agents[(model, unit_uuid)] = list(agents.values_list("pk", flat=True))
+
+    return {file_uuid: unit_agents[unit] for file_uuid, unit in units.items()}
+
+
+def _build_event(
+    fileUUID,
+    eventIdentifierUUID="",
+    eventType="",
+    eventDateTime=None,
+    eventDetail="",
+    eventOutcome="",
+    eventOutcomeDetailNote="",
+    agents=None,
+):
+    """Returns an unsaved Event built from the arguments of
+    ``insertIntoEvents``.
+    """
+    if eventDateTime is None:
+        eventDateTime = timezone.now()
+    if not eventIdentifierUUID:
+        eventIdentifierUUID = str(uuid.uuid4())
+
+    return Event(
+        event_id=eventIdentifierUUID,
+        file_uuid_id=fileUUID,
+        event_type=eventType,
+        event_datetime=eventDateTime,
+        event_detail=eventDetail,
+        event_outcome=eventOutcome,
+        event_outcome_detail=eventOutcomeDetailNote,
+    )
+
+
 def insertIntoEvents(
     fileUUID,
     eventIdentifierUUID="",
@@ -145,29 +235,81 @@ def insertIntoEvents(
         provided, automatically fetches Agents representing Archivematica.
     :returns Event: The created event object.
     """
-    if eventDateTime is None:
-        eventDateTime = timezone.now()
-
     # Assume the Agent is Archivematica & the current user
     if not agents:
         agents = getAMAgentsForFile(fileUUID)
-    if not eventIdentifierUUID:
-        eventIdentifierUUID = str(uuid.uuid4())
 
-    event = Event.objects.create(
-        event_id=eventIdentifierUUID,
-        file_uuid_id=fileUUID,
-        event_type=eventType,
-        event_datetime=eventDateTime,
-        event_detail=eventDetail,
-        event_outcome=eventOutcome,
-        event_outcome_detail=eventOutcomeDetailNote,
+    event = _build_event(
+        fileUUID,
+        eventIdentifierUUID=eventIdentifierUUID,
+        eventType=eventType,
+        eventDateTime=eventDateTime,
+        eventDetail=eventDetail,
+        eventOutcome=eventOutcome,
+        eventOutcomeDetailNote=eventOutcomeDetailNote,
     )
+    event.save(force_insert=True)
     # Splat agents list into multiple arguments
     event.agents.add(*agents)
     return event
 
 
+def bulkInsertIntoEvents(events):
+    """Creates many entries in the Events table with a few queries.
+
+    The agents of the events which do not list any are fetched once per SIP
+    or transfer, see ``getAMAgentsForFiles``.
+
+    :param list events: dicts with the keyword arguments of
+        ``insertIntoEvents`` for each event.
+    :returns list: The created Event objects, in the same order.
+    """
+    events = list(events)
+    if not events:
+        return []
+
+    # Assume the Agent is Archivematica & the current user
+    file_agents = getAMAgentsForFiles(
+        event["fileUUID"] for event in events if not event.get("agents")
+    )
+    event_objs = []
+    event_agents = []
+    for event in events:
+        event = dict(event)
+        agents = event.pop("agents", None)
+        if not agents:
+            agents = file_agents.get(str(event["fileUUID"]), [])
+        event_objs.append(_build_event(**event))
+        event_agents.append(agents)
+
+    with transaction.atomic():
+        Event.objects.bulk_create(event_objs, batch_size=CHUNK_SIZE)
+
+        # Not every database returns the primary keys of the inserted rows,
+        # which the agents relationship needs.
+        missing = {
+            str(uuid.UUID(str(event.event_id))): event
+            for event in event_objs
+            if event.pk is None
+        }
+        for chunk in chunks(missing):
+            for event_id, pk in Event.objects.filter(event_id__in=chunk).values_list(
+                "event_id", "pk"
+            ):
+                missing[str(uuid.UUID(str(event_id)))].pk = pk
+
+        Event.agents.through.objects.bulk_create(
+            [
+                Event.agents.through(event_id=event.pk, agent_id=agent_id)
+                for event, agents in zip(event_objs, event_agents)
+                for agent_id in dict.fromkeys(getattr(a, "pk", a) for a in agents)
+            ],
+            batch_size=CHUNK_SIZE,
+        )
+
+    return event_objs
+
+
 def insertIntoDerivations(sourceFileUUID, derivedFileUUID, relatedEventUUID=None):
     """Creates a new entry in the Derivations table using the supplied
     arguments. The two files in this relationship should already exist in the
@@ -177,18 +319,36 @@ def insertIntoDerivations(sourceFileUUID, derivedFileUUID, relatedEventUUID=None
     :param str derivedFileUUID: The UUID of the derived file.
     :param str relatedEventUUID: The UUID for an event describing the creation of the derived file. Can be blank.
     """
+    _build_derivation(sourceFileUUID, derivedFileUUID, relatedEventUUID).save(
+        force_insert=True
+    )
+
+
+def _build_derivation(sourceFileUUID, derivedFileUUID, relatedEventUUID=None):
     if not sourceFileUUID:
         raise ValueError("sourceFileUUID must be specified")
     if not derivedFileUUID:
         raise ValueError("derivedFileUUID must be specified")
 
-    Derivation.objects.create(
+    return Derivation(
         source_file_id=sourceFileUUID,
         derived_file_id=derivedFileUUID,
         event_id=relatedEventUUID,
     )
 
 
+def bulkInsertIntoDerivations(derivations):
+    """Creates many entries in the Derivations table with a few queries.
+
+    :param list derivations: dicts with the keyword arguments of
+        ``insertIntoDerivations`` for each derivation.
+    """
+    Derivation.objects.bulk_create(
+        [_build_derivation(**derivation) for derivation in derivations],
+        batch_size=CHUNK_SIZE,
+    )
+
+
 def insertIntoFPCommandOutput(fileUUID="", fitsXMLString="", ruleUUID=""):
     """
     Creates a new entry in the FPCommandOutput table using the supplied argument.
@@ -199,8 +359,22 @@ def insertIntoFPCommandOutput(fileUUID="", fitsXMLString="", ruleUUID=""):
     :param str fitsXMLString: An XML document, encoded into a string. The name is historical; this can represent XML output from any software.
     :param str ruleUUID: The UUID of the FPR rule used to generate this XML data. Foreign key to FPRule.
     """
-    FPCommandOutput.objects.create(
-        file_id=fileUUID, content=fitsXMLString, rule_id=ruleUUID
+    _build_fpcommand_output(fileUUID, fitsXMLString, ruleUUID).save(force_insert=True)
+
+
+def _build_fpcommand_output(fileUUID="", fitsXMLString="", ruleUUID=""):
+    return FPCommandOutput(file_id=fileUUID, content=fitsXMLString, rule_id=ruleUUID)
+
+
+def bulkInsertIntoFPCommandOutput(outputs):
+    """Creates many entries in the FPCommandOutput table with a few queries.
+
+    :param list outputs: dicts with the keyword arguments of
+        ``insertIntoFPCommandOutput`` for each output.
+    """
+    FPCommandOutput.objects.bulk_create(
+        [_build_fpcommand_output(**output) for output in outputs],
+        batch_size=CHUNK_SIZE,
     )
 
 
@@ -17,17 +17,22 @@
 import calendar
 import copy
 import datetime
+import itertools
 import logging
 import os
 import re
+import stat
 import sys
 import time
+from multiprocessing.pool import ThreadPool
 
 from django.db.models import Min
 from django.db.models import Q
 from elasticsearch import Elasticsearch
 from elasticsearch import ImproperlyConfigured
+from elasticsearch.helpers import BulkIndexError
 from elasticsearch.helpers import bulk
+from elasticsearch.helpers import streaming_bulk
 from lxml import etree
 
 from archivematica.archivematicaCommon import namespaces as ns
@@ -35,6 +40,7 @@ from archivematica.archivematicaCommon import version
 from archivematica.archivematicaCommon.archivematicaFunctions import get_dashboard_uuid
 from archivematica.archivematicaCommon.externals import xmltodict
 from archivematica.dashboard.main.models import File
+from archivematica.dashboard.main.models import FileFormatVersion
 from archivematica.dashboard.main.models import Identifier
 from archivematica.dashboard.main.models import Transfer
 
@@ -78,7 +84,13 @@ class TooManyResultsError(ElasticsearchError):
 
 _es_hosts = None
 _es_client = None
+_es_bulk_chunk_size = None
+_es_bulk_thread_count = None
 DEFAULT_TIMEOUT = 10
+# Number of documents per bulk request and how many bulk requests are sent
+# in parallel when indexing transfer files.
+DEFAULT_BULK_CHUNK_SIZE = 500
+DEFAULT_BULK_THREAD_COUNT = 1
 # Known indexes. This indexes may be enabled or not based on the SEARCH_ENABLED
 # setting. To add a new index, make sure it's related to the setting values in
 # the setup functions below, add its name to the following array and create a
@@ -100,19 +112,30 @@ TOTAL_FIELDS_LIMIT = 10000
 DEPTH_LIMIT = 1000
 
 
-def setup(hosts, timeout=DEFAULT_TIMEOUT, enabled=(AIPS_INDEX, TRANSFERS_INDEX)):
+def setup(
+    hosts,
+    timeout=DEFAULT_TIMEOUT,
+    enabled=(AIPS_INDEX, TRANSFERS_INDEX),
+    bulk_chunk_size=DEFAULT_BULK_CHUNK_SIZE,
+    bulk_thread_count=DEFAULT_BULK_THREAD_COUNT,
+):
     """Initialize and share the Elasticsearch client.
 
     Share it as the attribute _es_client in the current module. An additional
     attribute _es_hosts is defined containing the Elasticsearch hosts (expected
     types are: string, list or tuple). Also, the existence of the enabled
     indexes is checked to be able to create the required indexes on the fly if
-    they don't exist.
+    they don't exist. The bulk options are shared in the same way and used
+    when indexing transfer files.
     """
     global _es_hosts
     global _es_client
+    global _es_bulk_chunk_size
+    global _es_bulk_thread_count
 
     _es_hosts = hosts
+    _es_bulk_chunk_size = bulk_chunk_size
+    _es_bulk_thread_count = bulk_thread_count
     _es_client = Elasticsearch(
         **{"hosts": _es_hosts, "timeout": timeout, "dead_timeout": 2}
     )
@@ -136,6 +159,8 @@ def setup_reading_from_conf(settings):
         settings.ELASTICSEARCH_SERVER,
         settings.ELASTICSEARCH_TIMEOUT,
         settings.SEARCH_ENABLED,
+        bulk_chunk_size=settings.ELASTICSEARCH_BULK_CHUNK_SIZE,
+        bulk_thread_count=settings.ELASTICSEARCH_BULK_THREAD_COUNT,
     )
 
 
@@ -464,7 +489,8 @@ def index_aip_and_files(
         identifiers = []
     identifiers += _get_sip_identifiers(uuid)
 
-    aip_metadata = _get_aip_metadata(root)
+    mets_index = _METSIndex(root)
+    aip_metadata = _get_aip_metadata(root, mets_index=mets_index)
 
     printfn("AIP UUID: " + uuid)
     printfn("Indexing AIP files ...")
@@ -476,6 +502,7 @@ def index_aip_and_files(
         name=name,
         identifiers=identifiers,
         aip_metadata=aip_metadata,
+        mets_index=mets_index,
     )
 
     printfn("Files indexed: " + str(files_indexed))
@@ -507,7 +534,15 @@ def index_aip_and_files(
     return 0
 
 
-def _index_aip_files(client, uuid, mets, name, identifiers=None, aip_metadata=None):
+def _index_aip_files(
+    client,
+    uuid,
+    mets,
+    name,
+    identifiers=None,
+    aip_metadata=None,
+    mets_index=None,
+):
     """Index AIP files from AIP with UUID `uuid` and METS at path `mets_path`.
 
     :param client: The ElasticSearch client.
@@ -517,8 +552,11 @@ def _index_aip_files(client, uuid, mets, name, identifiers=None, aip_metadata=No
     :param identifiers: optional additional identifiers (MODS, Islandora, etc.).
     :param aip_metadata: list with the descriptive and administrative metadata
                          of each directory in the AIP
+    :param mets_index: optional _METSIndex of `mets`, built if not given.
     :return: number of files indexed, list of accession numbers
     """
+    if mets_index is None:
+        mets_index = _METSIndex(mets)
 
     # Extract isPartOf (for AIPs) or identifier (for AICs) from DublinCore.
     dublincore = ns.xml_find_premis(
@@ -594,7 +632,7 @@ def _index_aip_files(client, uuid, mets, name, identifiers=None, aip_metadata=No
                 if len(set(uuids)) == 1:
                     fileUUID = uuids[0]
             else:
-                amdSec = _get_amdSec(admID, mets)
+                amdSec = mets_index.amd_secs.get(admID)
                 fileUUID = _get_file_uuid(amdSec)
                 accession_id = _get_accession_number(amdSec)
                 if accession_id is not None:
@@ -612,12 +650,11 @@ def _index_aip_files(client, uuid, mets, name, identifiers=None, aip_metadata=No
             # Get the parent division for the file pointer by searching the
             # physical structural map section (structMap).
             file_id = file_.attrib.get("ID", None)
-            file_pointer_division = ns.xml_find_premis(
-                mets,
-                f"mets:structMap[@TYPE='physical']//mets:fptr[@FILEID='{file_id}']/..",
-            )
+            file_pointer_division = mets_index.file_divisions.get(file_id)
             if file_pointer_division is not None:
-                descriptive_metadata = _get_file_metadata(file_pointer_division, mets)
+                descriptive_metadata = _get_file_metadata(
+                    file_pointer_division, mets, mets_index=mets_index
+                )
                 if descriptive_metadata:
                     file_metadata.append(descriptive_metadata)
                 # If the parent division has a DMDID attribute then index
@@ -629,9 +666,11 @@ def _index_aip_files(client, uuid, mets, name, identifiers=None, aip_metadata=No
                     # has both DC and non-DC metadata).
                     # Attempt to index only the DC dmdSec if available.
                     for dmd_section_id_item in dmd_section_id.split():
+                        dmd_section = mets_index.dmd_secs.get(dmd_section_id_item)
+                        if dmd_section is None:
+                            continue
                         dmd_section_info = ns.xml_find_premis(
-                            mets,
-                            f"mets:dmdSec[@ID='{dmd_section_id_item}']/mets:mdWrap[@MDTYPE='DC']/mets:xmlData",
+                            dmd_section, "mets:mdWrap[@MDTYPE='DC']/mets:xmlData"
                         )
                         if dmd_section_info is not None:
                             xml = etree.tostring(dmd_section_info, encoding="utf8")
@@ -718,6 +757,9 @@ def index_transfer_and_files(
         if dt:
             ingest_date = str(dt.date())
 
+    # Check the cluster once for the whole run, not for every document.
+    _wait_for_cluster_yellow_status(client)
+
     printfn("Transfer UUID: " + uuid)
     printfn("Indexing Transfer files ...")
     files_indexed = _index_transfer_files(
@@ -746,7 +788,6 @@ def index_transfer_and_files(
         "pending_deletion": pending_deletion,
     }
 
-    _wait_for_cluster_yellow_status(client)
     _try_to_index(client, transfer_data, TRANSFERS_INDEX, printfn=printfn)
     printfn("Done.")
 
@@ -763,9 +804,16 @@ def _index_transfer_files(
     status="",
     pending_deletion=False,
     printfn=print,
+    chunk_size=None,
+    thread_count=None,
 ):
     """Indexes files in the Transfer with UUID `uuid` at path `path`.
 
+    Documents are sent with the bulk API, `chunk_size` at a time and using
+    `thread_count` parallel requests. Both default to the values given to
+    `setup`. Documents that fail to index are retried, see
+    `_try_to_bulk_index`.
+
     :param client: ElasticSearch client.
     :param uuid: UUID of the Transfer in the DB.
     :param path: path on disk, including the transfer directory and a
@@ -775,8 +823,15 @@ def _index_transfer_files(
     :param ingest_date: date Transfer was indexed
     :param status: optional Transfer status.
     :param printfn: optional print funtion.
+    :param chunk_size: optional number of documents per bulk request.
+    :param thread_count: optional number of parallel bulk requests.
     :return: number of files indexed.
     """
+    if chunk_size is None:
+        chunk_size = _es_bulk_chunk_size or DEFAULT_BULK_CHUNK_SIZE
+    if thread_count is None:
+        thread_count = _es_bulk_thread_count or DEFAULT_BULK_THREAD_COUNT
+
     files_indexed = 0
 
     # Some files should not be indexed.
@@ -786,8 +841,20 @@ def _index_transfer_files(
     # Get dashboard UUID
     dashboard_uuid = get_dashboard_uuid()
 
-    for filepath in _list_files_in_dir(path):
-        if os.path.isfile(filepath):
+    # Look up the file entries and formats of the whole transfer up front.
+    files = _get_transfer_files_by_location(uuid)
+
+    def _generator():
+        nonlocal files_indexed
+
+        for filepath in _list_files_in_dir(path):
+            try:
+                stat_result = os.stat(filepath)
+            except OSError:
+                continue
+            if not stat.S_ISREG(stat_result.st_mode):
+                continue
+
             # We need to account for the possibility of dealing with a BagIt
             # transfer package - the new default in Archivematica.
             # The BagIt is created when the package is sent to backlog hence
@@ -796,62 +863,105 @@ def _index_transfer_files(
             stripped_path = re.sub(r"^data/", "", os.path.relpath(filepath, path))
             currentlocation = "%transferDirectory%" + stripped_path
             try:
-                f = File.objects.get(
-                    currentlocation=currentlocation.encode(), transfer_id=uuid
-                )
-                file_uuid = str(f.uuid)
-                formats = _get_file_formats(f)
-                bulk_extractor_reports = _list_bulk_extractor_reports(path, file_uuid)
-                if f.modificationtime is not None:
-                    modification_date = f.modificationtime.strftime("%Y-%m-%d")
-                else:
-                    modification_date = ""
-            except File.DoesNotExist:
+                file_uuid, modificationtime, formats = files[currentlocation.encode()]
+            except KeyError:
                 file_uuid, modification_date = "", ""
                 formats = []
                 bulk_extractor_reports = []
+            else:
+                bulk_extractor_reports = _list_bulk_extractor_reports(path, file_uuid)
+                if modificationtime is not None:
+                    modification_date = modificationtime.strftime("%Y-%m-%d")
+                else:
+                    modification_date = ""
 
             # Get file path info
             stripped_path = filepath.replace(path, transfer_name + "/")
             file_extension = os.path.splitext(filepath)[1][1:].lower()
             filename = os.path.basename(filepath)
             # Size in megabytes
-            size = os.path.getsize(filepath) / (1024 * 1024)
-            create_time = os.stat(filepath).st_ctime
-
-            if filename not in ignore_files:
-                printfn(f"Indexing {stripped_path} (UUID: {file_uuid})")
-
-                # TODO: Index Backlog Location UUID?
-                indexData = {
-                    "filename": filename,
-                    "relative_path": stripped_path,
-                    "fileuuid": file_uuid,
-                    "sipuuid": uuid,
-                    "accessionid": accession_id,
-                    ES_FIELD_STATUS: status,
-                    "origin": dashboard_uuid,
-                    "ingestdate": ingest_date,
-                    ES_FIELD_CREATED: create_time,
-                    "modification_date": modification_date,
-                    ES_FIELD_SIZE: size,
-                    "tags": [],
-                    "file_extension": file_extension,
-                    "bulk_extractor_reports": bulk_extractor_reports,
-                    "format": formats,
-                    "pending_deletion": pending_deletion,
-                }
-
-                _wait_for_cluster_yellow_status(client)
-                _try_to_index(client, indexData, TRANSFER_FILES_INDEX, printfn=printfn)
+            size = stat_result.st_size / (1024 * 1024)
+            create_time = stat_result.st_ctime
 
-                files_indexed = files_indexed + 1
-            else:
+            if filename in ignore_files:
                 printfn(f"Skipping indexing {stripped_path}")
+                continue
+
+            printfn(f"Indexing {stripped_path} (UUID: {file_uuid})")
+
+            # TODO: Index Backlog Location UUID?
+            indexData = {
+                "filename": filename,
+                "relative_path": stripped_path,
+                "fileuuid": file_uuid,
+                "sipuuid": uuid,
+                "accessionid": accession_id,
+                ES_FIELD_STATUS: status,
+                "origin": dashboard_uuid,
+                "ingestdate": ingest_date,
+                ES_FIELD_CREATED: create_time,
+                "modification_date": modification_date,
+                ES_FIELD_SIZE: size,
+                "tags": [],
+                "file_extension": file_extension,
+                "bulk_extractor_reports": bulk_extractor_reports,
+                "format": formats,
+                "pending_deletion": pending_deletion,
+            }
+            files_indexed = files_indexed + 1
+
+            yield {
+                "_op_type": "index",
+                "_index": TRANSFER_FILES_INDEX,
+                "_type": DOC_TYPE,
+                "_source": indexData,
+            }
+
+    _try_to_bulk_index(
+        client,
+        _generator(),
+        chunk_size=chunk_size,
+        thread_count=thread_count,
+        printfn=printfn,
+    )
 
     return files_indexed
 
 
+def _get_transfer_files_by_location(transfer_uuid):
+    """Map the current location of every file in a transfer to its UUID,
+    modification time and formats, using two queries for the whole transfer.
+    """
+    formats = {}
+    fields = [
+        "file_uuid_id",
+        "format_version__pronom_id",
+        "format_version__description",
+        "format_version__format__group__description",
+    ]
+    for file_uuid, puid, fmt, group in FileFormatVersion.objects.filter(
+        file_uuid__transfer_id=transfer_uuid
+    ).values_list(*fields):
+        formats.setdefault(str(file_uuid), []).append(
+            {"puid": puid, "format": fmt, "group": group}
+        )
+
+    files = {}
+    for file_uuid, currentlocation, modificationtime in File.objects.filter(
+        transfer_id=transfer_uuid
+    ).values_list("uuid", "currentlocation", "modificationtime"):
+        if currentlocation is None:
+            continue
+        file_uuid = str(file_uuid)
+        files[bytes(currentlocation)] = (
+            file_uuid,
+            modificationtime,
+            formats.get(file_uuid, []),
+        )
+
+    return files
+
+
 def _try_to_index(
     client, data, index, wait_between_tries=10, max_tries=10, printfn=print
 ):
@@ -874,6 +984,62 @@ def _try_to_index(
         raise exception
 
 
+def _try_to_bulk_index(
+    client,
+    actions,
+    chunk_size,
+    thread_count=1,
+    wait_between_tries=10,
+    max_tries=10,
+    printfn=print,
+):
+    """Send ``actions`` with the bulk API, ``chunk_size`` at a time.
+
+    Like ``_try_to_index``, the documents of a chunk that were not indexed,
+    e.g. because Elasticsearch could not be reached, are sent again up to
+    ``max_tries`` times before the errors are raised. Chunks are sent by
+    ``thread_count`` threads.
+    """
+    if max_tries < 1:
+        raise ValueError("max_tries must be 1 or greater")
+
+    def _send(chunk):
+        for attempt in range(max_tries):
+            if attempt:
+                time.sleep(wait_between_tries)
+            # The results follow the order of the chunk.
+            results = streaming_bulk(
+                client,
+                chunk,
+                chunk_size=len(chunk),
+                raise_on_error=False,
+                raise_on_exception=False,
+            )
+            errors = []
+            failed = []
+            for action, (ok, info) in zip(chunk, results):
+                if not ok:
+                    errors.append(info)
+                    failed.append(action)
+            if not failed:
+                return
+            printfn(f"ERROR: error trying to index {len(failed)} document(s).")
+            printfn(errors[0])
+            chunk = failed
+        raise BulkIndexError(f"{len(errors)} document(s) failed to index.", errors)
+
+    iterator = iter(actions)
+    chunks = iter(lambda: list(itertools.islice(iterator, chunk_size)), [])
+    if thread_count > 1:
+        with ThreadPool(thread_count) as pool:
+            # imap is lazy, consume it to send every chunk.
+            for _ in pool.imap(_send, chunks):
+                pass
+    else:
+        for chunk in chunks:
+            _send(chunk)
+
+
 # ----------------
 # INDEXING HELPERS
 # ----------------
@@ -954,11 +1120,14 @@ def _get_relative_path_element(directory):
     return result
 
 
-def _get_latest_dmd_secs(dmd_id, doc):
+def _get_latest_dmd_secs(dmd_id, doc, mets_index=None):
     # Build a mapping of dmdSec by metadata type.
     dmd_secs = {}
     for id in dmd_id.split():
-        dmd_sec = ns.xml_find_premis(doc, f'mets:dmdSec[@ID="{id}"]')
+        if mets_index is not None:
+            dmd_sec = mets_index.dmd_secs.get(id)
+        else:
+            dmd_sec = ns.xml_find_premis(doc, f'mets:dmdSec[@ID="{id}"]')
         if not dmd_sec:
             continue
         # Use mdWrap MDTYPE and OTHERMDTYPE to generate a unique key.
@@ -991,7 +1160,7 @@ def _get_latest_dmd_secs(dmd_id, doc):
     return final_dmd_secs
 
 
-def _get_file_metadata(file_pointer_division, doc):
+def _get_file_metadata(file_pointer_division, doc, mets_index=None):
     """Get descriptive metadata for a file pointer.
 
     There are various types of metadata elements extracted: dublin core
@@ -1007,14 +1176,14 @@ def _get_file_metadata(file_pointer_division, doc):
     dmd_id = file_pointer_division.attrib.get("DMDID")
     if not dmd_id:
         return result
-    for dmd_sec in _get_latest_dmd_secs(dmd_id, doc):
+    for dmd_sec in _get_latest_dmd_secs(dmd_id, doc, mets_index=mets_index):
         elements_with_metadata += _get_descriptive_section_metadata(dmd_sec)
     if elements_with_metadata:
         result = _combine_elements(elements_with_metadata)
     return _normalize_dict(result)
 
 
-def _get_directory_metadata(directory, doc):
+def _get_directory_metadata(directory, doc, mets_index=None):
     """Get descriptive or administrive metadata for a directory.
 
     There are three types of metadata elements extracted:
@@ -1036,10 +1205,13 @@ def _get_directory_metadata(directory, doc):
     elements_with_metadata = []
     dmd_id = directory.attrib.get("DMDID")
     if dmd_id:
-        for dmd_sec in _get_latest_dmd_secs(dmd_id, doc):
+        for dmd_sec in _get_latest_dmd_secs(dmd_id, doc, mets_index=mets_index):
             elements_with_metadata += _get_descriptive_section_metadata(dmd_sec)
     for ADMID in directory.attrib.get("ADMID", "").split():
-        amd_sec = ns.xml_find_premis(doc, f'mets:amdSec[@ID="{ADMID}"]')
+        if mets_index is not None:
+            amd_sec = mets_index.amd_secs.get(ADMID)
+        else:
+            amd_sec = ns.xml_find_premis(doc, f'mets:amdSec[@ID="{ADMID}"]')
         if amd_sec is not None:
             # look for bag/disk image metadata
             elements_with_metadata += ns.xml_findall_premis(
@@ -1052,7 +1224,7 @@ def _get_directory_metadata(directory, doc):
     return _normalize_dict(result)
 
 
-def _get_aip_metadata(doc):
+def _get_aip_metadata(doc, mets_index=None):
     """Get metadata about the directories in the AIP.
 
     Given a doc representing a METS file, look for Directory entries
@@ -1064,7 +1236,9 @@ def _get_aip_metadata(doc):
     physical_struct_map = ns.xml_find_premis(doc, 'mets:structMap[@TYPE="physical"]')
     if physical_struct_map is not None:
         for directory in _get_directories_with_metadata(physical_struct_map):
-            directory_metadata = _get_directory_metadata(directory, doc)
+            directory_metadata = _get_directory_metadata(
+                directory, doc, mets_index=mets_index
+            )
             if directory_metadata:
                 result.append(directory_metadata)
     return result
@@ -1097,19 +1271,6 @@ def _normalize_dict(data):
     return new
 
 
-def _get_file_formats(f):
-    formats = []
-    fields = [
-        "format_version__pronom_id",
-        "format_version__description",
-        "format_version__format__group__description",
-    ]
-    for puid, fmt, group in f.fileformatversion_set.all().values_list(*fields):
-        formats.append({"puid": puid, "format": fmt, "group": group})
-
-    return formats
-
-
 def _list_bulk_extractor_reports(transfer_path, file_uuid):
     reports = []
     log_path = os.path.join(transfer_path, "data", "logs", "bulk-" + file_uuid)
@@ -1141,14 +1302,37 @@ def _list_files_in_dir(path, filepaths=None):
     return filepaths
 
 
-def _get_amdSec(admID, doc):
-    """Get amdSec with given admID.
+class _METSIndex:
+    """Lookup tables for the sections of a METS document.
+
+    Finding a section by ID with an XPath query scans the whole document,
+    which made indexing the files of an AIP quadratic in the number of files.
+    These tables are built in a single pass instead.
 
-    :param admID: admID.
-    :param doc: ElementTree object.
-    :return: amdSec.
+    - ``amd_secs`` maps ``ID`` to ``mets:amdSec``.
+    - ``dmd_secs`` maps ``ID`` to ``mets:dmdSec``.
+    - ``file_divisions`` maps ``FILEID`` to the ``mets:div`` holding the
+      ``mets:fptr`` in the physical structMap.
+
+    As with ``find``, the first element in document order wins.
     """
-    return ns.xml_find_premis(doc, f"mets:amdSec[@ID='{admID}']")
+
+    def __init__(self, doc):
+        self.amd_secs = {}
+        self.dmd_secs = {}
+        self.file_divisions = {}
+
+        for element in doc:
+            if element.tag == ns.metsBNS + "amdSec":
+                self.amd_secs.setdefault(element.get("ID"), element)
+            elif element.tag == ns.metsBNS + "dmdSec":
+                self.dmd_secs.setdefault(element.get("ID"), element)
+            elif (
+                element.tag == ns.metsBNS + "structMap"
+                and element.get("TYPE") == "physical"
+            ):
+                for fptr in element.iter(ns.metsBNS + "fptr"):
+                    self.file_divisions.setdefault(fptr.get("FILEID"), fptr.getparent())
 
 
 def _get_file_uuid(amdSec):
@@ -24,6 +24,9 @@ import tempfile
 from typing import Optional
 from typing import Union
 
+from django.conf import settings as django_settings
+
+from archivematica.archivematicaCommon import python_script_runner
 from archivematica.archivematicaCommon.archivematicaFunctions import escape
 
 Arguments = list[str]
@@ -33,6 +36,18 @@ Command = Union[str, list[str]]
 Result = tuple[int, str, str]
 
 
+def _environment(env_updates: Environment) -> Environment:
+    """Return the environment of the processes started by this module."""
+    my_env = os.environ.copy()
+    my_env["PYTHONIOENCODING"] = "utf-8"
+    if "LANG" not in my_env or not my_env["LANG"]:
+        my_env["LANG"] = "en_US.UTF-8"
+    if "LANGUAGE" not in my_env or not my_env["LANGUAGE"]:
+        my_env["LANGUAGE"] = my_env["LANG"]
+    my_env.update(env_updates)
+    return my_env
+
+
 def launchSubProcess(
     command: Command,
     stdIn: Input = "",
@@ -84,13 +99,7 @@ def launchSubProcess(
         else:
             command.extend(arguments)
 
-        my_env = os.environ.copy()
-        my_env["PYTHONIOENCODING"] = "utf-8"
-        if "LANG" not in my_env or not my_env["LANG"]:
-            my_env["LANG"] = "en_US.UTF-8"
-        if "LANGUAGE" not in my_env or not my_env["LANGUAGE"]:
-            my_env["LANGUAGE"] = my_env["LANG"]
-        my_env.update(env_updates)
+        my_env = _environment(env_updates)
 
         if isinstance(stdIn, str):
             stdin_pipe = subprocess.PIPE
@@ -176,7 +185,7 @@ def createAndRunScript(
         # Run it
         ret = launchSubProcess(
             cmd,
-            stdIn="",
+            stdIn=stdIn,
             printing=printing,
             env_updates=env_updates,
             capture_output=capture_output,
@@ -185,6 +194,67 @@ def createAndRunScript(
     return ret
 
 
+def runPythonScript(
+    text: str,
+    stdIn: Input = "",
+    printing: bool = True,
+    arguments: Optional[Arguments] = None,
+    env_updates: Optional[Environment] = None,
+    capture_output: bool = True,
+) -> Result:
+    """
+    Runs the Python script ``text`` in the persistent interpreter of
+    ``python_script_runner``, returning the same results as running it with
+    ``createAndRunScript``. If the interpreter can not be used, the script is
+    run with ``createAndRunScript``.
+    """
+    if arguments is None:
+        arguments = []
+    if env_updates is None:
+        env_updates = {}
+    if isinstance(stdIn, str):
+        stdin = stdIn.encode()
+    elif isinstance(stdIn, (bytes, io.IOBase)):
+        stdin = stdIn
+    else:
+        raise Exception("stdIn must be a string or a file object")
+    try:
+        retcode, std_out, std_error = python_script_runner.run(
+            text,
+            arguments,
+            _environment(env_updates),
+            capture_output=capture_output,
+            stdin=stdin,
+        )
+    except (OSError, python_script_runner.PythonScriptRunnerError) as err:
+        print("Python script runner failed:", err, file=sys.stderr)
+        return createAndRunScript(
+            text,
+            stdIn=stdIn,
+            printing=printing,
+            arguments=arguments,
+            env_updates=env_updates,
+            capture_output=capture_output,
+        )
+
+    stdOut = escape(std_out)
+    stdError = escape(std_error)
+    # Like launchSubProcess, only return the stderr of failed scripts if the
+    # output is not captured.
+    if (not capture_output) and (retcode == 0):
+        stdError = ""
+    if printing:
+        print(stdOut)
+        print(stdError, file=sys.stderr)
+    return retcode, stdOut, stdError
+
+
+def _use_python_script_runner() -> bool:
+    return django_settings.configured and getattr(
+        django_settings, "PYTHON_SCRIPT_RUNNER", False
+    )
+
+
 def executeOrRun(
     type: str,
     text: Command,
@@ -209,6 +279,8 @@ def executeOrRun(
                 to disk and executed. If the "arguments" parameter is passed,
                 they will be appended to the array that is built to be
                 passed to subprocess.Popen.
+                Python scripts are run by ``runPythonScript`` instead when
+                the PYTHON_SCRIPT_RUNNER setting is enabled.
     as_is:      Like the above, except that the provided script is executed
                 without modification.
 
@@ -253,6 +325,15 @@ def executeOrRun(
         if not isinstance(text, str):
             raise ValueError("command must be a str")
         text = f"#!/usr/bin/env python\n{text}"
+        if _use_python_script_runner():
+            return runPythonScript(
+                text,
+                stdIn=stdIn,
+                printing=printing,
+                arguments=arguments,
+                env_updates=env_updates,
+                capture_output=capture_output,
+            )
         return createAndRunScript(
             text,
             stdIn=stdIn,
@@ -22,8 +22,12 @@ import sys
 import uuid
 from pathlib import Path
 
+from django.db import transaction
+
 from archivematica.archivematicaCommon.archivematicaFunctions import get_file_checksum
 from archivematica.archivematicaCommon.archivematicaFunctions import get_setting
+from archivematica.archivematicaCommon.databaseFunctions import CHUNK_SIZE
+from archivematica.archivematicaCommon.databaseFunctions import bulkInsertIntoEvents
 from archivematica.archivematicaCommon.databaseFunctions import insertIntoEvents
 from archivematica.archivematicaCommon.databaseFunctions import insertIntoFiles
 from archivematica.archivematicaCommon.executeOrRunSubProcess import executeOrRun
@@ -31,13 +35,15 @@ from archivematica.dashboard.main.models import File
 from archivematica.dashboard.main.models import Transfer
 
 
-def get_size_and_checksum(file_path, file_size=None, checksum=None, checksum_type=None):
+def get_size_and_checksum(
+    file_path, file_size=None, checksum=None, checksum_type=None, use_mmap=False
+):
     if not file_size:
         file_size = os.path.getsize(file_path)
     if not checksum_type:
         checksum_type = get_setting("checksum_type", "sha256")
     if not checksum:
-        checksum = get_file_checksum(file_path, checksum_type)
+        checksum = get_file_checksum(file_path, checksum_type, use_mmap=use_mmap)
 
     return (file_size, checksum, checksum_type)
 
@@ -71,13 +77,20 @@ def updateSizeAndChecksum(
     )
 
     if add_event:
-        insertIntoEvents(
-            fileUUID=fileUUID,
-            eventType="message digest calculation",
-            eventDateTime=date,
-            eventDetail=f'program="python"; module="hashlib.{checksumType}()"',
-            eventOutcomeDetailNote=checksum,
-        )
+        insertIntoEvents(**checksum_event(fileUUID, date, checksum, checksumType))
+
+
+def checksum_event(fileUUID, date, checksum, checksumType):
+    """Return the ``insertIntoEvents`` arguments of the message digest
+    calculation event of a file.
+    """
+    return {
+        "fileUUID": fileUUID,
+        "eventType": "message digest calculation",
+        "eventDateTime": date,
+        "eventDetail": f'program="python"; module="hashlib.{checksumType}()"',
+        "eventOutcomeDetailNote": checksum,
+    }
 
 
 def addFileToTransfer(
@@ -113,6 +126,72 @@ def addFileToTransfer(
     return file_obj
 
 
+def bulkAddFilesToTransfer(
+    files,
+    transferUUID,
+    date,
+    sourceType="ingestion",
+    eventDetail="",
+    use="original",
+):
+    """Add many files to a transfer with a few queries.
+
+    Does what ``addFileToTransfer`` followed by ``updateSizeAndChecksum``
+    does for each file: the files, their ``sourceType`` and accession events
+    and their message digest calculation events are written in bulk.
+
+    :param list files: dicts with the ``fileUUID``, ``filePathRelativeToSIP``,
+        ``fileSize``, ``checksum`` and ``checksumType`` of each file, and
+        optionally its ``originalLocation``.
+    :returns list: The created File objects, in the same order.
+    """
+    transfer = Transfer.objects.get(uuid=transferUUID)
+    file_objs = []
+    events = []
+    for file_ in files:
+        fileUUID = str(file_["fileUUID"])
+        filePathRelativeToSIP = file_["filePathRelativeToSIP"]
+        originalLocation = file_.get("originalLocation") or filePathRelativeToSIP
+        file_objs.append(
+            File(
+                uuid=fileUUID,
+                originallocation=originalLocation.encode(),
+                currentlocation=filePathRelativeToSIP.encode(),
+                enteredsystem=date,
+                filegrpuse=use,
+                transfer=transfer,
+                size=file_["fileSize"],
+                checksum=file_["checksum"],
+                checksumtype=file_["checksumType"],
+            )
+        )
+        events.append(
+            {
+                "fileUUID": fileUUID,
+                "eventType": sourceType,
+                "eventDateTime": date,
+                "eventDetail": eventDetail,
+            }
+        )
+        if transfer.accessionid:
+            events.append(
+                {
+                    "fileUUID": fileUUID,
+                    "eventType": "registration",
+                    "eventDateTime": date,
+                    "eventOutcomeDetailNote": f"accession#{transfer.accessionid}",
+                }
+            )
+        events.append(
+            checksum_event(fileUUID, date, file_["checksum"], file_["checksumType"])
+        )
+
+    with transaction.atomic():
+        File.objects.bulk_create(file_objs, batch_size=CHUNK_SIZE)
+        bulkInsertIntoEvents(events)
+    return file_objs
+
+
 def addAccessionEvent(fileUUID, transferUUID, date):
     transfer = Transfer.objects.get(uuid=transferUUID)
     if transfer.accessionid:
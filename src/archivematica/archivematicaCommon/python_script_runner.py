@@ -0,0 +1,307 @@
+"""Run ``pythonScript`` FPR commands in a warm Python interpreter.
+
+``executeOrRun`` runs a ``pythonScript`` command by writing it to a temporary
+file and starting a new interpreter for it, so every file normalized,
+characterized or validated by a Python script pays for the interpreter start
+up and for the imports of the script.
+
+``PythonScriptRunner`` starts a server interpreter once per process instead.
+The server imports the modules commonly used by FPR scripts, compiles every
+script once and forks a child for each run, which gets the arguments,
+environment, working directory and standard streams a new interpreter would
+have had and exits with the status of the script. The requests carry the file
+descriptors of the streams of the child, so the output never goes through the
+server.
+
+This module is also the server program, and only uses the standard library
+so that it can be started by any Python interpreter.
+"""
+
+import errno
+import hashlib
+import importlib
+import json
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+
+# Imported by the server before it forks, so that scripts find them loaded.
+PRELOADED_MODULES = (
+    "argparse",
+    "json",
+    "re",
+    "shutil",
+    "subprocess",
+    "tempfile",
+    "uuid",
+    "xml.etree.ElementTree",
+    "lxml.etree",
+)
+
+# Largest request accepted by the server, i.e. script, arguments and
+# environment encoded as JSON.
+MAX_REQUEST_SIZE = 4 * 1024 * 1024
+
+
+class PythonScriptRunnerError(Exception):
+    """The server could not run a script."""
+
+
+class PythonScriptRunner:
+    """Client of a server interpreter running Python scripts.
+
+    The server is started on first use and again if it exits or if the
+    current process was forked from the one that started it. Runs can be
+    requested from several threads at once.
+    """
+
+    def __init__(self, python=None):
+        self.python = python
+        self.lock = threading.Lock()
+        self.process = None
+        self.control = None
+        self.pid = None
+
+    def _start(self):
+        python = self.python or shutil.which("python") or sys.executable
+        control, server_control = socket.socketpair(
+            socket.AF_UNIX, socket.SOCK_SEQPACKET
+        )
+        env = os.environ.copy()
+        env["PYTHONIOENCODING"] = "utf-8"
+        with server_control:
+            self.process = subprocess.Popen(
+                [python, os.path.abspath(__file__), str(server_control.fileno())],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                pass_fds=[server_control.fileno()],
+                env=env,
+            )
+        self.control = control
+        self.pid = os.getpid()
+
+    def _send(self, request, fds):
+        with self.lock:
+            for attempt in range(2):
+                if (
+                    self.pid != os.getpid()
+                    or self.process is None
+                    or self.process.poll() is not None
+                ):
+                    self._close()
+                    self._start()
+                try:
+                    socket.send_fds(self.control, [request], fds)
+                    return
+                except OSError as err:
+                    # The request is larger than the socket accepts, the
+                    # server is fine and would not take it either.
+                    if err.errno == errno.EMSGSIZE:
+                        raise PythonScriptRunnerError(
+                            "Script request is too large"
+                        ) from err
+                    # The server exited since it was checked, start it again.
+                    self._close()
+                    if attempt:
+                        raise
+
+    def _close(self):
+        # Only the process that started the server owns it.
+        if self.control is not None and self.pid == os.getpid():
+            self.control.close()
+            self.process.wait()
+        self.control = self.process = self.pid = None
+
+    def close(self):
+        """Stop the server, if started."""
+        with self.lock:
+            self._close()
+
+    def run(self, script, arguments, env, capture_output=True, stdin=None):
+        """Run ``script`` with ``arguments`` as a new interpreter would.
+
+        :param str script: Python source of the script
+        :param list arguments: arguments of the script, i.e. ``sys.argv[1:]``
+        :param dict env: environment of the script
+        :param bool capture_output: whether to capture the standard output;
+            the standard error is always captured
+        :param stdin: standard input of the script, as bytes or as a file
+            object; empty if None
+        :return: tuple of exit code, standard output and standard error, as
+            bytes; the exit code is negative when the script was killed by a
+            signal, like with ``subprocess``
+        """
+        request = json.dumps(
+            {
+                "script": script,
+                "arguments": list(arguments),
+                "env": env,
+                "cwd": os.getcwd(),
+            }
+        ).encode()
+        if len(request) > MAX_REQUEST_SIZE:
+            raise PythonScriptRunnerError("Script request is too large")
+
+        with (
+            _open_stdin(stdin) as stdin,
+            open(os.devnull, "wb") as devnull,
+            tempfile.TemporaryFile() as stdout,
+            tempfile.TemporaryFile() as stderr,
+        ):
+            status_read, status_write = os.pipe()
+            try:
+                self._send(
+                    request,
+                    [
+                        stdin.fileno(),
+                        stdout.fileno() if capture_output else devnull.fileno(),
+                        stderr.fileno(),
+                        status_write,
+                    ],
+                )
+            finally:
+                os.close(status_write)
+            with open(status_read, "rb") as status:
+                exit_code = status.read()
+            if not exit_code:
+                raise PythonScriptRunnerError("Script server exited during the run")
+
+            stdout.seek(0)
+            stderr.seek(0)
+            return int(exit_code), stdout.read(), stderr.read()
+
+
+_runner = PythonScriptRunner()
+
+
+def run(script, arguments, env, capture_output=True, stdin=None):
+    """Run a script with the runner of this process, see
+    ``PythonScriptRunner.run``.
+    """
+    return _runner.run(
+        script, arguments, env, capture_output=capture_output, stdin=stdin
+    )
+
+
+def _open_stdin(stdin):
+    """Return a file to pass as the standard input of a script."""
+    if stdin is None:
+        return open(os.devnull, "rb")
+    if isinstance(stdin, bytes):
+        f = tempfile.TemporaryFile()
+        f.write(stdin)
+        f.seek(0)
+        return f
+    # Duplicate the descriptor, the file object belongs to the caller.
+    return open(os.dup(stdin.fileno()), "rb")
+
+
+def _preload():
+    for name in PRELOADED_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+
+
+def _script_path(directory, script):
+    path = os.path.join(
+        directory, hashlib.sha256(script.encode()).hexdigest()[:32] + ".py"
+    )
+    if not os.path.exists(path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(script)
+    return path
+
+
+def _supervise(request, fds):
+    """Run the script in a child and report its exit code.
+
+    Runs in a child of the server, so that the server can go back to its
+    requests straight away. Returns in the child running the script.
+    """
+    stdin, stdout, stderr, status = fds
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+
+    pid = os.fork()
+    if pid == 0:
+        os.close(status)
+        for fd, target in ((stdin, 0), (stdout, 1), (stderr, 2)):
+            os.dup2(fd, target)
+            os.close(fd)
+        return request
+
+    for fd in (stdin, stdout, stderr):
+        os.close(fd)
+    _, wait_status = os.waitpid(pid, 0)
+    os.write(status, str(os.waitstatus_to_exitcode(wait_status)).encode())
+    os._exit(0)
+
+
+def serve(control):
+    """Serve the requests sent on ``control`` until it is closed.
+
+    Returns the request to run in the child forked for it, or None in the
+    server when the client goes away.
+    """
+    # Children report their exit code themselves, do not keep zombies.
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    _preload()
+    compiled = {}
+    directory = tempfile.mkdtemp(prefix="python-script-runner-")
+    server_pid = os.getpid()
+    try:
+        while True:
+            data, fds, _, _ = socket.recv_fds(control, MAX_REQUEST_SIZE, 4)
+            if not data:
+                return None
+
+            request = json.loads(data)
+            script = request["script"]
+            if script not in compiled:
+                path = _script_path(directory, script)
+                try:
+                    code = compile(script, path, "exec")
+                except SyntaxError:
+                    # Let the child fail the way the interpreter would.
+                    code = None
+                compiled[script] = (path, code)
+            request["path"], request["code"] = compiled[script]
+
+            if os.fork() == 0:
+                control.close()
+                return _supervise(request, fds)
+            for fd in fds:
+                os.close(fd)
+    finally:
+        if os.getpid() == server_pid:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def run_script(request):
+    """Run the script of a request in this process, as ``__main__``."""
+    os.chdir(request["cwd"])
+    os.environ.clear()
+    os.environ.update(request["env"])
+    sys.argv = [request["path"], *request["arguments"]]
+    sys.path.insert(0, os.path.dirname(request["path"]))
+
+    code = request["code"]
+    if code is None:
+        with open(request["path"], encoding="utf-8") as f:
+            code = compile(f.read(), request["path"], "exec")
+
+    exec(code, {"__name__": "__main__", "__file__": request["path"]})
+
+
+if __name__ == "__main__":
+    # Do not let the directory of this module shadow the modules of scripts.
+    del sys.path[0]
+    request = serve(socket.socket(fileno=int(sys.argv[1])))
+    if request is not None:
+        run_script(request)
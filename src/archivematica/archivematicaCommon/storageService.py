@@ -1,17 +1,33 @@
+import copy
 import logging
 import os
 import platform
+import threading
+import time
 import urllib
 
 import requests
 from django.conf import settings as django_settings
 from requests.auth import AuthBase
+from urllib3.util.retry import Retry
 
 from archivematica.archivematicaCommon import archivematicaFunctions as am
 from archivematica.archivematicaCommon.common_metrics import ss_api_timer
 
 LOGGER = logging.getLogger("archivematica.common")
 
+# Times a request is retried after a connection error, or after a 502, 503 or
+# 504 response to an idempotent request, unless the
+# ``STORAGE_SERVICE_CLIENT_RETRIES`` Django setting says otherwise.
+DEFAULT_STORAGE_SERVICE_CLIENT_RETRIES = 3
+RETRY_BACKOFF_FACTOR = 0.5
+RETRY_STATUSES = (502, 503, 504)
+
+# Seconds a process keeps the pipeline and locations read from the Storage
+# Service, unless the ``STORAGE_SERVICE_CACHE_TTL`` Django setting says
+# otherwise.
+DEFAULT_STORAGE_SERVICE_CACHE_TTL = 60
+
 
 class Error(requests.exceptions.RequestException):
     pass
@@ -34,14 +50,32 @@ class ApiKeyAuth(AuthBase):
     """Custom auth for requests that puts user & key in Authorization header."""
 
     def __init__(self, username=None, apikey=None):
-        self.username = username or am.get_setting("storage_service_user", "test")
-        self.apikey = apikey or am.get_setting("storage_service_apikey", None)
+        self.username = username
+        self.apikey = apikey
 
     def __call__(self, r):
-        r.headers["Authorization"] = f"ApiKey {self.username}:{self.apikey}"
+        # Read on every request because sessions outlive changes to the
+        # settings (see ``_storage_api_session``).
+        if self.username and self.apikey:
+            username, apikey = self.username, self.apikey
+        else:
+            username, apikey = _storage_service_credentials()
+            username = self.username or username
+            apikey = self.apikey or apikey
+        r.headers["Authorization"] = f"ApiKey {username}:{apikey}"
         return r
 
 
+def _storage_service_credentials():
+    """Return the user and API key of the Storage Service, in one lookup of
+    the Dashboard settings cache.
+    """
+    settings = am.get_settings(
+        {"storage_service_user": "test", "storage_service_apikey": None}
+    )
+    return settings["storage_service_user"], settings["storage_service_apikey"]
+
+
 def _storage_service_url():
     # Get storage service URL from DashboardSetting model
     storage_service_url = am.get_setting("storage_service_url", None)
@@ -55,25 +89,103 @@ def _storage_service_url():
     return storage_service_url
 
 
-def _storage_api_session(timeout=django_settings.STORAGE_SERVICE_CLIENT_QUICK_TIMEOUT):
-    """Return a requests.Session with a customized adapter with timeout support."""
+class HTTPAdapterWithTimeout(requests.adapters.HTTPAdapter):
+    """HTTP adapter that applies the same timeout to every request."""
+
+    def __init__(self, timeout=None, *args, **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, *args, **kwargs):
+        kwargs["timeout"] = self.timeout
+        return super().send(*args, **kwargs)
 
-    class HTTPAdapterWithTimeout(requests.adapters.HTTPAdapter):
-        def __init__(self, timeout=None, *args, **kwargs):
-            self.timeout = timeout
-            super().__init__(*args, **kwargs)
 
-        def send(self, *args, **kwargs):
-            kwargs["timeout"] = self.timeout
-            return super().send(*args, **kwargs)
+def _storage_api_retry():
+    """Return the retry policy of the Storage Service sessions.
 
-    session = requests.session()
-    session.auth = ApiKeyAuth()
-    session.mount("http://", HTTPAdapterWithTimeout(timeout=timeout))
-    session.mount("https://", HTTPAdapterWithTimeout(timeout=timeout))
+    Connection errors are retried for every method because the request was
+    not sent. Read errors are not retried: the request may have been
+    processed, and with the slow timeout it may have taken hours already.
+    """
+    retries = getattr(
+        django_settings,
+        "STORAGE_SERVICE_CLIENT_RETRIES",
+        DEFAULT_STORAGE_SERVICE_CLIENT_RETRIES,
+    )
+    return Retry(
+        total=retries,
+        connect=retries,
+        read=0,
+        status=retries,
+        other=0,
+        backoff_factor=RETRY_BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUSES,
+        raise_on_status=False,
+    )
+
+
+# Adapters of this process by timeout, see ``_storage_api_session``.
+_adapters = {}
+_adapters_pid = None
+_adapters_lock = threading.Lock()
+# Sessions of the current thread by timeout.
+_local = threading.local()
+
+
+def _storage_api_adapter(timeout):
+    """Return the adapter of this process for the given timeout.
+
+    The connection pool of the adapter is thread-safe and shared by the
+    sessions of every thread, so connections to the Storage Service are kept
+    alive and reused. A forked process (e.g. a worker of a process pool)
+    starts with adapters of its own.
+    """
+    global _adapters_pid
+
+    with _adapters_lock:
+        if _adapters_pid != os.getpid():
+            # The connections of the parent process cannot be shared.
+            _adapters.clear()
+            _adapters_pid = os.getpid()
+        adapter = _adapters.get(timeout)
+        if adapter is None:
+            adapter = HTTPAdapterWithTimeout(
+                timeout=timeout, max_retries=_storage_api_retry()
+            )
+            _adapters[timeout] = adapter
+    return adapter
+
+
+def _storage_api_session(timeout=django_settings.STORAGE_SERVICE_CLIENT_QUICK_TIMEOUT):
+    """Return a requests.Session with a customized adapter with timeout support.
+
+    Sessions are not thread-safe, so every thread gets its own session, but
+    they share the adapter (and its connections) of the process.
+    """
+    adapter = _storage_api_adapter(timeout)
+    sessions = getattr(_local, "sessions", None)
+    if sessions is None:
+        sessions = _local.sessions = {}
+    session = sessions.get(timeout)
+    if session is None or session.get_adapter("http://") is not adapter:
+        session = requests.session()
+        session.auth = ApiKeyAuth()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        sessions[timeout] = session
     return session
 
 
+def close_sessions():
+    """Close the Storage Service connections of this process."""
+    with _adapters_lock:
+        for adapter in _adapters.values():
+            adapter.close()
+        # The sessions of every thread are replaced on their next use.
+        _adapters.clear()
+
+
 def _storage_api_slow_session():
     """Return a requests.Session with a higher configurable timeout."""
     return _storage_api_session(django_settings.STORAGE_SERVICE_CLIENT_TIMEOUT)
@@ -81,11 +193,62 @@ def _storage_api_slow_session():
 
 def _storage_api_params():
     """Return API GET params username=USERNAME&api_key=KEY for use in URL."""
-    username = am.get_setting("storage_service_user", "test")
-    api_key = am.get_setting("storage_service_apikey", None)
+    username, api_key = _storage_service_credentials()
     return urllib.parse.urlencode({"username": username, "api_key": api_key})
 
 
+class StorageServiceCache:
+    """Process wide cache of the metadata read from the Storage Service.
+
+    The pipeline and the locations are looked up with the same arguments for
+    every package, sometimes more than once per job. Successful responses are
+    kept for ``ttl`` seconds and callers get a copy they can modify. Empty
+    responses are not kept, so a location added in the Storage Service is
+    found straight away. A TTL of zero disables caching.
+    """
+
+    def __init__(self, ttl=None):
+        self._ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = {}
+
+    @property
+    def ttl(self):
+        if self._ttl is not None:
+            return self._ttl
+        return getattr(
+            django_settings,
+            "STORAGE_SERVICE_CACHE_TTL",
+            DEFAULT_STORAGE_SERVICE_CACHE_TTL,
+        )
+
+    def get(self, key, fetch):
+        """Return the value cached for ``key`` or the one returned by
+        ``fetch``.
+        """
+        ttl = self.ttl
+        if ttl <= 0:
+            return fetch()
+
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is not None and time.monotonic() - entry[0] <= ttl:
+            return copy.deepcopy(entry[1])
+
+        value = fetch()
+        if value:
+            with self.lock:
+                self.entries[key] = (time.monotonic(), copy.deepcopy(value))
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+storage_service_cache = StorageServiceCache()
+
+
 def _storage_relative_from_absolute(location_path, space_path):
     """Strip space_path and next / from location_path."""
     location_path = os.path.normpath(location_path)
@@ -131,11 +294,16 @@ def create_pipeline(
             exc_info=True,
         )
         raise
+    storage_service_cache.clear()
     return True
 
 
 def get_pipeline(uuid):
     url = _storage_service_url() + "pipeline/" + uuid + "/"
+    return storage_service_cache.get(("pipeline", url), lambda: _get_pipeline(url))
+
+
+def _get_pipeline(url):
     try:
         with ss_api_timer(function="get_pipeline"):
             response = _storage_api_session().get(url)
@@ -166,7 +334,6 @@ def get_location(path=None, purpose=None, space=None):
     path: Path to location.  If a space is passed in, paths starting with /
         have the space's path stripped.
     """
-    return_locations = []
     if space and path:
         path = _storage_relative_from_absolute(path, space["path"])
         space = space["uuid"]
@@ -179,8 +346,15 @@ def get_location(path=None, purpose=None, space=None):
         "relative_path": path,
         "purpose": purpose,
         "space": space,
-        "offset": 0,
     }
+    return storage_service_cache.get(
+        ("location", url, tuple(params.items())), lambda: _get_location(url, params)
+    )
+
+
+def _get_location(url, params):
+    return_locations = []
+    params = dict(params, offset=0)
     while True:
         with ss_api_timer(function="get_location"):
             response = _storage_api_session().get(url, params=params)
@@ -224,10 +398,17 @@ def location_description_from_slug(aip_location_slug):
     :rtype: dict
     """
     API_SLUG = "/api/v2/"
-    JSON_MIME = "application/json"
-    CONTENT_TYPE_HDR = "content-type"
     service_uri = _storage_service_url()
     service_uri = service_uri.replace(API_SLUG, aip_location_slug)
+    return storage_service_cache.get(
+        ("location_description", service_uri),
+        lambda: _location_description(service_uri),
+    )
+
+
+def _location_description(service_uri):
+    JSON_MIME = "application/json"
+    CONTENT_TYPE_HDR = "content-type"
     response = {}
     with ss_api_timer(function="get_location"):
         response = _storage_api_session().get(service_uri)
@@ -249,6 +430,12 @@ def location_description_from_slug(aip_location_slug):
 
 def get_default_location(purpose):
     url = _storage_service_url() + f"location/default/{purpose}"
+    return storage_service_cache.get(
+        ("default_location", url), lambda: _get_default_location(url)
+    )
+
+
+def _get_default_location(url):
     with ss_api_timer(function="get_default_location"):
         response = _storage_api_session().get(url)
     response.raise_for_status()
@@ -0,0 +1,89 @@
+"""Notify the ``unit_changes`` requests waiting for a unit to change.
+
+Instead of every waiting request reading ``UnitStatusSequence`` on its own,
+one poller per process reads it while requests are waiting and wakes them
+when it moves. The poller is a thread, which the gevent workers of gunicorn
+turn into a greenlet, and it stops once no request is waiting.
+"""
+
+import logging
+import threading
+import time
+
+from django import db
+
+from archivematica.dashboard.main.models import UnitStatusSequence
+
+logger = logging.getLogger("archivematica.dashboard")
+
+# Seconds between the reads of the sequence while requests are waiting.
+POLL_INTERVAL = 1.0
+
+
+class SequenceNotifier:
+    """Wait for ``UnitStatusSequence`` to go past a number."""
+
+    def __init__(self, poll_interval=POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self.condition = threading.Condition()
+        self.poller = None
+        self.sequence = None
+        self.waiters = 0
+
+    def wait(self, since, timeout):
+        """Wait up to ``timeout`` seconds for the sequence to go past
+        ``since``.
+
+        Returns the sequence, or None if it did not change in time.
+        """
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            self.waiters += 1
+            try:
+                while self.sequence is None or self.sequence <= since:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return None
+                    if self.poller is None:
+                        self.poller = threading.Thread(target=self._poll, daemon=True)
+                        self.poller.start()
+                    self.condition.wait(remaining)
+                return self.sequence
+            finally:
+                self.waiters -= 1
+
+    @staticmethod
+    def current():
+        """Return the last number of the sequence."""
+        return (
+            UnitStatusSequence.objects.values_list("number", flat=True)
+            .filter(pk=1)
+            .first()
+            or 0
+        )
+
+    def _poll(self):
+        try:
+            while True:
+                sequence = self.current()
+                with self.condition:
+                    self.sequence = sequence
+                    self.condition.notify_all()
+                    if not self.waiters:
+                        return
+                time.sleep(self.poll_interval)
+        except Exception:
+            logger.exception("Unable to read the unit status sequence")
+            # Do not let the waiting requests retry straight away.
+            time.sleep(self.poll_interval)
+        finally:
+            with self.condition:
+                # Not read any more, the next poller starts from scratch.
+                self.poller = None
+                self.sequence = None
+                # Let the requests still waiting start a new poller.
+                self.condition.notify_all()
+            db.connection.close()
+
+
+notifier = SequenceNotifier()
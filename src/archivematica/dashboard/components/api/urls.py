@@ -53,6 +53,7 @@ urlpatterns = [
     re_path(
         r"ingest/waiting", views.waiting_for_user_input, name="waiting_for_user_input"
     ),
+    re_path(r"^units/changes", views.unit_changes, name="unit_changes"),
     re_path(
         r"^(?P<unit_type>transfer|ingest)/(?P<unit_uuid>"
         + settings.UUID_REGEX
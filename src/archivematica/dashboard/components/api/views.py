@@ -19,6 +19,7 @@ import logging
 import os
 import re
 import shutil
+import time
 import uuid
 from cgi import parse_header
 
@@ -36,6 +37,7 @@ from archivematica.archivematicaCommon.processing import install_builtin_config
 from archivematica.archivematicaCommon.version import get_full_version
 from archivematica.dashboard.components import helpers
 from archivematica.dashboard.components.api import validators
+from archivematica.dashboard.components.api.changes import notifier as changes_notifier
 from archivematica.dashboard.components.filesystem_ajax import (
     views as filesystem_ajax_views,
 )
@@ -57,6 +59,9 @@ JOB_STATUS_CODE_LABELS = {
     models.Job.STATUS_EXECUTING_COMMANDS: "PROCESSING",
     models.Job.STATUS_FAILED: "FAILED",
 }
+UNIT_TYPE_LABELS = {"unitTransfer": "transfer", "unitSIP": "SIP", "unitDIP": "DIP"}
+CHANGES_DEFAULT_LIMIT = 100
+CHANGES_MAX_LIMIT = 1000
 
 
 def _api_endpoint(expected_methods):
@@ -176,68 +181,21 @@ def get_unit_status(unit_uuid, unit_type):
     SIP UUID is populated only if the unit_type was unitTransfer and status is
     COMPLETE.  Otherwise, it is None.
 
+    The status is the one recorded by MCPServer in ``UnitStatus``. Units
+    without one, e.g. processed before it was recorded, get it computed from
+    their jobs.
+
     :param str unit_uuid: UUID of the SIP or Transfer
     :param str unit_type: unitSIP or unitTransfer
     :return: Dict with status info.
     """
-    ret = {}
-    # get jobs for the current unit ordered by created time
-    unit_jobs = (
-        models.Job.objects.filter(sipuuid=unit_uuid)
-        .filter(unittype=unit_type)
-        .order_by("-createdtime", "-createdtimedec")
-    )
-    # tentatively choose the job with the latest created time to be the current/last for the unit
-    job = unit_jobs[0]
-
-    ret["microservice"] = job.jobtype
-    if job.currentstep == models.Job.STATUS_AWAITING_DECISION:
-        ret["status"] = "USER_INPUT"
-    elif "failed" in job.microservicegroup.lower():
-        ret["status"] = "FAILED"
-    elif "reject" in job.microservicegroup.lower():
-        ret["status"] = "REJECTED"
-    elif job.jobtype == "Remove the processing directory":  # Done storing AIP
-        ret["status"] = "COMPLETE"
-    elif (
-        models.Job.objects.filter(sipuuid=unit_uuid)
-        .filter(jobtype="Create SIP from transfer objects")
-        .exists()
-    ):
-        ret["status"] = "PROCESSING"
-        # Get SIP UUID
-        sips = (
-            models.File.objects.filter(transfer_id=unit_uuid, sip__isnull=False)
-            .values("sip")
-            .distinct()
+    try:
+        unit_status = models.UnitStatus.objects.get(
+            unit_uuid=unit_uuid, unit_type=unit_type
         )
-        if sips:
-            ret["status"] = "COMPLETE"
-            ret["sip_uuid"] = str(sips[0]["sip"])
-    elif (
-        models.Job.objects.filter(sipuuid=unit_uuid)
-        .filter(jobtype="Move transfer to backlog")
-        .exists()
-    ):
-        ret["status"] = "COMPLETE"
-        ret["sip_uuid"] = "BACKLOG"
-    else:
-        ret["status"] = "PROCESSING"
-
-    # The job with the latest created time is not always the last/current
-    # (Ref. https://github.com/archivematica/Issues/issues/262)
-    # As a workaround for SIPs, in case the job with latest created time
-    # is not the one that closes the chain, check if there could be a job
-    # that does so
-    # (a better fix would be to try to use microchain links related tables
-    # to obtain the actual last/current job, but this adds too much complexity)
-    if unit_type == "unitSIP" and ret["status"] == "PROCESSING":
-        for x in unit_jobs:
-            if x.jobtype == "Remove the processing directory":
-                ret["status"] = "COMPLETE"
-                break
-
-    return ret
+    except models.UnitStatus.DoesNotExist:
+        unit_status = models.UnitStatus.objects.from_jobs(unit_uuid, unit_type)
+    return unit_status.to_dict()
 
 
 @_api_endpoint(expected_methods=["GET"])
@@ -314,6 +272,59 @@ def waiting_for_user_input(request):
     return helpers.json_response(response)
 
 
+@_api_endpoint(expected_methods=["GET"])
+def unit_changes(request):
+    """Return the units whose status changed after a sequence number::
+
+    GET /api/units/changes?since=<sequence>&wait=<seconds>&limit=<count>
+
+    Each result is the current status of a unit with the ``sequence`` number
+    of its last change, oldest first. The response ``sequence`` is the one to
+    pass as ``since`` to get the next changes. If nothing changed, the request
+    waits up to ``wait`` seconds (capped by ``API_CHANGES_MAX_WAIT``) for a
+    change before returning an empty list.
+    """
+    try:
+        since = int(request.GET.get("since", 0))
+        wait = float(request.GET.get("wait", 0))
+        limit = int(request.GET.get("limit", CHANGES_DEFAULT_LIMIT))
+    except ValueError:
+        return _error_response("since, wait and limit must be numbers")
+    if since < 0 or wait < 0 or limit < 1:
+        return _error_response("since, wait and limit must be positive")
+    wait = min(wait, django_settings.API_CHANGES_MAX_WAIT)
+    limit = min(limit, CHANGES_MAX_LIMIT)
+
+    deadline = time.monotonic() + wait
+    seen = since
+    while True:
+        changes = list(models.UnitStatus.objects.changed_since(since)[:limit])
+        remaining = deadline - time.monotonic()
+        if changes or remaining <= 0:
+            break
+        # Shared by the requests of the process, see ``changes.notifier``.
+        seen = changes_notifier.wait(seen, remaining)
+        if seen is None:
+            break
+
+    results = [
+        {
+            "sequence": change.sequence,
+            "uuid": str(change.unit_uuid),
+            "type": UNIT_TYPE_LABELS.get(change.unit_type, change.unit_type),
+            "job_uuid": str(change.job_uuid) if change.job_uuid else None,
+            "updated_at": change.updated_at.isoformat(),
+            **change.to_dict(),
+        }
+        for change in changes
+    ]
+    return _ok_response(
+        "Fetched changes successfully.",
+        results=results,
+        sequence=changes[-1].sequence if changes else since,
+    )
+
+
 @_api_endpoint(expected_methods=["DELETE"])
 def mark_hidden(request, unit_type, unit_uuid):
     """
@@ -402,21 +413,31 @@ def _completed_units(unit_type="transfer"):
     """
     model_name = {"transfer": "Transfer", "ingest": "SIP"}.get(unit_type)
     model = getattr(models, model_name)
+    job_unit_type = f"unit{model_name}"
     completed = []
-    units = model.objects.filter(hidden=False)
-    status_err = None
-    for unit in units:
-        try:
-            status = get_unit_status(unit.uuid, f"unit{model_name}")
-        except IndexError as err:
-            status_err = err
-            continue
-        if status.get("status") == "COMPLETE":
-            completed.append(str(unit.uuid))
-    if status_err:
+    units = model.objects.filter(hidden=False).values_list("uuid", flat=True)
+    statuses = dict(
+        models.UnitStatus.objects.filter(
+            unit_type=job_unit_type, unit_uuid__in=units
+        ).values_list("unit_uuid", "status")
+    )
+    unknown_unit = None
+    for unit_uuid in units:
+        status = statuses.get(unit_uuid)
+        if status is None:
+            try:
+                status = models.UnitStatus.objects.from_jobs(
+                    unit_uuid, job_unit_type
+                ).status
+            except IndexError:
+                unknown_unit = unit_uuid
+                continue
+        if status == models.UnitStatus.STATUS_COMPLETE:
+            completed.append(str(unit_uuid))
+    if unknown_unit:
         LOGGER.warning(
             "Unable to determine status of at least one unit, e.g.: unit %s (%s)",
-            unit.uuid,
+            unknown_unit,
             model_name,
         )
     return completed
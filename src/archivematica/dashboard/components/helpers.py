@@ -40,6 +40,7 @@ from django.utils.dateformat import format
 from django.utils.translation import gettext as _
 from tastypie.models import ApiKey
 
+from archivematica.archivematicaCommon import archivematicaFunctions
 from archivematica.dashboard.main import models
 
 logger = logging.getLogger("archivematica.dashboard")
@@ -176,8 +177,7 @@ def get_metadata_type_id_by_description(description):
 
 def get_setting(setting, default=""):
     try:
-        setting = models.DashboardSetting.objects.get(name=setting)
-        return setting.value
+        return archivematicaFunctions.get_setting(setting, default)
     except Exception:
         return default
 
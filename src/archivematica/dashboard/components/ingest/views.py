@@ -112,7 +112,9 @@ def ingest_status(request, uuid=None):
     response = {"objects": {}, "mcp": False}
     try:
         client = MCPClient(request.user)
-        response["objects"] = client.get_sips_statuses()
+        response["objects"] = client.get_sips_statuses(
+            changed_since=request.GET.get("changed_since")
+        )
     except Exception:
         pass
     else:
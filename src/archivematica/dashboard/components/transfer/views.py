@@ -126,7 +126,9 @@ def status(request, uuid=None):
     response = {"objects": {}, "mcp": False}
     try:
         client = MCPClient(request.user)
-        response["objects"] = client.get_transfers_statuses()
+        response["objects"] = client.get_transfers_statuses(
+            changed_since=request.GET.get("changed_since")
+        )
     except Exception:
         pass
     else:
@@ -207,15 +207,17 @@ class MCPClient:
         data = {"lang": self.lang}
         return self._rpc_sync_call("getProcessingConfigFields", data)
 
-    def _get_units_statuses(self, type_):
+    def _get_units_statuses(self, type_, changed_since=None):
         data = {"type": type_, "lang": self.lang}
+        if changed_since is not None:
+            data["changed_since"] = changed_since
         return self._rpc_sync_call("getUnitsStatuses", data)
 
-    def get_transfers_statuses(self):
-        return self._get_units_statuses(type_="Transfer")
+    def get_transfers_statuses(self, changed_since=None):
+        return self._get_units_statuses(type_="Transfer", changed_since=changed_since)
 
-    def get_sips_statuses(self):
-        return self._get_units_statuses(type_="SIP")
+    def get_sips_statuses(self, changed_since=None):
+        return self._get_units_statuses(type_="SIP", changed_since=changed_since)
 
     def get_unit_status(self, unit_id):
         data = {"id": unit_id, "lang": self.lang}
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class FPRAppConfig(AppConfig):
     default_auto_field = "django.db.models.AutoField"
     name = "archivematica.dashboard.fpr"
+
+    def ready(self):
+        import archivematica.dashboard.fpr.signals  # noqa: F401
@@ -70,7 +70,14 @@ class IDToolForm(forms.ModelForm):
 class IDCommandForm(forms.ModelForm):
     class Meta:
         model = fprmodels.IDCommand
-        fields = ("tool", "description", "config", "script_type", "script")
+        fields = (
+            "tool",
+            "description",
+            "config",
+            "script_type",
+            "script",
+            "accepts_multiple_paths",
+        )
 
 
 # ########## ID RULES ############
@@ -1,12 +1,21 @@
 import os
 
+from django.core import serializers
 from django.core.management import call_command
 from django.db import migrations
 
 
 def load_fixtures(apps, schema_editor):
-    fixture_file = os.path.join(os.path.dirname(__file__), "initial_data.json")
-    call_command("loaddata", fixture_file, app_label="main")
+    # Deserialize with the models of this migration, not the current ones,
+    # which may have fields that do not exist yet.
+    python_serializer = serializers.python
+    current_apps = python_serializer.apps
+    python_serializer.apps = apps
+    try:
+        fixture_file = os.path.join(os.path.dirname(__file__), "initial_data.json")
+        call_command("loaddata", fixture_file, app_label="main")
+    finally:
+        python_serializer.apps = current_apps
 
 
 class Migration(migrations.Migration):
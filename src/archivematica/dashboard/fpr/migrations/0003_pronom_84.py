@@ -1,10 +1,23 @@
 import os
 
+from django.core import serializers
 from django.core.management import call_command
 from django.db import migrations
 
 
 def load_fixtures(apps, schema_editor):
+    # Deserialize with the models of this migration, not the current ones,
+    # which may have fields that do not exist yet.
+    python_serializer = serializers.python
+    current_apps = python_serializer.apps
+    python_serializer.apps = apps
+    try:
+        _load_fixtures()
+    finally:
+        python_serializer.apps = current_apps
+
+
+def _load_fixtures():
     fixture_file = os.path.join(
         os.path.dirname(__file__), "pronom84_formatgroups_new.json"
     )
@@ -0,0 +1,18 @@
+from django.db import migrations
+from django.db import models
+
+
+class Migration(migrations.Migration):
+    dependencies = [("fpr", "0049_update_idtools")]
+
+    operations = [
+        migrations.AddField(
+            model_name="idcommand",
+            name="accepts_multiple_paths",
+            field=models.BooleanField(
+                default=False,
+                help_text="The script identifies all the files given as arguments and prints a JSON object mapping each path to its output.",
+                verbose_name="accepts multiple paths",
+            ),
+        ),
+    ]
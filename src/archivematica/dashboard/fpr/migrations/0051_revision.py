@@ -0,0 +1,34 @@
+from django.db import migrations
+from django.db import models
+
+
+def create_revision(apps, schema_editor):
+    Revision = apps.get_model("fpr", "Revision")
+    Revision.objects.create(pk=1, number=0)
+
+
+class Migration(migrations.Migration):
+    dependencies = [("fpr", "0050_idcommand_accepts_multiple_paths")]
+
+    operations = [
+        migrations.CreateModel(
+            name="Revision",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "number",
+                    models.PositiveBigIntegerField(default=0, verbose_name="number"),
+                ),
+            ],
+            options={"verbose_name": "FPR revision"},
+        ),
+        migrations.RunPython(create_revision, migrations.RunPython.noop),
+    ]
@@ -24,7 +24,36 @@ logger = logging.getLogger(__name__)
 # ########### MANAGERS ############
 
 
-class Enabled(models.Manager):
+class RevisedQuerySet(models.QuerySet):
+    """QuerySet starting a new FPR revision on bulk writes.
+
+    ``update``, ``bulk_create`` and ``bulk_update`` do not send the signals
+    ``fpr.signals`` bumps the revision from.
+    """
+
+    def update(self, **kwargs):
+        rows = super().update(**kwargs)
+        if rows:
+            Revision.bump()
+        return rows
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        if objs:
+            Revision.bump()
+        return objs
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        rows = super().bulk_update(objs, fields, *args, **kwargs)
+        if rows:
+            Revision.bump()
+        return rows
+
+
+RevisedManager = models.Manager.from_queryset(RevisedQuerySet)
+
+
+class Enabled(RevisedManager):
     """Manager to only return enabled objects.
 
     Filters by enabled=True."""
@@ -67,14 +96,14 @@ class VersionedModel(models.Model):
     class Meta:
         abstract = True
 
-    objects = models.Manager()
+    objects = RevisedManager()
     active = Enabled()
 
 
 # ########### FORMATS ############
 
 
-class FormatManager(models.Manager):
+class FormatManager(RevisedManager):
     def get_full_list(self):
         """Detailed list of formats including PRONOM IDs.
 
@@ -177,6 +206,8 @@ class FormatGroup(models.Model):
     description = models.CharField(_("description"), max_length=128)
     slug = AutoSlugField(_("slug"), populate_from="description", unique=True)
 
+    objects = RevisedManager()
+
     class Meta:
         verbose_name = _("Format group")
         ordering = ["description"]
@@ -294,6 +325,14 @@ class IDCommand(VersionedModel, models.Model):
         verbose_name=_("the related tool"),
         on_delete=models.CASCADE,
     )
+    accepts_multiple_paths = models.BooleanField(
+        _("accepts multiple paths"),
+        default=False,
+        help_text=_(
+            "The script identifies all the files given as arguments and prints"
+            " a JSON object mapping each path to its output."
+        ),
+    )
 
     class Meta:
         verbose_name = _("Format identification command")
@@ -400,7 +439,7 @@ class IDTool(models.Model):
     class Meta:
         verbose_name = _("Format identification tool")
 
-    objects = models.Manager()
+    objects = RevisedManager()
     active = Enabled()
 
     def __str__(self):
@@ -613,6 +652,8 @@ class FPTool(models.Model):
     slug = AutoSlugField(_("slug"), populate_from="_slug", unique=True)
     # Many to many field is on FPCommand
 
+    objects = RevisedManager()
+
     class Meta:
         verbose_name = _("Normalization tool")
 
@@ -624,3 +665,35 @@ class FPTool(models.Model):
         src = f"{self.description} {self.version}"
         encoded = src.encode("utf-8")[: self._meta.get_field("slug").max_length]
         return encoded.decode("utf-8", "ignore")
+
+
+# ########### REVISION ############
+
+
+class Revision(models.Model):
+    """Counter of the changes made to the FPR.
+
+    It is bumped every time an FPR model is saved or deleted (see
+    ``fpr.signals``), written in bulk (see ``RevisedQuerySet``) or migrated,
+    so that processes holding an ``fpr.snapshot`` can tell whether theirs is
+    still current with a single query.
+    """
+
+    number = models.PositiveBigIntegerField(_("number"), default=0)
+
+    class Meta:
+        verbose_name = _("FPR revision")
+
+    def __str__(self):
+        return _("FPR revision %(number)s") % {"number": self.number}
+
+    @classmethod
+    def current(cls):
+        """Return the number of the current revision."""
+        return cls.objects.values_list("number", flat=True).filter(pk=1).first() or 0
+
+    @classmethod
+    def bump(cls):
+        """Start a new revision."""
+        if not cls.objects.filter(pk=1).update(number=models.F("number") + 1):
+            cls.objects.create(pk=1, number=1)
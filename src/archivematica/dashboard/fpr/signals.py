@@ -0,0 +1,62 @@
+from django.db import connections
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_migrate
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from archivematica.dashboard.fpr.models import Format
+from archivematica.dashboard.fpr.models import FormatGroup
+from archivematica.dashboard.fpr.models import FormatVersion
+from archivematica.dashboard.fpr.models import FPCommand
+from archivematica.dashboard.fpr.models import FPRule
+from archivematica.dashboard.fpr.models import FPTool
+from archivematica.dashboard.fpr.models import IDCommand
+from archivematica.dashboard.fpr.models import IDRule
+from archivematica.dashboard.fpr.models import IDTool
+from archivematica.dashboard.fpr.models import Revision
+
+# Models read by ``fpr.snapshot``.
+FPR_MODELS = (
+    Format,
+    FormatGroup,
+    FormatVersion,
+    FPCommand,
+    FPRule,
+    FPTool,
+    IDCommand,
+    IDRule,
+    IDTool,
+)
+
+
+def _revision_table_exists(using):
+    return Revision._meta.db_table in connections[using].introspection.table_names()
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def bump_revision(sender, **kwargs):
+    """Start a new FPR revision when an FPR model changes.
+
+    Rows loaded from fixtures are raw saves, which some migrations make
+    before the revision table exists; ``bump_revision_after_migrate`` covers
+    those.
+    """
+    if sender not in FPR_MODELS:
+        return
+    if kwargs.get("raw") and not _revision_table_exists(kwargs["using"]):
+        return
+    Revision.bump()
+
+
+@receiver(post_migrate)
+def bump_revision_after_migrate(sender, **kwargs):
+    """Start a new FPR revision once the migrations are applied.
+
+    The data migrations change the FPR with their historical models, which
+    neither send signals nor use ``RevisedQuerySet``.
+    """
+    if sender.name == "archivematica.dashboard.fpr" and _revision_table_exists(
+        kwargs["using"]
+    ):
+        Revision.bump()
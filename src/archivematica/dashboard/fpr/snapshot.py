@@ -0,0 +1,207 @@
+"""In-memory view of the format policy rules of the FPR.
+
+The normalize, characterize_file, validate_file and policy_check client
+scripts look up the FPR rules of every file they process, plus the format the
+file was identified as. The FPR rarely changes while a transfer is processed,
+so ``current`` returns an ``FPRSnapshot`` shared by the jobs of an MCPClient
+process. The snapshot loads the active rules of a purpose, with their
+commands and tools, the first time the purpose is needed and answers the per
+file lookups from memory.
+
+Changes to the FPR bump ``fpr.models.Revision`` (see ``fpr.signals``); every
+call to ``current`` compares it with the revision of the snapshot and loads a
+new one when they differ.
+"""
+
+import threading
+import uuid
+from collections import defaultdict
+
+from django.conf import settings as django_settings
+from django.core.exceptions import ValidationError
+
+from archivematica.archivematicaCommon.databaseFunctions import chunks
+from archivematica.dashboard.fpr.models import FormatVersion
+from archivematica.dashboard.fpr.models import FPRule
+from archivematica.dashboard.fpr.models import Revision
+from archivematica.dashboard.main.models import FileFormatVersion
+
+# Related rows read by the client scripts running the commands of a rule.
+RULE_RELATIONS = (
+    "format",
+    "command__tool",
+    "command__output_format__format",
+    "command__verification_command",
+    "command__event_detail_command",
+)
+
+
+def _format_version_uuid(format_version):
+    return str(getattr(format_version, "uuid", format_version))
+
+
+class FPRSnapshot:
+    """Active FPR rules of a revision of the FPR, loaded by purpose."""
+
+    def __init__(self, revision=None):
+        self.revision = revision
+        self.lock = threading.Lock()
+        self._rules = {}
+
+    def _load(self, purpose):
+        with self.lock:
+            if purpose not in self._rules:
+                by_format = defaultdict(list)
+                for rule in (
+                    FPRule.active.filter(purpose=purpose)
+                    .select_related(*RULE_RELATIONS)
+                    .order_by("pk")
+                ):
+                    by_format[str(rule.format_id)].append(rule)
+                    by_format[None].append(rule)
+                self._rules[purpose] = by_format
+        return self._rules[purpose]
+
+    def rules_for_purpose(self, purpose):
+        """Return the rules with the purpose given, e.g. the default rules."""
+        return self._load(purpose).get(None, [])
+
+    def rules_for_format(self, format_version, purpose):
+        """Return the rules with the purpose given for a ``FormatVersion``
+        or the UUID of one.
+        """
+        return self._load(purpose).get(_format_version_uuid(format_version), [])
+
+    def rule_for_format(self, format_version, purpose):
+        """Return the only rule with the purpose given for a format.
+
+        Raises ``FPRule.DoesNotExist`` or ``FPRule.MultipleObjectsReturned``
+        like ``FPRule.active.get`` would.
+        """
+        return self._get(self.rules_for_format(format_version, purpose))
+
+    def default_rule(self, purpose):
+        """Return the only default rule for the purpose given."""
+        return self._get(self.rules_for_purpose("default_" + purpose))
+
+    @staticmethod
+    def _get(rules):
+        if not rules:
+            raise FPRule.DoesNotExist("FPRule matching query does not exist.")
+        if len(rules) > 1:
+            raise FPRule.MultipleObjectsReturned(
+                f"get() returned more than one FPRule -- it returned {len(rules)}!"
+            )
+        return rules[0]
+
+
+class FPRSnapshotCache:
+    """Process wide ``FPRSnapshot`` of the current FPR revision.
+
+    The ``FPR_SNAPSHOT_CACHE`` Django setting turns the cache off, in which
+    case every call gets a new snapshot.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.snapshot = None
+
+    def current(self):
+        if not getattr(django_settings, "FPR_SNAPSHOT_CACHE", True):
+            return FPRSnapshot()
+
+        revision = Revision.current()
+        with self.lock:
+            if self.snapshot is None or self.snapshot.revision != revision:
+                self.snapshot = FPRSnapshot(revision)
+            return self.snapshot
+
+    def clear(self):
+        with self.lock:
+            self.snapshot = None
+
+
+fpr_snapshot_cache = FPRSnapshotCache()
+
+
+def current():
+    """Return the snapshot of the current FPR revision."""
+    return fpr_snapshot_cache.current()
+
+
+class FileFormatVersions:
+    """``FileFormatVersion`` rows of a batch of files, loaded in a few chunked
+    queries. Files outside the batch are looked up on their own.
+    """
+
+    def __init__(self, file_uuids):
+        self.file_uuids = set()
+        for file_uuid in file_uuids:
+            try:
+                self.file_uuids.add(str(uuid.UUID(str(file_uuid))))
+            except ValueError:
+                pass
+        self._rows = None
+
+    def _load(self):
+        self._rows = defaultdict(list)
+        for chunk in chunks(sorted(self.file_uuids)):
+            for row in (
+                FileFormatVersion.objects.filter(file_uuid_id__in=chunk)
+                .select_related("format_version__format")
+                .order_by("pk")
+            ):
+                self._rows[str(row.file_uuid_id)].append(row)
+
+    def _rows_of(self, file_uuid):
+        try:
+            file_uuid = str(uuid.UUID(str(file_uuid)))
+        except ValueError:
+            raise ValidationError(f"“{file_uuid}” is not a valid UUID.")
+        if file_uuid not in self.file_uuids:
+            return list(
+                FileFormatVersion.objects.filter(file_uuid_id=file_uuid)
+                .select_related("format_version__format")
+                .order_by("pk")
+            )
+        if self._rows is None:
+            self._load()
+        return self._rows.get(file_uuid, [])
+
+    def get(self, file_uuid):
+        """Return the ``FileFormatVersion`` of a file.
+
+        Raises the exceptions ``FileFormatVersion.objects.get`` would.
+        """
+        rows = self._rows_of(file_uuid)
+        if not rows:
+            raise FileFormatVersion.DoesNotExist(
+                "FileFormatVersion matching query does not exist."
+            )
+        if len(rows) > 1:
+            raise FileFormatVersion.MultipleObjectsReturned(
+                "get() returned more than one FileFormatVersion --"
+                f" it returned {len(rows)}!"
+            )
+        return rows[0]
+
+    def active_format_version(self, file_uuid):
+        """Return the enabled ``FormatVersion`` a file was identified as.
+
+        Raises the exceptions ``FormatVersion.active.get`` would.
+        """
+        format_versions = [
+            row.format_version
+            for row in self._rows_of(file_uuid)
+            if row.format_version.enabled
+        ]
+        if not format_versions:
+            raise FormatVersion.DoesNotExist(
+                "FormatVersion matching query does not exist."
+            )
+        if len(format_versions) > 1:
+            raise FormatVersion.MultipleObjectsReturned(
+                "get() returned more than one FormatVersion --"
+                f" it returned {len(format_versions)}!"
+            )
+        return format_versions[0]
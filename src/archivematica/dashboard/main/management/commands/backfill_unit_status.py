@@ -0,0 +1,44 @@
+"""Record the status of existing transfers and SIPs.
+
+MCPServer records the status of a unit reported by the REST API as its jobs
+run (see ``models.UnitStatus``). This command computes it from the jobs of
+the units processed before it was recorded, so that the API does not have to.
+
+By default, it only looks at the units without a status. An optional
+parameter ``--all`` may be passed to compute the status of every unit again.
+
+``/manage.py backfill_unit_status --all`` recomputes the status of every
+transfer and SIP.
+"""
+
+from archivematica.dashboard.main import models
+from archivematica.dashboard.main.management.commands import DashboardCommand
+
+UNIT_MODELS = (("unitTransfer", models.Transfer), ("unitSIP", models.SIP))
+
+
+class Command(DashboardCommand):
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Recompute the status of the units that already have one.",
+        )
+
+    def handle(self, *args, **options):
+        for unit_type, model in UNIT_MODELS:
+            units = model.objects.values_list("uuid", flat=True)
+            if not options["all"]:
+                units = units.exclude(
+                    uuid__in=models.UnitStatus.objects.filter(
+                        unit_type=unit_type
+                    ).values("unit_uuid")
+                )
+
+            recorded = 0
+            for unit_uuid in units.iterator():
+                if models.UnitStatus.objects.refresh(unit_uuid, unit_type):
+                    recorded += 1
+            self.success(f"Recorded the status of {recorded} {model.__name__} units.")
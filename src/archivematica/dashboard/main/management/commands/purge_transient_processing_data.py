@@ -132,6 +132,12 @@ class Command(DashboardCommand):
                     models.Job.objects.filter(sipuuid=package_id, unittype="unitSIP"),
                     options["quiet"],
                 )
+                self.delete_queryset(
+                    models.UnitStatus.objects.filter(
+                        unit_uuid=package_id, unit_type="unitSIP"
+                    ),
+                    options["quiet"],
+                )
                 self.delete_queryset(
                     models.SIP.objects.filter(pk=package_id),
                     options["quiet"],
@@ -171,6 +177,12 @@ class Command(DashboardCommand):
                     ),
                     options["quiet"],
                 )
+                self.delete_queryset(
+                    models.UnitStatus.objects.filter(
+                        unit_uuid=package_id, unit_type="unitTransfer"
+                    ),
+                    options["quiet"],
+                )
                 self.delete_queryset(
                     models.Transfer.objects.filter(pk=package_id),
                     options["quiet"],
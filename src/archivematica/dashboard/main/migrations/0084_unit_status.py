@@ -0,0 +1,48 @@
+# Generated by Django 4.2.21 on 2026-10-18 07:42
+
+from django.db import migrations
+from django.db import models
+
+import archivematica.dashboard.main.models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("main", "0083_unpickle_access_target"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UnitStatus",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(db_column="pk", primary_key=True, serialize=False),
+                ),
+                (
+                    "unit_uuid",
+                    archivematica.dashboard.main.models.UUIDField(db_column="unitUUID"),
+                ),
+                ("unit_type", models.CharField(db_column="unitType", max_length=50)),
+                ("status", models.CharField(max_length=20)),
+                ("microservice", models.CharField(blank=True, max_length=250)),
+                (
+                    "sip_uuid",
+                    models.CharField(
+                        blank=True, db_column="SIPUUID", max_length=36, null=True
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "db_table": "UnitStatuses",
+                "indexes": [
+                    models.Index(
+                        fields=["unit_type", "status"],
+                        name="UnitStatuse_unitTyp_146ffc_idx",
+                    )
+                ],
+                "unique_together": {("unit_uuid", "unit_type")},
+            },
+        ),
+    ]
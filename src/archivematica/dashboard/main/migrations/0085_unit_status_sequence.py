@@ -0,0 +1,45 @@
+# Generated by Django 4.2.21 on 2026-10-18 07:49
+
+from django.db import migrations
+from django.db import models
+
+import archivematica.dashboard.main.models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("main", "0084_unit_status"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UnitStatusSequence",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("number", models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                "db_table": "UnitStatusSequence",
+            },
+        ),
+        migrations.AddField(
+            model_name="unitstatus",
+            name="job_uuid",
+            field=archivematica.dashboard.main.models.UUIDField(
+                db_column="jobUUID", null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="unitstatus",
+            name="sequence",
+            field=models.PositiveBigIntegerField(db_index=True, default=0),
+        ),
+    ]
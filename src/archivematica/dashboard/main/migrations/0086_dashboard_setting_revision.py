@@ -0,0 +1,31 @@
+# Generated by Django 4.2.21 on 2026-10-18 09:08
+
+from django.db import migrations
+from django.db import models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("main", "0085_unit_status_sequence"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DashboardSettingRevision",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("number", models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                "db_table": "DashboardSettingRevision",
+            },
+        ),
+    ]
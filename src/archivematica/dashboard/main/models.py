@@ -145,7 +145,7 @@ class DashboardSettingManager(models.Manager):
             return False
         with transaction.atomic():
             self.unset_dict(scope)
-            self.bulk_create(
+            settings = self.bulk_create(
                 [
                     DashboardSetting(
                         scope=scope,
@@ -155,6 +155,17 @@ class DashboardSettingManager(models.Manager):
                     for name, value in items.items()
                 ]
             )
+            # bulk_create does not send post_save, which the caches of the
+            # settings rely on (see ``DashboardSettingRevision``).
+            for setting in settings:
+                post_save.send(
+                    sender=DashboardSetting,
+                    instance=setting,
+                    created=True,
+                    raw=False,
+                    using=self.db,
+                    update_fields=None,
+                )
 
     def unset_dict(self, scope):
         return self.get_queryset().filter(scope=scope).delete()
@@ -180,6 +191,32 @@ class DashboardSetting(models.Model):
         )
 
 
+class DashboardSettingRevision(models.Model):
+    """Counter of the changes made to ``DashboardSetting``.
+
+    It is bumped every time a setting is saved or deleted, or the settings
+    are migrated (see ``main.signals``), so that processes caching the
+    settings (see ``archivematicaFunctions.DashboardSettingsCache``) can tell
+    whether theirs are still current with a single query.
+    """
+
+    number = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        db_table = "DashboardSettingRevision"
+
+    @classmethod
+    def current(cls):
+        """Return the number of the current revision."""
+        return cls.objects.values_list("number", flat=True).filter(pk=1).first() or 0
+
+    @classmethod
+    def bump(cls):
+        """Start a new revision."""
+        if not cls.objects.filter(pk=1).update(number=models.F("number") + 1):
+            cls.objects.create(pk=1, number=1)
+
+
 class Access(models.Model):
     """Information about an upload to AtoM for a SIP."""
 
@@ -966,6 +1003,253 @@ class Job(models.Model):
         return transfer_name
 
 
+class UnitStatusManager(models.Manager):
+    def _transfer_sip_uuid(self, transfer_uuid):
+        """Return the UUID of the SIP created from the files of a transfer."""
+        sip_uuid = (
+            File.objects.filter(transfer_id=transfer_uuid, sip__isnull=False)
+            .values_list("sip", flat=True)
+            .first()
+        )
+        return None if sip_uuid is None else str(sip_uuid)
+
+    def from_jobs(self, unit_uuid, unit_type):
+        """Compute the status of a unit from all its jobs.
+
+        Returns an unsaved ``UnitStatus``. Raises ``IndexError`` when the unit
+        has no jobs.
+        """
+        job = Job.objects.filter(sipuuid=unit_uuid, unittype=unit_type).order_by(
+            "-createdtime", "-createdtimedec"
+        )[0]
+        jobtypes = set(
+            Job.objects.filter(
+                sipuuid=unit_uuid,
+                jobtype__in=(
+                    UnitStatus.JOB_CREATE_SIP,
+                    UnitStatus.JOB_MOVE_TO_BACKLOG,
+                    UnitStatus.JOB_REMOVE_PROCESSING_DIRECTORY,
+                ),
+            )
+            .values_list("jobtype", flat=True)
+            .distinct()
+        )
+        sip_uuid = None
+        if UnitStatus.JOB_CREATE_SIP in jobtypes:
+            sip_uuid = self._transfer_sip_uuid(unit_uuid)
+        elif UnitStatus.JOB_MOVE_TO_BACKLOG in jobtypes:
+            sip_uuid = UnitStatus.SIP_UUID_BACKLOG
+
+        return UnitStatus(
+            unit_uuid=unit_uuid,
+            unit_type=unit_type,
+            status=UnitStatus.status_of_job(
+                unit_type,
+                job.jobtype,
+                job.microservicegroup,
+                job.currentstep,
+                sip_uuid,
+                UnitStatus.JOB_REMOVE_PROCESSING_DIRECTORY in jobtypes,
+            ),
+            microservice=job.jobtype,
+            sip_uuid=sip_uuid,
+            job_uuid=job.jobuuid,
+        )
+
+    def refresh(self, unit_uuid, unit_type):
+        """Compute the status of a unit from all its jobs and record it.
+
+        Returns the ``UnitStatus``, or None if the unit has no jobs yet.
+        """
+        try:
+            unit_status = self.from_jobs(unit_uuid, unit_type)
+        except IndexError:
+            return None
+
+        previous = self.filter(unit_uuid=unit_uuid, unit_type=unit_type).first()
+        if previous is not None:
+            fields = ("status", "microservice", "sip_uuid", "job_uuid")
+            if all(
+                getattr(previous, field) == getattr(unit_status, field)
+                for field in fields
+            ):
+                return previous
+            for field in fields:
+                setattr(previous, field, getattr(unit_status, field))
+            unit_status = previous
+        self._save(unit_status)
+        return unit_status
+
+    def _save(self, unit_status):
+        # The sequence counter stays locked until the transaction ends, so
+        # changes are committed in the order of their sequence numbers.
+        with transaction.atomic():
+            unit_status.sequence = UnitStatusSequence.next()
+            unit_status.save()
+
+    def changed_since(self, sequence):
+        """Return the statuses changed after the sequence number given, in the
+        order they changed.
+        """
+        return self.filter(sequence__gt=sequence).order_by("sequence")
+
+    def record_job(
+        self, unit_uuid, unit_type, job_uuid, jobtype, microservicegroup, currentstep
+    ):
+        """Record the status of a unit after a change to its current job.
+
+        Only looks at the job given and the status previously recorded for
+        the unit, which keeps what is known about the earlier jobs. Units
+        without a status yet, e.g. started before the table existed, get one
+        computed from all their jobs.
+        """
+        previous = self.filter(unit_uuid=unit_uuid, unit_type=unit_type).first()
+        if previous is None:
+            return self.refresh(unit_uuid, unit_type)
+
+        sip_uuid = previous.sip_uuid
+        if jobtype == UnitStatus.JOB_CREATE_SIP:
+            sip_uuid = self._transfer_sip_uuid(unit_uuid)
+        elif jobtype == UnitStatus.JOB_MOVE_TO_BACKLOG and sip_uuid is None:
+            sip_uuid = UnitStatus.SIP_UUID_BACKLOG
+
+        # Whether the processing directory of a SIP was removed only matters
+        # when a later job would report it as processing.
+        processing_directory_removed = (
+            jobtype == UnitStatus.JOB_REMOVE_PROCESSING_DIRECTORY
+            or previous.status == UnitStatus.STATUS_COMPLETE
+        )
+        if (
+            unit_type == "unitSIP"
+            and not processing_directory_removed
+            and previous.status != UnitStatus.STATUS_PROCESSING
+        ):
+            processing_directory_removed = Job.objects.filter(
+                sipuuid=unit_uuid,
+                unittype=unit_type,
+                jobtype=UnitStatus.JOB_REMOVE_PROCESSING_DIRECTORY,
+            ).exists()
+
+        previous.status = UnitStatus.status_of_job(
+            unit_type,
+            jobtype,
+            microservicegroup,
+            currentstep,
+            sip_uuid,
+            processing_directory_removed,
+        )
+        previous.microservice = jobtype
+        previous.sip_uuid = sip_uuid
+        previous.job_uuid = job_uuid
+        self._save(previous)
+        return previous
+
+
+class UnitStatusSequence(models.Model):
+    """Counter of the changes made to ``UnitStatus``.
+
+    Every change gets the next number, so clients of the change feed of the
+    API can ask for the units changed since the last number they saw.
+    """
+
+    number = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        db_table = "UnitStatusSequence"
+
+    @classmethod
+    def next(cls):
+        """Return a new sequence number.
+
+        Call it in a transaction: the counter stays locked until it ends.
+        """
+        if not cls.objects.filter(pk=1).update(number=models.F("number") + 1):
+            cls.objects.get_or_create(pk=1)
+            cls.objects.filter(pk=1).update(number=models.F("number") + 1)
+        return cls.objects.values_list("number", flat=True).get(pk=1)
+
+
+class UnitStatus(models.Model):
+    """Current status of a Transfer or SIP, as reported by the REST API.
+
+    MCPServer records it as the jobs of the unit are created and completed,
+    so that the API does not have to go through the jobs of every unit. The
+    criteria are those ``api.views.get_unit_status`` used on the jobs.
+
+    Every change gets a new ``sequence`` number, see ``UnitStatusSequence``.
+    """
+
+    STATUS_COMPLETE = "COMPLETE"
+    STATUS_FAILED = "FAILED"
+    STATUS_PROCESSING = "PROCESSING"
+    STATUS_REJECTED = "REJECTED"
+    STATUS_USER_INPUT = "USER_INPUT"
+
+    JOB_CREATE_SIP = "Create SIP from transfer objects"
+    JOB_MOVE_TO_BACKLOG = "Move transfer to backlog"
+    JOB_REMOVE_PROCESSING_DIRECTORY = "Remove the processing directory"
+
+    SIP_UUID_BACKLOG = "BACKLOG"
+
+    id = models.AutoField(primary_key=True, db_column="pk")
+    unit_uuid = UUIDField(db_column="unitUUID")
+    unit_type = models.CharField(max_length=50, db_column="unitType")
+    status = models.CharField(max_length=20)
+    microservice = models.CharField(max_length=250, blank=True)
+    # SIP created from a transfer, or "BACKLOG" for transfers sent to backlog.
+    sip_uuid = models.CharField(
+        max_length=36, null=True, blank=True, db_column="SIPUUID"
+    )
+    # Job the status was last recorded for.
+    job_uuid = UUIDField(null=True, db_column="jobUUID")
+    sequence = models.PositiveBigIntegerField(default=0, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = UnitStatusManager()
+
+    class Meta:
+        db_table = "UnitStatuses"
+        # DIPs share the UUID of their SIP.
+        unique_together = ("unit_uuid", "unit_type")
+        indexes = [models.Index(fields=["unit_type", "status"])]
+
+    def __str__(self):
+        return f"{self.unit_type} {self.unit_uuid}: {self.status}"
+
+    @classmethod
+    def status_of_job(
+        cls,
+        unit_type,
+        jobtype,
+        microservicegroup,
+        currentstep,
+        sip_uuid,
+        processing_directory_removed,
+    ):
+        """Return the status of a unit whose current job is the one given."""
+        group = microservicegroup.lower()
+        if currentstep == Job.STATUS_AWAITING_DECISION:
+            return cls.STATUS_USER_INPUT
+        if "failed" in group:
+            return cls.STATUS_FAILED
+        if "reject" in group:
+            return cls.STATUS_REJECTED
+        if jobtype == cls.JOB_REMOVE_PROCESSING_DIRECTORY or sip_uuid is not None:
+            return cls.STATUS_COMPLETE
+        # The job with the latest created time is not always the last of the
+        # chain of a SIP, see https://github.com/archivematica/Issues/issues/262.
+        if unit_type == "unitSIP" and processing_directory_removed:
+            return cls.STATUS_COMPLETE
+        return cls.STATUS_PROCESSING
+
+    def to_dict(self):
+        """Return the status in the format of ``api.views.get_unit_status``."""
+        result = {"status": self.status, "microservice": self.microservice}
+        if self.status == self.STATUS_COMPLETE and self.sip_uuid is not None:
+            result["sip_uuid"] = self.sip_uuid
+        return result
+
+
 class Task(models.Model):
     taskuuid = UUIDField(default=uuid.uuid4, primary_key=True, db_column="taskUUID")
     job = models.ForeignKey(
@@ -1,9 +1,13 @@
 from django.conf import settings
+from django.db import connections
 from django.db.models.signals import post_delete
+from django.db.models.signals import post_migrate
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from prometheus_client import Counter
 
+from archivematica.dashboard.main.models import DashboardSetting
+from archivematica.dashboard.main.models import DashboardSettingRevision
 from archivematica.dashboard.main.models import RightsStatement
 from archivematica.dashboard.main.models import RightsStatementRightsGranted
 
@@ -26,6 +30,36 @@ def delete_rights_statement(sender, **kwargs):
         pass
 
 
+def _revision_table_exists(using):
+    return (
+        DashboardSettingRevision._meta.db_table
+        in connections[using].introspection.table_names()
+    )
+
+
+@receiver(post_save, sender=DashboardSetting)
+@receiver(post_delete, sender=DashboardSetting)
+def bump_dashboard_setting_revision(sender, **kwargs):
+    """Start a new revision of the Dashboard settings when one changes.
+
+    Some migrations save settings with the current model before the
+    revision table exists.
+    """
+    if _revision_table_exists(kwargs["using"]):
+        DashboardSettingRevision.bump()
+
+
+@receiver(post_migrate)
+def bump_dashboard_setting_revision_after_migrate(sender, **kwargs):
+    """Start a new revision of the Dashboard settings once the migrations are
+    applied, since data migrations change them with their historical models.
+    """
+    if sender.name == "archivematica.dashboard.main" and _revision_table_exists(
+        kwargs["using"]
+    ):
+        DashboardSettingRevision.bump()
+
+
 if settings.PROMETHEUS_ENABLED:
     # Count saves and deletes via Prometheus.
     # This is a bit of a flawed way to do it (it doesn't include bulk create,
@@ -71,6 +71,16 @@ CONFIG_MAPPING = {
         "option": "elasticsearch_timeout",
         "type": "float",
     },
+    "elasticsearch_bulk_chunk_size": {
+        "section": "Dashboard",
+        "option": "elasticsearch_bulk_chunk_size",
+        "type": "int",
+    },
+    "elasticsearch_bulk_thread_count": {
+        "section": "Dashboard",
+        "option": "elasticsearch_bulk_thread_count",
+        "type": "int",
+    },
     "elasticsearch_max_query_size": {
         "section": "Dashboard",
         "option": "elasticsearch_max_query_size",
@@ -140,16 +150,36 @@ CONFIG_MAPPING = {
         "option": "storage_service_client_quick_timeout",
         "type": "float",
     },
+    "storage_service_client_retries": {
+        "section": "Dashboard",
+        "option": "storage_service_client_retries",
+        "type": "int",
+    },
+    "storage_service_cache_ttl": {
+        "section": "Dashboard",
+        "option": "storage_service_cache_ttl",
+        "type": "float",
+    },
     "agentarchives_client_timeout": {
         "section": "Dashboard",
         "option": "agentarchives_client_timeout",
         "type": "float",
     },
+    "dashboard_settings_cache_ttl": {
+        "section": "Dashboard",
+        "option": "dashboard_settings_cache_ttl",
+        "type": "float",
+    },
     "polling_interval": {
         "section": "Dashboard",
         "option": "polling_interval",
         "type": "int",
     },
+    "api_changes_max_wait": {
+        "section": "Dashboard",
+        "option": "api_changes_max_wait",
+        "type": "float",
+    },
     "csp_enabled": {
         "section": "Dashboard",
         "option": "csp_enabled",
@@ -195,6 +225,8 @@ shared_directory = /var/archivematica/sharedDirectory/
 watch_directory = /var/archivematica/sharedDirectory/watchedDirectories/
 elasticsearch_server = 127.0.0.1:9200
 elasticsearch_timeout = 10
+elasticsearch_bulk_chunk_size = 500
+elasticsearch_bulk_thread_count = 1
 elasticsearch_max_query_size = 10000
 search_enabled = true
 gearman_server = 127.0.0.1:4730
@@ -211,11 +243,15 @@ oidc_authentication = False
 oidc_allow_local_authentication = True
 storage_service_client_timeout = 86400
 storage_service_client_quick_timeout = 5
+storage_service_client_retries = 3
+storage_service_cache_ttl = 10
 agentarchives_client_timeout = 300
+dashboard_settings_cache_ttl = 5
 csp_enabled = False
 prometheus_enabled = False
 audit_log_middleware = False
 polling_interval = 10
+api_changes_max_wait = 30
 site_url =
 time_zone = UTC
 
@@ -524,6 +560,7 @@ LOGIN_EXEMPT_URLS = [
 # Dashboard internal settings
 GEARMAN_SERVER = config.get("gearman_server")
 POLLING_INTERVAL = config.get("polling_interval")
+API_CHANGES_MAX_WAIT = config.get("api_changes_max_wait")
 
 TASKS_PER_PAGE = 10  # for paging in tasks dialog
 UUID_REGEX = r"[\w]{8}(-[\w]{4}){3}-[\w]{12}"
@@ -563,13 +600,18 @@ SHARED_DIRECTORY = config.get("shared_directory")
 WATCH_DIRECTORY = config.get("watch_directory")
 ELASTICSEARCH_SERVER = config.get("elasticsearch_server")
 ELASTICSEARCH_TIMEOUT = config.get("elasticsearch_timeout")
+ELASTICSEARCH_BULK_CHUNK_SIZE = config.get("elasticsearch_bulk_chunk_size")
+ELASTICSEARCH_BULK_THREAD_COUNT = config.get("elasticsearch_bulk_thread_count")
 ELASTICSEARCH_MAX_QUERY_SIZE = config.get("elasticsearch_max_query_size")
 SEARCH_ENABLED = config.get("search_enabled")
 STORAGE_SERVICE_CLIENT_TIMEOUT = config.get("storage_service_client_timeout")
 STORAGE_SERVICE_CLIENT_QUICK_TIMEOUT = config.get(
     "storage_service_client_quick_timeout"
 )
+STORAGE_SERVICE_CLIENT_RETRIES = config.get("storage_service_client_retries")
+STORAGE_SERVICE_CACHE_TTL = config.get("storage_service_cache_ttl")
 AGENTARCHIVES_CLIENT_TIMEOUT = config.get("agentarchives_client_timeout")
+DASHBOARD_SETTINGS_CACHE_TTL = config.get("dashboard_settings_cache_ttl")
 
 SITE_URL = config.get("site_url")
 
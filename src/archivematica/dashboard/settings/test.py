@@ -72,3 +72,11 @@ AUTH_LDAP_USER_SEARCH = LDAPSearch(
 )
 AUTH_LDAP_USER_FLAGS_BY_GROUP: dict[str, Any] = {}
 AUTH_LDAP_USERNAME_SUFFIX = "_ldap"
+
+# Test transactions are rolled back without sending signals, so a cached
+# DashboardSetting could leak into the next test.
+DASHBOARD_SETTINGS_CACHE_TTL = 0
+
+# Tests mock the Storage Service responses, so a cached location could leak
+# into the next test.
+STORAGE_SERVICE_CACHE_TTL = 0
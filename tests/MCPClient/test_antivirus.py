@@ -6,6 +6,8 @@ from unittest import mock
 
 import pytest
 
+from archivematica.dashboard.main import models
+from archivematica.MCPClient.client.job import Job
 from archivematica.MCPClient.clientScripts import archivematica_clamscan
 
 from . import test_antivirus_clamdscan
@@ -222,3 +224,51 @@ def test_scan_file(
             if setup_kwargs["scanner_passed"]
             else "Fail"
         )
+
+
+class BatchScannerMock(ScannerMock):
+    def __init__(self):
+        super().__init__(passed=True)
+        self.batches = []
+
+    def scan(self, path):
+        raise AssertionError(f"{path} should have been scanned with its batch")
+
+    def scan_many(self, paths):
+        self.batches.append(paths)
+        return {path: (not path.endswith("eicar"), None, None) for path in paths}
+
+
+@pytest.mark.django_db
+@mock.patch("archivematica.MCPClient.clientScripts.archivematica_clamscan.get_scanner")
+def test_call_scans_the_files_of_a_batch_together(
+    get_scanner, settings, transfer, django_assert_max_num_queries
+):
+    settings.CLAMAV_CLIENT_MAX_FILE_SIZE = 42
+    settings.CLAMAV_CLIENT_MAX_SCAN_SIZE = 84
+    scanner = get_scanner.return_value = BatchScannerMock()
+    sizes = {"clean": 1, "eicar": 1, "scanned": 1, "large": 43 * 1024 * 1024}
+    files = {
+        name: models.File.objects.create(transfer=transfer, size=size)
+        for name, size in sizes.items()
+    }
+    models.Event.objects.create(file_uuid=files["scanned"], event_type="virus check")
+    jobs = [
+        Job("stub", "stub", [str(f.uuid), f"/{name}", "2019-12-01", "task"])
+        for name, f in files.items()
+    ]
+
+    # The lookups of the batch, then the events and their agents, whatever
+    # the number of files.
+    with django_assert_max_num_queries(12):
+        archivematica_clamscan.call(jobs)
+
+    assert get_scanner.call_count == 1
+    assert scanner.batches == [["/clean", "/eicar"]]
+    assert [job.get_exit_code() for job in jobs] == [0, 1, 0, 0]
+    assert {
+        event.file_uuid_id: event.event_outcome
+        for event in models.Event.objects.filter(
+            event_type="virus check", event_outcome__in=["Pass", "Fail"]
+        )
+    } == {files["clean"].uuid: "Pass", files["eicar"].uuid: "Fail"}
@@ -1,9 +1,13 @@
 """Tests for the archivematica_clamscan.py client script."""
 
 import errno
+import socket
+import struct
+import threading
 from collections import namedtuple
 from unittest import mock
 
+import pytest
 from clamd import BufferTooLongError
 from clamd import ClamdNetworkSocket
 from clamd import ClamdUnixSocket
@@ -215,3 +219,147 @@ def test_clamdscanner_scan(settings):
         assert passed is None
         assert state is None
         assert details is None
+
+
+class FakeClamd:
+    """clamd listening on a Unix socket, which finds a virus in the files
+    named "eicar" and answers ``SCAN``, ``INSTREAM`` and ``IDSESSION``.
+    A ``silent`` clamd never answers the commands of a session.
+    """
+
+    def __init__(self, path, close_after=None, silent=False):
+        self.path = str(path)
+        self.close_after = close_after
+        self.silent = silent
+        self.connections = 0
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(self.path)
+        self.server.listen()
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.close()
+
+    def serve(self):
+        while True:
+            try:
+                connection, _ = self.server.accept()
+            except OSError:
+                return
+            self.connections += 1
+            with connection, connection.makefile("rb") as stream:
+                self.handle(connection, stream)
+
+    @staticmethod
+    def read_command(stream):
+        delimiter = {b"z": b"\0", b"n": b"\n"}.get(stream.read(1))
+        if delimiter is None:
+            return None, None
+        command = b""
+        while (char := stream.read(1)) not in (delimiter, b""):
+            command += char
+        return command.decode(), delimiter
+
+    @staticmethod
+    def result(name, contents):
+        if b"eicar" in contents or name.endswith("eicar"):
+            return f"{name}: Eicar-Signature FOUND"
+        return f"{name}: OK"
+
+    def run(self, command, stream):
+        if command.startswith("SCAN "):
+            path = command[len("SCAN ") :]
+            return self.result(path, b"")
+        if command == "INSTREAM":
+            contents = b""
+            while size := struct.unpack("!L", stream.read(4))[0]:
+                contents += stream.read(size)
+            return self.result("stream", contents)
+        return "UNKNOWN COMMAND"
+
+    def handle(self, connection, stream):
+        command, delimiter = self.read_command(stream)
+        if command != "IDSESSION":
+            connection.sendall(self.run(command, stream).encode() + delimiter)
+            return
+        request_id = 0
+        while True:
+            command, delimiter = self.read_command(stream)
+            if command in (None, "END"):
+                return
+            if self.silent:
+                continue
+            request_id += 1
+            reply = f"{request_id}: {self.run(command, stream)}"
+            connection.sendall(reply.encode() + delimiter)
+            if request_id == self.close_after:
+                return
+
+
+@pytest.fixture
+def fake_clamd(tmp_path):
+    servers = []
+
+    def start(**kwargs):
+        server = FakeClamd(tmp_path / f"clamd{len(servers)}.ctl", **kwargs)
+        servers.append(server)
+        return server
+
+    yield start
+
+    for server in servers:
+        server.close()
+
+
+@pytest.fixture
+def files_to_scan(tmp_path):
+    result = []
+    for name in ["a", "eicar", "b", "c"]:
+        path = tmp_path / name
+        path.write_bytes(b"eicar" if name == "eicar" else b"clean")
+        result.append(str(path))
+
+    return result
+
+
+@pytest.mark.parametrize("stream", [False, True], ids=["reference", "stream"])
+def test_clamdscanner_scan_many_uses_one_session(
+    settings, fake_clamd, files_to_scan, stream
+):
+    clamd = fake_clamd()
+    scanner = setup_clamdscanner(settings, addr=clamd.path, stream=stream)
+
+    results = scanner.scan_many(files_to_scan)
+
+    assert clamd.connections == 1
+    assert results == {
+        path: (
+            (False, "FOUND", "Eicar-Signature")
+            if path.endswith("eicar")
+            else (True, "OK", None)
+        )
+        for path in files_to_scan
+    }
+    assert results == {path: scanner.scan(path) for path in files_to_scan}
+
+
+def test_clamdscanner_scan_many_scans_one_at_a_time_if_the_session_breaks(
+    settings, fake_clamd, files_to_scan
+):
+    clamd = fake_clamd(close_after=2)
+    scanner = setup_clamdscanner(settings, addr=clamd.path)
+
+    results = scanner.scan_many(files_to_scan)
+
+    # The session, then a connection per file left.
+    assert clamd.connections == 3
+    assert [passed for passed, _, _ in results.values()] == [True, False, True, True]
+
+
+def test_clamd_session_times_out_if_clamd_does_not_reply(fake_clamd, files_to_scan):
+    clamd = fake_clamd(silent=True)
+
+    with pytest.raises(ConnectionError, match="timed out"):
+        with archivematica_clamscan.ClamdSession(clamd.path, timeout=0.1) as session:
+            session.scan(files_to_scan[0])
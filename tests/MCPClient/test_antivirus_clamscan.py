@@ -77,3 +77,71 @@ def test_clamscanner_scan(settings):
             2, "clamscan", "Output of clamscan"
         )
         assert scanner.scan("/file") == (False, "ERROR", None)
+
+
+def test_clamscanner_scan_many(settings):
+    settings.CLAMAV_CLIENT_MAX_FILE_SIZE = 20
+    settings.CLAMAV_CLIENT_MAX_SCAN_SIZE = 20
+    scanner = setup_clamscanner()
+    paths = ["/file: one", "/eicar", "/unreadable"]
+
+    def clamscan(*args):
+        if "--file-list" not in args[-1]:
+            raise subprocess.CalledProcessError(2, "clamscan", b"")
+        with open(args[-1].split("=", 1)[1], "rb") as f:
+            assert f.read().splitlines() == [path.encode() for path in paths]
+        raise subprocess.CalledProcessError(
+            1,
+            "clamscan",
+            b"/file: one: OK\n/eicar: Eicar-Signature FOUND\n",
+        )
+
+    with mock.patch.object(scanner, "_call", side_effect=clamscan) as mock_call:
+        assert scanner.scan_many(paths) == {
+            "/file: one": (True, "OK", None),
+            "/eicar": (False, "FOUND", "Eicar-Signature"),
+            "/unreadable": (False, "ERROR", None),
+        }
+
+    # One run for the batch, then one for the file missing from its report.
+    assert mock_call.call_count == 2
+    assert mock_call.call_args_list[0].args[:3] == (
+        "--max-filesize=20M",
+        "--max-scansize=20M",
+        "--no-summary",
+    )
+    mock_call.assert_called_with(
+        "--max-filesize=20M", "--max-scansize=20M", "/unreadable"
+    )
+
+
+def test_clamscanner_scan_and_scan_many_return_the_same_results(settings):
+    settings.CLAMAV_CLIENT_MAX_FILE_SIZE = 20
+    settings.CLAMAV_CLIENT_MAX_SCAN_SIZE = 20
+    scanner = setup_clamscanner()
+    paths = ["/file", "/eicar", "/unreadable"]
+    summary = "\n----------- SCAN SUMMARY -----------\nInfected files: 1\n"
+
+    def report(path):
+        if path == "/unreadable":
+            return ""
+        if path == "/eicar":
+            return f"{path}: Eicar-Signature FOUND\n"
+        return f"{path}: OK\n"
+
+    def clamscan(*args):
+        batch = args[-1].startswith("--file-list=")
+        scanned = paths if batch else [args[-1]]
+        output = "".join(report(path) for path in scanned)
+        if not batch:
+            output += summary
+        returncode = 2 if "/unreadable" in scanned else 1 if "FOUND" in output else 0
+        if returncode:
+            raise subprocess.CalledProcessError(returncode, "clamscan", output.encode())
+        return output.encode()
+
+    with mock.patch.object(scanner, "_call", side_effect=clamscan):
+        results = scanner.scan_many(paths)
+
+        assert results == {path: scanner.scan(path) for path in paths}
+    assert results["/eicar"] == (False, "FOUND", "Eicar-Signature")
@@ -15,11 +15,16 @@ from lxml import etree
 
 from archivematica.archivematicaCommon import namespaces as ns
 from archivematica.archivematicaCommon.version import get_preservation_system_identifier
+from archivematica.dashboard.main.models import File
+from archivematica.dashboard.main.models import FPCommandOutput
+from archivematica.dashboard.main.models import MetadataAppliesToType
 from archivematica.dashboard.main.models import RightsStatement
 from archivematica.MCPClient.client.job import Job
 from archivematica.MCPClient.clientScripts import archivematicaCreateMETSMetadataCSV
 from archivematica.MCPClient.clientScripts import archivematicaCreateMETSRights
+from archivematica.MCPClient.clientScripts import create_mets_prefetch
 from archivematica.MCPClient.clientScripts import create_mets_v2
+from archivematica.MCPClient.clientScripts.create_mets_prefetch import PremisPrefetch
 
 THIS_DIR = pathlib.Path(__file__).parent
 
@@ -703,6 +708,98 @@ class TestCreateDigiprovMD(TestCase):
         )
 
 
+class TestPremisPrefetch(TestCase):
+    """Test building amdSecs from prefetched PREMIS data."""
+
+    fixture_files = [
+        "metadata_applies_to_type.json",
+        "agents.json",
+        "sip.json",
+        "files.json",
+        "events-transfer.json",
+    ]
+    fixtures = [os.path.join(THIS_DIR, "fixtures", p) for p in fixture_files]
+    sip_uuid = "4060ee97-9c3f-4822-afaf-ebdf838284c3"
+
+    def setUp(self):
+        RightsStatement.objects.create(
+            metadataappliestotype_id=MetadataAppliesToType.SIP_TYPE,
+            metadataappliestoidentifier=self.sip_uuid,
+            rightsstatementidentifiertype="local",
+            rightsstatementidentifiervalue="policy-1",
+            rightsbasis="Policy",
+        )
+
+    def _amdsecs(self, state):
+        return [
+            etree.tostring(
+                create_mets_v2.getAMDSec(
+                    mcp_job,
+                    f.uuid,
+                    f.currentlocation.decode(),
+                    f.filegrpuse,
+                    self.sip_uuid,
+                    f.transfer_id,
+                    None,
+                    None,
+                    None,
+                    state,
+                )[0]
+            )
+            for f in File.objects.filter(sip_id=self.sip_uuid).order_by("pk")
+        ]
+
+    def test_amdsecs_match_the_ones_built_from_the_database(self):
+        expected = self._amdsecs(create_mets_v2.MetsState())
+
+        state = create_mets_v2.MetsState()
+        state.premis_prefetch = PremisPrefetch.for_sip(self.sip_uuid)
+
+        assert self._amdsecs(state) == expected
+        assert b"policy-1" in b"".join(expected)
+
+    def test_amdsecs_do_not_query_the_database_once_loaded(self):
+        files = list(File.objects.filter(sip_id=self.sip_uuid).order_by("pk"))
+        state = create_mets_v2.MetsState()
+        state.premis_prefetch = PremisPrefetch.for_sip(self.sip_uuid)
+        self._amdsecs(state)
+
+        with self.assertNumQueries(2):
+            # The File query made by _amdsecs itself, and the characterization
+            # outputs, which are dropped as each amdSec is built.
+            assert len(self._amdsecs(state)) == len(files)
+
+
+@pytest.mark.django_db
+def test_premis_prefetch_holds_one_chunk_of_characterization_outputs(
+    sip, fprule_characterization, django_assert_num_queries, monkeypatch
+):
+    monkeypatch.setattr(create_mets_prefetch, "CHUNK_SIZE", 2)
+    files = [
+        File.objects.create(
+            sip=sip, currentlocation=f"%SIPDirectory%objects/{i}".encode()
+        )
+        for i in range(5)
+    ]
+    for f in files:
+        FPCommandOutput.objects.create(
+            file=f, rule=fprule_characterization, content=f"<fits>{f.uuid}</fits>"
+        )
+    prefetch = PremisPrefetch.for_sip(sip.uuid)
+    held = []
+
+    with django_assert_num_queries(3):
+        for f in files:
+            assert prefetch.characterization_documents(f.uuid) == [
+                f"<fits>{f.uuid}</fits>"
+            ]
+            held.append(len(prefetch._characterization_documents))
+            prefetch.release(f.uuid)
+
+    assert max(held) == 2
+    assert prefetch._characterization_documents == {}
+
+
 class TestRights(TestCase):
     """Test archivematicaCreateMETSRights creating rightsMD."""
 
@@ -1,3 +1,5 @@
+import datetime
+import html
 import pathlib
 import uuid
 from contextlib import ExitStack as does_not_raise
@@ -5,15 +7,20 @@ from unittest import mock
 
 import pytest
 import pytest_django
+from django.db import connection
 from lxml import etree
 
 from archivematica.archivematicaCommon.namespaces import NSMAP
 from archivematica.dashboard.main.models import SIP
+from archivematica.dashboard.main.models import Agent
 from archivematica.dashboard.main.models import DublinCore
+from archivematica.dashboard.main.models import Event
 from archivematica.dashboard.main.models import File
 from archivematica.dashboard.main.models import MetadataAppliesToType
 from archivematica.dashboard.main.models import SIPArrange
 from archivematica.MCPClient.client.job import Job
+from archivematica.MCPClient.clientScripts import create_mets_streaming
+from archivematica.MCPClient.clientScripts import create_mets_v2
 from archivematica.MCPClient.clientScripts.create_mets_v2 import (
     createDMDIDsFromCSVMetadata,
 )
@@ -593,3 +600,193 @@ def test_source_metadata_xml_is_recorded_in_a_amdsec(
         "LOCTYPE": "OTHER",
         "OTHERLOCTYPE": "SYSTEM",
     }
+
+
+@pytest.fixture()
+def sip_file_events(sip_file: File) -> None:
+    agent = Agent.objects.create(
+        identifiertype="preservation system",
+        identifiervalue="Archivematica-1.x",
+        name="Archivematica",
+        agenttype="software",
+    )
+    for event_type, outcome_detail in [
+        ("ingestion", ""),
+        ("message digest calculation", "d2a84f4b8b650937ec8f73cd8be2c74add5a911b"),
+        ("validation", 'Tab\tquote\'s "here" <b>&amp; non-ascii: café\\'),
+    ]:
+        event = Event.objects.create(
+            event_id=uuid.uuid4(),
+            file_uuid=sip_file,
+            event_type=event_type,
+            event_outcome_detail=outcome_detail,
+        )
+        event.agents.add(agent)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "create_normative_structmap", [True, False], ids=["normative", "physical"]
+)
+def test_streaming_writer_writes_the_same_mets(
+    settings: pytest_django.fixtures.SettingsWrapper,
+    mcp_job: Job,
+    tmp_path: pathlib.Path,
+    sip_directory_path: pathlib.Path,
+    sip: SIP,
+    sip_file: File,
+    sip_dublincore: DublinCore,
+    sip_file_events: None,
+    create_normative_structmap: bool,
+) -> None:
+    settings.TEMP_DIRECTORY = str(tmp_path)
+    now = datetime.datetime(2024, 1, 1, 12, 0, 0)
+    written = {}
+    for streaming in (False, True):
+        settings.METS_STREAMING_WRITER = streaming
+        mets_path = tmp_path / f"METS.{streaming}.xml"
+        with (
+            mock.patch("metsrw.mets.datetime", **{"utcnow.return_value": now}),
+            mock.patch.object(create_mets_v2, "datetime", **{"now.return_value": now}),
+        ):
+            main(
+                mcp_job,
+                sipType="SIP",
+                baseDirectoryPath=str(sip_directory_path),
+                XMLFile=str(mets_path),
+                sipUUID=sip.pk,
+                includeAmdSec=True,
+                createNormativeStructmap=create_normative_structmap,
+            )
+        written[streaming] = (
+            mets_path.read_bytes(),
+            pathlib.Path(f"{mets_path}.validatorTester.html").read_bytes(),
+        )
+
+    mets_xml = etree.fromstring(written[True][0])
+    assert len(mets_xml.xpath(".//premis:event", namespaces=NSMAP)) == 3
+    assert not mets_xml.xpath(
+        ".//spool:*", namespaces={"spool": create_mets_streaming.SPOOL_NS}
+    )
+    assert written[True][0] == written[False][0]
+    # The streaming writer puts the text of the document in the form.
+    validator_tester = written[True][1].decode()
+    assert html.unescape(validator_tester) == (
+        create_mets_streaming.VALIDATOR_TESTER_HEAD
+        + written[True][0].decode()
+        + create_mets_streaming.VALIDATOR_TESTER_TAIL
+    )
+    assert not list(tmp_path.glob(".*.tmp"))
+
+
+@pytest.mark.django_db
+def test_streaming_writer_leaves_no_partial_mets_on_error(
+    settings: pytest_django.fixtures.SettingsWrapper,
+    mcp_job: Job,
+    tmp_path: pathlib.Path,
+    sip_directory_path: pathlib.Path,
+    sip: SIP,
+    sip_file: File,
+    sip_file_events: None,
+) -> None:
+    settings.TEMP_DIRECTORY = str(tmp_path)
+    settings.METS_STREAMING_WRITER = True
+    output_path = tmp_path / "output"
+    output_path.mkdir()
+    mets_path = output_path / "METS.xml"
+    spools = []
+
+    class FailingSpool(create_mets_streaming.DocumentSpool):
+        def __init__(self, *args: object, **kwargs: object) -> None:
+            super().__init__(*args, **kwargs)
+            spools.append(self)
+
+        def restore(self, tree: etree._Element) -> None:
+            if tree.tag == f"{{{NSMAP['mets']}}}amdSec":
+                raise OSError("No space left on device")
+            super().restore(tree)
+
+    with (
+        mock.patch.object(create_mets_streaming, "DocumentSpool", FailingSpool),
+        pytest.raises(OSError, match="No space left on device"),
+    ):
+        main(
+            mcp_job,
+            sipType="SIP",
+            baseDirectoryPath=str(sip_directory_path),
+            XMLFile=str(mets_path),
+            sipUUID=sip.pk,
+            includeAmdSec=True,
+            createNormativeStructmap=False,
+        )
+
+    assert list(output_path.iterdir()) == []
+    assert spools[0].file.closed
+
+
+@pytest.fixture(scope="module")
+def reload_serialized_data(django_db_blocker: pytest_django.DjangoDbBlocker):
+    """Reload the data of the migrations after the transactional tests.
+
+    Django only reloads it before the next test using ``serialized_rollback``,
+    so the database kept by ``--reuse-db`` would otherwise be left empty.
+    """
+    yield
+    with django_db_blocker.unblock():
+        connection.creation.deserialize_db_from_string(
+            connection._test_serialized_contents
+        )
+
+
+# The processes only see committed rows, so the test data is committed.
+@pytest.mark.django_db(transaction=True, serialized_rollback=True)
+@pytest.mark.parametrize("streaming", [False, True], ids=["tree", "streaming"])
+def test_amdsec_processes_write_the_same_mets(
+    reload_serialized_data: None,
+    settings: pytest_django.fixtures.SettingsWrapper,
+    mcp_job: Job,
+    tmp_path: pathlib.Path,
+    sip_directory_path: pathlib.Path,
+    sip: SIP,
+    sip_file: File,
+    sip_file_events: None,
+    streaming: bool,
+) -> None:
+    settings.TEMP_DIRECTORY = str(tmp_path)
+    settings.METS_STREAMING_WRITER = streaming
+    now = datetime.datetime(2024, 1, 1, 12, 0, 0)
+    written = {}
+    for processes in (1, 2):
+        settings.METS_AMDSEC_PROCESSES = processes
+        mets_path = tmp_path / f"METS.{processes}.xml"
+        with (
+            mock.patch("metsrw.mets.datetime", **{"utcnow.return_value": now}),
+            mock.patch.object(create_mets_v2, "datetime", **{"now.return_value": now}),
+            mock.patch(
+                "archivematica.MCPClient.clientScripts.create_mets_v2.prebuild_amdsec_documents",
+                wraps=create_mets_v2.prebuild_amdsec_documents,
+            ) as prebuild_amdsec_documents,
+        ):
+            main(
+                mcp_job,
+                sipType="SIP",
+                baseDirectoryPath=str(sip_directory_path),
+                XMLFile=str(mets_path),
+                sipUUID=sip.pk,
+                includeAmdSec=True,
+                createNormativeStructmap=True,
+            )
+        assert prebuild_amdsec_documents.called == (processes > 1)
+        written[processes] = mets_path.read_bytes()
+
+    assert written[2] == written[1]
+
+
+@pytest.mark.django_db
+def test_amdsec_processes_are_not_started_inside_a_transaction(
+    sip_file: File,
+) -> None:
+    with pytest.raises(RuntimeError, match="inside a transaction"):
+        create_mets_v2.prebuild_amdsec_documents(
+            [str(sip_file.uuid)], 2, create_mets_v2.MetsState()
+        )
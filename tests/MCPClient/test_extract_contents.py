@@ -473,3 +473,85 @@ def test_job_uses_replacement_keys_in_bash_command(
         printing=True,
         capture_output=True,
     )
+
+
+@pytest.mark.django_db
+@mock.patch("archivematica.MCPClient.clientScripts.extract_contents.executeOrRun")
+def test_job_extracts_packages_in_parallel(
+    execute_or_run,
+    settings,
+    transfer,
+    transfer_directory_path,
+    task,
+    transfer_file,
+    transfer_file_format_version,
+    format_version,
+    fpcommand,
+    fprule_extraction,
+    transfer_file_path,
+):
+    settings.EXTRACT_THREADS = 2
+    location = b"%transferDirectory%objects/other.mp3"
+    other_file = models.File.objects.create(
+        transfer=transfer, originallocation=location, currentlocation=location
+    )
+    models.FileFormatVersion.objects.create(
+        file_uuid=other_file, format_version=format_version
+    )
+    (transfer_directory_path / "objects" / "other.mp3").touch()
+
+    def execute_or_run_side_effect(*args, **kwargs):
+        """Mock extraction by creating two new files."""
+        extraction_tmp_path = pathlib.Path(kwargs["arguments"][1])
+        extraction_tmp_path.mkdir()
+        (extraction_tmp_path / "one.txt").write_text("one")
+        (extraction_tmp_path / "two.txt").write_text("two")
+
+        return (0, "success!", "")
+
+    execute_or_run.side_effect = execute_or_run_side_effect
+
+    date = "2024-08-01"
+    job = mock.Mock(
+        args=[
+            "extract_contents",
+            str(transfer.uuid),
+            f"{transfer_directory_path}/",
+            date,
+            str(task.taskuuid),
+            str(False),
+        ],
+        spec=Job,
+    )
+    job.JobContext = mock.MagicMock()
+
+    extract_contents.call([job])
+    job.set_status.assert_called_once_with(0)
+
+    assert execute_or_run.call_count == 2
+    for package in (transfer_file, other_file):
+        extracted_files = models.File.objects.filter(
+            transfer=transfer, event__event_type="unpacking"
+        ).filter(event__event_detail__contains=str(package.uuid))
+        assert sorted(
+            (
+                pathlib.Path(f.currentlocation.decode()).name,
+                f.checksum,
+                f.event_set.filter(
+                    event_type="message digest calculation",
+                    event_outcome_detail=f.checksum,
+                ).count(),
+            )
+            for f in extracted_files
+        ) == [
+            (
+                "one.txt",
+                "7692c3ad3540bb803c020b3aee66cd8887123234ea0c6e7143c0add73ff431ed",
+                1,
+            ),
+            (
+                "two.txt",
+                "3fc4ccfe745870e2c0d99f71f30ff0656c8dedd41cc1d7d3d376b0dbe685e2f3",
+                1,
+            ),
+        ]
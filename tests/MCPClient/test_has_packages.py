@@ -2,6 +2,7 @@ import pathlib
 from unittest import mock
 
 import pytest
+import pytest_django
 
 from archivematica.dashboard.fpr import models as fprmodels
 from archivematica.dashboard.main import models
@@ -97,3 +98,32 @@ def test_main_detects_file_was_already_extracted_from_unpacking_event(
     result = has_packages.main(job, str(transfer.uuid))
 
     assert result == expected_exit_code
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "event_type,expected_extracted",
+    [("unpacking", True), ("charaterization", False)],
+    ids=["unpacking_event", "not_unpacking_event"],
+)
+def test_extracted_packages_reads_the_unpacking_events_once(
+    transfer: models.Transfer,
+    compressed_file: models.File,
+    event_type: str,
+    expected_extracted: bool,
+    django_assert_num_queries: pytest_django.DjangoAssertNumQueries,
+) -> None:
+    extracted_file = models.File.objects.exclude(uuid=compressed_file.uuid).get(
+        transfer=transfer
+    )
+    models.Event.objects.create(
+        file_uuid=extracted_file,
+        event_type=event_type,
+        event_detail=f"Unpacked from: {compressed_file.currentlocation.decode()} ({compressed_file.uuid})",
+    )
+    files = list(transfer.file_set.all())
+
+    with django_assert_num_queries(1):
+        result = has_packages.extracted_packages(files)
+
+    assert result == ({str(compressed_file.uuid)} if expected_extracted else set())
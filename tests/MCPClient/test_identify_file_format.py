@@ -1,7 +1,9 @@
+import json
 import pathlib
 from unittest import mock
 
 import pytest
+import pytest_django
 
 from archivematica.dashboard.fpr import models as fprmodels
 from archivematica.dashboard.main import models
@@ -364,3 +366,160 @@ def test_job_falls_back_to_identification_rule_if_format_version_does_not_exist(
         ).count()
         == 1
     )
+
+
+@pytest.fixture
+def batch_jobs(
+    sip: models.SIP,
+    transfer: models.Transfer,
+    sip_directory_path: pathlib.Path,
+) -> list[mock.Mock]:
+    result = []
+    for i in range(3):
+        location = f"objects/file{i}.mp3"
+        file_ = models.File.objects.create(
+            transfer=transfer,
+            sip=sip,
+            filegrpuse="original",
+            originallocation=f"%transferDirectory%{location}".encode(),
+            currentlocation=f"%SIPDirectory%{location}".encode(),
+        )
+        path = sip_directory_path / location
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.touch()
+        result.append(
+            mock.Mock(
+                args=[
+                    "archivematica.MCPClient.clientScripts.identify_file_format.py",
+                    "True",
+                    str(path),
+                    str(file_.uuid),
+                ],
+                JobContext=mock.MagicMock(),
+                spec=Job,
+            )
+        )
+
+    return result
+
+
+@pytest.mark.django_db
+@mock.patch("archivematica.MCPClient.clientScripts.identify_file_format.executeOrRun")
+def test_command_accepting_multiple_paths_runs_once_per_batch(
+    execute_or_run: mock.Mock,
+    batch_jobs: list[mock.Mock],
+    idcommand: fprmodels.IDCommand,
+    format_version: fprmodels.FormatVersion,
+) -> None:
+    command_output = "fmt/111"
+    fprmodels.FormatVersion.objects.filter(pronom_id=command_output).delete()
+    format_version.pronom_id = command_output
+    format_version.save()
+    idcommand.accepts_multiple_paths = True
+    idcommand.save()
+    paths = [job.args[2] for job in batch_jobs]
+    execute_or_run.return_value = (
+        0,
+        json.dumps(dict.fromkeys(paths, f"{command_output}\n")),
+        "",
+    )
+
+    identify_file_format.call(batch_jobs)
+
+    execute_or_run.assert_called_once_with(
+        idcommand.script_type,
+        idcommand.script,
+        arguments=paths,
+        printing=False,
+        capture_output=True,
+    )
+    for job in batch_jobs:
+        job.set_status.assert_called_once_with(identify_file_format.SUCCESS)
+        assert (
+            models.FileFormatVersion.objects.filter(
+                file_uuid_id=job.args[3], format_version=format_version
+            ).count()
+            == 1
+        )
+
+
+@pytest.mark.django_db
+@mock.patch("archivematica.MCPClient.clientScripts.identify_file_format.executeOrRun")
+def test_command_accepting_multiple_paths_falls_back_to_one_run_per_file(
+    execute_or_run: mock.Mock,
+    batch_jobs: list[mock.Mock],
+    idcommand: fprmodels.IDCommand,
+    format_version: fprmodels.FormatVersion,
+) -> None:
+    command_output = "fmt/111"
+    fprmodels.FormatVersion.objects.filter(pronom_id=command_output).delete()
+    format_version.pronom_id = command_output
+    format_version.save()
+    idcommand.accepts_multiple_paths = True
+    idcommand.save()
+    paths = [job.args[2] for job in batch_jobs]
+    # The batch output misses the last file, which is identified on its own.
+    execute_or_run.side_effect = [
+        (0, json.dumps(dict.fromkeys(paths[:-1], command_output)), ""),
+        (0, command_output, ""),
+    ]
+
+    identify_file_format.call(batch_jobs)
+
+    assert execute_or_run.mock_calls == [
+        mock.call(
+            idcommand.script_type,
+            idcommand.script,
+            arguments=paths,
+            printing=False,
+            capture_output=True,
+        ),
+        mock.call(
+            idcommand.script_type,
+            idcommand.script,
+            arguments=paths[-1:],
+            printing=False,
+            capture_output=True,
+        ),
+    ]
+    for job in batch_jobs:
+        job.set_status.assert_called_once_with(identify_file_format.SUCCESS)
+
+
+@pytest.mark.django_db
+@mock.patch("archivematica.MCPClient.clientScripts.identify_file_format.executeOrRun")
+def test_batch_is_identified_with_a_fixed_number_of_queries(
+    execute_or_run: mock.Mock,
+    batch_jobs: list[mock.Mock],
+    idcommand: fprmodels.IDCommand,
+    format_version: fprmodels.FormatVersion,
+    django_assert_max_num_queries: pytest_django.DjangoAssertNumQueries,
+) -> None:
+    command_output = "fmt/111"
+    fprmodels.FormatVersion.objects.filter(pronom_id=command_output).delete()
+    format_version.pronom_id = command_output
+    format_version.save()
+    idcommand.accepts_multiple_paths = True
+    idcommand.save()
+    for job in batch_jobs:
+        job.args.append("--disable-reidentify")
+    # The first file is identified already, its version is updated.
+    models.FileFormatVersion.objects.create(
+        file_uuid_id=batch_jobs[0].args[3], format_version=format_version
+    )
+    paths = [job.args[2] for job in batch_jobs]
+    execute_or_run.return_value = (
+        0,
+        json.dumps(dict.fromkeys(paths, command_output)),
+        "",
+    )
+
+    # None of them depends on the number of files.
+    with django_assert_max_num_queries(20):
+        identify_file_format.call(batch_jobs)
+
+    for job in batch_jobs:
+        job.set_status.assert_called_once_with(identify_file_format.SUCCESS)
+    assert models.FileFormatVersion.objects.filter(
+        format_version=format_version
+    ).count() == len(batch_jobs)
@@ -1,5 +1,6 @@
 import argparse
 import pathlib
+import threading
 import uuid
 from collections.abc import Mapping
 from collections.abc import Sequence
@@ -502,7 +503,7 @@ def test_normalization_finds_rule_by_file_format_version(
 @mock.patch("os.makedirs", side_effect=OSError("error!"))
 @mock.patch(
     "archivematica.MCPClient.clientScripts.transcoder.CommandLinker",
-    return_value=mock.Mock(**{"execute.return_value": 0}),
+    return_value=mock.Mock(**{"run.return_value": 0, "finish.return_value": 0}),
 )
 def test_normalization_fails_if_thumbnail_directory_cannot_be_created(
     command_linker: mock.Mock,
@@ -652,6 +653,228 @@ def test_normalization_copies_generated_thumbnail_to_shared_thumbnails_directory
     assert updated_fprule_thumbnail.count_not_okay == 0
 
 
+@pytest.mark.django_db
+@mock.patch(
+    "archivematica.MCPClient.clientScripts.transcoder.executeOrRun",
+    return_value=(1, "", "error!"),
+)
+def test_normalization_counts_do_not_start_a_new_fpr_revision(
+    execute_or_run: mock.Mock,
+    sip: models.SIP,
+    sip_directory_path: pathlib.Path,
+    sip_file: models.File,
+    task: models.Task,
+    sip_file_format_version: models.FileFormatVersion,
+    fprule_thumbnail: fprmodels.FPRule,
+    fpcommand_thumbnail: fprmodels.FPCommand,
+    shared_directory_path: pathlib.Path,
+) -> None:
+    job = mock.Mock(
+        args=[
+            "normalize.py",
+            "thumbnail",
+            str(sip_file.uuid),
+            "file_path_not_used",
+            str(sip_directory_path),
+            str(sip.uuid),
+            str(task.taskuuid),
+            "original",
+            "--thumbnail_mode=generate",
+        ],
+        JobContext=mock.MagicMock(),
+        spec=Job,
+    )
+    revision = fprmodels.Revision.current()
+
+    normalize.call([job])
+
+    updated_fprule_thumbnail = fprmodels.FPRule.objects.get(uuid=fprule_thumbnail.uuid)
+    assert updated_fprule_thumbnail.count_attempts == 1
+    assert updated_fprule_thumbnail.count_not_okay == 1
+    assert fprmodels.Revision.current() == revision
+
+
+@pytest.mark.django_db
+@mock.patch("archivematica.MCPClient.clientScripts.transcoder.executeOrRun")
+def test_normalization_runs_the_commands_of_a_batch_in_parallel(
+    execute_or_run: mock.Mock,
+    sip: models.SIP,
+    transfer: models.Transfer,
+    sip_directory_path: pathlib.Path,
+    sip_file: models.File,
+    format_version: fprmodels.FormatVersion,
+    sip_file_format_version: models.FileFormatVersion,
+    fprule_thumbnail: fprmodels.FPRule,
+    settings: pytest_django.fixtures.SettingsWrapper,
+    fpcommand_thumbnail: fprmodels.FPCommand,
+    shared_directory_path: pathlib.Path,
+) -> None:
+    settings.NORMALIZE_THREADS = 2
+    other_file = models.File.objects.create(
+        transfer=transfer,
+        sip=sip,
+        filegrpuse="original",
+        originallocation=b"%transferDirectory%objects/other.mp3",
+        currentlocation=b"%SIPDirectory%objects/other.mp3",
+    )
+    models.FileFormatVersion.objects.create(
+        file_uuid=other_file, format_version=format_version
+    )
+    # Both commands have to be running at the same time to get past this.
+    barrier = threading.Barrier(2, timeout=10)
+    command_threads = []
+
+    def execute_or_run_side_effect(
+        type: str,
+        text: str,
+        stdIn: str = "",
+        printing: bool = True,
+        arguments: Optional[Sequence[str]] = None,
+        env_updates: Optional[Mapping[str, str]] = None,
+        capture_output: bool = True,
+    ) -> tuple[int, str, str]:
+        command_threads.append(threading.get_ident())
+        barrier.wait()
+
+        parser = argparse.ArgumentParser()
+        parser.add_argument("--output-directory", required=True)
+        parser.add_argument("--postfix", required=True)
+        args, _ = parser.parse_known_args(arguments)
+        thumbnail_path = pathlib.Path(args.output_directory, args.postfix)
+        thumbnail_path.parent.mkdir(parents=True, exist_ok=True)
+        thumbnail_path.with_suffix(".jpg").write_bytes(b"thumbnail")
+
+        return (0, "success!", "")
+
+    execute_or_run.side_effect = execute_or_run_side_effect
+
+    jobs = [
+        mock.Mock(
+            args=[
+                "normalize.py",
+                "thumbnail",
+                str(file_.uuid),
+                "file_path_not_used",
+                str(sip_directory_path),
+                str(sip.uuid),
+                str(uuid.uuid4()),
+                "original",
+                "--thumbnail_mode=generate",
+            ],
+            JobContext=mock.MagicMock(),
+            spec=Job,
+        )
+        for file_ in (sip_file, other_file)
+    ]
+
+    normalize.call(jobs)
+
+    for job in jobs:
+        job.set_status.assert_called_once_with(normalize.SUCCESS)
+    assert len(set(command_threads)) == 2
+    assert threading.get_ident() not in command_threads
+
+    # The database was updated by the thread of the batch.
+    updated_fprule_thumbnail = fprmodels.FPRule.objects.get(uuid=fprule_thumbnail.uuid)
+    assert updated_fprule_thumbnail.count_attempts == 2
+    assert updated_fprule_thumbnail.count_okay == 2
+
+
+@pytest.mark.django_db
+@mock.patch("archivematica.archivematicaCommon.databaseFunctions.insertIntoDerivations")
+@mock.patch("archivematica.archivematicaCommon.databaseFunctions.insertIntoEvents")
+@mock.patch("archivematica.MCPClient.clientScripts.transcoder.executeOrRun")
+def test_normalization_writes_the_events_of_a_batch_once_its_commands_ran(
+    execute_or_run: mock.Mock,
+    insert_into_events: mock.Mock,
+    insert_into_derivations: mock.Mock,
+    sip: models.SIP,
+    transfer: models.Transfer,
+    sip_directory_path: pathlib.Path,
+    sip_file: models.File,
+    format_version: fprmodels.FormatVersion,
+    sip_file_format_version: models.FileFormatVersion,
+    fprule_preservation: fprmodels.FPRule,
+    settings: pytest_django.fixtures.SettingsWrapper,
+) -> None:
+    settings.NORMALIZE_THREADS = 2
+    fprule_preservation.command.output_format = format_version
+    fprule_preservation.command.output_location = "%outputDirectory%%postfix%.tif"
+    fprule_preservation.command.save()
+    other_file = models.File.objects.create(
+        transfer=transfer,
+        sip=sip,
+        filegrpuse="original",
+        originallocation=b"%transferDirectory%objects/other.mp3",
+        currentlocation=b"%SIPDirectory%objects/other.mp3",
+    )
+    models.FileFormatVersion.objects.create(
+        file_uuid=other_file, format_version=format_version
+    )
+    events_during_commands = []
+
+    def execute_or_run_side_effect(
+        type: str,
+        text: str,
+        stdIn: str = "",
+        printing: bool = True,
+        arguments: Optional[Sequence[str]] = None,
+        env_updates: Optional[Mapping[str, str]] = None,
+        capture_output: bool = True,
+    ) -> tuple[int, str, str]:
+        events_during_commands.append(models.Event.objects.count())
+
+        parser = argparse.ArgumentParser()
+        parser.add_argument("--output-directory", required=True)
+        parser.add_argument("--postfix", required=True)
+        args, _ = parser.parse_known_args(arguments)
+        output_path = pathlib.Path(args.output_directory, args.postfix)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        output_path.with_suffix(".tif").write_bytes(b"preservation")
+
+        return (0, "success!", "")
+
+    execute_or_run.side_effect = execute_or_run_side_effect
+    task_uuids = [str(uuid.uuid4()) for _ in range(2)]
+    jobs = [
+        mock.Mock(
+            args=[
+                "normalize.py",
+                "preservation",
+                str(file_.uuid),
+                "file_path_not_used",
+                str(sip_directory_path),
+                str(sip.uuid),
+                task_uuid,
+                "original",
+            ],
+            JobContext=mock.MagicMock(),
+            spec=Job,
+        )
+        for file_, task_uuid in zip((sip_file, other_file), task_uuids)
+    ]
+
+    normalize.call(jobs)
+
+    for job in jobs:
+        job.set_status.assert_called_once_with(normalize.SUCCESS)
+    assert events_during_commands == [0, 0]
+    insert_into_events.assert_not_called()
+    insert_into_derivations.assert_not_called()
+
+    for file_, task_uuid in zip((sip_file, other_file), task_uuids):
+        derivation = models.Derivation.objects.get(source_file=file_)
+        assert str(derivation.derived_file_id) == task_uuid
+        assert derivation.event.event_type == "normalization"
+        assert derivation.event.file_uuid == file_
+        assert derivation.event.agents.exists()
+        assert sorted(
+            models.Event.objects.filter(file_uuid_id=task_uuid).values_list(
+                "event_type", flat=True
+            )
+        ) == ["creation", "message digest calculation"]
+
+
 FALLBACK_THUMBNAIL_COMMAND = "fallback"
 VERIFICATION_THUMBNAIL_COMMAND = "verification"
 EVENT_DETAIL_THUMBNAIL_COMMAND = "event detail"
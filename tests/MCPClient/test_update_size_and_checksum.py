@@ -0,0 +1,68 @@
+import hashlib
+import uuid
+from unittest import mock
+
+import pytest
+
+from archivematica.dashboard.main import models
+from archivematica.MCPClient.client.job import Job
+from archivematica.MCPClient.clientScripts import update_size_and_checksum
+
+
+@pytest.fixture
+def transfer_files(transfer, transfer_directory_path):
+    (transfer_directory_path / "objects").mkdir()
+    result = {}
+    for i in range(5):
+        name = f"file{i}.txt"
+        content = f"content of file {i}".encode() * (i + 1)
+        (transfer_directory_path / "objects" / name).write_bytes(content)
+        location = f"%transferDirectory%objects/{name}".encode()
+        file_ = models.File.objects.create(
+            transfer=transfer,
+            filegrpuse="original",
+            originallocation=location,
+            currentlocation=location,
+        )
+        result[file_.uuid] = content
+
+    return result
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("use_mmap", [False, True], ids=["read", "mmap"])
+def test_call_updates_size_and_checksum_of_transfer_files(
+    settings, transfer, transfer_files, transfer_directory_path, use_mmap
+):
+    settings.CHECKSUM_THREADS = 3
+    settings.CHECKSUM_USE_MMAP = use_mmap
+    job = Job(
+        "stub",
+        "stub",
+        [
+            "sharedPath",
+            "--sipDirectory",
+            f"{transfer_directory_path}/",
+            "--transferUUID",
+            str(transfer.uuid),
+            "--date",
+            "2024-01-01T00:00:00",
+            "--eventIdentifierUUID",
+            str(uuid.uuid4()),
+        ],
+    )
+
+    with mock.patch.object(
+        update_size_and_checksum, "get_setting", return_value="sha256"
+    ):
+        update_size_and_checksum.call([job])
+
+    assert job.get_exit_code() == 0
+    for file_uuid, content in transfer_files.items():
+        file_ = models.File.objects.get(uuid=file_uuid)
+        assert file_.size == len(content)
+        assert file_.checksum == hashlib.sha256(content).hexdigest()
+        assert file_.checksumtype == "sha256"
+    assert models.Event.objects.filter(
+        file_uuid__in=transfer_files, event_type="message digest calculation"
+    ).count() == len(transfer_files)
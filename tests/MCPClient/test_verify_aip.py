@@ -0,0 +1,155 @@
+import hashlib
+import shutil
+import subprocess
+import tarfile
+from unittest import mock
+
+import bagit
+import pytest
+import pytest_django
+
+from archivematica.dashboard.main import models
+from archivematica.MCPClient.client.job import Job
+from archivematica.MCPClient.clientScripts import verify_aip
+
+CONTENTS = b"data"
+
+LISTING_7Z = """
+7-Zip [64] 16.02 : Copyright (c) 1999-2016 Igor Pavlov : 2016-05-21
+
+Listing archive: aip.7z
+
+--
+Path = aip.7z
+Type = 7z
+Physical Size = 1234
+Solid = +
+
+----------
+Path = aip/data/objects/file.txt
+Size = 4
+Attributes = A_ -rw-r--r--
+
+Path = aip/data/objects/empty.txt
+Size = 0
+Attributes = A_ -rw-r--r--
+
+Path = aip/data/objects
+Size = 0
+Attributes = D_ drwxr-xr-x
+
+"""
+
+
+@pytest.fixture
+def bag(tmp_path, sip):
+    bag_path = tmp_path / f"aip-{sip.uuid}"
+    (bag_path / "objects").mkdir(parents=True)
+    (bag_path / "objects" / "file.txt").write_bytes(CONTENTS)
+    bagit.make_bag(str(bag_path), checksums=["sha256"])
+    models.File.objects.create(
+        sip=sip,
+        originallocation=b"%SIPDirectory%objects/file.txt",
+        currentlocation=b"%SIPDirectory%objects/file.txt",
+        checksum=hashlib.sha256(CONTENTS).hexdigest(),
+        checksumtype="sha256",
+    )
+
+    return bag_path
+
+
+@pytest.fixture
+def streaming(settings: pytest_django.fixtures.SettingsWrapper, tmp_path):
+    settings.VERIFY_AIP_STREAMING = True
+    settings.TEMP_DIRECTORY = str(tmp_path / "tmp")
+
+    return tmp_path / "tmp"
+
+
+def make_tarball(bag_path):
+    aip_path = f"{bag_path}.tar.gz"
+    with tarfile.open(aip_path, "w:gz") as tar:
+        tar.add(bag_path, arcname=bag_path.name)
+
+    return aip_path
+
+
+@pytest.mark.django_db
+@mock.patch("archivematica.archivematicaCommon.databaseFunctions.insertIntoEvents")
+def test_streamed_aip_is_verified_without_extracting_it(
+    insert_into_events, sip, bag, streaming
+):
+    job = Job("stub", "stub", [str(sip.uuid), make_tarball(bag)])
+
+    assert verify_aip.verify_aip(job) == 0
+    assert "All checksums (count=1)" in job.get_stdout()
+    assert insert_into_events.call_args.kwargs["eventOutcome"] == "Pass"
+    assert not streaming.exists()
+
+
+@pytest.mark.django_db
+def test_streamed_aip_payload_is_hashed(sip, bag, streaming):
+    (bag / "data" / "objects" / "file.txt").write_bytes(b"atad")
+    job = Job("stub", "stub", [str(sip.uuid), make_tarball(bag)])
+
+    assert verify_aip.verify_aip(job) == 1
+    assert "invalid checksums: ['data/objects/file.txt']" in job.get_stderr()
+
+
+@pytest.mark.django_db
+def test_streamed_aip_must_be_complete(sip, bag, streaming):
+    (bag / "data" / "objects" / "file.txt").unlink()
+    job = Job("stub", "stub", [str(sip.uuid), make_tarball(bag)])
+
+    assert verify_aip.verify_aip(job) == 1
+    assert "missing files: ['data/objects/file.txt']" in job.get_stderr()
+
+
+@pytest.mark.parametrize(
+    "checksum_type,reads",
+    [("sha256", 1), ("md5", 2)],
+    ids=["same_checksum_type", "changed_checksum_type"],
+)
+@pytest.mark.django_db
+def test_streamed_aip_is_verified_with_the_manifest_of_the_bag(
+    sip, bag, checksum_type, reads
+):
+    models.DashboardSetting.objects.create(name="checksum_type", value=checksum_type)
+    aip_path = make_tarball(bag)
+    streamed_bag = verify_aip.StreamedBag(
+        aip_path, verify_aip.get_setting("checksum_type")
+    )
+
+    with mock.patch(
+        "archivematica.MCPClient.clientScripts.verify_aip.iter_archive_members",
+        side_effect=verify_aip.iter_archive_members,
+    ) as iter_archive_members:
+        streamed_bag.validate()
+
+    assert iter_archive_members.call_count == reads
+    assert streamed_bag.checksum_type == "sha256"
+    assert streamed_bag.entries == {
+        "data/objects/file.txt": {"sha256": hashlib.sha256(CONTENTS).hexdigest()}
+    }
+
+
+def test_7z_listing_splits_the_extracted_stream():
+    members = verify_aip.parse_7z_listing(LISTING_7Z)
+
+    assert members == [
+        ("aip/data/objects/file.txt", 4),
+        ("aip/data/objects/empty.txt", 0),
+    ]
+
+
+@pytest.mark.skipif(shutil.which("7z") is None, reason="7z is not installed")
+@pytest.mark.django_db
+def test_streamed_7z_aip_is_verified(sip, bag, streaming):
+    aip_path = f"{bag}.7z"
+    subprocess.run(("7z", "a", aip_path, str(bag)), check=True, capture_output=True)
+    job = Job("stub", "stub", [str(sip.uuid), aip_path])
+
+    with mock.patch(
+        "archivematica.archivematicaCommon.databaseFunctions.insertIntoEvents"
+    ):
+        assert verify_aip.verify_aip(job) == 0
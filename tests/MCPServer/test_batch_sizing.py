@@ -0,0 +1,51 @@
+import pytest
+
+from archivematica.MCPServer.server.tasks.batch_sizing import BatchSizer
+
+
+@pytest.fixture
+def batch_sizer():
+    return BatchSizer(default_size=128, target_duration=10, max_size=1000)
+
+
+def test_default_size_is_used_until_script_is_observed(batch_sizer):
+    assert batch_sizer.batch_size({"execute": "normalize_v1.0"}) == 128
+
+
+def test_default_size_is_used_when_adaptive_sizing_is_disabled():
+    batch_sizer = BatchSizer(default_size=128, target_duration=0, max_size=1000)
+    batch_sizer.observe("normalize_v1.0", 10, 100.0)
+
+    assert batch_sizer.batch_size({"execute": "normalize_v1.0"}) == 128
+
+
+def test_link_config_overrides_batch_size(batch_sizer):
+    batch_sizer.observe("normalize_v1.0", 10, 100.0)
+
+    assert batch_sizer.batch_size({"execute": "normalize_v1.0", "batch_size": 3}) == 3
+
+
+def test_expensive_scripts_get_small_batches(batch_sizer):
+    batch_sizer.observe("normalize_v1.0", 10, 50.0)
+
+    assert batch_sizer.batch_size({"execute": "normalize_v1.0"}) == 2
+
+
+def test_batches_have_at_least_one_task(batch_sizer):
+    batch_sizer.observe("normalize_v1.0", 1, 600.0)
+
+    assert batch_sizer.batch_size({"execute": "normalize_v1.0"}) == 1
+
+
+def test_cheap_scripts_get_large_batches(batch_sizer):
+    batch_sizer.observe("assign_file_uuids_v0.0", 128, 0.128)
+
+    assert batch_sizer.batch_size({"execute": "assign_file_uuids_v0.0"}) == 1000
+
+
+def test_observations_are_smoothed(batch_sizer):
+    batch_sizer.observe("normalize_v1.0", 10, 10.0)
+    batch_sizer.observe("normalize_v1.0", 10, 20.0)
+
+    # 0.3 * 2.0 + 0.7 * 1.0 = 1.3 seconds per task
+    assert batch_sizer.batch_size({"execute": "normalize_v1.0"}) == 7
@@ -1,3 +1,4 @@
+import datetime
 import math
 import uuid
 from unittest import mock
@@ -6,8 +7,12 @@ import gearman
 import pytest
 
 from archivematica.MCPServer.server.jobs import Job
+from archivematica.MCPServer.server.tasks import GearmanCompletionDispatcher
 from archivematica.MCPServer.server.tasks import GearmanTaskBackend
 from archivematica.MCPServer.server.tasks import Task
+from archivematica.MCPServer.server.tasks.backends.gearman_backend import (
+    GearmanTaskBatch,
+)
 
 
 class MockJob(Job):
@@ -69,8 +74,15 @@ def format_gearman_response(task_results):
     "archivematica.MCPServer.server.tasks.backends.gearman_backend.Task.bulk_log"
 )
 def test_gearman_task_submission(bulk_log, mock_client, simple_job, simple_task):
-    backend = GearmanTaskBackend()
-    backend.submit_task(simple_job, simple_task)
+    dispatcher = GearmanCompletionDispatcher()
+    backend = GearmanTaskBackend(dispatcher=dispatcher)
+    with mock.patch.object(dispatcher, "start"):
+        backend.submit_task(simple_job, simple_task)
+
+    # Batches are sent by the dispatcher, not the submitting thread
+    bulk_log.assert_called_once_with([simple_task], simple_job)
+    mock_client.return_value.submit_job.assert_not_called()
+    dispatcher.poll_once()
 
     task_data = format_gearman_request([simple_task])
 
@@ -94,14 +106,15 @@ def test_gearman_task_submission(bulk_log, mock_client, simple_job, simple_task)
     "archivematica.MCPServer.server.tasks.backends.gearman_backend.Task.bulk_log"
 )
 def test_gearman_task_result_success(bulk_log, mock_client, simple_job, simple_task):
-    backend = GearmanTaskBackend()
+    dispatcher = GearmanCompletionDispatcher()
+    backend = GearmanTaskBackend(dispatcher=dispatcher)
 
     mock_gearman_job = mock.Mock()
     job_request = gearman.job.GearmanJobRequest(
         mock_gearman_job, background=True, max_attempts=0
     )
 
-    def mock_jobs_completed(*args):
+    def mock_jobs_completed(*args, **kwargs):
         job_request.state = gearman.JOB_COMPLETE
         job_request.result = format_gearman_response(
             [
@@ -125,6 +138,7 @@ def test_gearman_task_result_success(bulk_log, mock_client, simple_job, simple_t
 
     backend.submit_task(simple_job, simple_task)
     results = list(backend.wait_for_results(simple_job))
+    dispatcher.stop()
 
     assert len(results) == 1
 
@@ -145,14 +159,15 @@ def test_gearman_task_result_success(bulk_log, mock_client, simple_job, simple_t
     "archivematica.MCPServer.server.tasks.backends.gearman_backend.Task.bulk_log"
 )
 def test_gearman_task_result_error(bulk_log, mock_client, simple_job, simple_task):
-    backend = GearmanTaskBackend()
+    dispatcher = GearmanCompletionDispatcher()
+    backend = GearmanTaskBackend(dispatcher=dispatcher)
 
     mock_gearman_job = mock.Mock()
     job_request = gearman.job.GearmanJobRequest(
         mock_gearman_job, background=True, max_attempts=0
     )
 
-    def mock_jobs_completed(*args):
+    def mock_jobs_completed(*args, **kwargs):
         job_request.state = gearman.JOB_FAILED
         job_request.exception = Exception("Error!")
 
@@ -165,6 +180,7 @@ def test_gearman_task_result_error(bulk_log, mock_client, simple_job, simple_tas
 
     backend.submit_task(simple_job, simple_task)
     results = list(backend.wait_for_results(simple_job))
+    dispatcher.stop()
 
     assert len(results) == 1
 
@@ -200,7 +216,8 @@ def test_gearman_multiple_batches(
         )
         tasks.append(task)
 
-    backend = GearmanTaskBackend()
+    dispatcher = GearmanCompletionDispatcher()
+    backend = GearmanTaskBackend(dispatcher=dispatcher)
 
     job_requests = []
     for _ in range(3):
@@ -210,7 +227,7 @@ def test_gearman_multiple_batches(
         )
         job_requests.append(job_request)
 
-    def mock_get_job_statuses(*args):
+    def mock_get_job_statuses(*args, **kwargs):
         """Complete one batch per call, either in regular or reverse order."""
         status_requests = list(job_requests)
         if reverse_result_order:
@@ -244,11 +261,23 @@ def test_gearman_multiple_batches(
         mock_get_job_statuses
     )
 
-    for task in tasks:
-        backend.submit_task(simple_job, task)
-    results = list(backend.wait_for_results(simple_job))
-
     expected_batch_count = int(math.ceil(5 / backend.TASK_BATCH_SIZE))
+
+    # Hold the dispatcher back until every batch is queued, including the
+    # partial one flushed by wait_for_results, so that batches complete in a
+    # predictable order.
+    start = dispatcher.start
+
+    def start_when_all_queued():
+        if dispatcher.submission_queue.qsize() == expected_batch_count:
+            start()
+
+    with mock.patch.object(dispatcher, "start", side_effect=start_when_all_queued):
+        for task in tasks:
+            backend.submit_task(simple_job, task)
+        results = list(backend.wait_for_results(simple_job))
+    dispatcher.stop()
+
     expected_first_result = tasks[-1] if reverse_result_order else tasks[0]
 
     assert len(results) == 5
@@ -257,3 +286,220 @@ def test_gearman_multiple_batches(
     assert mock_client.return_value.wait_until_any_job_completed.call_count == len(
         job_requests
     )
+
+
+@mock.patch(
+    "archivematica.MCPServer.server.tasks.backends.gearman_backend.MCPGearmanClient"
+)
+@mock.patch(
+    "archivematica.MCPServer.server.tasks.backends.gearman_backend.Task.bulk_log"
+)
+def test_gearman_dispatcher_shares_one_client_between_jobs(bulk_log, mock_client):
+    dispatcher = GearmanCompletionDispatcher()
+    jobs = [
+        MockJob(mock.Mock(), mock.Mock(), mock.Mock(), name=f"test_job_{i}")
+        for i in range(3)
+    ]
+    backends = [GearmanTaskBackend(dispatcher=dispatcher) for _ in jobs]
+    tasks = {}
+
+    def mock_submit_job(task, data, **kwargs):
+        job_request = gearman.job.GearmanJobRequest(
+            mock.Mock(), background=False, max_attempts=0
+        )
+        tasks[job_request] = list(data["tasks"])
+        return job_request
+
+    def mock_jobs_completed(job_requests, **kwargs):
+        for job_request in job_requests:
+            job_request.state = gearman.JOB_COMPLETE
+            job_request.result = format_gearman_response(
+                [(task_uuid, {"exitCode": 0}) for task_uuid in tasks[job_request]]
+            )
+        return job_requests
+
+    mock_client.return_value.submit_job.side_effect = mock_submit_job
+    mock_client.return_value.wait_until_any_job_completed.side_effect = (
+        mock_jobs_completed
+    )
+
+    for job, backend in zip(jobs, backends):
+        backend.submit_task(
+            job,
+            Task("args", None, None, {r"%relativeLocation%": "testfile"}),
+        )
+    results = [
+        list(backend.wait_for_results(job)) for job, backend in zip(jobs, backends)
+    ]
+    dispatcher.stop()
+
+    mock_client.assert_called_once()
+    assert [len(job_results) for job_results in results] == [1, 1, 1]
+    assert all(task.exit_code == 0 for job_results in results for task in job_results)
+
+
+@mock.patch(
+    "archivematica.MCPServer.server.tasks.backends.gearman_backend.MCPGearmanClient"
+)
+@mock.patch(
+    "archivematica.MCPServer.server.tasks.backends.gearman_backend.Task.bulk_log"
+)
+def test_gearman_dispatcher_submission_error(
+    bulk_log, mock_client, simple_job, simple_task
+):
+    dispatcher = GearmanCompletionDispatcher()
+    backend = GearmanTaskBackend(dispatcher=dispatcher)
+    mock_client.return_value.submit_job.side_effect = gearman.errors.ServerUnavailable(
+        "No gearman"
+    )
+
+    backend.submit_task(simple_job, simple_task)
+    with pytest.raises(gearman.errors.ServerUnavailable):
+        list(backend.wait_for_results(simple_job))
+    dispatcher.stop()
+
+
+@mock.patch(
+    "archivematica.MCPServer.server.tasks.backends.gearman_backend.MCPGearmanClient"
+)
+@mock.patch.object(GearmanTaskBackend, "TASK_BATCH_SIZE", 1)
+@mock.patch.object(GearmanTaskBackend, "MAX_IN_FLIGHT_BATCHES", 2)
+@mock.patch(
+    "archivematica.MCPServer.server.tasks.backends.gearman_backend.Task.bulk_log"
+)
+def test_gearman_collects_results_while_submitting(bulk_log, mock_client, simple_job):
+    dispatcher = GearmanCompletionDispatcher()
+    backend = GearmanTaskBackend(dispatcher=dispatcher)
+    tasks = [
+        Task(f"argument {i}", None, None, {r"%relativeLocation%": "testfile"})
+        for i in range(5)
+    ]
+    batch_tasks = {}
+
+    def mock_submit_job(task, data, **kwargs):
+        job_request = gearman.job.GearmanJobRequest(
+            mock.Mock(), background=False, max_attempts=0
+        )
+        batch_tasks[job_request] = list(data["tasks"])
+        return job_request
+
+    def mock_jobs_completed(job_requests, **kwargs):
+        for job_request in job_requests:
+            job_request.state = gearman.JOB_COMPLETE
+            job_request.result = format_gearman_response(
+                [(task_uuid, {"exitCode": 0}) for task_uuid in batch_tasks[job_request]]
+            )
+        return job_requests
+
+    mock_client.return_value.submit_job.side_effect = mock_submit_job
+    mock_client.return_value.wait_until_any_job_completed.side_effect = (
+        mock_jobs_completed
+    )
+
+    results = []
+    for task in tasks:
+        backend.submit_task(simple_job, task)
+        results.extend(backend.collect_completed_results(simple_job))
+        assert len(backend.pending_gearman_jobs.get(simple_job.uuid, [])) < 2
+    results.extend(backend.wait_for_results(simple_job))
+    dispatcher.stop()
+
+    assert sorted(str(task.uuid) for task in results) == sorted(
+        str(task.uuid) for task in tasks
+    )
+    assert all(task.done for task in results)
+
+
+@mock.patch(
+    "archivematica.MCPServer.server.tasks.backends.gearman_backend.MCPGearmanClient"
+)
+@mock.patch(
+    "archivematica.MCPServer.server.tasks.backends.gearman_backend.Task.bulk_log"
+)
+def test_gearman_batch_size_comes_from_batch_sizer(bulk_log, mock_client, simple_job):
+    batch_sizer = mock.Mock(**{"batch_size.return_value": 2})
+    dispatcher = GearmanCompletionDispatcher()
+    backend = GearmanTaskBackend(dispatcher=dispatcher, batch_sizer=batch_sizer)
+
+    with mock.patch.object(dispatcher, "submit") as submit:
+        for i in range(5):
+            backend.submit_task(
+                simple_job,
+                Task(f"argument {i}", None, None, {r"%relativeLocation%": "testfile"}),
+            )
+
+    assert submit.call_count == 2
+    assert [len(call.args[0]) for call in submit.call_args_list] == [2, 2]
+    batch_sizer.batch_size.assert_called_with(
+        simple_job.link.config, default_size=GearmanTaskBackend.TASK_BATCH_SIZE
+    )
+
+
+def test_gearman_batch_processing_duration(simple_task):
+    batch = GearmanTaskBatch(size=2)
+    batch.add_task(simple_task)
+    simple_task.started_timestamp = datetime.datetime(2024, 1, 1, 0, 0, 0)
+    simple_task.finished_timestamp = datetime.datetime(2024, 1, 1, 0, 0, 30)
+
+    assert batch.processing_duration() == 30.0
+
+
+@mock.patch(
+    "archivematica.MCPServer.server.tasks.backends.gearman_backend.MCPGearmanClient"
+)
+@mock.patch.object(GearmanTaskBackend, "TASK_BATCH_SIZE", 1)
+@mock.patch(
+    "archivematica.MCPServer.server.tasks.backends.gearman_backend.metrics.gearman_active_jobs_gauge"
+)
+@mock.patch(
+    "archivematica.MCPServer.server.tasks.backends.gearman_backend.Task.bulk_log"
+)
+def test_gearman_poll_error_only_fails_jobs_on_the_failed_connection(
+    bulk_log, active_jobs_gauge, mock_client, simple_job
+):
+    dispatcher = GearmanCompletionDispatcher()
+    backend = GearmanTaskBackend(dispatcher=dispatcher)
+    healthy, failed = (
+        gearman.job.GearmanJobRequest(
+            mock.Mock(**{"connection.connected": connected}),
+            background=False,
+            max_attempts=0,
+        )
+        for connected in (True, False)
+    )
+    healthy.state = failed.state = gearman.JOB_CREATED
+    mock_client.return_value.submit_job.side_effect = [healthy, failed]
+    mock_client.return_value.wait_until_any_job_completed.side_effect = (
+        gearman.errors.ConnectionError("Connection reset")
+    )
+    tasks = [
+        Task(f"argument {i}", None, None, {r"%relativeLocation%": "testfile"})
+        for i in range(2)
+    ]
+
+    with mock.patch.object(dispatcher, "start"):
+        for task in tasks:
+            backend.submit_task(simple_job, task)
+    dispatcher.poll_once()
+    healthy_batch, failed_batch = backend.pending_gearman_jobs[simple_job.uuid]
+
+    assert isinstance(failed_batch.future.exception(), gearman.errors.ConnectionError)
+    assert not healthy_batch.future.done()
+    assert list(dispatcher.in_flight) == [healthy]
+
+    def mock_jobs_completed(job_requests, **kwargs):
+        healthy.state = gearman.JOB_COMPLETE
+        healthy.result = format_gearman_response([(tasks[0].uuid, {"exitCode": 0})])
+        return job_requests
+
+    mock_client.return_value.wait_until_any_job_completed.side_effect = (
+        mock_jobs_completed
+    )
+    dispatcher.poll_once()
+
+    assert healthy_batch.future.result().complete
+    with pytest.raises(gearman.errors.ConnectionError):
+        list(backend.wait_for_results(simple_job))
+    # The lost batch leaves the gauge too, although it is never collected
+    assert active_jobs_gauge.inc.call_count == 2
+    assert active_jobs_gauge.dec.call_count == 2
@@ -2,12 +2,10 @@ import concurrent.futures
 import os
 import threading
 import uuid
-from io import StringIO
 from unittest import mock
 
 import pytest
 from django.utils import timezone
-from lxml import etree
 
 from archivematica.dashboard.main import models
 from archivematica.MCPServer.server.jobs import DirectoryClientScriptJob
@@ -27,20 +25,10 @@ from archivematica.MCPServer.server.workflow import load as load_workflow
 FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
 INTEGRATION_TEST_PATH = os.path.join(FIXTURES_DIR, "workflow-integration-test.json")
 DEFAULT_STORAGE_LOCATION = "/api/v2/location/default/"
-TEST_PROCESSING_CONFIG = etree.parse(
-    StringIO(
-        """<processingMCP>
-  <preconfiguredChoices>
-    <!-- Store DIP -->
-    <preconfiguredChoice>
-      <appliesTo>de6eb412-0029-4dbd-9bfa-7311697d6012</appliesTo>
-      <goToChain>51e395b9-1b74-419c-b013-3283b7fe39ff</goToChain>
-    </preconfiguredChoice>
-  </preconfiguredChoices>
-</processingMCP>
-"""
-    )
-)
+TEST_PRECONFIGURED_CHOICES = {
+    # Store DIP
+    "de6eb412-0029-4dbd-9bfa-7311697d6012": "51e395b9-1b74-419c-b013-3283b7fe39ff",
+}
 
 
 class EchoBackend(TaskBackend):
@@ -95,13 +83,13 @@ def dummy_file_replacements(request):
 
 
 @pytest.mark.django_db(transaction=True)
-@mock.patch("archivematica.MCPServer.server.jobs.decisions.load_processing_xml")
+@mock.patch("archivematica.MCPServer.server.jobs.decisions.load_preconfigured_choices")
 @mock.patch("archivematica.MCPServer.server.jobs.decisions.load_preconfigured_choice")
 @mock.patch("archivematica.MCPServer.server.jobs.client.get_task_backend")
 def test_workflow_integration(
     mock_get_task_backend,
     mock_load_preconfigured_choice,
-    mock_load_processing_xml,
+    mock_load_preconfigured_choices,
     settings,
     tmp_path,
     workflow,
@@ -218,7 +206,7 @@ def test_workflow_integration(
         assert job.job_chain.chain.id == "7b814362-c679-43c4-a2e2-1ba59957cd18"
 
         # Setup preconfigured choice for next job
-        mock_load_processing_xml.return_value = TEST_PROCESSING_CONFIG
+        mock_load_preconfigured_choices.return_value = TEST_PRECONFIGURED_CHOICES
 
         # Process the sixth job (UpdateContextDecisionJob)
         future = package_queue.process_one_job(timeout=1.0)
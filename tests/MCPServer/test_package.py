@@ -1,3 +1,5 @@
+import os
+import time
 import uuid
 from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
@@ -10,6 +12,7 @@ from archivematica.dashboard.main import models
 from archivematica.MCPServer.server.packages import DIP
 from archivematica.MCPServer.server.packages import SIP
 from archivematica.MCPServer.server.packages import Package
+from archivematica.MCPServer.server.packages import PackageFileInventory
 from archivematica.MCPServer.server.packages import Transfer
 from archivematica.MCPServer.server.packages import _determine_transfer_paths
 from archivematica.MCPServer.server.packages import _move_to_internal_shared_dir
@@ -430,3 +433,112 @@ def test_create_package(tmp_path, admin_user, settings):
 
     # Verify a transfer was added.
     assert models.Transfer.objects.count() == 1
+
+
+def _age(path, seconds=60):
+    """Backdate the mtime of a path so its listing can be cached."""
+    mtime = time.time() - seconds
+    os.utime(path, (mtime, mtime))
+
+
+def test_package_file_inventory_lists_files_like_os_walk(tmp_path):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "a" / "b").mkdir()
+    (tmp_path / "c").mkdir()
+    for path in ("f1", "a/f2", "a/b/f3", "c/f4"):
+        (tmp_path / path).touch()
+    (tmp_path / "link").symlink_to(tmp_path / "a")
+
+    expected = [
+        os.path.join(basedir, file_name)
+        for basedir, _, file_names in os.walk(str(tmp_path))
+        for file_name in file_names
+    ]
+
+    assert PackageFileInventory().files(str(tmp_path)) == expected
+
+
+def test_package_file_inventory_reuses_unchanged_listings(tmp_path):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "a" / "f1").touch()
+    _age(tmp_path / "a")
+    _age(tmp_path)
+    inventory = PackageFileInventory()
+
+    assert inventory.files(str(tmp_path)) == [str(tmp_path / "a" / "f1")]
+
+    with mock.patch(
+        "archivematica.MCPServer.server.packages.os.scandir", side_effect=os.scandir
+    ) as scandir:
+        assert inventory.files(str(tmp_path)) == [str(tmp_path / "a" / "f1")]
+        scandir.assert_not_called()
+
+        # Adding a file changes the directory mtime, so it is listed again
+        (tmp_path / "a" / "f2").touch()
+        assert sorted(inventory.files(str(tmp_path))) == [
+            str(tmp_path / "a" / "f1"),
+            str(tmp_path / "a" / "f2"),
+        ]
+        scandir.assert_called_once_with(str(tmp_path / "a"))
+
+
+def test_package_file_inventory_does_not_cache_recently_modified_dirs(tmp_path):
+    (tmp_path / "f1").touch()
+    inventory = PackageFileInventory()
+
+    inventory.files(str(tmp_path))
+
+    assert inventory.directories == {}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_package_files_skips_database_rows_missing_from_disk(tmp_path):
+    transfer_uuid = uuid.uuid4()
+    transfer_path = tmp_path / f"test-transfer-{transfer_uuid}"
+    transfer = Transfer.get_or_create_from_db_by_path(str(transfer_path))
+    transfer_path.mkdir()
+    (transfer_path / "on_disk.txt").touch()
+    models.File.objects.create(
+        uuid=uuid.uuid4(),
+        currentlocation=bytes(Path(transfer.REPLACEMENT_PATH_STRING, "missing.txt")),
+        filegrpuse="original",
+        transfer_id=transfer_uuid,
+    )
+
+    result = list(transfer.files())
+
+    assert result == [
+        {
+            r"%relativeLocation%": str(transfer_path / "on_disk.txt"),
+            r"%fileUUID%": "None",
+            r"%fileGrpUse%": "",
+        }
+    ]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_package_files_keeps_rows_through_symlinks_and_duplicates(tmp_path):
+    transfer_uuid = uuid.uuid4()
+    transfer_path = tmp_path / f"test-transfer-{transfer_uuid}"
+    transfer = Transfer.get_or_create_from_db_by_path(str(transfer_path))
+    (transfer_path / "objects").mkdir(parents=True)
+    (transfer_path / "objects" / "file.txt").touch()
+    (transfer_path / "linked").symlink_to(transfer_path / "objects")
+    file_uuids = [uuid.uuid4() for _ in range(3)]
+    for file_uuid, location in zip(
+        file_uuids, ("objects/file.txt", "objects/file.txt", "linked/file.txt")
+    ):
+        models.File.objects.create(
+            uuid=file_uuid,
+            currentlocation=bytes(Path(transfer.REPLACEMENT_PATH_STRING, location)),
+            filegrpuse="original",
+            transfer_id=transfer_uuid,
+        )
+
+    result = list(transfer.files())
+
+    # Like the os.path.exists check this replaced, every row for a file on
+    # disk is returned, and the file is not returned again as untracked.
+    assert sorted(entry[r"%fileUUID%"] for entry in result) == sorted(
+        str(file_uuid) for file_uuid in file_uuids
+    )
@@ -1,13 +1,18 @@
 import importlib.resources
+import os
+import uuid
 from unittest import mock
 
 import pytest
 
 from archivematica.MCPServer.server.processing_config import ChainChoicesField
+from archivematica.MCPServer.server.processing_config import PreconfiguredChoicesCache
 from archivematica.MCPServer.server.processing_config import ReplaceDictField
 from archivematica.MCPServer.server.processing_config import SharedChainChoicesField
 from archivematica.MCPServer.server.processing_config import StorageLocationField
 from archivematica.MCPServer.server.processing_config import get_processing_fields
+from archivematica.MCPServer.server.processing_config import load_preconfigured_choice
+from archivematica.MCPServer.server.processing_config import load_processing_xml
 from archivematica.MCPServer.server.processing_config import (
     processing_configuration_file_exists,
 )
@@ -424,3 +429,113 @@ def test_processing_configuration_file_exists_with_nonexistent_file(isfile, logg
     logger.debug.assert_called_once_with(
         "Processing configuration file for %s does not exist", "bogus.xml"
     )
+
+
+PROCESSING_XML_TEMPLATE = """<processingMCP>
+  <preconfiguredChoices>
+    <preconfiguredChoice>
+      <appliesTo>de6eb412-0029-4dbd-9bfa-7311697d6012</appliesTo>
+      <goToChain>{}</goToChain>
+    </preconfiguredChoice>
+    <preconfiguredChoice>
+      <appliesTo>b320ce81-9982-408a-9502-097d0daa48fa</appliesTo>
+      <goToChain>/api/v2/location/default/</goToChain>
+    </preconfiguredChoice>
+    <preconfiguredChoice>
+      <appliesTo>b320ce81-9982-408a-9502-097d0daa48fa</appliesTo>
+      <goToChain>/api/v2/location/other/</goToChain>
+    </preconfiguredChoice>
+  </preconfiguredChoices>
+</processingMCP>
+"""
+
+
+@pytest.fixture
+def processing_xml(settings, tmp_path):
+    path = tmp_path / settings.PROCESSING_XML_FILE
+    path.write_text(PROCESSING_XML_TEMPLATE.format("chain-1"))
+
+    return path
+
+
+def test_preconfigured_choices_cache_maps_link_to_choice(processing_xml, tmp_path):
+    cache = PreconfiguredChoicesCache()
+
+    choices = cache.get(str(tmp_path))
+
+    assert choices == {
+        "de6eb412-0029-4dbd-9bfa-7311697d6012": "chain-1",
+        # The last matching entry wins.
+        "b320ce81-9982-408a-9502-097d0daa48fa": "/api/v2/location/other/",
+    }
+
+
+def test_preconfigured_choices_cache_parses_once(processing_xml, tmp_path):
+    cache = PreconfiguredChoicesCache()
+
+    with mock.patch(
+        "archivematica.MCPServer.server.processing_config.load_processing_xml",
+        wraps=load_processing_xml,
+    ) as load:
+        first = cache.get(str(tmp_path))
+        second = cache.get(str(tmp_path))
+
+    assert first is second
+    load.assert_called_once_with(str(tmp_path))
+
+
+def test_preconfigured_choices_cache_reloads_modified_file(processing_xml, tmp_path):
+    cache = PreconfiguredChoicesCache()
+    assert cache.get(str(tmp_path))["de6eb412-0029-4dbd-9bfa-7311697d6012"] == (
+        "chain-1"
+    )
+
+    processing_xml.write_text(PROCESSING_XML_TEMPLATE.format("chain-22"))
+    stat_result = processing_xml.stat()
+    os.utime(
+        processing_xml, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns + 10**9)
+    )
+
+    assert cache.get(str(tmp_path))["de6eb412-0029-4dbd-9bfa-7311697d6012"] == (
+        "chain-22"
+    )
+
+
+def test_preconfigured_choices_cache_handles_missing_file(processing_xml, tmp_path):
+    cache = PreconfiguredChoicesCache()
+    assert cache.get(str(tmp_path))
+
+    processing_xml.unlink()
+
+    assert cache.get(str(tmp_path)) == {}
+    assert cache.entries == {}
+
+
+def test_preconfigured_choices_cache_is_bounded(settings, tmp_path):
+    cache = PreconfiguredChoicesCache(max_entries=2)
+    for name in ("a", "b", "c"):
+        package_path = tmp_path / name
+        package_path.mkdir()
+        (package_path / settings.PROCESSING_XML_FILE).write_text(
+            PROCESSING_XML_TEMPLATE.format(name)
+        )
+        cache.get(str(package_path))
+
+    assert [os.path.basename(os.path.dirname(path)) for path in cache.entries] == [
+        "b",
+        "c",
+    ]
+
+
+def test_load_preconfigured_choice(processing_xml, tmp_path):
+    with mock.patch(
+        "archivematica.MCPServer.server.processing_config.preconfigured_choices_cache",
+        PreconfiguredChoicesCache(),
+    ):
+        assert (
+            load_preconfigured_choice(
+                str(tmp_path), uuid.UUID("de6eb412-0029-4dbd-9bfa-7311697d6012")
+            )
+            == "chain-1"
+        )
+        assert load_preconfigured_choice(str(tmp_path), "unknown") is None
@@ -1,6 +1,7 @@
 import importlib.resources
 import threading
 import uuid
+from datetime import timedelta
 from unittest import mock
 
 import pytest
@@ -34,3 +35,124 @@ def test_approve_partial_reingest_handler():
     server._approve_partial_reingest_handler(None, wf, {"sip_uuid": sip.pk})
 
     package_queue.decide.assert_called_once()
+
+
+@pytest.fixture
+def workflow_():
+    with open(
+        importlib.resources.files("archivematica.MCPServer")
+        / "assets"
+        / "workflow.json"
+    ) as fp:
+        return workflow.load(fp)
+
+
+@pytest.fixture
+def server(workflow_):
+    package_queue = mock.MagicMock()
+    package_queue.jobs_awaiting_decisions.return_value = {}
+    shutdown_event = threading.Event()
+    shutdown_event.set()
+
+    return rpc_server.RPCServer(workflow_, shutdown_event, package_queue, None)
+
+
+LINK_ID = "3229e01f-adf3-4294-85f7-4acb01b3fbcf"
+
+
+def create_unit_job(unit, unit_type, createdtime, **kwargs):
+    return models.Job.objects.create(
+        sipuuid=unit.pk,
+        unittype=unit_type,
+        createdtime=createdtime,
+        createdtimedec="0.5",
+        directory=f"%sharedPath%watchedDirectories/{unit.pk}/",
+        microservicechainlink=LINK_ID,
+        currentstep=models.Job.STATUS_COMPLETED_SUCCESSFULLY,
+        **kwargs,
+    )
+
+
+@pytest.mark.django_db
+def test_units_statuses_handler(server, django_assert_max_num_queries):
+    now = timezone.now()
+    transfer_1 = models.Transfer.objects.create(
+        status=models.PACKAGE_STATUS_PROCESSING, access_system_id="AtoM-1"
+    )
+    transfer_2 = models.Transfer.objects.create(
+        status=models.PACKAGE_STATUS_DONE, access_system_id="AtoM-2"
+    )
+    hidden_transfer = models.Transfer.objects.create(hidden=True)
+    sip = models.SIP.objects.create(status=models.PACKAGE_STATUS_DONE)
+    models.File.objects.create(sip=sip, transfer=transfer_2)
+    for unit in (transfer_1, transfer_2, hidden_transfer):
+        create_unit_job(unit, "unitTransfer", now - timedelta(minutes=1))
+    latest_job = create_unit_job(transfer_1, "unitTransfer", now)
+    create_unit_job(sip, "unitSIP", now)
+
+    with django_assert_max_num_queries(3):
+        result = server._units_statuses_handler(
+            None, None, {"type": "Transfer", "lang": "en"}
+        )
+
+    assert sorted(item["uuid"] for item in result) == sorted(
+        [str(transfer_1.pk), str(transfer_2.pk)]
+    )
+    item = next(item for item in result if item["uuid"] == str(transfer_1.pk))
+    assert item["active"] is True
+    assert item["directory"] == str(transfer_1.pk)
+    assert item["timestamp"] == rpc_server._job_timestamp(latest_job)
+    assert [job["uuid"] for job in item["jobs"]][0] == str(latest_job.pk)
+    assert len(item["jobs"]) == 2
+    assert "access_system_id" not in item
+
+    with django_assert_max_num_queries(4):
+        result = server._units_statuses_handler(
+            None, None, {"type": "SIP", "lang": "en"}
+        )
+
+    assert len(result) == 1
+    assert result[0]["uuid"] == str(sip.pk)
+    assert result[0]["active"] is False
+    assert result[0]["access_system_id"] == "AtoM-2"
+
+
+@pytest.mark.django_db
+def test_units_statuses_handler_changed_since(server):
+    now = timezone.now()
+    since = now - timedelta(minutes=5)
+    old = since - timedelta(hours=1)
+    processing = models.Transfer.objects.create(status=models.PACKAGE_STATUS_PROCESSING)
+    completed_recently = models.Transfer.objects.create(
+        status=models.PACKAGE_STATUS_DONE, completed_at=now
+    )
+    with_new_jobs = models.Transfer.objects.create(
+        status=models.PACKAGE_STATUS_DONE, completed_at=old
+    )
+    unchanged = models.Transfer.objects.create(
+        status=models.PACKAGE_STATUS_DONE, completed_at=old
+    )
+    for unit in (processing, completed_recently, with_new_jobs, unchanged):
+        create_unit_job(unit, "unitTransfer", old)
+    create_unit_job(with_new_jobs, "unitTransfer", now)
+
+    result = server._units_statuses_handler(
+        None,
+        None,
+        {"type": "Transfer", "lang": "en", "changed_since": since.timestamp()},
+    )
+
+    assert sorted(item["uuid"] for item in result) == sorted(
+        str(unit.pk) for unit in (processing, completed_recently, with_new_jobs)
+    )
+    # All the jobs of a changed unit are included.
+    item = next(item for item in result if item["uuid"] == str(with_new_jobs.pk))
+    assert len(item["jobs"]) == 2
+
+
+@pytest.mark.django_db
+def test_units_statuses_handler_rejects_invalid_changed_since(server):
+    with pytest.raises(rpc_server.UnexpectedPayloadError):
+        server._units_statuses_handler(
+            None, None, {"type": "SIP", "lang": "en", "changed_since": "yesterday"}
+        )
@@ -0,0 +1,161 @@
+import datetime
+import uuid
+
+import pytest
+from django.utils import timezone
+
+from archivematica.dashboard.main import models
+from archivematica.MCPServer.server.jobs import Job
+from archivematica.MCPServer.server.packages import SIP
+from archivematica.MCPServer.server.packages import Transfer
+from archivematica.MCPServer.server.workflow import Link
+
+
+class MockJob(Job):
+    def run(self, *args, **kwargs):
+        pass
+
+
+def make_job(package, description, group):
+    link = Link(
+        uuid.uuid4(),
+        {
+            "config": {
+                "@manager": "linkTaskManagerDirectory",
+                "@model": "StandardTaskConfig",
+                "execute": "testLink_v0",
+            },
+            "description": {"en": description},
+            "group": {"en": group},
+            "exit_codes": {"0": {"job_status": "Completed successfully"}},
+            "fallback_job_status": "Failed",
+        },
+        object(),
+    )
+    return MockJob(None, link, package)
+
+
+def assert_recorded_status(package):
+    """The status recorded job by job is the one computed from all jobs."""
+    recorded = models.UnitStatus.objects.get(
+        unit_uuid=package.uuid, unit_type=package.JOB_UNIT_TYPE
+    )
+    computed = models.UnitStatus.objects.from_jobs(package.uuid, package.JOB_UNIT_TYPE)
+    assert recorded.to_dict() == computed.to_dict()
+
+    return recorded.to_dict()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_jobs_record_the_status_of_a_transfer(tmp_path):
+    transfer = Transfer(str(tmp_path), uuid.uuid4())
+    transfer_model = models.Transfer.objects.create(uuid=transfer.uuid)
+
+    job = make_job(transfer, "Approve standard transfer", "Approve transfer")
+    job.save_to_db()
+    assert assert_recorded_status(transfer) == {
+        "status": "PROCESSING",
+        "microservice": "Approve standard transfer",
+    }
+    job.mark_awaiting_decision()
+    assert assert_recorded_status(transfer)["status"] == "USER_INPUT"
+    job.mark_complete()
+    assert assert_recorded_status(transfer)["status"] == "PROCESSING"
+
+    job = make_job(
+        transfer, "Create SIP from transfer objects", "Create SIP from Transfer"
+    )
+    job.save_to_db()
+    assert assert_recorded_status(transfer)["status"] == "PROCESSING"
+    sip_model = models.SIP.objects.create()
+    models.File.objects.create(transfer=transfer_model, sip=sip_model)
+    job.mark_complete()
+    assert assert_recorded_status(transfer) == {
+        "status": "COMPLETE",
+        "microservice": "Create SIP from transfer objects",
+        "sip_uuid": str(sip_model.uuid),
+    }
+
+    make_job(
+        transfer,
+        "Move to SIP creation directory for completed transfers",
+        "Create SIP from Transfer",
+    ).save_to_db()
+    assert assert_recorded_status(transfer)["sip_uuid"] == str(sip_model.uuid)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_jobs_record_the_status_of_a_failed_transfer(tmp_path):
+    transfer = Transfer(str(tmp_path), uuid.uuid4())
+
+    make_job(
+        transfer, "Move transfer to backlog", "Create SIP from Transfer"
+    ).save_to_db()
+    assert assert_recorded_status(transfer)["sip_uuid"] == "BACKLOG"
+
+    make_job(transfer, "Move to the failed directory", "Failed transfer").save_to_db()
+    assert assert_recorded_status(transfer)["status"] == "FAILED"
+
+
+@pytest.mark.django_db(transaction=True)
+def test_jobs_record_the_status_of_a_sip_stored_before_its_last_job(tmp_path):
+    sip = SIP(str(tmp_path), uuid.uuid4())
+
+    clean_up = make_job(sip, "Clean up after storing AIP", "Store AIP")
+    remove = make_job(sip, "Remove the processing directory", "Store AIP")
+    # See https://github.com/archivematica/Issues/issues/262.
+    clean_up.created_at = remove.created_at - datetime.timedelta(seconds=1)
+    remove.save_to_db()
+    clean_up.save_to_db()
+
+    # The recorded microservice is the job run last, not the one created last.
+    assert models.UnitStatus.objects.get(unit_uuid=sip.uuid).to_dict() == {
+        "status": "COMPLETE",
+        "microservice": "Clean up after storing AIP",
+    }
+    assert models.UnitStatus.objects.from_jobs(sip.uuid, "unitSIP").status == (
+        "COMPLETE"
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_package_status_changes_reconcile_the_recorded_status(tmp_path):
+    transfer = Transfer(str(tmp_path), uuid.uuid4())
+    models.Transfer.objects.create(uuid=transfer.uuid)
+    transfer.mark_as_processing()
+
+    assert not models.UnitStatus.objects.exists()
+
+    models.Job.objects.create(
+        sipuuid=transfer.uuid,
+        unittype="unitTransfer",
+        createdtime=timezone.now(),
+        jobtype="Move to the rejected directory",
+        microservicegroup="Reject transfer",
+    )
+    transfer.mark_as_done()
+
+    assert assert_recorded_status(transfer)["status"] == "REJECTED"
+
+
+@pytest.mark.django_db(transaction=True)
+def test_every_change_gets_a_new_sequence_number(tmp_path):
+    transfer = Transfer(str(tmp_path), uuid.uuid4())
+    sip = SIP(str(tmp_path), uuid.uuid4())
+
+    transfer_job = make_job(transfer, "Approve standard transfer", "Approve transfer")
+    transfer_job.save_to_db()
+    make_job(sip, "Normalize for preservation", "Normalize").save_to_db()
+    transfer_job.mark_awaiting_decision()
+
+    changes = list(models.UnitStatus.objects.changed_since(0))
+    assert [(change.unit_uuid, change.status) for change in changes] == [
+        (sip.uuid, "PROCESSING"),
+        (transfer.uuid, "USER_INPUT"),
+    ]
+    assert changes[0].sequence < changes[1].sequence
+    assert changes[1].job_uuid == transfer_job.uuid
+
+    # Reconciling a status that did not change is not a change.
+    transfer.mark_as_processing()
+    assert not models.UnitStatus.objects.changed_since(changes[1].sequence).exists()
@@ -0,0 +1,151 @@
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from archivematica.MCPServer.server import watch_dirs
+
+SETTLE_TIME = 0.2
+
+
+@pytest.fixture
+def watched_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(watch_dirs, "WATCHED_BASE_DIR", str(tmp_path))
+    (tmp_path / "activeTransfers").mkdir()
+
+    return SimpleNamespace(path="/activeTransfers", only_dirs=False)
+
+
+@pytest.fixture
+def watcher(watched_dir):
+    reported = []
+    watcher = watch_dirs.InotifyWatcher(
+        [watched_dir],
+        lambda path, watched_dir: reported.append(os.path.basename(path)),
+        SETTLE_TIME,
+    )
+    watcher.reported_names = reported
+    watcher.start()
+
+    yield watcher
+
+    watcher.close()
+
+
+def settle(watcher):
+    watcher.step(0.05)
+    time.sleep(SETTLE_TIME * 1.5)
+    watcher.step(0.05)
+
+
+def test_existing_entries_are_reported_on_start(tmp_path, watched_dir):
+    (tmp_path / "activeTransfers" / "transfer").mkdir()
+    reported = []
+    watcher = watch_dirs.InotifyWatcher(
+        [watched_dir], lambda path, _: reported.append(path), SETTLE_TIME
+    )
+
+    watcher.start()
+    watcher.close()
+
+    assert reported == [str(tmp_path / "activeTransfers" / "transfer")]
+
+
+def test_entries_moved_in_are_reported_straight_away(tmp_path, watcher):
+    (tmp_path / "transfer").mkdir()
+    (tmp_path / "transfer" / "file.txt").write_text("data")
+
+    os.rename(tmp_path / "transfer", tmp_path / "activeTransfers" / "transfer")
+    watcher.step(0.05)
+
+    assert watcher.reported_names == ["transfer"]
+
+
+def test_created_files_are_reported_once_closed_and_settled(tmp_path, watcher):
+    with open(tmp_path / "activeTransfers" / "file.txt", "w") as f:
+        f.write("data")
+        f.flush()
+        settle(watcher)
+
+        assert watcher.reported_names == []
+
+    watcher.step(0.05)
+    assert watcher.reported_names == []
+
+    settle(watcher)
+    assert watcher.reported_names == ["file.txt"]
+
+
+def test_links_are_reported_once_settled(tmp_path, watcher):
+    (tmp_path / "file.txt").write_text("data")
+    os.symlink(tmp_path / "file.txt", tmp_path / "activeTransfers" / "symlink")
+    os.link(tmp_path / "file.txt", tmp_path / "activeTransfers" / "hardlink")
+    transfer = tmp_path / "activeTransfers" / "transfer"
+    transfer.mkdir()
+    watcher.step(0.05)
+    os.symlink(tmp_path / "file.txt", transfer / "symlink")
+    os.link(tmp_path / "file.txt", transfer / "hardlink")
+    settle(watcher)
+
+    assert sorted(watcher.reported_names) == ["hardlink", "symlink", "transfer"]
+
+
+def test_created_directories_are_reported_once_their_contents_settle(tmp_path, watcher):
+    transfer = tmp_path / "activeTransfers" / "transfer"
+    transfer.mkdir()
+    watcher.step(0.05)
+    (transfer / "objects").mkdir()
+    watcher.step(0.05)
+
+    with open(transfer / "objects" / "file.txt", "w") as f:
+        f.write("data")
+        f.flush()
+        settle(watcher)
+
+        assert watcher.reported_names == []
+
+    settle(watcher)
+    assert watcher.reported_names == ["transfer"]
+
+    # Later writes do not report it again.
+    (transfer / "objects" / "other.txt").write_text("data")
+    settle(watcher)
+    assert watcher.reported_names == ["transfer"]
+
+
+def test_entries_are_reported_again_after_being_moved_out(tmp_path, watcher):
+    transfer = tmp_path / "activeTransfers" / "transfer"
+    transfer.mkdir()
+    settle(watcher)
+
+    os.rename(transfer, tmp_path / "transfer")
+    watcher.step(0.05)
+    os.rename(tmp_path / "transfer", transfer)
+    watcher.step(0.05)
+
+    assert watcher.reported_names == ["transfer", "transfer"]
+
+
+def test_reconciliation_finds_entries_missed_by_inotify(tmp_path, watcher):
+    (tmp_path / "activeTransfers" / "transfer").mkdir()
+    # Drop the events, like NFS does for changes made by other hosts.
+    watcher.inotify.read(timeout=50)
+    settle(watcher)
+
+    assert watcher.reported_names == []
+
+    watcher.reconcile_interval = 0
+    settle(watcher)
+
+    assert watcher.reported_names == ["transfer"]
+
+
+def test_only_dirs_ignores_files(tmp_path, watched_dir, watcher):
+    watched_dir.only_dirs = True
+    (tmp_path / "activeTransfers" / "file.txt").write_text("data")
+    (tmp_path / "activeTransfers" / "transfer").mkdir()
+    watcher.reconcile_interval = 0
+    settle(watcher)
+
+    assert watcher.reported_names == ["transfer"]
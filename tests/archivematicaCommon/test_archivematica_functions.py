@@ -1,9 +1,13 @@
+import hashlib
 from unittest.mock import patch
 
 import bagit
 import pytest
+from django.db import transaction
 
 from archivematica.archivematicaCommon import archivematicaFunctions as am
+from archivematica.dashboard.main.models import DashboardSetting
+from archivematica.dashboard.main.models import DashboardSettingRevision
 
 
 def test_find_mets_file_match(tmp_path):
@@ -74,6 +78,127 @@ def test_get_bag_size_bag_missing_oxum(tmpdir):
         mock_os_path.getsize.assert_called()
 
 
+@pytest.mark.parametrize("use_mmap", [False, True], ids=["read", "mmap"])
+@pytest.mark.parametrize(
+    "content",
+    [b"", b"archivematica", b"x" * (am.CHECKSUM_BUFFER_SIZE * 2 + 7)],
+    ids=["empty", "small", "multiple_buffers"],
+)
+@pytest.mark.parametrize("algorithm", ["sha256", "md5"])
+def test_get_file_checksum(tmp_path, content, use_mmap, algorithm):
+    path = tmp_path / "file.bin"
+    path.write_bytes(content)
+
+    assert (
+        am.get_file_checksum(str(path), algorithm, use_mmap=use_mmap)
+        == hashlib.new(algorithm, content).hexdigest()
+    )
+
+
+@pytest.mark.django_db
+def test_dashboard_settings_cache_reads_settings_once(django_assert_num_queries):
+    DashboardSetting.objects.create(name="checksum_type", value="md5")
+    DashboardSetting.objects.create(scope="handle", name="checksum_type", value="x")
+    cache = am.DashboardSettingsCache(ttl=60)
+
+    # One query for the revision and one for the settings.
+    with django_assert_num_queries(2):
+        for _ in range(3):
+            assert cache.get("checksum_type", "sha256") == "md5"
+            assert cache.get("missing", "default") == "default"
+
+
+@pytest.mark.django_db
+def test_dashboard_settings_cache_without_ttl_reads_one_setting(
+    django_assert_num_queries,
+):
+    DashboardSetting.objects.create(name="checksum_type", value="md5")
+    DashboardSetting.objects.create(scope="handle", name="checksum_type", value="x")
+    DashboardSetting.objects.create(scope="handle", name="other", value="y")
+    cache = am.DashboardSettingsCache(ttl=0)
+
+    with django_assert_num_queries(3) as captured:
+        assert cache.get("checksum_type", "sha256") == "md5"
+        assert cache.get("other") == "y"
+        assert cache.get("missing", "default") == "default"
+    assert all("WHERE" in query["sql"] for query in captured.captured_queries)
+    assert cache.values is None
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("ttl", [0, 60], ids=["uncached", "cached"])
+def test_dashboard_settings_cache_gets_many_settings_in_one_query(
+    ttl, django_assert_max_num_queries
+):
+    DashboardSetting.objects.create(name="checksum_type", value="md5")
+    DashboardSetting.objects.create(scope="handle", name="checksum_type", value="x")
+    DashboardSetting.objects.create(name="storage_service_user", value="user")
+    cache = am.DashboardSettingsCache(ttl=ttl)
+
+    # The revision is read too when caching.
+    with django_assert_max_num_queries(1 if ttl <= 0 else 2):
+        assert cache.get_many(
+            {"checksum_type": "sha256", "storage_service_user": "", "missing": None}
+        ) == {"checksum_type": "md5", "storage_service_user": "user", "missing": None}
+
+
+@pytest.mark.django_db
+def test_dashboard_settings_cache_expires(monkeypatch):
+    setting = DashboardSetting.objects.create(name="checksum_type", value="md5")
+    now = 1000.0
+    monkeypatch.setattr(am.time, "monotonic", lambda: now)
+    cache = am.DashboardSettingsCache(ttl=60)
+    assert cache.get("checksum_type") == "md5"
+
+    # Simulate a change made by another process.
+    DashboardSetting.objects.filter(pk=setting.pk).update(value="sha512")
+    DashboardSettingRevision.bump()
+    assert cache.get("checksum_type") == "md5"
+
+    now += 61
+    assert cache.get("checksum_type") == "sha512"
+
+
+@pytest.mark.django_db
+def test_dashboard_settings_cache_keeps_settings_of_same_revision(
+    monkeypatch, django_assert_num_queries
+):
+    DashboardSetting.objects.create(name="checksum_type", value="md5")
+    now = 1000.0
+    monkeypatch.setattr(am.time, "monotonic", lambda: now)
+    cache = am.DashboardSettingsCache(ttl=60)
+    assert cache.get("checksum_type") == "md5"
+
+    now += 61
+    with django_assert_num_queries(1):
+        assert cache.get("checksum_type") == "md5"
+        assert cache.get("checksum_type") == "md5"
+
+
+@pytest.mark.django_db
+def test_dashboard_settings_revision_is_bumped_by_changes():
+    revision = DashboardSettingRevision.current()
+
+    DashboardSetting.objects.set_dict("handle", {"resolver_url": "http://x"})
+    assert DashboardSettingRevision.current() == revision + 1
+
+    DashboardSetting.objects.get(scope="handle", name="resolver_url").delete()
+    assert DashboardSettingRevision.current() == revision + 2
+
+
+@pytest.mark.django_db
+def test_get_setting_is_invalidated_by_signals(settings):
+    settings.DASHBOARD_SETTINGS_CACHE_TTL = 60
+    am.dashboard_settings_cache.invalidate()
+    assert am.get_setting("checksum_type", "sha256") == "sha256"
+
+    setting = DashboardSetting.objects.create(name="checksum_type", value="md5")
+    assert am.get_setting("checksum_type", "sha256") == "md5"
+
+    setting.delete()
+    assert am.get_setting("checksum_type", "sha256") == "sha256"
+
+
 def test_package_name_from_path():
     """Test that package_name_from_path returns expected results."""
     test_packages = [
@@ -235,3 +360,40 @@ def test_get_oidc_secondary_providers_capitalizes_provider_names(
             "OIDC_ROLE_CLAIM_DEFAULT": "default",
         },
     }
+
+
+@pytest.mark.django_db
+def test_dashboard_settings_cache_ignores_rolled_back_changes(settings):
+    settings.DASHBOARD_SETTINGS_CACHE_TTL = 60
+    am.dashboard_settings_cache.invalidate()
+    assert am.get_setting("checksum_type", "sha256") == "sha256"
+
+    with pytest.raises(RuntimeError):
+        with transaction.atomic():
+            DashboardSetting.objects.create(name="checksum_type", value="md5")
+            # The writer sees its own change, without caching it.
+            assert am.get_setting("checksum_type", "sha256") == "md5"
+            raise RuntimeError("rollback")
+
+    assert am.get_setting("checksum_type", "sha256") == "sha256"
+
+
+@pytest.mark.django_db
+def test_dashboard_settings_cache_is_invalidated_on_commit(
+    settings, django_capture_on_commit_callbacks
+):
+    settings.DASHBOARD_SETTINGS_CACHE_TTL = 60
+    cache = am.dashboard_settings_cache
+
+    with django_capture_on_commit_callbacks() as callbacks:
+        DashboardSetting.objects.create(name="checksum_type", value="md5")
+    # Other threads can cache the settings until the change is committed.
+    assert cache.get("checksum_type", "sha256") == "md5"
+    cache.values = {}
+    cache.loaded_at = am.time.monotonic()
+
+    for callback in callbacks:
+        callback()
+
+    assert cache.values is None
+    assert cache.get("checksum_type", "sha256") == "md5"
@@ -5,6 +5,7 @@ import pytest
 from django.test import TestCase
 
 from archivematica.archivematicaCommon import databaseFunctions
+from archivematica.dashboard.main.models import Derivation
 from archivematica.dashboard.main.models import Event
 from archivematica.dashboard.main.models import File
 
@@ -153,3 +154,93 @@ class TestDatabaseFunctions(TestCase):
         ).agents
         assert agents.get(id=2)
         assert agents.get(id=5)
+
+    # getAMAgentsForFiles
+
+    def test_get_agents_for_files_matches_get_agent_for_file(self):
+        file_uuids = [
+            "88c8f115-80bc-4da4-a1e6-0158f5df13b9",
+            "1f4af873-8d60-4907-a92e-d1889e643524",
+            "dc569efe-c88f-4be3-94d3-d9eac0c5d410",
+            "d4e599bd-f9ab-48d4-9ae7-9e87d4ac1619",
+        ]
+        agents = databaseFunctions.getAMAgentsForFiles(
+            [*file_uuids, str(uuid.uuid4()), "None"]
+        )
+
+        assert agents == {
+            file_uuid: list(databaseFunctions.getAMAgentsForFile(file_uuid))
+            for file_uuid in file_uuids
+        }
+
+    # bulkInsertIntoEvents
+
+    def test_bulk_insert_into_events(self):
+        sip_file = "88c8f115-80bc-4da4-a1e6-0158f5df13b9"
+        transfer_file = "1f4af873-8d60-4907-a92e-d1889e643524"
+        event_ids = [str(uuid.uuid4()) for _ in range(3)]
+
+        events = databaseFunctions.bulkInsertIntoEvents(
+            [
+                {
+                    "fileUUID": sip_file,
+                    "eventIdentifierUUID": event_ids[0],
+                    "eventType": "virus check",
+                    "eventOutcome": "Pass",
+                },
+                {
+                    "fileUUID": transfer_file,
+                    "eventIdentifierUUID": event_ids[1],
+                },
+                {
+                    "fileUUID": transfer_file,
+                    "eventIdentifierUUID": event_ids[2],
+                    "agents": [2],
+                },
+            ]
+        )
+
+        assert [str(event.event_id) for event in events] == event_ids
+        event = Event.objects.get(event_id=event_ids[0])
+        assert event.event_type == "virus check"
+        assert event.event_outcome == "Pass"
+        assert set(event.agents.values_list("pk", flat=True)) == set(
+            databaseFunctions.getAMAgentsForFile(sip_file)
+        )
+        assert set(
+            Event.objects.get(event_id=event_ids[1]).agents.values_list("pk", flat=True)
+        ) == set(databaseFunctions.getAMAgentsForFile(transfer_file))
+        assert list(
+            Event.objects.get(event_id=event_ids[2]).agents.values_list("pk", flat=True)
+        ) == [2]
+
+    # bulkInsertIntoDerivations
+
+    def test_bulk_insert_into_derivations(self):
+        source_file = "88c8f115-80bc-4da4-a1e6-0158f5df13b9"
+        derived_files = [
+            "1f4af873-8d60-4907-a92e-d1889e643524",
+            "dc569efe-c88f-4be3-94d3-d9eac0c5d410",
+        ]
+
+        databaseFunctions.bulkInsertIntoDerivations(
+            {"sourceFileUUID": source_file, "derivedFileUUID": derived_file}
+            for derived_file in derived_files
+        )
+
+        assert sorted(
+            str(derivation.derived_file_id)
+            for derivation in Derivation.objects.filter(source_file_id=source_file)
+        ) == sorted(derived_files)
+
+    def test_bulk_insert_into_derivations_raises_if_a_file_is_missing(self):
+        with pytest.raises(ValueError, match="derivedFileUUID must be specified"):
+            databaseFunctions.bulkInsertIntoDerivations(
+                [
+                    {
+                        "sourceFileUUID": "88c8f115-80bc-4da4-a1e6-0158f5df13b9",
+                        "derivedFileUUID": "",
+                    }
+                ]
+            )
+        assert not Derivation.objects.exists()
@@ -10,6 +10,7 @@ from lxml import etree
 
 from archivematica.archivematicaCommon import elasticSearchFunctions
 from archivematica.dashboard.components import helpers
+from archivematica.dashboard.fpr import models as fprmodels
 from archivematica.dashboard.main.models import SIP
 from archivematica.dashboard.main.models import Directory
 from archivematica.dashboard.main.models import File
@@ -616,6 +617,134 @@ def test_index_aipfile_fileuuid(
         assert indexed_data[file_uuid["filePath"]] == file_uuid["FILEUUID"]
 
 
+def test_mets_index_maps_sections_by_id():
+    mets = etree.parse(
+        os.path.join(THIS_DIR, "fixtures", "test_index_aipfile_dmdsec_METS_dconly.xml")
+    ).getroot()
+
+    mets_index = elasticSearchFunctions._METSIndex(mets)
+
+    assert set(mets_index.dmd_secs) == {"dmdSec_1", "dmdSec_2"}
+    assert mets_index.amd_secs["amdSec_1"].get("ID") == "amdSec_1"
+    division = mets_index.file_divisions["file-5c1af9c3-0edd-4f99-a681-8894309e9bf2"]
+    assert division.get("LABEL") == "lion.svg"
+    assert division.get("DMDID") == "dmdSec_2"
+
+
+def _synthetic_mets(file_count):
+    """Return the root of a METS document describing `file_count` files."""
+    file_ids = [f"file-{uuid.UUID(int=i)}" for i in range(file_count)]
+    amd_secs = "".join(
+        f"""
+        <mets:amdSec ID="amdSec_{i}"><mets:techMD ID="techMD_{i}">
+          <mets:mdWrap MDTYPE="PREMIS:OBJECT"><mets:xmlData>
+            <premis:object xsi:type="premis:file">
+              <premis:objectIdentifier>
+                <premis:objectIdentifierType>UUID</premis:objectIdentifierType>
+                <premis:objectIdentifierValue>{uuid.UUID(int=i)}</premis:objectIdentifierValue>
+              </premis:objectIdentifier>
+            </premis:object>
+          </mets:xmlData></mets:mdWrap>
+        </mets:techMD></mets:amdSec>"""
+        for i in range(file_count)
+    )
+    dmd_secs = "".join(
+        f"""
+        <mets:dmdSec ID="dmdSec_{i}">
+          <mets:mdWrap MDTYPE="DC"><mets:xmlData>
+            <dcterms:dublincore><dc:title>File {i}</dc:title></dcterms:dublincore>
+          </mets:xmlData></mets:mdWrap>
+        </mets:dmdSec>"""
+        for i in range(file_count)
+    )
+    files = "".join(
+        f"""
+        <mets:file ID="{file_id}" ADMID="amdSec_{i}">
+          <mets:FLocat xlink:href="objects/file_{i}.txt" LOCTYPE="OTHER"/>
+        </mets:file>"""
+        for i, file_id in enumerate(file_ids)
+    )
+    divisions = "".join(
+        f"""
+        <mets:div TYPE="Item" LABEL="file_{i}.txt" DMDID="dmdSec_{i}">
+          <mets:fptr FILEID="{file_id}"/>
+        </mets:div>"""
+        for i, file_id in enumerate(file_ids)
+    )
+    return etree.fromstring(
+        f"""<mets:mets
+          xmlns:mets="http://www.loc.gov/METS/"
+          xmlns:premis="http://www.loc.gov/premis/v3"
+          xmlns:dc="http://purl.org/dc/elements/1.1/"
+          xmlns:dcterms="http://purl.org/dc/terms/"
+          xmlns:xlink="http://www.w3.org/1999/xlink"
+          xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
+          {dmd_secs}{amd_secs}
+          <mets:fileSec><mets:fileGrp USE="original">{files}</mets:fileGrp></mets:fileSec>
+          <mets:structMap TYPE="physical">
+            <mets:div TYPE="Directory" LABEL="objects">{divisions}</mets:div>
+          </mets:structMap>
+        </mets:mets>"""
+    )
+
+
+@pytest.mark.parametrize("file_count", [10, 100])
+@mock.patch(
+    "archivematica.archivematicaCommon.elasticSearchFunctions._get_file_identifiers",
+    return_value=[],
+)
+@mock.patch(
+    "archivematica.archivematicaCommon.elasticSearchFunctions.get_dashboard_uuid"
+)
+@mock.patch("archivematica.archivematicaCommon.elasticSearchFunctions.bulk")
+def test_index_aip_files_queries_the_mets_document_a_fixed_number_of_times(
+    bulk, get_dashboard_uuid, get_file_identifiers, file_count
+):
+    """Indexing each file must not search the whole METS document again.
+
+    A query from the root scans the whole document, so one per file made
+    indexing quadratic in the number of files. The number of those queries
+    must not depend on how many files the AIP has.
+    """
+    mets = _synthetic_mets(file_count)
+    indexed = []
+    bulk.side_effect = lambda client, actions, **kwargs: indexed.extend(actions)
+    root_queries = []
+
+    def counting(query):
+        def wrapper(element, *args, **kwargs):
+            if element is mets:
+                root_queries.append(args[0])
+            return query(element, *args, **kwargs)
+
+        return wrapper
+
+    with (
+        mock.patch.object(
+            elasticSearchFunctions.ns,
+            "xml_find_premis",
+            counting(elasticSearchFunctions.ns.xml_find_premis),
+        ),
+        mock.patch.object(
+            elasticSearchFunctions.ns,
+            "xml_findall_premis",
+            counting(elasticSearchFunctions.ns.xml_findall_premis),
+        ),
+        mock.patch.object(
+            elasticSearchFunctions.ns,
+            "xml_xpath_premis",
+            counting(elasticSearchFunctions.ns.xml_xpath_premis),
+        ),
+    ):
+        elasticSearchFunctions._index_aip_files(
+            client=None, uuid=str(uuid.uuid4()), mets=mets, name="aip"
+        )
+
+    assert len(indexed) == file_count
+    assert indexed[-1]["_source"]["FILEUUID"] == str(uuid.UUID(int=file_count - 1))
+    assert len(root_queries) == 3
+
+
 dmdsec_dconly = {
     "filePath": "objects/lion.svg",
     "dublincore_dict": {
@@ -1061,13 +1190,29 @@ def transfer_file(transfer):
     return result
 
 
+def _streaming_bulk(actions):
+    """Return a streaming_bulk side effect recording the actions sent."""
+
+    def _side_effect(client, chunk, **kwargs):
+        for action in chunk:
+            actions.append(action)
+            yield True, {}
+
+    return _side_effect
+
+
 @pytest.mark.django_db
+@mock.patch("archivematica.archivematicaCommon.elasticSearchFunctions.streaming_bulk")
 @mock.patch("elasticsearch.Elasticsearch.index")
 @mock.patch(
     "elasticsearch.client.cluster.ClusterClient.health",
     return_value={"status": "green"},
 )
-def test_index_transfer_and_files(health, index, es_client, transfer, transfer_file):
+def test_index_transfer_and_files(
+    health, index, streaming_bulk, es_client, transfer, transfer_file
+):
+    actions = []
+    streaming_bulk.side_effect = _streaming_bulk(actions)
     dashboard_uuid = uuid.uuid4()
     helpers.set_setting("dashboard_uuid", str(dashboard_uuid))
     printfn = mock.Mock()
@@ -1086,10 +1231,20 @@ def test_index_transfer_and_files(health, index, es_client, transfer, transfer_f
     )
     assert result == 0
 
-    assert health.mock_calls == [mock.call(), mock.call()]
-    assert index.mock_calls == [
-        mock.call(
-            body={
+    assert health.mock_calls == [mock.call()]
+    streaming_bulk.assert_called_once_with(
+        es_client,
+        mock.ANY,
+        chunk_size=1,
+        raise_on_error=False,
+        raise_on_exception=False,
+    )
+    assert actions == [
+        {
+            "_op_type": "index",
+            "_index": "transferfiles",
+            "_type": "_doc",
+            "_source": {
                 "filename": expected_file_name,
                 "relative_path": f"{expected_transfer_name}/{expected_file_name}",
                 "fileuuid": str(transfer_file.uuid),
@@ -1107,9 +1262,9 @@ def test_index_transfer_and_files(health, index, es_client, transfer, transfer_f
                 "format": [],
                 "pending_deletion": False,
             },
-            index="transferfiles",
-            doc_type="_doc",
-        ),
+        }
+    ]
+    assert index.mock_calls == [
         mock.call(
             body={
                 "accessionid": transfer.accessionid,
@@ -1143,6 +1298,97 @@ def test_index_transfer_and_files(health, index, es_client, transfer, transfer_f
     )
 
 
+@pytest.mark.django_db
+@mock.patch("archivematica.archivematicaCommon.elasticSearchFunctions.streaming_bulk")
+def test_index_transfer_files_in_parallel(
+    streaming_bulk, es_client, transfer, transfer_file
+):
+    transfer_path = pathlib.Path(transfer.currentlocation)
+    (transfer_path / "unknown.txt").touch()
+    format_version = fprmodels.FormatVersion.objects.create(
+        format=fprmodels.Format.objects.create(
+            description="Text",
+            group=fprmodels.FormatGroup.objects.create(description="Text"),
+        ),
+        description="Plain Text",
+        pronom_id="x-fmt/111",
+    )
+    transfer_file.fileformatversion_set.create(format_version=format_version)
+    actions = []
+    streaming_bulk.side_effect = _streaming_bulk(actions)
+
+    with mock.patch(
+        "archivematica.archivematicaCommon.elasticSearchFunctions.ThreadPool",
+        wraps=elasticSearchFunctions.ThreadPool,
+    ) as thread_pool:
+        result = elasticSearchFunctions._index_transfer_files(
+            es_client,
+            str(transfer.uuid),
+            str(transfer.currentlocation),
+            "transfer",
+            "",
+            "2024-01-01",
+            printfn=mock.Mock(),
+            chunk_size=10,
+            thread_count=2,
+        )
+
+    assert result == 2
+    thread_pool.assert_called_once_with(2)
+    documents = {action["_source"]["filename"]: action["_source"] for action in actions}
+    assert documents["file.txt"]["fileuuid"] == str(transfer_file.uuid)
+    assert documents["file.txt"]["format"] == [
+        {"puid": "x-fmt/111", "format": "Plain Text", "group": "Text"}
+    ]
+    assert documents["unknown.txt"]["fileuuid"] == ""
+    assert documents["unknown.txt"]["format"] == []
+
+
+@mock.patch("time.sleep")
+@mock.patch("archivematica.archivematicaCommon.elasticSearchFunctions.streaming_bulk")
+def test_bulk_index_retries_the_documents_that_failed(streaming_bulk, sleep, es_client):
+    sent = []
+
+    def _side_effect(client, chunk, **kwargs):
+        sent.append(list(chunk))
+        for action in chunk:
+            # The second document fails the first time it is sent.
+            if action["_id"] == 2 and len(sent) == 1:
+                yield False, {"index": {"status": 503}}
+            else:
+                yield True, {}
+
+    streaming_bulk.side_effect = _side_effect
+    printfn = mock.Mock()
+
+    elasticSearchFunctions._try_to_bulk_index(
+        es_client, [{"_id": i} for i in range(3)], chunk_size=10, printfn=printfn
+    )
+
+    assert sent == [[{"_id": 0}, {"_id": 1}, {"_id": 2}], [{"_id": 2}]]
+    sleep.assert_called_once_with(10)
+    printfn.assert_any_call("ERROR: error trying to index 1 document(s).")
+
+
+@mock.patch("time.sleep")
+@mock.patch(
+    "archivematica.archivematicaCommon.elasticSearchFunctions.streaming_bulk",
+    side_effect=lambda client, chunk, **kwargs: (
+        (False, {"index": {"status": 503}}) for _ in chunk
+    ),
+)
+def test_bulk_index_raises_once_the_tries_are_exhausted(
+    streaming_bulk, sleep, es_client
+):
+    with pytest.raises(elasticSearchFunctions.BulkIndexError):
+        elasticSearchFunctions._try_to_bulk_index(
+            es_client, [{"_id": 1}], chunk_size=10, max_tries=3, printfn=mock.Mock()
+        )
+
+    assert streaming_bulk.call_count == 3
+    assert sleep.call_count == 2
+
+
 @mock.patch(
     "archivematica.archivematicaCommon.elasticSearchFunctions.search_all_results",
     return_value={
@@ -7,8 +7,10 @@ from unittest.mock import Mock
 from unittest.mock import patch
 
 import pytest
+import pytest_django
 
 import archivematica.archivematicaCommon.executeOrRunSubProcess as execsub
+from archivematica.archivematicaCommon import python_script_runner
 
 
 def test_capture_output() -> None:
@@ -114,3 +116,122 @@ def test_launchSubProcess_replaces_non_utf8_output_with_replacement_characters(
     assert code == communicate_return_code
     assert stdout == communicate_output.decode(errors="replace")
     assert stderr == communicate_error.decode(errors="replace")
+
+
+PYTHON_SCRIPT = """
+import os
+import sys
+
+print("arguments:", sys.argv[1:])
+print("environment:", os.environ.get("SCRIPT_VARIABLE"))
+print("main:", __name__ == "__main__")
+print("error output", file=sys.stderr)
+sys.exit(int(sys.argv[1]))
+"""
+
+
+@pytest.mark.parametrize("capture_output", [True, False], ids=["capture", "no_capture"])
+@pytest.mark.parametrize("exit_code", [0, 3], ids=["success", "failure"])
+def test_python_script_runner_returns_the_same_results(
+    settings: pytest_django.fixtures.SettingsWrapper,
+    capture_output: bool,
+    exit_code: int,
+) -> None:
+    results = {}
+    for use_runner in (False, True):
+        settings.PYTHON_SCRIPT_RUNNER = use_runner
+        results[use_runner] = execsub.executeOrRun(
+            "pythonScript",
+            PYTHON_SCRIPT,
+            arguments=[str(exit_code), "--file-name=a b.txt"],
+            env_updates={"SCRIPT_VARIABLE": "value"},
+            capture_output=capture_output,
+            printing=False,
+        )
+
+    assert results[True] == results[False]
+    assert results[True][0] == exit_code
+
+
+@pytest.mark.parametrize("stdin_type", ["str", "file"])
+def test_python_script_runner_passes_the_standard_input(
+    settings: pytest_django.fixtures.SettingsWrapper, stdin_type: str
+) -> None:
+    script = "import sys\nprint(sys.stdin.read().upper())"
+    results = {}
+    for use_runner in (False, True):
+        settings.PYTHON_SCRIPT_RUNNER = use_runner
+        with tempfile.TemporaryFile() as f:
+            f.write(b"line 1\nline 2\n")
+            f.seek(0)
+            results[use_runner] = execsub.executeOrRun(
+                "pythonScript",
+                script,
+                stdIn="line 1\nline 2\n" if stdin_type == "str" else f,
+                printing=False,
+            )
+
+    assert results[True] == results[False]
+    assert results[True] == (0, "LINE 1\nLINE 2\n\n", "")
+
+
+def test_python_script_runner_does_not_restart_for_large_scripts(
+    settings: pytest_django.fixtures.SettingsWrapper,
+) -> None:
+    settings.PYTHON_SCRIPT_RUNNER = True
+    execsub.executeOrRun("pythonScript", "pass", printing=False)
+    server = python_script_runner._runner.process
+
+    # Larger than the socket buffer, but not than MAX_REQUEST_SIZE.
+    script = f"# {'x' * 1024 * 1024}\nprint('hello')"
+    code, stdout, stderr = execsub.executeOrRun("pythonScript", script, printing=False)
+
+    assert (code, stdout) == (0, "hello\n")
+    assert python_script_runner._runner.process is server
+    assert server.poll() is None
+
+
+def test_python_script_runner_runs_scripts_in_a_forked_interpreter(
+    settings: pytest_django.fixtures.SettingsWrapper,
+) -> None:
+    settings.PYTHON_SCRIPT_RUNNER = True
+    script = "import os, sys\nprint(os.getpid(), 'lxml.etree' in sys.modules)"
+
+    _, first, _ = execsub.executeOrRun("pythonScript", script, printing=False)
+    _, second, _ = execsub.executeOrRun("pythonScript", script, printing=False)
+
+    first_pid, lxml_loaded = first.split()
+    second_pid, _ = second.split()
+    assert first_pid != second_pid
+    assert lxml_loaded == "True"
+
+
+def test_python_script_runner_reports_uncaught_exceptions(
+    settings: pytest_django.fixtures.SettingsWrapper,
+) -> None:
+    settings.PYTHON_SCRIPT_RUNNER = True
+
+    code, stdout, stderr = execsub.executeOrRun(
+        "pythonScript", "raise ValueError('invalid file')", printing=False
+    )
+
+    assert code == 1
+    assert stdout == ""
+    assert "ValueError: invalid file" in stderr
+
+
+@patch(
+    "archivematica.archivematicaCommon.python_script_runner.run",
+    side_effect=OSError("Cannot start interpreter"),
+)
+def test_python_script_runner_falls_back_to_a_new_interpreter(
+    run: Mock, settings: pytest_django.fixtures.SettingsWrapper
+) -> None:
+    settings.PYTHON_SCRIPT_RUNNER = True
+
+    code, stdout, stderr = execsub.executeOrRun(
+        "pythonScript", "print('hello')", printing=False
+    )
+
+    assert run.called
+    assert (code, stdout, stderr) == (0, "hello\n", "")
@@ -1,13 +1,18 @@
 import pathlib
+import uuid
 from unittest import mock
 
 import pytest
+from django.db import connection
 from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
 from archivematica.archivematicaCommon.fileOperations import (
     FindFileInNormalizatonCSVError,
 )
 from archivematica.archivematicaCommon.fileOperations import addAccessionEvent
+from archivematica.archivematicaCommon.fileOperations import bulkAddFilesToTransfer
 from archivematica.archivematicaCommon.fileOperations import findFileInNormalizationCSV
 from archivematica.archivematicaCommon.fileOperations import get_extract_dir_name
 from archivematica.dashboard.main.models import SIP
@@ -56,6 +61,55 @@ def test_addAccessionEvent_adds_registration_event_when_accessionid_is_set():
     assert Event.objects.filter(query_filter).count() == 1
 
 
+def transfer_files(count):
+    return [
+        {
+            "fileUUID": str(uuid.uuid4()),
+            "filePathRelativeToSIP": f"%transferDirectory%objects/{i}.txt",
+            "originalLocation": f"%transferDirectory%objects/package.zip/{i}.txt",
+            "fileSize": i,
+            "checksum": f"checksum{i}",
+            "checksumType": "sha256",
+        }
+        for i in range(count)
+    ]
+
+
+@pytest.mark.django_db
+def test_bulkAddFilesToTransfer_adds_files_and_events():
+    t = Transfer.objects.create(accessionid="my-id")
+    files = transfer_files(3)
+
+    bulkAddFilesToTransfer(files, t.uuid, timezone.now(), sourceType="unpacking")
+
+    for file_ in files:
+        f = File.objects.get(uuid=file_["fileUUID"])
+        assert f.transfer_id == t.uuid
+        assert f.currentlocation.decode() == file_["filePathRelativeToSIP"]
+        assert f.originallocation.decode() == file_["originalLocation"]
+        assert (f.size, f.checksum, f.checksumtype) == (
+            file_["fileSize"],
+            file_["checksum"],
+            "sha256",
+        )
+        assert [
+            e.event_type for e in Event.objects.filter(file_uuid=f).order_by("pk")
+        ] == ["unpacking", "registration", "message digest calculation"]
+
+
+@pytest.mark.django_db
+def test_bulkAddFilesToTransfer_queries_do_not_grow_with_the_files():
+    t = Transfer.objects.create(accessionid="my-id")
+    query_counts = []
+
+    for count in (1, 10):
+        with CaptureQueriesContext(connection) as queries:
+            bulkAddFilesToTransfer(transfer_files(count), t.uuid, timezone.now())
+        query_counts.append(len(queries))
+
+    assert query_counts[0] == query_counts[1]
+
+
 @pytest.fixture
 def sip_directory(tmp_path):
     result = tmp_path / "sip"
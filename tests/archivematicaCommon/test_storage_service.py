@@ -3,18 +3,26 @@
 Tests for the Archivematica Common Storage Service helpers.
 """
 
+import http.server
 import json
+import threading
+import uuid
 from unittest import mock
 
 import pytest
+from requests import Request
 from requests import Response
 
+from archivematica.archivematicaCommon import storageService
 from archivematica.archivematicaCommon.storageService import (
     location_description_from_slug,
 )
 from archivematica.archivematicaCommon.storageService import (
     retrieve_storage_location_description,
 )
+from archivematica.dashboard.main.models import DashboardSetting
+
+PIPELINE_UUID = str(uuid.uuid4())
 
 
 def mock_response(status_code, content_type, content):
@@ -99,3 +107,151 @@ def test_retrieve_storage_location(
     location_description_from_slug.return_value = return_value
     res = retrieve_storage_location_description(slug)
     assert res == expected_result
+
+
+class StubStorageServiceHandler(http.server.BaseHTTPRequestHandler):
+    """Answer the pipeline and location requests of the client."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        self.server.client_ports.add(self.client_address[1])
+        if self.server.failures:
+            self.server.failures -= 1
+            self.reply(503, {})
+        elif self.path.startswith(f"/api/v2/pipeline/{PIPELINE_UUID}/"):
+            self.reply(200, {"uuid": PIPELINE_UUID, "resource_uri": "/pipeline/"})
+        elif self.path.startswith("/api/v2/location/?"):
+            self.reply(
+                200,
+                {
+                    "meta": {"next": None, "limit": 20},
+                    "objects": [{"uuid": "location", "purpose": "CP"}],
+                },
+            )
+        else:
+            self.reply(404, {})
+
+    def reply(self, status, content):
+        body = json.dumps(content).encode("utf8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def storage_service(monkeypatch):
+    server = http.server.ThreadingHTTPServer(
+        ("127.0.0.1", 0), StubStorageServiceHandler
+    )
+    server.requests = []
+    server.client_ports = set()
+    server.failures = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    DashboardSetting.objects.create(
+        name="storage_service_url",
+        value=f"http://127.0.0.1:{server.server_address[1]}/",
+    )
+    DashboardSetting.objects.create(name="dashboard_uuid", value=PIPELINE_UUID)
+    monkeypatch.setattr(storageService, "RETRY_BACKOFF_FACTOR", 0)
+    storageService.close_sessions()
+    storageService.storage_service_cache.clear()
+
+    yield server
+
+    storageService.close_sessions()
+    storageService.storage_service_cache.clear()
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.django_db
+def test_requests_reuse_the_connections_of_the_process(storage_service):
+    session = storageService._storage_api_session()
+
+    assert storageService._storage_api_session() is session
+    assert storageService._storage_api_slow_session() is not session
+
+    for _ in range(3):
+        storageService.get_pipeline(PIPELINE_UUID)
+        storageService.get_first_location(purpose="CP")
+
+    # get_location requests the pipeline too.
+    assert len(storage_service.requests) == 9
+    assert len(storage_service.client_ports) == 1
+
+
+@pytest.mark.django_db
+def test_threads_have_their_own_sessions_sharing_the_connections(storage_service):
+    session = storageService._storage_api_session()
+    # Read in this thread, the settings are not committed.
+    url = f"{storageService._storage_service_url()}pipeline/{PIPELINE_UUID}/"
+    session.get(url)
+    thread_sessions = []
+
+    def request():
+        thread_sessions.append(storageService._storage_api_session())
+        thread_sessions[0].get(url)
+
+    thread = threading.Thread(target=request)
+    thread.start()
+    thread.join()
+
+    assert thread_sessions[0] is not session
+    assert thread_sessions[0].get_adapter("http://") is session.get_adapter("http://")
+    assert len(storage_service.requests) == 2
+    assert len(storage_service.client_ports) == 1
+
+
+@pytest.mark.django_db
+def test_unavailable_responses_are_retried(storage_service):
+    storage_service.failures = 2
+
+    assert storageService.get_pipeline(PIPELINE_UUID)["uuid"] == PIPELINE_UUID
+    assert len(storage_service.requests) == 3
+
+
+@pytest.mark.django_db
+def test_locations_and_pipeline_are_cached(storage_service, settings, monkeypatch):
+    settings.STORAGE_SERVICE_CACHE_TTL = 60
+    now = 1000.0
+    monkeypatch.setattr(storageService.time, "monotonic", lambda: now)
+
+    location = storageService.get_first_location(purpose="CP")
+    location["purpose"] = "modified by the caller"
+    assert storageService.get_first_location(purpose="CP")["purpose"] == "CP"
+    assert storageService.get_pipeline(PIPELINE_UUID)["uuid"] == PIPELINE_UUID
+    assert len(storage_service.requests) == 2
+
+    # Other arguments are other lookups.
+    storageService.get_location(purpose="AS")
+    assert len(storage_service.requests) == 3
+
+    now += 61
+    storageService.get_first_location(purpose="CP")
+    assert len(storage_service.requests) == 5
+
+
+@pytest.mark.django_db
+def test_credentials_are_read_in_one_lookup(settings, django_assert_num_queries):
+    settings.DASHBOARD_SETTINGS_CACHE_TTL = 0
+    DashboardSetting.objects.create(name="storage_service_user", value="user")
+    DashboardSetting.objects.create(name="storage_service_apikey", value="key")
+    request = Request("GET", "http://127.0.0.1/api/v2/").prepare()
+
+    with django_assert_num_queries(1):
+        storageService.ApiKeyAuth()(request)
+    with django_assert_num_queries(1):
+        params = storageService._storage_api_params()
+    with django_assert_num_queries(0):
+        storageService.ApiKeyAuth("other", "secret")(request)
+
+    assert params == "username=user&api_key=key"
+    assert request.headers["Authorization"] == "ApiKey other:secret"
@@ -0,0 +1,197 @@
+import json
+import pathlib
+import uuid
+
+import pytest
+import pytest_django
+from django.core.management import call_command
+from django.core.management.sql import emit_post_migrate_signal
+
+from archivematica.dashboard.fpr import snapshot
+from archivematica.dashboard.fpr.models import Format
+from archivematica.dashboard.fpr.models import FormatGroup
+from archivematica.dashboard.fpr.models import FormatVersion
+from archivematica.dashboard.fpr.models import FPCommand
+from archivematica.dashboard.fpr.models import FPRule
+from archivematica.dashboard.fpr.models import FPTool
+from archivematica.dashboard.fpr.models import Revision
+from archivematica.dashboard.main.models import File
+from archivematica.dashboard.main.models import FileFormatVersion
+from archivematica.dashboard.main.models import Transfer
+
+PURPOSE = "characterization"
+
+
+@pytest.fixture
+def format_versions() -> list[FormatVersion]:
+    format = Format.objects.create(group=FormatGroup.objects.create())
+    return [FormatVersion.objects.create(format=format) for _ in range(2)]
+
+
+@pytest.fixture
+def fpcommand() -> FPCommand:
+    return FPCommand.objects.create(tool=FPTool.objects.create())
+
+
+@pytest.fixture
+def snapshot_cache(settings: pytest_django.fixtures.SettingsWrapper):
+    settings.FPR_SNAPSHOT_CACHE = True
+    snapshot.fpr_snapshot_cache.clear()
+    yield snapshot.fpr_snapshot_cache
+    snapshot.fpr_snapshot_cache.clear()
+
+
+@pytest.mark.django_db
+def test_snapshot_resolves_rules_like_the_active_manager(
+    format_versions: list[FormatVersion],
+    fpcommand: FPCommand,
+    django_assert_num_queries: pytest_django.DjangoAssertNumQueries,
+) -> None:
+    FPRule.objects.filter(purpose__in=[PURPOSE, f"default_{PURPOSE}"]).delete()
+    first, second = format_versions
+    rule = FPRule.objects.create(command=fpcommand, format=first, purpose=PURPOSE)
+    FPRule.objects.create(
+        command=fpcommand, format=first, purpose=PURPOSE, enabled=False
+    )
+    defaults = [
+        FPRule.objects.create(
+            command=fpcommand, format=fv, purpose=f"default_{PURPOSE}"
+        )
+        for fv in format_versions
+    ]
+    fpr = snapshot.FPRSnapshot()
+
+    # One query per purpose, with the commands and tools of the rules.
+    with django_assert_num_queries(2):
+        assert fpr.rules_for_format(first, PURPOSE) == [rule]
+        assert fpr.rules_for_format(str(second.uuid), PURPOSE) == []
+        assert fpr.rule_for_format(first, PURPOSE).command.tool == fpcommand.tool
+        assert fpr.rules_for_purpose(f"default_{PURPOSE}") == defaults
+
+    with pytest.raises(FPRule.DoesNotExist):
+        fpr.rule_for_format(second, PURPOSE)
+    with pytest.raises(FPRule.MultipleObjectsReturned):
+        fpr.default_rule(PURPOSE)
+
+
+@pytest.mark.django_db
+def test_cached_snapshot_is_replaced_when_the_fpr_changes(
+    snapshot_cache: snapshot.FPRSnapshotCache,
+    format_versions: list[FormatVersion],
+    fpcommand: FPCommand,
+) -> None:
+    revision = Revision.current()
+    fpr = snapshot.current()
+
+    assert snapshot.current() is fpr
+
+    FPRule.objects.create(command=fpcommand, format=format_versions[0])
+
+    assert Revision.current() == revision + 1
+    assert snapshot.current() is not fpr
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("write", ["update", "bulk_update", "bulk_create"])
+def test_cached_snapshot_is_replaced_after_bulk_writes(
+    snapshot_cache: snapshot.FPRSnapshotCache,
+    format_versions: list[FormatVersion],
+    fpcommand: FPCommand,
+    write: str,
+) -> None:
+    rule = FPRule.objects.create(command=fpcommand, format=format_versions[0])
+    fpr = snapshot.current()
+
+    if write == "update":
+        FPRule.active.filter(pk=rule.pk).update(enabled=False)
+    elif write == "bulk_update":
+        rule.enabled = False
+        FPRule.objects.bulk_update([rule], ["enabled"])
+    else:
+        FPRule.objects.bulk_create(
+            [FPRule(command=fpcommand, format=format_versions[1])]
+        )
+
+    assert snapshot.current() is not fpr
+
+
+@pytest.mark.django_db
+def test_cached_snapshot_is_replaced_after_loading_a_fixture(
+    snapshot_cache: snapshot.FPRSnapshotCache,
+    tmp_path: pathlib.Path,
+) -> None:
+    fixture = tmp_path / "fpr.json"
+    fixture.write_text(
+        json.dumps(
+            [
+                {
+                    "model": "fpr.formatgroup",
+                    "pk": 10000,
+                    "fields": {
+                        "uuid": str(uuid.uuid4()),
+                        "description": "Fixture group",
+                        "slug": "fixture-group",
+                    },
+                }
+            ]
+        )
+    )
+    fpr = snapshot.current()
+
+    call_command("loaddata", str(fixture), verbosity=0)
+
+    assert snapshot.current() is not fpr
+
+
+@pytest.mark.django_db
+def test_cached_snapshot_is_replaced_after_migrating(
+    snapshot_cache: snapshot.FPRSnapshotCache,
+) -> None:
+    fpr = snapshot.current()
+
+    emit_post_migrate_signal(verbosity=0, interactive=False, db="default")
+
+    assert snapshot.current() is not fpr
+
+
+@pytest.mark.django_db
+def test_snapshot_is_not_cached_when_disabled(
+    settings: pytest_django.fixtures.SettingsWrapper,
+) -> None:
+    settings.FPR_SNAPSHOT_CACHE = False
+
+    assert snapshot.current() is not snapshot.current()
+
+
+@pytest.mark.django_db
+def test_file_format_versions_are_loaded_per_batch(
+    format_versions: list[FormatVersion],
+    django_assert_num_queries: pytest_django.DjangoAssertNumQueries,
+) -> None:
+    transfer = Transfer.objects.create()
+    enabled, disabled = format_versions
+    disabled.enabled = False
+    disabled.save()
+    identified, unidentified, disabled_format = (
+        File.objects.create(transfer=transfer) for _ in range(3)
+    )
+    FileFormatVersion.objects.create(file_uuid=identified, format_version=enabled)
+    FileFormatVersion.objects.create(file_uuid=disabled_format, format_version=disabled)
+    file_format_versions = snapshot.FileFormatVersions(
+        [identified.uuid, unidentified.uuid, str(disabled_format.uuid), "None"]
+    )
+
+    with django_assert_num_queries(1):
+        assert file_format_versions.active_format_version(identified.uuid) == enabled
+        assert file_format_versions.get(disabled_format.uuid).format_version == (
+            disabled
+        )
+        with pytest.raises(FormatVersion.DoesNotExist):
+            file_format_versions.active_format_version(disabled_format.uuid)
+        with pytest.raises(FileFormatVersion.DoesNotExist):
+            file_format_versions.get(unidentified.uuid)
+
+    # Files outside of the batch are looked up on their own.
+    with django_assert_num_queries(1):
+        with pytest.raises(FileFormatVersion.DoesNotExist):
+            file_format_versions.get(uuid.uuid4())
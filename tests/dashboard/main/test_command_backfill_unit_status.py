@@ -0,0 +1,33 @@
+import pytest
+from django.core.management import call_command
+
+from archivematica.dashboard.main import models
+
+
+@pytest.mark.django_db
+def test_backfill_records_the_status_of_units_without_one(transfer, sip):
+    models.UnitStatus.objects.create(
+        unit_uuid=sip.uuid, unit_type="unitSIP", status="COMPLETE"
+    )
+    # Units without jobs have no status.
+    models.Transfer.objects.create()
+
+    call_command("backfill_unit_status")
+
+    assert models.UnitStatus.objects.get(unit_uuid=transfer.uuid).to_dict() == {
+        "status": "PROCESSING",
+        "microservice": "",
+    }
+    assert models.UnitStatus.objects.get(unit_uuid=sip.uuid).status == "COMPLETE"
+    assert models.UnitStatus.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_backfill_all_recomputes_recorded_statuses(sip):
+    models.UnitStatus.objects.create(
+        unit_uuid=sip.uuid, unit_type="unitSIP", status="COMPLETE"
+    )
+
+    call_command("backfill_unit_status", "--all")
+
+    assert models.UnitStatus.objects.get(unit_uuid=sip.uuid).status == "PROCESSING"
@@ -1,5 +1,7 @@
 import datetime
+import itertools
 import json
+import threading
 import uuid
 from unittest import mock
 
@@ -13,6 +15,7 @@ from lxml import etree
 from archivematica.archivematicaCommon import archivematicaFunctions
 from archivematica.archivematicaCommon.processing import install_builtin_config
 from archivematica.dashboard.components import helpers
+from archivematica.dashboard.components.api import changes
 from archivematica.dashboard.components.api import views
 from archivematica.dashboard.main.models import PACKAGE_STATUS_COMPLETED_SUCCESSFULLY
 from archivematica.dashboard.main.models import SIP
@@ -26,6 +29,7 @@ from archivematica.dashboard.main.models import RightsStatement
 from archivematica.dashboard.main.models import SIPArrange
 from archivematica.dashboard.main.models import Task
 from archivematica.dashboard.main.models import Transfer
+from archivematica.dashboard.main.models import UnitStatus
 
 
 def load_fixture(fixtures):
@@ -413,6 +417,141 @@ def test_completed_units_with_bogus_unit(transfer, sip, jobs_transfer_complete,
     assert completed == [str(transfer.uuid)]
 
 
+@pytest.mark.django_db
+def test_get_unit_status_reads_the_recorded_status(
+    transfer, sip, django_assert_num_queries
+):
+    UnitStatus.objects.create(
+        unit_uuid=transfer.uuid,
+        unit_type="unitTransfer",
+        status="COMPLETE",
+        microservice="Create SIP from transfer objects",
+        sip_uuid=str(sip.uuid),
+    )
+
+    with django_assert_num_queries(1):
+        status = views.get_unit_status(transfer.uuid, "unitTransfer")
+
+    assert status == {
+        "status": "COMPLETE",
+        "microservice": "Create SIP from transfer objects",
+        "sip_uuid": str(sip.uuid),
+    }
+
+
+@pytest.mark.django_db
+def test_completed_units_reads_the_recorded_statuses(transfer, jobs_processing):
+    """Units without a recorded status get it computed from their jobs."""
+    recorded = Transfer.objects.create()
+    hidden = Transfer.objects.create(hidden=True)
+    for unit in (recorded, hidden):
+        UnitStatus.objects.create(
+            unit_uuid=unit.uuid, unit_type="unitTransfer", status="COMPLETE"
+        )
+
+    completed = views._completed_units()
+
+    assert completed == [str(recorded.uuid)]
+
+
+@pytest.mark.django_db
+def test_unit_changes_returns_the_units_changed_since_a_sequence(
+    admin_client, dashboard_uuid, transfer, sip, jobs_processing
+):
+    UnitStatus.objects.refresh(transfer.uuid, "unitTransfer")
+    Job.objects.create(
+        sipuuid=sip.uuid,
+        unittype="unitSIP",
+        createdtime="2016-10-04T23:10:00Z",
+        jobtype="Normalize for preservation",
+    )
+    UnitStatus.objects.refresh(sip.uuid, "unitSIP")
+    since = UnitStatus.objects.get(unit_uuid=transfer.uuid).sequence
+
+    resp = admin_client.get(reverse("api:unit_changes"), {"since": since})
+
+    assert resp.status_code == 200
+    payload = json.loads(resp.content.decode("utf8"))
+    assert payload["sequence"] == since + 1
+    assert [(r["uuid"], r["type"], r["status"]) for r in payload["results"]] == [
+        (str(sip.uuid), "SIP", "PROCESSING")
+    ]
+
+    resp = admin_client.get(reverse("api:unit_changes"), {"since": 0, "limit": 1})
+    payload = json.loads(resp.content.decode("utf8"))
+    assert payload["results"][0]["uuid"] == str(transfer.uuid)
+    assert payload["results"][0]["job_uuid"] == str(jobs_processing[-1].jobuuid)
+    assert payload["sequence"] == since
+
+
+@pytest.mark.django_db
+def test_unit_changes_waits_for_a_change(admin_client, dashboard_uuid, settings):
+    settings.API_CHANGES_MAX_WAIT = 0.2
+
+    with mock.patch.object(
+        views.changes_notifier, "wait", return_value=None
+    ) as notifier_wait:
+        resp = admin_client.get(reverse("api:unit_changes"), {"since": 5, "wait": 60})
+
+    assert resp.status_code == 200
+    payload = json.loads(resp.content.decode("utf8"))
+    assert payload["results"] == []
+    assert payload["sequence"] == 5
+    since, timeout = notifier_wait.call_args[0]
+    assert since == 5
+    assert 0 < timeout <= 0.2
+
+
+def test_sequence_notifier_wakes_the_waiting_requests_from_one_poller():
+    notifier = changes.SequenceNotifier(poll_interval=0.05)
+    results = []
+
+    with (
+        mock.patch.object(
+            changes.SequenceNotifier,
+            "current",
+            side_effect=itertools.chain([5, 5], itertools.repeat(6)),
+        ),
+        mock.patch.object(
+            changes.SequenceNotifier,
+            "_poll",
+            autospec=True,
+            side_effect=changes.SequenceNotifier._poll,
+        ) as poll,
+    ):
+        waiters = [
+            threading.Thread(target=lambda: results.append(notifier.wait(5, 5)))
+            for _ in range(3)
+        ]
+        for waiter in waiters:
+            waiter.start()
+        for waiter in waiters:
+            waiter.join()
+        poller = notifier.poller
+        if poller is not None:
+            poller.join()
+
+    assert results == [6, 6, 6]
+    # One poller read the sequence for every request and stopped afterwards.
+    assert poll.call_count == 1
+    assert notifier.poller is None
+    assert notifier.waiters == 0
+
+
+def test_sequence_notifier_times_out_without_changes():
+    notifier = changes.SequenceNotifier(poll_interval=0.01)
+
+    with mock.patch.object(changes.SequenceNotifier, "current", return_value=5):
+        assert notifier.wait(5, 0.05) is None
+
+
+@pytest.mark.django_db
+def test_unit_changes_rejects_invalid_parameters(admin_client, dashboard_uuid):
+    resp = admin_client.get(reverse("api:unit_changes"), {"since": "x"})
+
+    assert resp.status_code == 400
+
+
 @pytest.mark.django_db
 def test_completed_transfers(
     admin_client, dashboard_uuid, transfer, sip, jobs_transfer_complete, files